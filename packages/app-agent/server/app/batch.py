@@ -0,0 +1,164 @@
+"""Batched agent turns for evaluation and scripted workloads.
+
+A batch runs many turns with bounded concurrency, inside the same admission
+slots as background jobs, and reports each result as soon as it completes.
+The batch ends with a summary of its throughput and latency percentiles.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Awaitable, Callable, Sequence, TypeVar
+
+from app.jobs import JobFailedError
+
+_T = TypeVar("_T")
+
+
+@dataclass(frozen=True, slots=True)
+class BatchItemResult:
+    """Describe the outcome of one turn of a batch.
+
+    Attributes:
+        index: Position of the turn in the submitted batch.
+        status_code: HTTP status the synchronous endpoint would return.
+        duration_ms: Time from admission to completion.
+        response: Agent-turn response payload of a successful turn.
+        error: Failure message of a failed turn.
+    """
+
+    index: int
+    status_code: int
+    duration_ms: int
+    response: dict[str, Any] | None = None
+    error: str | None = None
+
+    def to_json(self) -> dict[str, Any]:
+        """Return the NDJSON line payload of this result."""
+        payload: dict[str, Any] = {
+            "index": self.index,
+            "status": self.status_code,
+            "durationMs": self.duration_ms,
+        }
+        if self.response is not None:
+            payload["response"] = self.response
+        if self.error is not None:
+            payload["error"] = self.error
+        return payload
+
+
+@dataclass(frozen=True, slots=True)
+class BatchSummary:
+    """Summarize the throughput and latency of a finished batch.
+
+    Latency percentiles use the nearest-rank method over every turn,
+    including failed ones, and are None for an empty batch.
+    """
+
+    completed: int
+    failed: int
+    wall_ms: int
+    turns_per_second: float
+    p50_ms: int | None
+    p95_ms: int | None
+    p99_ms: int | None
+
+    def to_json(self) -> dict[str, Any]:
+        """Return the NDJSON summary line payload."""
+        return {
+            "summary": {
+                "completed": self.completed,
+                "failed": self.failed,
+                "wallMs": self.wall_ms,
+                "turnsPerSecond": round(self.turns_per_second, 2),
+                "latencyMs": {
+                    "p50": self.p50_ms,
+                    "p95": self.p95_ms,
+                    "p99": self.p99_ms,
+                },
+            }
+        }
+
+
+async def run_batch(
+    items: Sequence[_T],
+    run_one: Callable[[_T], Awaitable[dict[str, Any]]],
+    *,
+    concurrency: int,
+    admission: asyncio.Semaphore,
+) -> AsyncGenerator[BatchItemResult, None]:
+    """Run every item and yield its result as soon as it completes.
+
+    Args:
+        items: Turns to run.
+        run_one: Coroutine function that runs one turn and returns its
+            response payload. It reports expected failures with
+            `JobFailedError`.
+        concurrency: Most turns of this batch that run at once.
+        admission: Relay-wide admission slots shared with other work.
+
+    Returns:
+        Async generator of results, in completion order. Closing it cancels
+        the turns that have not completed.
+    """
+    limit = asyncio.Semaphore(concurrency)
+
+    async def run_item(index: int, item: _T) -> BatchItemResult:
+        async with limit, admission:
+            started_at = time.perf_counter()
+            try:
+                response = await run_one(item)
+            except JobFailedError as exc:
+                return BatchItemResult(
+                    index, exc.status_code, _elapsed_ms(started_at), error=str(exc)
+                )
+            except Exception as exc:
+                return BatchItemResult(
+                    index,
+                    500,
+                    _elapsed_ms(started_at),
+                    error="Batch turn failed: " + str(exc),
+                )
+            return BatchItemResult(
+                index, 200, _elapsed_ms(started_at), response=response
+            )
+
+    tasks = [
+        asyncio.create_task(run_item(index, item)) for index, item in enumerate(items)
+    ]
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            yield await next_result
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def summarize_batch(results: Sequence[BatchItemResult], wall_ms: int) -> BatchSummary:
+    """Summarize the results of a finished batch."""
+    latencies = sorted(result.duration_ms for result in results)
+    completed = sum(1 for result in results if result.status_code == 200)
+    return BatchSummary(
+        completed=completed,
+        failed=len(results) - completed,
+        wall_ms=wall_ms,
+        turns_per_second=completed / (wall_ms / 1000) if wall_ms > 0 else 0.0,
+        p50_ms=latency_percentile(latencies, 50),
+        p95_ms=latency_percentile(latencies, 95),
+        p99_ms=latency_percentile(latencies, 99),
+    )
+
+
+def latency_percentile(sorted_latencies: Sequence[int], percent: float) -> int | None:
+    """Return the nearest-rank percentile of sorted latencies."""
+    if not sorted_latencies:
+        return None
+    rank = max(math.ceil(percent / 100 * len(sorted_latencies)), 1)
+    return sorted_latencies[rank - 1]
+
+
+def _elapsed_ms(started_at: float) -> int:
+    return round((time.perf_counter() - started_at) * 1000)
@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import gzip
+import io
+import json
+import logging
+import zlib
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Literal
+
+try:
+    import zstandard  # type: ignore[import-not-found, unused-ignore]
+except ImportError:  # pragma: no cover - depends on the optional package
+    zstandard = None
+
+Message = dict[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+ASGIApp = Callable[[dict[str, Any], Receive, Send], Awaitable[None]]
+
+MAX_DECOMPRESSED_REQUEST_BYTES = 256 * 1024 * 1024
+GZIP_COMPRESS_LEVEL = 5
+ZSTD_COMPRESS_LEVEL = 3
+REQUEST_BODY_COMPRESSION_STATE_KEY = "request_body_compression"
+
+
+class BodyDecodingError(ValueError):
+    """Raised when a compressed body cannot be decoded."""
+
+    def __init__(self, message: str, status_code: int = 400) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass(frozen=True, slots=True)
+class BodyCompressionRecord:
+    """Describe the wire and decoded size of one request body.
+
+    Attributes:
+        direction: Which hop the body travelled over.
+        encoding: Content encoding used on the wire, or `identity`.
+        wire_bytes: Body size as sent over the network.
+        decoded_bytes: Body size after decompression.
+    """
+
+    direction: Literal["browser request", "upstream request"]
+    encoding: str
+    wire_bytes: int
+    decoded_bytes: int
+
+    @property
+    def ratio(self) -> float:
+        """Return the decoded-to-wire size ratio."""
+        return self.decoded_bytes / max(self.wire_bytes, 1)
+
+
+def supported_content_encodings() -> tuple[str, ...]:
+    """Return the body encodings this process can decode and produce."""
+    return ("gzip", "zstd") if zstandard is not None else ("gzip",)
+
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    """Compress a request body with the given content encoding.
+
+    Args:
+        body: Uncompressed body bytes.
+        encoding: `gzip` or `zstd`.
+
+    Returns:
+        Compressed body bytes.
+
+    Raises:
+        ValueError: If the encoding is not supported in this process.
+    """
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_COMPRESS_LEVEL, mtime=0)
+
+    if encoding == "zstd" and zstandard is not None:
+        compressor = zstandard.ZstdCompressor(level=ZSTD_COMPRESS_LEVEL)
+        compressed: bytes = compressor.compress(body)
+        return compressed
+
+    raise ValueError("Unsupported content encoding: " + encoding)
+
+
+def decompress_body(
+    body: bytes,
+    encoding: str,
+    max_bytes: int = MAX_DECOMPRESSED_REQUEST_BYTES,
+) -> bytes:
+    """Decompress a request body, refusing to expand past `max_bytes`.
+
+    Args:
+        body: Compressed body bytes.
+        encoding: `gzip` or `zstd`.
+        max_bytes: Largest accepted decompressed size.
+
+    Returns:
+        Decompressed body bytes.
+
+    Raises:
+        BodyDecodingError: If the encoding is unsupported, the body is
+            corrupt, or it expands past `max_bytes`.
+    """
+    if encoding not in supported_content_encodings():
+        raise BodyDecodingError(
+            "Unsupported Content-Encoding: "
+            + encoding
+            + ". Supported encodings: "
+            + ", ".join(supported_content_encodings()),
+            status_code=415,
+        )
+
+    decoded = b""
+    try:
+        if encoding == "gzip":
+            decompressor = zlib.decompressobj(wbits=31)
+            decoded = decompressor.decompress(body, max_bytes + 1)
+            if len(decoded) <= max_bytes and not decompressor.eof:
+                raise BodyDecodingError("Compressed request body is truncated.")
+        elif zstandard is not None:
+            with zstandard.ZstdDecompressor().stream_reader(io.BytesIO(body)) as reader:
+                decoded = reader.read(max_bytes + 1)
+    except BodyDecodingError:
+        raise
+    except Exception as exc:
+        raise BodyDecodingError(
+            "Request body is not valid " + encoding + " data: " + str(exc)
+        ) from exc
+
+    if len(decoded) > max_bytes:
+        raise BodyDecodingError(
+            "Decompressed request body exceeds " + str(max_bytes) + " bytes.",
+            status_code=413,
+        )
+
+    return decoded
+
+
+def format_body_compression_record(record: BodyCompressionRecord) -> str:
+    """Format a one-line body size summary for logs and tests."""
+    return (
+        f"Agent body size: {record.direction} {record.encoding} "
+        f"{record.wire_bytes} -> {record.decoded_bytes} bytes "
+        f"(ratio {record.ratio:.2f})"
+    )
+
+
+def log_body_compression_record(
+    logger: logging.Logger, record: BodyCompressionRecord
+) -> None:
+    """Log the wire and decoded size of one request body."""
+    logger.info("%s", format_body_compression_record(record))
+
+
+class RequestDecompressionMiddleware:
+    """Decode `Content-Encoding: gzip` or `zstd` request bodies.
+
+    Compressed bodies are buffered, decompressed, and handed to the app
+    without the `Content-Encoding` header, so route handlers and request
+    validation see plain JSON. The wire and decoded sizes are stored in the
+    request state under `request_body_compression` for per-turn logging.
+    Uncompressed bodies pass through untouched and only have their declared
+    length recorded.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_decompressed_bytes: int = MAX_DECOMPRESSED_REQUEST_BYTES,
+    ) -> None:
+        self.app = app
+        self.max_decompressed_bytes = max_decompressed_bytes
+
+    async def __call__(
+        self, scope: dict[str, Any], receive: Receive, send: Send
+    ) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = _read_headers(scope)
+        encoding = headers.get(b"content-encoding", b"").decode("latin-1")
+        encoding = encoding.strip().lower()
+        state = scope.setdefault("state", {})
+        if encoding in {"", "identity"}:
+            content_length = headers.get(b"content-length")
+            if content_length is not None and content_length.isdigit():
+                size = int(content_length)
+                state[REQUEST_BODY_COMPRESSION_STATE_KEY] = BodyCompressionRecord(
+                    direction="browser request",
+                    encoding="identity",
+                    wire_bytes=size,
+                    decoded_bytes=size,
+                )
+            await self.app(scope, receive, send)
+            return
+
+        body = await _read_body(receive)
+        try:
+            decoded = decompress_body(body, encoding, self.max_decompressed_bytes)
+        except BodyDecodingError as exc:
+            await _send_error(send, exc.status_code, str(exc))
+            return
+
+        state[REQUEST_BODY_COMPRESSION_STATE_KEY] = BodyCompressionRecord(
+            direction="browser request",
+            encoding=encoding,
+            wire_bytes=len(body),
+            decoded_bytes=len(decoded),
+        )
+        scope = {
+            **scope,
+            "headers": [
+                (name, value)
+                for name, value in scope["headers"]
+                if name.lower() not in {b"content-encoding", b"content-length"}
+            ]
+            + [(b"content-length", str(len(decoded)).encode("latin-1"))],
+        }
+        await self.app(scope, _replay_body(decoded, receive), send)
+
+
+def _read_headers(scope: dict[str, Any]) -> dict[bytes, bytes]:
+    return {name.lower(): value for name, value in scope.get("headers", [])}
+
+
+async def _read_body(receive: Receive) -> bytes:
+    chunks: list[bytes] = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+def _replay_body(body: bytes, receive: Receive) -> Receive:
+    """Return a receive callable that yields `body` once, then defers."""
+    sent = False
+
+    async def replay() -> Message:
+        nonlocal sent
+        if sent:
+            return await receive()
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return replay
+
+
+async def _send_error(send: Send, status_code: int, detail: str) -> None:
+    body = json.dumps({"detail": detail}, ensure_ascii=False).encode("utf-8")
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
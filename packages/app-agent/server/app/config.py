@@ -6,7 +6,13 @@ import os
 from dataclasses import dataclass
 from importlib import resources
 
+from .compression import supported_content_encodings
+
 logger = logging.getLogger(__name__)
+DEFAULT_WARMUP_MESSAGE = "Reply with OK."
+DEFAULT_STREAM_BUFFER_MAX_BYTES = 1024 * 1024
+DEFAULT_STREAM_COALESCE_MAX_BYTES = 2048
+DEFAULT_TRAFFIC_RECORD_MAX_BYTES = 64 * 1024 * 1024
 
 
 @dataclass(frozen=True)
@@ -20,6 +26,49 @@ class Settings:
     prefer_responses_role_compat: bool
     enable_token_debug_logs: bool
     enable_throughput_debug_logs: bool
+    history_token_budget: int | None = None
+    history_keep_recent_turns: int = 4
+    compact_tool_outputs: bool = False
+    tool_output_keep_recent: int = 2
+    prompt_token_budget: int | None = None
+    context_prune_order: tuple[str, ...] | None = None
+    context_prune_depths: tuple[int, ...] | None = None
+    upstream_request_compression: str | None = None
+    session_store_path: str | None = None
+    session_max_entries: int = 32
+    session_idle_ttl_seconds: int = 3600
+    enable_response_chaining: bool = False
+    send_prompt_cache_key: bool = False
+    enable_prefix_debug_logs: bool = False
+    learn_context_key_order: bool = False
+    context_key_order_warmup_turns: int = 4
+    backend_base_urls: tuple[str, ...] | None = None
+    routing_key: str = "session"
+    routing_load_factor: float = 1.25
+    enable_prewarm: bool = False
+    prewarm_max_per_minute: int = 6
+    enable_startup_warmup: bool = False
+    warmup_message: str = DEFAULT_WARMUP_MESSAGE
+    keep_alive_interval_seconds: int | None = None
+    model_keep_alive: str | None = None
+    probe_upstream_capabilities: bool = False
+    capability_cache_path: str | None = None
+    connect_timeout_seconds: float | None = None
+    first_event_timeout_seconds: float | None = None
+    stream_idle_timeout_seconds: float | None = None
+    total_timeout_seconds: float | None = None
+    send_upstream_cancel: bool = False
+    stream_buffer_max_bytes: int = DEFAULT_STREAM_BUFFER_MAX_BYTES
+    stream_coalesce_ms: int = 0
+    stream_coalesce_max_bytes: int = DEFAULT_STREAM_COALESCE_MAX_BYTES
+    enable_stream_resumption: bool = False
+    stream_replay_ttl_seconds: int = 60
+    stream_resume_grace_seconds: int = 15
+    job_max_concurrency: int = 4
+    job_store_path: str | None = None
+    job_ttl_seconds: int = 3600
+    traffic_record_path: str | None = None
+    traffic_record_max_bytes: int = DEFAULT_TRAFFIC_RECORD_MAX_BYTES
 
 
 def describe_api_key_for_logs(api_key: str) -> str:
@@ -63,8 +112,9 @@ def load_settings() -> Settings:
     """
     api_key_env = os.environ.get("GENOMESPY_AGENT_API_KEY")
     api_key = api_key_env if api_key_env is not None else "ollama"
+    model = os.environ["GENOMESPY_AGENT_MODEL"]
     settings = Settings(
-        model=os.environ["GENOMESPY_AGENT_MODEL"],
+        model=model,
         base_url=os.environ.get(
             "GENOMESPY_AGENT_BASE_URL", "http://127.0.0.1:11434/v1"
         ).rstrip("/"),
@@ -85,6 +135,131 @@ def load_settings() -> Settings:
         enable_throughput_debug_logs=_load_bool_env(
             "GENOMESPY_AGENT_ENABLE_THROUGHPUT_DEBUG_LOGS", True
         ),
+        history_token_budget=_load_optional_positive_int_env(
+            "GENOMESPY_AGENT_HISTORY_TOKEN_BUDGET"
+        ),
+        history_keep_recent_turns=_load_positive_int_env(
+            "GENOMESPY_AGENT_HISTORY_KEEP_RECENT_TURNS", 4
+        ),
+        compact_tool_outputs=_load_bool_env(
+            "GENOMESPY_AGENT_COMPACT_TOOL_OUTPUTS", False
+        ),
+        tool_output_keep_recent=_load_positive_int_env(
+            "GENOMESPY_AGENT_TOOL_OUTPUT_KEEP_RECENT", 2
+        ),
+        prompt_token_budget=_load_prompt_token_budget(
+            "GENOMESPY_AGENT_PROMPT_TOKEN_BUDGETS", model
+        ),
+        context_prune_order=_load_optional_csv_env(
+            "GENOMESPY_AGENT_CONTEXT_PRUNE_ORDER"
+        ),
+        context_prune_depths=_load_optional_positive_int_csv_env(
+            "GENOMESPY_AGENT_CONTEXT_PRUNE_DEPTHS"
+        ),
+        upstream_request_compression=_load_optional_choice_env(
+            "GENOMESPY_AGENT_UPSTREAM_REQUEST_COMPRESSION",
+            supported_content_encodings(),
+        ),
+        session_store_path=os.environ.get("GENOMESPY_AGENT_SESSION_STORE_PATH")
+        or None,
+        session_max_entries=_load_positive_int_env(
+            "GENOMESPY_AGENT_SESSION_MAX_ENTRIES", 32
+        ),
+        session_idle_ttl_seconds=_load_positive_int_env(
+            "GENOMESPY_AGENT_SESSION_IDLE_TTL_SECONDS", 3600
+        ),
+        enable_response_chaining=_load_bool_env(
+            "GENOMESPY_AGENT_ENABLE_RESPONSE_CHAINING", False
+        ),
+        send_prompt_cache_key=_load_bool_env(
+            "GENOMESPY_AGENT_SEND_PROMPT_CACHE_KEY", False
+        ),
+        enable_prefix_debug_logs=_load_bool_env(
+            "GENOMESPY_AGENT_ENABLE_PREFIX_DEBUG_LOGS", False
+        ),
+        learn_context_key_order=_load_bool_env(
+            "GENOMESPY_AGENT_LEARN_CONTEXT_KEY_ORDER", False
+        ),
+        context_key_order_warmup_turns=_load_positive_int_env(
+            "GENOMESPY_AGENT_CONTEXT_KEY_ORDER_WARMUP_TURNS", 4
+        ),
+        backend_base_urls=_load_backend_base_urls(
+            "GENOMESPY_AGENT_BACKEND_BASE_URLS"
+        ),
+        routing_key=_load_optional_choice_env(
+            "GENOMESPY_AGENT_ROUTING_KEY", ("session", "prefix")
+        )
+        or "session",
+        routing_load_factor=_load_routing_load_factor(
+            "GENOMESPY_AGENT_ROUTING_LOAD_FACTOR", 1.25
+        ),
+        enable_prewarm=_load_bool_env("GENOMESPY_AGENT_ENABLE_PREWARM", False),
+        prewarm_max_per_minute=_load_positive_int_env(
+            "GENOMESPY_AGENT_PREWARM_MAX_PER_MINUTE", 6
+        ),
+        enable_startup_warmup=_load_bool_env(
+            "GENOMESPY_AGENT_ENABLE_STARTUP_WARMUP", False
+        ),
+        warmup_message=os.environ.get(
+            "GENOMESPY_AGENT_WARMUP_MESSAGE", DEFAULT_WARMUP_MESSAGE
+        ),
+        keep_alive_interval_seconds=_load_optional_positive_int_env(
+            "GENOMESPY_AGENT_KEEP_ALIVE_INTERVAL_SECONDS"
+        ),
+        model_keep_alive=(
+            os.environ.get("GENOMESPY_AGENT_MODEL_KEEP_ALIVE", "").strip() or None
+        ),
+        probe_upstream_capabilities=_load_bool_env(
+            "GENOMESPY_AGENT_PROBE_UPSTREAM_CAPABILITIES", False
+        ),
+        capability_cache_path=os.environ.get("GENOMESPY_AGENT_CAPABILITY_CACHE_PATH")
+        or None,
+        connect_timeout_seconds=_load_optional_positive_float_env(
+            "GENOMESPY_AGENT_CONNECT_TIMEOUT_SECONDS"
+        ),
+        first_event_timeout_seconds=_load_optional_positive_float_env(
+            "GENOMESPY_AGENT_FIRST_EVENT_TIMEOUT_SECONDS"
+        ),
+        stream_idle_timeout_seconds=_load_optional_positive_float_env(
+            "GENOMESPY_AGENT_STREAM_IDLE_TIMEOUT_SECONDS"
+        ),
+        total_timeout_seconds=_load_optional_positive_float_env(
+            "GENOMESPY_AGENT_TOTAL_TIMEOUT_SECONDS"
+        ),
+        send_upstream_cancel=_load_bool_env(
+            "GENOMESPY_AGENT_SEND_UPSTREAM_CANCEL", False
+        ),
+        stream_buffer_max_bytes=_load_positive_int_env(
+            "GENOMESPY_AGENT_STREAM_BUFFER_MAX_BYTES", DEFAULT_STREAM_BUFFER_MAX_BYTES
+        ),
+        stream_coalesce_ms=_load_optional_positive_int_env(
+            "GENOMESPY_AGENT_STREAM_COALESCE_MS"
+        )
+        or 0,
+        stream_coalesce_max_bytes=_load_positive_int_env(
+            "GENOMESPY_AGENT_STREAM_COALESCE_MAX_BYTES",
+            DEFAULT_STREAM_COALESCE_MAX_BYTES,
+        ),
+        enable_stream_resumption=_load_bool_env(
+            "GENOMESPY_AGENT_ENABLE_STREAM_RESUMPTION", False
+        ),
+        stream_replay_ttl_seconds=_load_positive_int_env(
+            "GENOMESPY_AGENT_STREAM_REPLAY_TTL_SECONDS", 60
+        ),
+        stream_resume_grace_seconds=_load_positive_int_env(
+            "GENOMESPY_AGENT_STREAM_RESUME_GRACE_SECONDS", 15
+        ),
+        job_max_concurrency=_load_positive_int_env(
+            "GENOMESPY_AGENT_JOB_MAX_CONCURRENCY", 4
+        ),
+        job_store_path=os.environ.get("GENOMESPY_AGENT_JOB_STORE_PATH") or None,
+        job_ttl_seconds=_load_positive_int_env("GENOMESPY_AGENT_JOB_TTL_SECONDS", 3600),
+        traffic_record_path=os.environ.get("GENOMESPY_AGENT_TRAFFIC_RECORD_PATH")
+        or None,
+        traffic_record_max_bytes=_load_positive_int_env(
+            "GENOMESPY_AGENT_TRAFFIC_RECORD_MAX_BYTES",
+            DEFAULT_TRAFFIC_RECORD_MAX_BYTES,
+        ),
     )
 
     logger.info(
@@ -92,7 +267,26 @@ def load_settings() -> Settings:
             "Loaded GenomeSpy agent settings: "
             "base_url=%s model=%s api_key_source=%s api_key=%s "
             "streaming=%s responses_role_compat=%s timeout_seconds=%s "
-            "token_debug_logs=%s throughput_debug_logs=%s"
+            "token_debug_logs=%s throughput_debug_logs=%s "
+            "history_token_budget=%s history_keep_recent_turns=%s "
+            "compact_tool_outputs=%s tool_output_keep_recent=%s "
+            "prompt_token_budget=%s upstream_request_compression=%s "
+            "session_store_path=%s session_max_entries=%s "
+            "session_idle_ttl_seconds=%s response_chaining=%s "
+            "prompt_cache_key=%s prefix_debug_logs=%s "
+            "learn_context_key_order=%s context_key_order_warmup_turns=%s "
+            "backend_base_urls=%s routing_key=%s routing_load_factor=%s "
+            "prewarm=%s prewarm_max_per_minute=%s "
+            "startup_warmup=%s keep_alive_interval_seconds=%s "
+            "model_keep_alive=%s probe_upstream_capabilities=%s "
+            "capability_cache_path=%s connect_timeout_seconds=%s "
+            "first_event_timeout_seconds=%s stream_idle_timeout_seconds=%s "
+            "total_timeout_seconds=%s send_upstream_cancel=%s "
+            "stream_buffer_max_bytes=%s stream_coalesce_ms=%s "
+            "stream_coalesce_max_bytes=%s enable_stream_resumption=%s "
+            "stream_replay_ttl_seconds=%s stream_resume_grace_seconds=%s "
+            "job_max_concurrency=%s job_store_path=%s job_ttl_seconds=%s "
+            "traffic_record_path=%s traffic_record_max_bytes=%s"
         ),
         settings.base_url,
         settings.model,
@@ -103,6 +297,46 @@ def load_settings() -> Settings:
         settings.timeout_seconds,
         settings.enable_token_debug_logs,
         settings.enable_throughput_debug_logs,
+        settings.history_token_budget,
+        settings.history_keep_recent_turns,
+        settings.compact_tool_outputs,
+        settings.tool_output_keep_recent,
+        settings.prompt_token_budget,
+        settings.upstream_request_compression,
+        settings.session_store_path,
+        settings.session_max_entries,
+        settings.session_idle_ttl_seconds,
+        settings.enable_response_chaining,
+        settings.send_prompt_cache_key,
+        settings.enable_prefix_debug_logs,
+        settings.learn_context_key_order,
+        settings.context_key_order_warmup_turns,
+        ",".join(settings.backend_base_urls or ()) or None,
+        settings.routing_key,
+        settings.routing_load_factor,
+        settings.enable_prewarm,
+        settings.prewarm_max_per_minute,
+        settings.enable_startup_warmup,
+        settings.keep_alive_interval_seconds,
+        settings.model_keep_alive,
+        settings.probe_upstream_capabilities,
+        settings.capability_cache_path,
+        settings.connect_timeout_seconds,
+        settings.first_event_timeout_seconds,
+        settings.stream_idle_timeout_seconds,
+        settings.total_timeout_seconds,
+        settings.send_upstream_cancel,
+        settings.stream_buffer_max_bytes,
+        settings.stream_coalesce_ms,
+        settings.stream_coalesce_max_bytes,
+        settings.enable_stream_resumption,
+        settings.stream_replay_ttl_seconds,
+        settings.stream_resume_grace_seconds,
+        settings.job_max_concurrency,
+        settings.job_store_path,
+        settings.job_ttl_seconds,
+        settings.traffic_record_path,
+        settings.traffic_record_max_bytes,
     )
 
     return settings
@@ -123,3 +357,134 @@ def _load_bool_env(name: str, default: bool) -> bool:
     raise ValueError(
         name + " must be one of: true, false, yes, no, on, off, 1, 0"
     )
+
+
+def _load_positive_int_env(name: str, default: int) -> int:
+    value = _load_optional_positive_int_env(name)
+    return default if value is None else value
+
+
+def _load_optional_positive_int_env(name: str) -> int | None:
+    raw_value = os.environ.get(name)
+    if raw_value is None or not raw_value.strip():
+        return None
+
+    try:
+        value = int(raw_value.strip())
+    except ValueError as exc:
+        raise ValueError(name + " must be a positive integer") from exc
+
+    if value <= 0:
+        raise ValueError(name + " must be a positive integer")
+
+    return value
+
+
+def _load_optional_positive_float_env(name: str) -> float | None:
+    raw_value = os.environ.get(name)
+    if raw_value is None or not raw_value.strip():
+        return None
+
+    try:
+        value = float(raw_value.strip())
+    except ValueError as exc:
+        raise ValueError(name + " must be a positive number") from exc
+
+    if not value > 0:
+        raise ValueError(name + " must be a positive number")
+
+    return value
+
+
+def _load_prompt_token_budget(name: str, model: str) -> int | None:
+    """Resolve the prompt-token budget for `model` from a per-model list.
+
+    Accepts comma-separated `model=tokens` entries. A bare number or a `*`
+    entry sets the budget for models that are not listed explicitly.
+    """
+    raw_value = os.environ.get(name)
+    if raw_value is None or not raw_value.strip():
+        return None
+
+    budgets: dict[str, str] = {}
+    for entry in raw_value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        model_name, separator, model_budget = entry.rpartition("=")
+        budgets[model_name.strip() if separator else "*"] = model_budget.strip()
+
+    budget = budgets.get(model, budgets.get("*"))
+    if budget is None:
+        return None
+
+    try:
+        value = int(budget)
+    except ValueError as exc:
+        raise ValueError(name + " budgets must be positive integers") from exc
+
+    if value <= 0:
+        raise ValueError(name + " budgets must be positive integers")
+
+    return value
+
+
+def _load_optional_csv_env(name: str) -> tuple[str, ...] | None:
+    raw_value = os.environ.get(name)
+    if raw_value is None or not raw_value.strip():
+        return None
+
+    return tuple(item.strip() for item in raw_value.split(",") if item.strip())
+
+
+def _load_backend_base_urls(name: str) -> tuple[str, ...] | None:
+    """Load the base URLs of equivalent backends that turns are routed over."""
+    items = _load_optional_csv_env(name)
+    if items is None:
+        return None
+
+    return tuple(dict.fromkeys(item.rstrip("/") for item in items))
+
+
+def _load_routing_load_factor(name: str, default: float) -> float:
+    raw_value = os.environ.get(name)
+    if raw_value is None or not raw_value.strip():
+        return default
+
+    try:
+        value = float(raw_value.strip())
+    except ValueError as exc:
+        raise ValueError(name + " must be a number of at least 1") from exc
+
+    if not value >= 1.0:
+        raise ValueError(name + " must be a number of at least 1")
+
+    return value
+
+
+def _load_optional_positive_int_csv_env(name: str) -> tuple[int, ...] | None:
+    items = _load_optional_csv_env(name)
+    if items is None:
+        return None
+
+    try:
+        values = tuple(int(item) for item in items)
+    except ValueError as exc:
+        raise ValueError(name + " must list positive integers") from exc
+
+    if any(value <= 0 for value in values):
+        raise ValueError(name + " must list positive integers")
+
+    return values
+
+
+def _load_optional_choice_env(name: str, choices: tuple[str, ...]) -> str | None:
+    raw_value = os.environ.get(name)
+    if raw_value is None or raw_value.strip().lower() in {"", "none", "identity"}:
+        return None
+
+    value = raw_value.strip().lower()
+    if value not in choices:
+        raise ValueError(name + " must be one of: none, " + ", ".join(choices))
+
+    return value
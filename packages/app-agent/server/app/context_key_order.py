@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any
+
+CONTEXT_KEY_ORDER_MAX_SESSIONS = 256
+DEFAULT_CONTEXT_KEY_ORDER_WARMUP_TURNS = 4
+
+
+@dataclass(slots=True)
+class _SessionKeyChurn:
+    previous_context: dict[str, Any]
+    change_counts: dict[str, int] = field(default_factory=dict)
+    compared_turns: int = 0
+    frozen_order: tuple[str, ...] | None = None
+
+
+class ContextKeyOrderLearner:
+    """Learn a per-session top-level context key order from key churn.
+
+    During a short warm-up, the learner counts how often each top-level
+    context key changes between consecutive turns of a session. The order is
+    then frozen for the rest of the session: keys that changed least come
+    first, so they stay in the cached prompt prefix, and the keys that changed
+    most move to the end of the snapshot, next to the conversation and the
+    volatile block. Until the order is frozen, the snapshot uses the plain
+    sorted order, so the ordering is deterministic at every turn and changes
+    at most once per session.
+    """
+
+    def __init__(
+        self,
+        warmup_turns: int = DEFAULT_CONTEXT_KEY_ORDER_WARMUP_TURNS,
+        max_sessions: int = CONTEXT_KEY_ORDER_MAX_SESSIONS,
+    ) -> None:
+        self._warmup_turns = warmup_turns
+        self._max_sessions = max_sessions
+        self._sessions: OrderedDict[str, _SessionKeyChurn] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def order_for(
+        self, session_id: str, context: dict[str, Any]
+    ) -> tuple[str, ...] | None:
+        """Record one turn's context and return the session's key order.
+
+        Args:
+            session_id: Relay session the context belongs to.
+            context: Stable context payload sent for the current turn.
+
+        Returns:
+            Frozen top-level key order, or None while the session is still
+            warming up and the sorted order should be used.
+        """
+        with self._lock:
+            churn = self._sessions.get(session_id)
+            if churn is None:
+                churn = _SessionKeyChurn(previous_context=context)
+                self._sessions[session_id] = churn
+            elif churn.frozen_order is None:
+                _count_changed_keys(churn, context, self._warmup_turns)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self._max_sessions:
+                self._sessions.popitem(last=False)
+            return churn.frozen_order
+
+    def current_order(self, session_id: str) -> tuple[str, ...] | None:
+        """Return the session's frozen key order without recording a turn."""
+        with self._lock:
+            churn = self._sessions.get(session_id)
+            return churn.frozen_order if churn is not None else None
+
+
+def _count_changed_keys(
+    churn: _SessionKeyChurn, context: dict[str, Any], warmup_turns: int
+) -> None:
+    """Add one compared turn and freeze the order once warm-up completes."""
+    previous_context = churn.previous_context
+    for key in previous_context.keys() | context.keys():
+        churn.change_counts.setdefault(key, 0)
+        if key not in previous_context or key not in context:
+            churn.change_counts[key] += 1
+        elif previous_context[key] is not context[key] and (
+            previous_context[key] != context[key]
+        ):
+            churn.change_counts[key] += 1
+    churn.previous_context = context
+    churn.compared_turns += 1
+
+    if churn.compared_turns >= warmup_turns:
+        churn.frozen_order = tuple(
+            sorted(churn.change_counts, key=lambda key: (churn.change_counts[key], key))
+        )
+        churn.previous_context = {}
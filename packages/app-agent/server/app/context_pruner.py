@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+from typing import Literal
+
+from .models import ProviderRequest
+from .prompt_builder import build_context_text
+from .token_debugger import TokenDebugSummary, count_tokens, resolve_encoding
+from .tool_output_compactor import limit_json_depth
+
+DEFAULT_CONTEXT_PRUNE_ORDER = (
+    "searchableViews",
+    "metadataSources",
+    "viewRoot",
+    "sampleAttributes",
+    "intentActionSummaries",
+)
+DEFAULT_CONTEXT_PRUNE_DEPTHS = (4, 2)
+
+
+@dataclass(frozen=True, slots=True)
+class ContextPruningPolicy:
+    """Describe how stable context is trimmed to fit a prompt budget.
+
+    Attributes:
+        token_budget: Estimated prompt-token budget for the configured model.
+        prune_order: Top-level context keys in the order they may be trimmed.
+            Keys that are not listed are never pruned.
+        depth_limits: Nesting depths tried, in order, before a branch is
+            dropped entirely.
+    """
+
+    token_budget: int
+    prune_order: tuple[str, ...] = DEFAULT_CONTEXT_PRUNE_ORDER
+    depth_limits: tuple[int, ...] = DEFAULT_CONTEXT_PRUNE_DEPTHS
+
+
+@dataclass(frozen=True, slots=True)
+class ContextPruningDecision:
+    """Describe one trimming step applied to a top-level context branch."""
+
+    key: str
+    action: Literal["depth_limited", "dropped"]
+    tokens_before: int
+    tokens_after: int
+    depth: int | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class ContextPruningReport:
+    """Summarize the pruning applied to one provider request.
+
+    Attributes:
+        token_budget: Prompt-token budget that triggered pruning.
+        total_before: Estimated prompt tokens before pruning.
+        total_after: Estimated prompt tokens after pruning, based on the
+            per-key savings of each decision.
+        decisions: Ordered trimming steps applied to context branches.
+    """
+
+    token_budget: int
+    total_before: int
+    total_after: int
+    decisions: list[ContextPruningDecision] = field(default_factory=list)
+
+
+def prune_context_to_budget(
+    request: ProviderRequest,
+    summary: TokenDebugSummary,
+    policy: ContextPruningPolicy,
+) -> tuple[ProviderRequest, ContextPruningReport]:
+    """Trim low-priority context branches until the prompt fits the budget.
+
+    Walks `policy.prune_order` from the lowest-priority branch upward. Each
+    branch is first limited to the configured nesting depths and dropped only
+    when the prompt still exceeds the budget. Pruning stops as soon as the
+    estimated total fits, so higher-priority branches are left untouched.
+
+    Args:
+        request: Provider request whose context may be pruned.
+        summary: Token summary already computed for `request`.
+        policy: Budget, branch order, and depth limits to apply.
+
+    Returns:
+        Tuple of the possibly pruned request and a report of the decisions.
+    """
+    excess = summary.total - policy.token_budget
+    if excess <= 0:
+        return request, ContextPruningReport(
+            token_budget=policy.token_budget,
+            total_before=summary.total,
+            total_after=summary.total,
+        )
+
+    encoding = resolve_encoding(summary.model)
+    context = dict(request.context)
+    decisions: list[ContextPruningDecision] = []
+    for key in policy.prune_order:
+        if excess <= 0:
+            break
+        if key not in context:
+            continue
+
+        tokens = summary.context_by_key.get(key)
+        if tokens is None:
+            tokens = count_tokens(build_context_text({key: context[key]}), encoding)
+
+        for depth in policy.depth_limits:
+            limited_value = limit_json_depth(context[key], depth)
+            limited_tokens = count_tokens(
+                build_context_text({key: limited_value}), encoding
+            )
+            if limited_tokens >= tokens:
+                continue
+
+            decisions.append(
+                ContextPruningDecision(
+                    key=key,
+                    action="depth_limited",
+                    tokens_before=tokens,
+                    tokens_after=limited_tokens,
+                    depth=depth,
+                )
+            )
+            context[key] = limited_value
+            excess -= tokens - limited_tokens
+            tokens = limited_tokens
+            if excess <= 0:
+                break
+
+        if excess > 0:
+            del context[key]
+            decisions.append(
+                ContextPruningDecision(
+                    key=key,
+                    action="dropped",
+                    tokens_before=tokens,
+                    tokens_after=0,
+                )
+            )
+            excess -= tokens
+
+    report = ContextPruningReport(
+        token_budget=policy.token_budget,
+        total_before=summary.total,
+        total_after=policy.token_budget + excess,
+        decisions=decisions,
+    )
+    if not decisions:
+        return request, report
+
+    return request.model_copy(update={"context": context}), report
+
+
+def log_context_pruning_report(
+    logger: logging.Logger, report: ContextPruningReport
+) -> None:
+    """Log the pruning decisions for one provider request."""
+    logger.info("%s", format_context_pruning_report(report))
+
+
+def format_context_pruning_report(report: ContextPruningReport) -> str:
+    """Format a readable context-pruning report for logs and tests."""
+    lines = [
+        "Agent context pruning:",
+        f"  budget: {report.token_budget}",
+        f"  estimated total before: {report.total_before}",
+        f"  estimated total after: {report.total_after}",
+        "  decisions:",
+    ]
+    if not report.decisions:
+        lines.append("    none")
+
+    for decision in report.decisions:
+        action = (
+            "depth limited to " + str(decision.depth)
+            if decision.action == "depth_limited"
+            else "dropped"
+        )
+        lines.append(
+            f"    {decision.key}: {action} "
+            f"({decision.tokens_before} -> {decision.tokens_after})"
+        )
+
+    if report.total_after > report.token_budget:
+        lines.append("  still over budget after pruning")
+
+    return "\n".join(lines)
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import json
+import math
+from dataclasses import dataclass, field
+from typing import Any
+
+from .models import HistoryMessage, HistoryWindowPolicy
+
+OMITTED_HISTORY_HEADER = "Earlier conversation omitted to fit the prompt budget:"
+
+
+@dataclass(frozen=True, slots=True)
+class HistoryWindow:
+    """Describe the history items selected for one provider prompt.
+
+    Attributes:
+        kept: History items that are replayed to the provider, in their
+            original order.
+        dropped: Older history items left out of the prompt.
+        dropped_turns: Number of user turns that were left out completely.
+        dropped_tokens: Rough token estimate for the dropped items.
+    """
+
+    kept: list[HistoryMessage]
+    dropped: list[HistoryMessage] = field(default_factory=list)
+    dropped_turns: int = 0
+    dropped_tokens: int = 0
+
+    @property
+    def placeholder_text(self) -> str | None:
+        """Return the prompt note that stands in for dropped history."""
+        if not self.dropped:
+            return None
+
+        return (
+            OMITTED_HISTORY_HEADER
+            + " "
+            + str(len(self.dropped))
+            + " earlier messages from "
+            + str(self.dropped_turns)
+            + " turns (about "
+            + str(self.dropped_tokens)
+            + " tokens) are no longer shown. Ask the user to restate details "
+            + "from them if needed."
+        )
+
+
+def apply_history_window(
+    history: list[HistoryMessage], policy: HistoryWindowPolicy | None
+) -> HistoryWindow:
+    """Select the history items that fit the configured token budget.
+
+    History is grouped into turns that start at each user message. The most
+    recent `keep_recent_turns` turns are always kept, and older turns are added
+    newest-first while they fit the budget, so the kept history stays one
+    contiguous suffix of the conversation. Tool calls and tool outputs are
+    kept as complete pairs, unresolved tool calls are never dropped, and the
+    latest successful and rejected tool outputs stay in place so the volatile
+    context block keeps its usual position.
+
+    Args:
+        history: Browser-provided conversation history in chronological order.
+        policy: Windowing policy, or `None` to keep the whole history.
+
+    Returns:
+        Window describing the kept and dropped history items.
+    """
+    if policy is None or not history:
+        return HistoryWindow(kept=list(history))
+
+    turns = _split_turns(history)
+    costs = [estimate_history_message_tokens(message) for message in history]
+    first_kept_turn = max(len(turns) - policy.keep_recent_turns, 0)
+    used_tokens = sum(costs[turns[first_kept_turn][0] :]) if turns else 0
+    while first_kept_turn > 0:
+        start, end = turns[first_kept_turn - 1]
+        turn_tokens = sum(costs[start:end])
+        if used_tokens + turn_tokens > policy.token_budget:
+            break
+        used_tokens += turn_tokens
+        first_kept_turn -= 1
+
+    if first_kept_turn == 0:
+        return HistoryWindow(kept=list(history))
+
+    first_kept_index = turns[first_kept_turn][0]
+    kept_indices = set(range(first_kept_index, len(history)))
+    kept_indices |= _find_pinned_indices(history)
+    _complete_tool_pairs(history, kept_indices)
+
+    kept = [message for index, message in enumerate(history) if index in kept_indices]
+    dropped_indices = [
+        index for index in range(len(history)) if index not in kept_indices
+    ]
+    dropped_turns = sum(
+        1
+        for start, end in turns[:first_kept_turn]
+        if all(index not in kept_indices for index in range(start, end))
+    )
+    return HistoryWindow(
+        kept=kept,
+        dropped=[history[index] for index in dropped_indices],
+        dropped_turns=dropped_turns,
+        dropped_tokens=sum(costs[index] for index in dropped_indices),
+    )
+
+
+def estimate_history_message_tokens(message: HistoryMessage) -> int:
+    """Return a cheap token estimate for one history item.
+
+    Uses the common four-characters-per-token heuristic instead of a tokenizer
+    so windowing stays inexpensive on long sessions.
+    """
+    characters = len(message.text)
+    if message.content is not None:
+        characters += len(_dump_json(message.content))
+    for tool_call in message.tool_calls:
+        characters += len(tool_call.name) + len(_dump_json(tool_call.arguments))
+
+    return math.ceil(characters / 4)
+
+
+def _split_turns(history: list[HistoryMessage]) -> list[tuple[int, int]]:
+    """Return `(start, end)` index ranges for turns that begin at user items."""
+    starts = [
+        index
+        for index, message in enumerate(history)
+        if message.role == "user" and index > 0
+    ]
+    boundaries = [0, *starts, len(history)]
+    return list(zip(boundaries[:-1], boundaries[1:], strict=True))
+
+
+def _find_pinned_indices(history: list[HistoryMessage]) -> set[int]:
+    """Return history items that must survive windowing.
+
+    Pins assistant tool calls that have not received an output yet, plus the
+    latest successful and rejected tool outputs that decide where the volatile
+    context block is placed.
+    """
+    answered_call_ids = {
+        message.tool_call_id
+        for message in history
+        if message.role == "tool" and message.tool_call_id is not None
+    }
+    pinned: set[int] = set()
+    last_successful_tool_result_index = -1
+    last_rejected_tool_result_index = -1
+    for index, message in enumerate(history):
+        if message.role == "tool":
+            if message.rejected is True:
+                last_rejected_tool_result_index = index
+            else:
+                last_successful_tool_result_index = index
+            continue
+
+        if any(
+            tool_call.call_id not in answered_call_ids
+            for tool_call in message.tool_calls
+        ):
+            pinned.add(index)
+
+    for index in (last_successful_tool_result_index, last_rejected_tool_result_index):
+        if index >= 0:
+            pinned.add(index)
+
+    return pinned
+
+
+def _complete_tool_pairs(history: list[HistoryMessage], kept_indices: set[int]) -> None:
+    """Extend kept items so every tool call keeps its outputs and vice versa."""
+    call_index_by_id: dict[str, int] = {}
+    output_indices_by_call_id: dict[str, list[int]] = {}
+    for index, message in enumerate(history):
+        for tool_call in message.tool_calls:
+            call_index_by_id[tool_call.call_id] = index
+        if message.role == "tool" and message.tool_call_id is not None:
+            output_indices_by_call_id.setdefault(message.tool_call_id, []).append(index)
+
+    pending = list(kept_indices)
+    while pending:
+        index = pending.pop()
+        message = history[index]
+        related: list[int] = []
+        if message.role == "tool" and message.tool_call_id in call_index_by_id:
+            related.append(call_index_by_id[message.tool_call_id])
+        for tool_call in message.tool_calls:
+            related.extend(output_indices_by_call_id.get(tool_call.call_id, []))
+
+        for related_index in related:
+            if related_index not in kept_indices:
+                kept_indices.add(related_index)
+                pending.append(related_index)
+
+
+def _dump_json(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+
+    return json.dumps(value, ensure_ascii=False, sort_keys=True)
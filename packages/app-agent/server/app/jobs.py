@@ -0,0 +1,413 @@
+"""Background agent-turn jobs that outlive the request that submitted them.
+
+A submitted turn becomes a job that the scheduler runs in the background,
+with a bounded number of jobs generating at once. Clients poll the job or
+subscribe to its state changes. Job records live in memory or, optionally,
+in SQLite shared by several relay workers, and expire a while after they
+finish. The worker that runs a job renews its heartbeat, so any worker can
+tell a job that is still running elsewhere from one whose worker stopped.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Literal
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOB_MAX_ENTRIES = 1024
+DEFAULT_JOB_TTL_SECONDS = 3600.0
+DEFAULT_JOB_LEASE_SECONDS = 30.0
+JobState = Literal["queued", "running", "succeeded", "failed"]
+FINISHED_JOB_STATES: frozenset[JobState] = frozenset({"succeeded", "failed"})
+
+
+class JobFailedError(Exception):
+    """Raised by a job's turn to report a failure with an HTTP status.
+
+    Attributes:
+        status_code: HTTP status that the synchronous endpoint would return.
+    """
+
+    def __init__(self, message: str, status_code: int) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass(frozen=True, slots=True)
+class AgentJob:
+    """Describe one submitted agent turn and its lifecycle.
+
+    Attributes:
+        job_id: Relay-assigned job identifier.
+        state: Lifecycle state of the job.
+        submitted_at: Wall-clock time the job was submitted.
+        started_at: Wall-clock time the job left the queue.
+        finished_at: Wall-clock time the job succeeded or failed.
+        result: Agent-turn response payload of a succeeded job.
+        error: Failure message of a failed job.
+        error_status: HTTP status matching the failure.
+        owner: Relay worker that runs the job, as `host:pid`.
+        heartbeat_at: Wall-clock time the owner last renewed the job.
+    """
+
+    job_id: str
+    state: JobState
+    submitted_at: float
+    started_at: float | None = None
+    finished_at: float | None = None
+    result: dict[str, Any] | None = None
+    error: str | None = None
+    error_status: int | None = None
+    owner: str | None = None
+    heartbeat_at: float | None = None
+
+    @property
+    def finished(self) -> bool:
+        """Whether the job succeeded or failed."""
+        return self.state in FINISHED_JOB_STATES
+
+    @property
+    def queued_ms(self) -> int | None:
+        """Return how long the job waited for a free slot."""
+        if self.started_at is None:
+            return None
+        return round((self.started_at - self.submitted_at) * 1000)
+
+    @property
+    def run_ms(self) -> int | None:
+        """Return how long the job's turn ran."""
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return round((self.finished_at - self.started_at) * 1000)
+
+
+class JobStore(ABC):
+    """Store job records keyed by job id."""
+
+    @abstractmethod
+    def get(self, job_id: str) -> AgentJob | None:
+        """Return the stored job, or None when it is unknown or expired."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def put(self, job: AgentJob) -> None:
+        """Store the latest state of a job.
+
+        Once the store is full, the oldest finished jobs are evicted.
+        Queued and running jobs are never evicted.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def renew(self, job_ids: list[str], heartbeat_at: float) -> None:
+        """Record that the owner of unfinished jobs is still running them."""
+        raise NotImplementedError
+
+
+class InMemoryJobStore(JobStore):
+    """Keep jobs in process memory, expiring them after they finish."""
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_JOB_MAX_ENTRIES,
+        ttl_seconds: float = DEFAULT_JOB_TTL_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._jobs: OrderedDict[str, AgentJob] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, job_id: str) -> AgentJob | None:
+        with self._lock:
+            self._evict_expired()
+            return self._jobs.get(job_id)
+
+    def put(self, job: AgentJob) -> None:
+        with self._lock:
+            self._jobs[job.job_id] = job
+            excess = len(self._jobs) - self._max_entries
+            if excess > 0:
+                evicted = [
+                    job_id for job_id, stored in self._jobs.items() if stored.finished
+                ][:excess]
+                for job_id in evicted:
+                    del self._jobs[job_id]
+
+    def renew(self, job_ids: list[str], heartbeat_at: float) -> None:
+        with self._lock:
+            for job_id in job_ids:
+                job = self._jobs.get(job_id)
+                if job is not None and not job.finished:
+                    self._jobs[job_id] = replace(job, heartbeat_at=heartbeat_at)
+
+    def _evict_expired(self) -> None:
+        cutoff = self._clock() - self._ttl_seconds
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at is not None and job.finished_at < cutoff:
+                del self._jobs[job_id]
+
+
+class SqliteJobStore(JobStore):
+    """Persist jobs in SQLite so their results survive relay restarts."""
+
+    def __init__(
+        self,
+        path: Path,
+        max_entries: int = DEFAULT_JOB_MAX_ENTRIES,
+        ttl_seconds: float = DEFAULT_JOB_TTL_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(path), check_same_thread=False)
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS agent_jobs (
+                job_id TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                submitted_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                result_json TEXT,
+                error TEXT,
+                error_status INTEGER,
+                owner TEXT,
+                heartbeat_at REAL
+            )
+            """
+        )
+        self._connection.commit()
+
+    def get(self, job_id: str) -> AgentJob | None:
+        with self._lock:
+            self._evict_expired()
+            row = self._connection.execute(
+                "SELECT state, submitted_at, started_at, finished_at, "
+                "result_json, error, error_status, owner, heartbeat_at "
+                "FROM agent_jobs WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()
+            self._connection.commit()
+
+        if row is None:
+            return None
+
+        return AgentJob(
+            job_id=job_id,
+            state=row[0],
+            submitted_at=row[1],
+            started_at=row[2],
+            finished_at=row[3],
+            result=json.loads(row[4]) if row[4] is not None else None,
+            error=row[5],
+            error_status=row[6],
+            owner=row[7],
+            heartbeat_at=row[8],
+        )
+
+    def put(self, job: AgentJob) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO agent_jobs VALUES "
+                "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job.job_id,
+                    job.state,
+                    job.submitted_at,
+                    job.started_at,
+                    job.finished_at,
+                    (
+                        json.dumps(job.result, ensure_ascii=False)
+                        if job.result is not None
+                        else None
+                    ),
+                    job.error,
+                    job.error_status,
+                    job.owner,
+                    job.heartbeat_at,
+                ),
+            )
+            (unfinished,) = self._connection.execute(
+                "SELECT COUNT(*) FROM agent_jobs WHERE finished_at IS NULL"
+            ).fetchone()
+            self._connection.execute(
+                "DELETE FROM agent_jobs WHERE job_id IN ("
+                "SELECT job_id FROM agent_jobs WHERE finished_at IS NOT NULL "
+                "ORDER BY submitted_at DESC LIMIT -1 OFFSET ?)",
+                (max(self._max_entries - unfinished, 0),),
+            )
+            self._connection.commit()
+
+    def renew(self, job_ids: list[str], heartbeat_at: float) -> None:
+        with self._lock:
+            self._connection.executemany(
+                "UPDATE agent_jobs SET heartbeat_at = ? "
+                "WHERE job_id = ? AND finished_at IS NULL",
+                [(heartbeat_at, job_id) for job_id in job_ids],
+            )
+            self._connection.commit()
+
+    def _evict_expired(self) -> None:
+        self._connection.execute(
+            "DELETE FROM agent_jobs WHERE finished_at < ?",
+            (self._clock() - self._ttl_seconds,),
+        )
+
+
+class JobScheduler:
+    """Run submitted turns in the background with bounded concurrency.
+
+    Jobs wait in submission order for one of `max_concurrency` slots, so a
+    burst of submissions queues in the relay instead of overloading the
+    backend. While the scheduler has unfinished jobs, it renews their
+    heartbeat every third of `lease_seconds`.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        max_concurrency: int,
+        clock: Callable[[], float] = time.time,
+        lease_seconds: float = DEFAULT_JOB_LEASE_SECONDS,
+    ) -> None:
+        self._store = store
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._clock = clock
+        self._lease_seconds = lease_seconds
+        self._owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks: dict[str, asyncio.Task[None]] = {}
+        self._changed: dict[str, asyncio.Event] = {}
+        self._heartbeat: asyncio.Task[None] | None = None
+
+    def submit(self, run: Callable[[], Awaitable[dict[str, Any]]]) -> AgentJob:
+        """Queue one turn and return its job right away.
+
+        Args:
+            run: Coroutine function that runs the turn and returns the
+                agent-turn response payload. It reports expected failures
+                with `JobFailedError`.
+
+        Returns:
+            The queued job.
+        """
+        now = self._clock()
+        job = AgentJob(
+            job_id=uuid.uuid4().hex,
+            state="queued",
+            submitted_at=now,
+            owner=self._owner,
+            heartbeat_at=now,
+        )
+        self._store.put(job)
+        self._tasks[job.job_id] = asyncio.create_task(self._run(job, run))
+        if self._heartbeat is None or self._heartbeat.done():
+            self._heartbeat = asyncio.create_task(self._renew_leases())
+        return job
+
+    def get(self, job_id: str) -> AgentJob | None:
+        """Return a job's latest state.
+
+        An unfinished job whose heartbeat is older than the lease lost its
+        worker, for example to a relay restart, and is reported as failed.
+        Jobs that another live worker runs are returned as stored.
+        """
+        job = self._store.get(job_id)
+        if job is None or job.finished or job_id in self._tasks:
+            return job
+        if (
+            job.heartbeat_at is not None
+            and self._clock() - job.heartbeat_at < self._lease_seconds
+        ):
+            return job
+        return replace(
+            job,
+            state="failed",
+            error=f"Relay worker {job.owner} stopped before the job finished.",
+            error_status=503,
+        )
+
+    @property
+    def slots(self) -> asyncio.Semaphore:
+        """Return the admission slots that other batched work shares."""
+        return self._slots
+
+    def changed(self, job_id: str) -> asyncio.Event | None:
+        """Return the event set by the job's next state change.
+
+        Returns:
+            The event, or None when the job does not run in this process and
+            its changes have to be polled from the store.
+        """
+        if job_id not in self._tasks:
+            return None
+        return self._changed.setdefault(job_id, asyncio.Event())
+
+    async def _run(
+        self, job: AgentJob, run: Callable[[], Awaitable[dict[str, Any]]]
+    ) -> None:
+        """Wait for a slot, run the turn, and record its outcome."""
+        try:
+            async with self._slots:
+                job = replace(job, state="running", started_at=self._clock())
+                self._update(job)
+                try:
+                    result = await run()
+                except JobFailedError as exc:
+                    job = replace(
+                        job,
+                        state="failed",
+                        error=str(exc),
+                        error_status=exc.status_code,
+                    )
+                except Exception as exc:
+                    logger.exception("Agent job %s failed", job.job_id)
+                    job = replace(
+                        job,
+                        state="failed",
+                        error="Agent job failed: " + str(exc),
+                        error_status=500,
+                    )
+                else:
+                    job = replace(job, state="succeeded", result=result)
+                job = replace(job, finished_at=self._clock())
+                self._update(job)
+                logger.info(
+                    "Agent job %s %s: queued %d ms, ran %d ms",
+                    job.job_id,
+                    job.state,
+                    job.queued_ms,
+                    job.run_ms,
+                )
+        finally:
+            self._tasks.pop(job.job_id, None)
+            self._changed.pop(job.job_id, asyncio.Event()).set()
+
+    async def _renew_leases(self) -> None:
+        """Renew the heartbeat of this process's jobs until none are left."""
+        while self._tasks:
+            await asyncio.sleep(self._lease_seconds / 3)
+            self._store.renew(list(self._tasks), self._clock())
+
+    def _update(self, job: AgentJob) -> None:
+        """Store a job state and wake its subscribers."""
+        job = replace(job, heartbeat_at=self._clock())
+        self._store.put(job)
+        self._changed.pop(job.job_id, asyncio.Event()).set()
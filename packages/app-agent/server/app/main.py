@@ -1,43 +1,117 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
 import os
 import time
-from contextlib import asynccontextmanager
+from contextlib import aclosing, asynccontextmanager, suppress
+from dataclasses import replace
 from functools import lru_cache
-from typing import AsyncIterator
+from pathlib import Path
+from typing import Any, AsyncGenerator, AsyncIterator
 
-from fastapi import FastAPI, HTTPException, Query, Request
+import anyio
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import StreamingResponse
 
+from app.batch import BatchItemResult, run_batch, summarize_batch
+from app.compression import (
+    REQUEST_BODY_COMPRESSION_STATE_KEY,
+    RequestDecompressionMiddleware,
+    log_body_compression_record,
+)
 from app.config import Settings, describe_api_key_for_logs, load_settings
+from app.context_key_order import ContextKeyOrderLearner
+from app.context_pruner import (
+    ContextPruningPolicy,
+    log_context_pruning_report,
+    prune_context_to_budget,
+)
+from app.jobs import (
+    AgentJob,
+    InMemoryJobStore,
+    JobFailedError,
+    JobScheduler,
+    JobStore,
+    SqliteJobStore,
+)
 from app.models import (
+    AgentBatchRequest,
+    AgentJobResponse,
+    AgentPrewarmResponse,
     AgentServerInfoResponse,
     AgentTurnRequest,
     AgentTurnResponse,
+    HistoryWindowPolicy,
     ProviderRequest,
     ProviderResponse,
+    ToolOutputCompactionPolicy,
 )
+from app.prefix_debugger import PrefixStabilityAnalyzer, log_prefix_stability_report
 from app.providers import ProviderError
 from app.providers.openai_responses import BaseProvider, OpenAIResponsesProvider
-from app.token_debugger import log_token_summary, summarize_prompt_tokens
+from app.providers.timeouts import ProviderTimeoutError
+from app.session_store import (
+    SESSION_HASH_HEADERS,
+    InMemorySessionStore,
+    SessionComponentMissingError,
+    SessionStore,
+    SqliteSessionStore,
+    resolve_session_request,
+)
+from app.stream_buffer import (
+    StreamBuffer,
+    StreamBufferOverflowError,
+    StreamBufferStats,
+    StreamFrameCounter,
+    fill_stream_buffer,
+    format_stream_buffer_stats,
+)
 from app.throughput_debugger import (
+    CancellationTracker,
+    PromptCacheSummary,
+    PromptCacheTracker,
+    format_cancellation_summary,
     log_throughput_summary,
     summarize_response_throughput,
 )
+from app.token_debugger import (
+    TokenDebugSummary,
+    log_token_summary,
+    summarize_prompt_tokens,
+)
+from app.traffic_recorder import bind_recorded_turn
+from app.turn_replay import (
+    TURN_ID_HEADER,
+    TurnEventsExpiredError,
+    TurnReplayStore,
+    new_turn_id,
+)
+from app.warmth import ModelWarmthManager
 
 logger = logging.getLogger(__name__)
 startup_logger = logging.getLogger("uvicorn.error")
+RESPONSE_GZIP_MINIMUM_BYTES = 1024
+# Status logged by nginx for requests whose client closed the connection.
+CLIENT_CLOSED_REQUEST_STATUS = 499
+DISCONNECT_POLL_INTERVAL_SECONDS = 0.25
+JOB_POLL_INTERVAL_SECONDS = 1.0
+MAX_STREAM_COALESCE_MS = 1000
+prompt_cache_tracker = PromptCacheTracker()
+cancellation_tracker = CancellationTracker()
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI) -> AsyncIterator[None]:
-    """Log the relay startup configuration summary.
+    """Log the relay startup configuration summary and start model warm-up.
 
     Emits a single startup log line that captures the selected provider, model,
     base URL, and sanitized API-key metadata for debugging deployment issues.
+    When configured, the model warmth manager runs in the background until
+    shutdown.
     """
     settings = get_settings()
     provider = get_provider()
@@ -51,7 +125,14 @@ async def lifespan(_: FastAPI) -> AsyncIterator[None]:
             "GenomeSpy agent server startup: provider=%s base_url=%s "
             "model=%s api_key_source=%s api_key=%s "
             "streaming=%s responses_role_compat=%s timeout_seconds=%s "
-            "token_debug_logs=%s throughput_debug_logs=%s"
+            "token_debug_logs=%s throughput_debug_logs=%s "
+            "history_token_budget=%s compact_tool_outputs=%s "
+            "prompt_token_budget=%s upstream_request_compression=%s "
+            "session_store=%s response_chaining=%s prompt_cache_key=%s "
+            "prefix_debug_logs=%s learn_context_key_order=%s "
+            "routed_backends=%s routing_key=%s "
+            "startup_warmup=%s keep_alive_interval_seconds=%s "
+            "job_store=%s job_max_concurrency=%s traffic_record_path=%s"
         ),
         provider.__class__.__name__,
         settings.base_url,
@@ -63,8 +144,34 @@ async def lifespan(_: FastAPI) -> AsyncIterator[None]:
         settings.timeout_seconds,
         settings.enable_token_debug_logs,
         settings.enable_throughput_debug_logs,
+        settings.history_token_budget,
+        settings.compact_tool_outputs,
+        settings.prompt_token_budget,
+        settings.upstream_request_compression,
+        settings.session_store_path or "memory",
+        settings.enable_response_chaining,
+        settings.send_prompt_cache_key,
+        settings.enable_prefix_debug_logs,
+        settings.learn_context_key_order,
+        len(settings.backend_base_urls or ()),
+        settings.routing_key,
+        settings.enable_startup_warmup,
+        settings.keep_alive_interval_seconds,
+        settings.job_store_path or "memory",
+        settings.job_max_concurrency,
+        settings.traffic_record_path,
     )
-    yield
+    warmth_manager = get_warmth_manager()
+    warmth_task = (
+        asyncio.create_task(warmth_manager.run()) if warmth_manager.enabled else None
+    )
+    try:
+        yield
+    finally:
+        if warmth_task is not None:
+            warmth_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await warmth_task
 
 
 app = FastAPI(
@@ -72,6 +179,11 @@ app = FastAPI(
     version="0.0.1",
     lifespan=lifespan,
 )
+# Starlette's gzip middleware leaves `text/event-stream` responses untouched,
+# so only non-streaming JSON responses are compressed. CORS is added last to
+# stay outermost and annotate decompression errors as well.
+app.add_middleware(GZipMiddleware, minimum_size=RESPONSE_GZIP_MINIMUM_BYTES)
+app.add_middleware(RequestDecompressionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -81,6 +193,7 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["POST", "GET", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=[*SESSION_HASH_HEADERS, TURN_ID_HEADER],
 )
 
 
@@ -100,6 +213,72 @@ def get_provider() -> BaseProvider:
     return OpenAIResponsesProvider(get_settings())
 
 
+@lru_cache
+def get_prefix_stability_analyzer() -> PrefixStabilityAnalyzer:
+    """Return the cached prompt-prefix analyzer for current settings."""
+    return PrefixStabilityAnalyzer(get_settings().model)
+
+
+@lru_cache
+def get_context_key_order_learner() -> ContextKeyOrderLearner:
+    """Return the cached context key-order learner for current settings."""
+    return ContextKeyOrderLearner(
+        warmup_turns=get_settings().context_key_order_warmup_turns
+    )
+
+
+@lru_cache
+def get_warmth_manager() -> ModelWarmthManager:
+    """Return the cached model warmth manager for current settings."""
+    settings = get_settings()
+    return ModelWarmthManager(
+        lambda: get_provider().warm_up(settings.warmup_message),
+        warm_up_on_start=settings.enable_startup_warmup,
+        keep_alive_interval_seconds=settings.keep_alive_interval_seconds,
+    )
+
+
+@lru_cache
+def get_turn_replay_store() -> TurnReplayStore:
+    """Return the cached replay store of resumable streaming turns."""
+    settings = get_settings()
+    return TurnReplayStore(
+        ttl_seconds=settings.stream_replay_ttl_seconds,
+        grace_seconds=settings.stream_resume_grace_seconds,
+    )
+
+
+@lru_cache
+def get_job_scheduler() -> JobScheduler:
+    """Return the cached agent job scheduler for current settings."""
+    settings = get_settings()
+    store: JobStore = (
+        SqliteJobStore(
+            Path(settings.job_store_path), ttl_seconds=settings.job_ttl_seconds
+        )
+        if settings.job_store_path is not None
+        else InMemoryJobStore(ttl_seconds=settings.job_ttl_seconds)
+    )
+    return JobScheduler(store, settings.job_max_concurrency)
+
+
+@lru_cache
+def get_session_store() -> SessionStore:
+    """Return the cached session store for current settings."""
+    settings = get_settings()
+    if settings.session_store_path is not None:
+        return SqliteSessionStore(
+            Path(settings.session_store_path),
+            max_entries=settings.session_max_entries,
+            idle_ttl_seconds=settings.session_idle_ttl_seconds,
+        )
+
+    return InMemorySessionStore(
+        max_entries=settings.session_max_entries,
+        idle_ttl_seconds=settings.session_idle_ttl_seconds,
+    )
+
+
 @app.get("/health")
 async def health() -> dict[str, str]:
     """Return the relay health status."""
@@ -110,11 +289,128 @@ async def health() -> dict[str, str]:
 async def server_info() -> AgentServerInfoResponse:
     """Return the relay's active model configuration for diagnostics."""
     settings = get_settings()
+    warmth = get_warmth_manager().snapshot()
     return AgentServerInfoResponse(
         status="ok",
         model=settings.model,
         base_url=settings.base_url,
         streamingEnabled=settings.enable_streaming,
+        modelState=warmth.state,
+        lastColdStartMs=warmth.last_cold_start_ms,
+        lastColdStartAt=warmth.last_cold_start_at,
+    )
+
+
+@app.post(
+    "/v1/agent-prewarm",
+    response_model=AgentPrewarmResponse,
+    response_model_exclude_none=True,
+)
+async def agent_prewarm(
+    request: AgentTurnRequest, http_response: Response
+) -> AgentPrewarmResponse:
+    """Warm the upstream prompt cache before the user's next turn.
+
+    Clients call this when a new context snapshot arrives, while the user is
+    still typing. The relay sends the stable prompt prefix the next turn will
+    use, so that turn starts from a prefilled prompt cache. The message and
+    history of the payload are ignored.
+
+    Args:
+        request: Browser payload with the context and tools of the next turn.
+        http_response: Outgoing response used to return session hashes.
+
+    Returns:
+        Outcome of the warm-up, including whether it was deduplicated or
+        rate-limited.
+
+    Raises:
+        HTTPException: If a session component must be resent.
+    """
+    settings = get_settings()
+    if not settings.enable_prewarm:
+        return AgentPrewarmResponse(status="disabled")
+
+    if request.session_id is not None:
+        request, session_headers = _resolve_session_request(request)
+        http_response.headers.update(session_headers)
+    provider_request = _build_provider_request(
+        request, settings, record_context_key_order=False
+    )
+    if settings.prompt_token_budget is not None:
+        provider_request, _ = _prune_context_to_budget(
+            provider_request,
+            summarize_prompt_tokens(provider_request, settings.model),
+            settings,
+            settings.prompt_token_budget,
+        )
+
+    result = await get_provider().prewarm(provider_request)
+    if settings.enable_throughput_debug_logs:
+        startup_logger.info(
+            "Agent prefix warm-up: status=%s prefix=%s duration_ms=%s",
+            result.status,
+            result.prefix_hash,
+            result.duration_ms,
+        )
+    return AgentPrewarmResponse(
+        status=result.status,
+        prefixHash=result.prefix_hash,
+        durationMs=result.duration_ms,
+    )
+
+
+@app.get("/v1/agent-turn/{turn_id}/events")
+async def resume_agent_turn(
+    turn_id: str,
+    http_request: Request,
+    last_event_id: int | None = Query(default=None, alias="lastEventId", ge=0),
+) -> StreamingResponse:
+    """Resume the SSE stream of an in-progress or recently finished turn.
+
+    Replays the turn's events after the last one the client received, then
+    follows the turn until it finishes. No new upstream request is made.
+
+    Args:
+        turn_id: Turn id announced in the `start` event and response header.
+        http_request: Incoming request, whose `Last-Event-ID` header is used
+            when present.
+        last_event_id: Last event id the client received, for clients that
+            cannot set the header. Defaults to replaying the whole turn.
+
+    Returns:
+        Streaming SSE response with the remaining events of the turn.
+
+    Raises:
+        HTTPException: If resumption is disabled, the turn is unknown or
+            expired, or the requested events were dropped from its log.
+    """
+    settings = get_settings()
+    turn = (
+        get_turn_replay_store().get(turn_id)
+        if settings.enable_stream_resumption
+        else None
+    )
+    if turn is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired turn.")
+
+    header_value = http_request.headers.get("last-event-id")
+    if header_value is not None:
+        try:
+            last_event_id = int(header_value)
+        except ValueError as exc:
+            raise HTTPException(
+                status_code=400, detail="Last-Event-ID must be an integer."
+            ) from exc
+    resume_after = last_event_id or 0
+    try:
+        turn.frames_after(resume_after)
+    except TurnEventsExpiredError as exc:
+        raise HTTPException(status_code=410, detail=str(exc)) from exc
+
+    return _build_sse_response(
+        get_turn_replay_store().subscribe(turn, resume_after),
+        {TURN_ID_HEADER: turn_id},
     )
 
 
@@ -126,52 +422,347 @@ async def server_info() -> AgentServerInfoResponse:
 async def agent_turn(
     request: AgentTurnRequest,
     http_request: Request,
+    http_response: Response,
     stream: bool = Query(default=False),
-) -> AgentTurnResponse | StreamingResponse:
+    coalesce_ms: int | None = Query(
+        default=None, alias="coalesceMs", ge=0, le=MAX_STREAM_COALESCE_MS
+    ),
+) -> AgentTurnResponse | StreamingResponse | Response:
     """Handle one browser-to-model agent turn.
 
     Builds the provider request from the browser payload, logs prompt-token
-    diagnostics, and returns either a normal response or an SSE stream.
+    diagnostics, and returns either a normal response or an SSE stream. If
+    the client disconnects before a non-streaming turn completes, the
+    upstream request is cancelled and the turn ends with status 499.
 
     Args:
         request: Browser request payload for the current agent turn.
         http_request: Incoming FastAPI request used to inspect client headers.
+        http_response: Outgoing response used to return session hashes.
         stream: Whether the caller explicitly requested server-sent events.
+        coalesce_ms: Longest delay, in milliseconds, that streamed deltas may
+            be held back to merge them into fewer SSE frames. Overrides the
+            configured default; zero disables the delay.
+
+    Returns:
+        Final agent-turn payload or a streaming SSE response, depending on the
+        request, or an empty 499 response for a client that went away.
+
+    Raises:
+        HTTPException: If a session component must be resent, or if the
+            upstream provider request fails before a non-streaming response is
+            returned.
+    """
+    settings = get_settings()
+    provider_request, session_headers, token_summary = _prepare_turn(
+        request, http_request, settings
+    )
+    http_response.headers.update(session_headers)
+    should_stream = _should_stream_response(settings, http_request, stream)
+
+    if should_stream:
+        return _build_streaming_response(
+            provider_request,
+            settings,
+            estimated_input_tokens=(
+                token_summary.total if token_summary is not None else None
+            ),
+            headers=session_headers,
+            coalesce_ms=(
+                coalesce_ms if coalesce_ms is not None else settings.stream_coalesce_ms
+            ),
+        )
+
+    started_at = time.perf_counter()
+    response = await _generate_plan_until_disconnect(provider_request, http_request)
+    if response is None:
+        _record_cancelled_turn(settings, "")
+        return Response(status_code=CLIENT_CLOSED_REQUEST_STATUS)
+    return _complete_turn(
+        response,
+        provider_request,
+        settings,
+        token_summary,
+        round((time.perf_counter() - started_at) * 1000),
+    )
+
+
+@app.post(
+    "/v1/agent-jobs",
+    status_code=202,
+    response_model=AgentJobResponse,
+    response_model_exclude_defaults=True,
+)
+async def submit_agent_job(
+    request: AgentTurnRequest, http_request: Request, http_response: Response
+) -> AgentJobResponse:
+    """Queue one agent turn as a background job and return its id right away.
+
+    The turn runs under the job scheduler, independently of this request's
+    connection. Poll `/v1/agent-jobs/{jobId}` or subscribe to
+    `/v1/agent-jobs/{jobId}/events` for its result.
+
+    Args:
+        request: Browser request payload for the agent turn.
+        http_request: Incoming FastAPI request used to inspect client headers.
+        http_response: Outgoing response used to return session hashes.
 
     Returns:
-        Final agent-turn payload or a streaming SSE response, depending on the request.
+        The queued job.
 
     Raises:
-        HTTPException: If the upstream provider request fails before a
-            non-streaming response is returned.
+        HTTPException: If a session component must be resent.
     """
     settings = get_settings()
+    provider_request, session_headers, token_summary = _prepare_turn(
+        request, http_request, settings
+    )
+    http_response.headers.update(session_headers)
+    return _build_agent_job_response(
+        get_job_scheduler().submit(
+            lambda: _run_background_turn(provider_request, settings, token_summary)
+        )
+    )
+
+
+@app.post("/v1/agent-batch")
+async def agent_batch(
+    batch: AgentBatchRequest, http_request: Request
+) -> StreamingResponse:
+    """Run many agent turns and stream each result as it completes.
+
+    Turns run with the requested concurrency, capped by the admission slots
+    that background jobs share. Results are NDJSON lines in completion order,
+    each with the turn's index in the batch. The last line summarizes the
+    batch's throughput and p50/p95/p99 latency.
+
+    Args:
+        batch: Turns to run and the batch's concurrency.
+        http_request: Incoming FastAPI request used to inspect client headers.
+
+    Returns:
+        Streaming NDJSON response with one line per turn plus the summary.
+    """
+    settings = get_settings()
+
+    async def run_one(request: AgentTurnRequest) -> dict[str, Any]:
+        try:
+            provider_request, _, token_summary = _prepare_turn(
+                request, http_request, settings
+            )
+        except HTTPException as exc:
+            raise _job_failure(exc) from exc
+        return await _run_background_turn(provider_request, settings, token_summary)
+
+    return StreamingResponse(
+        _batch_lines(
+            run_batch(
+                batch.requests,
+                run_one,
+                concurrency=batch.concurrency or settings.job_max_concurrency,
+                admission=get_job_scheduler().slots,
+            )
+        ),
+        media_type="application/x-ndjson",
+    )
+
+
+async def _batch_lines(
+    results: AsyncGenerator[BatchItemResult, None],
+) -> AsyncIterator[str]:
+    """Encode batch results, then the batch summary, as NDJSON lines."""
+    started_at = time.perf_counter()
+    finished: list[BatchItemResult] = []
+    async with aclosing(results):
+        async for result in results:
+            finished.append(result)
+            yield json.dumps(result.to_json(), ensure_ascii=False) + "\n"
+    summary = summarize_batch(
+        finished, round((time.perf_counter() - started_at) * 1000)
+    )
+    startup_logger.info(
+        "Agent batch finished: %d completed, %d failed in %d ms "
+        "(%.2f turns/s, p50=%s ms p95=%s ms p99=%s ms)",
+        summary.completed,
+        summary.failed,
+        summary.wall_ms,
+        summary.turns_per_second,
+        summary.p50_ms,
+        summary.p95_ms,
+        summary.p99_ms,
+    )
+    yield json.dumps(summary.to_json()) + "\n"
+
+
+def _job_failure(exc: HTTPException) -> JobFailedError:
+    """Convert an HTTP error of the synchronous path into a job failure."""
+    detail = exc.detail
+    if isinstance(detail, dict) and "message" in detail:
+        detail = detail["message"]
+    return JobFailedError(str(detail), exc.status_code)
+
+
+async def _run_background_turn(
+    provider_request: ProviderRequest,
+    settings: Settings,
+    token_summary: TokenDebugSummary | None,
+) -> dict[str, Any]:
+    """Run one non-streaming turn for a job or batch.
+
+    Returns:
+        The agent-turn response payload.
+
+    Raises:
+        JobFailedError: If the provider request fails.
+    """
+    started_at = time.perf_counter()
+    try:
+        response = await _generate_plan(provider_request)
+    except HTTPException as exc:
+        raise _job_failure(exc) from exc
+    return _complete_turn(
+        response,
+        provider_request,
+        settings,
+        token_summary,
+        round((time.perf_counter() - started_at) * 1000),
+    ).model_dump(by_alias=True, exclude_defaults=True)
+
+
+@app.get(
+    "/v1/agent-jobs/{job_id}",
+    response_model=AgentJobResponse,
+    response_model_exclude_defaults=True,
+)
+async def get_agent_job(job_id: str) -> AgentJobResponse:
+    """Return the state of an agent job, with its result once finished.
+
+    Raises:
+        HTTPException: If the job is unknown or expired.
+    """
+    job = get_job_scheduler().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job.")
+    return _build_agent_job_response(job)
+
+
+@app.get("/v1/agent-jobs/{job_id}/events")
+async def subscribe_agent_job(job_id: str) -> StreamingResponse:
+    """Stream an agent job's state changes over SSE until it finishes.
+
+    Emits a `state` event for every state the job enters, then a `final`
+    event with the job, including its result or error.
+
+    Raises:
+        HTTPException: If the job is unknown or expired.
+    """
+    if get_job_scheduler().get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job.")
+    return _build_sse_response(_job_events(job_id), None)
+
+
+async def _job_events(job_id: str) -> AsyncIterator[str]:
+    """Yield SSE events for the state changes of one job."""
+    scheduler = get_job_scheduler()
+    last_state: str | None = None
+    while True:
+        job = scheduler.get(job_id)
+        if job is None:
+            yield _encode_sse_event("error", {"message": "Unknown or expired job."})
+            return
+        payload = _build_agent_job_response(job).model_dump(
+            by_alias=True, exclude_defaults=True
+        )
+        if job.finished:
+            yield _encode_sse_event("final", payload)
+            return
+        if job.state != last_state:
+            last_state = job.state
+            yield _encode_sse_event("state", payload)
+        changed = scheduler.changed(job_id)
+        if changed is None:
+            await asyncio.sleep(JOB_POLL_INTERVAL_SECONDS)
+        else:
+            await changed.wait()
+
+
+def _build_agent_job_response(job: AgentJob) -> AgentJobResponse:
+    """Convert a job record into the API response shape."""
+    return AgentJobResponse(
+        jobId=job.job_id,
+        state=job.state,
+        queuedMs=job.queued_ms,
+        runMs=job.run_ms,
+        result=(
+            AgentTurnResponse.model_validate(job.result)
+            if job.result is not None
+            else None
+        ),
+        error=job.error,
+    )
+
+
+def _prepare_turn(
+    request: AgentTurnRequest, http_request: Request, settings: Settings
+) -> tuple[ProviderRequest, dict[str, str], TokenDebugSummary | None]:
+    """Build the provider request of one turn and log its diagnostics.
+
+    Resolves session deltas, prunes the context to the prompt-token budget,
+    binds the turn to recorded upstream traffic, and records the turn as
+    model activity.
+
+    Returns:
+        The provider request, the session hash headers for the response, and
+        the prompt-token summary when one was computed.
+
+    Raises:
+        HTTPException: If a session component must be resent.
+    """
+    body_compression = getattr(
+        http_request.state, REQUEST_BODY_COMPRESSION_STATE_KEY, None
+    )
+    if settings.enable_throughput_debug_logs and body_compression is not None:
+        log_body_compression_record(startup_logger, body_compression)
+    session_headers: dict[str, str] = {}
+    if request.session_id is not None:
+        request, session_headers = _resolve_session_request(request)
     provider_request = _build_provider_request(request, settings)
     token_summary = (
         summarize_prompt_tokens(provider_request, settings.model)
         if (
             settings.enable_token_debug_logs
             or settings.enable_throughput_debug_logs
+            or settings.prompt_token_budget is not None
         )
         else None
     )
+    if settings.prompt_token_budget is not None and token_summary is not None:
+        provider_request, token_summary = _prune_context_to_budget(
+            provider_request, token_summary, settings, settings.prompt_token_budget
+        )
     if settings.enable_token_debug_logs and token_summary is not None:
         log_token_summary(startup_logger, token_summary)
+    if settings.enable_prefix_debug_logs:
+        prefix_report = get_prefix_stability_analyzer().observe(provider_request)
+        if prefix_report is not None:
+            log_prefix_stability_report(startup_logger, prefix_report)
 
-    should_stream = _should_stream_response(settings, http_request, stream)
+    if settings.traffic_record_path is not None:
+        bind_recorded_turn(provider_request)
 
-    if should_stream:
-        return _build_streaming_response(
-            provider_request,
-            settings,
-            estimated_input_tokens=(
-                token_summary.total if token_summary is not None else None
-            ),
-        )
+    get_warmth_manager().record_activity()
+    return provider_request, session_headers, token_summary
 
-    started_at = time.perf_counter()
-    response = await _generate_plan(provider_request)
-    duration_ms = round((time.perf_counter() - started_at) * 1000)
+
+def _complete_turn(
+    response: ProviderResponse,
+    provider_request: ProviderRequest,
+    settings: Settings,
+    token_summary: TokenDebugSummary | None,
+    duration_ms: int,
+) -> AgentTurnResponse:
+    """Record a completed non-streaming turn and build its API response."""
+    cancellation_tracker.record_completed(response.usage)
     if settings.enable_throughput_debug_logs:
         log_throughput_summary(
             startup_logger,
@@ -182,11 +773,74 @@ async def agent_turn(
                 estimated_input_tokens=(
                     token_summary.total if token_summary is not None else None
                 ),
+                prompt_cache=_record_prompt_cache(
+                    response, provider_request, settings
+                ),
             ),
         )
     return _build_agent_turn_response(response)
 
 
+def _record_prompt_cache(
+    response: ProviderResponse,
+    provider_request: ProviderRequest,
+    settings: Settings,
+) -> PromptCacheSummary | None:
+    """Add the provider-reported prompt-cache usage of one turn to the stats."""
+    if response.usage is None:
+        return None
+
+    return prompt_cache_tracker.record(
+        settings.model, provider_request.session_id, response.usage
+    )
+
+
+def _record_cancelled_turn(settings: Settings, streamed_text: str) -> None:
+    """Count a turn abandoned by its client and log the generation it saved."""
+    summary = cancellation_tracker.record_cancelled(streamed_text, settings.model)
+    startup_logger.info("%s", format_cancellation_summary(summary))
+
+
+async def _generate_plan_until_disconnect(
+    provider_request: ProviderRequest, http_request: Request
+) -> ProviderResponse | None:
+    """Return one non-streaming provider response unless the client leaves.
+
+    The client connection is polled while the provider works. When it goes
+    away, the provider call is cancelled, which closes the upstream request
+    so the backend can stop generating.
+
+    Returns:
+        The provider response, or None if the client disconnected first.
+
+    Raises:
+        HTTPException: If the provider request fails.
+    """
+    response: ProviderResponse | None = None
+    error: Exception | None = None
+
+    async with anyio.create_task_group() as task_group:
+
+        async def generate() -> None:
+            nonlocal response, error
+            try:
+                response = await _generate_plan(provider_request)
+            except Exception as exc:
+                error = exc
+            finally:
+                task_group.cancel_scope.cancel()
+
+        task_group.start_soon(generate)
+        while not await http_request.is_disconnected():
+            await anyio.sleep(DISCONNECT_POLL_INTERVAL_SECONDS)
+        logger.info("Client disconnected; cancelling the provider request.")
+        task_group.cancel_scope.cancel()
+
+    if error is not None:
+        raise error
+    return response
+
+
 async def _generate_plan(provider_request: ProviderRequest) -> ProviderResponse:
     """Return one non-streaming provider response.
 
@@ -195,6 +849,9 @@ async def _generate_plan(provider_request: ProviderRequest) -> ProviderResponse:
     """
     try:
         return await get_provider().generate(provider_request)
+    except ProviderTimeoutError as exc:
+        logger.warning("Provider request timed out: %s", exc)
+        raise HTTPException(status_code=504, detail=str(exc)) from exc
     except ProviderError as exc:
         logger.warning("Provider request failed: %s", exc)
         raise HTTPException(status_code=502, detail=str(exc)) from exc
@@ -211,27 +868,74 @@ async def _stream_plan(
     settings: Settings,
     *,
     estimated_input_tokens: int | None,
-) -> AsyncIterator[str]:
+    coalesce_ms: int = 0,
+    turn_id: str | None = None,
+) -> AsyncGenerator[str, None]:
     """Yield SSE events for one streaming provider turn.
 
     Bridges normalized provider stream events into the relay's SSE wire format
-    and converts stream failures into SSE error events.
+    and converts stream failures into SSE error events. A stream that stalls
+    after partial output ends with a `stalled` event instead, so the client can
+    keep the partial answer and offer a retry. When the client disconnects,
+    the server closes this generator, which closes the upstream stream; the
+    abandoned turn is counted with the output it had already received.
+
+    A background task reads the upstream stream into a bounded buffer, so a
+    slow client never slows the backend down. Deltas that queue up while the
+    client lags are sent as one event, and a client that falls further behind
+    than the buffer cap is abandoned. With `coalesce_ms`, each delta is also
+    held back for up to that long, or until it reaches the configured size,
+    to merge the deltas that follow it into the same frame. A `turn_id` is
+    announced in the `start` event so clients can resume the turn.
     """
     started_at = time.perf_counter()
-    yield _encode_sse_event("start", {"status": "working"})
+    yielded_output = False
+    streamed_text: list[str] = []
+    finished = False
+    frames = StreamFrameCounter()
+    coalesce_seconds = coalesce_ms / 1000
+    buffer = StreamBuffer(settings.stream_buffer_max_bytes)
+    reader = asyncio.create_task(
+        fill_stream_buffer(get_provider().generate_stream(provider_request), buffer)
+    )
 
     try:
-        async for event in get_provider().generate_stream(provider_request):
+        yield frames.record(
+            _encode_sse_event(
+                "start",
+                {"status": "working", **({"turnId": turn_id} if turn_id else {})},
+            )
+        )
+        while (
+            event := await buffer.get_coalesced(
+                coalesce_seconds, settings.stream_coalesce_max_bytes
+            )
+        ) is not None:
             if event.type == "delta" and event.delta:
-                yield _encode_sse_event("delta", {"delta": event.delta})
+                yielded_output = True
+                streamed_text.append(event.delta)
+                yield frames.record(_encode_sse_event("delta", {"delta": event.delta}))
             elif event.type == "reasoning_delta" and event.reasoning:
-                yield _encode_sse_event("reasoning_delta", {"delta": event.reasoning})
+                yielded_output = True
+                yield frames.record(
+                    _encode_sse_event("reasoning_delta", {"delta": event.reasoning})
+                )
             elif event.type == "heartbeat":
-                yield _encode_sse_event("heartbeat", {"status": "working"})
+                yield frames.record(
+                    _encode_sse_event("heartbeat", {"status": "working"})
+                )
             elif event.type == "final":
                 response = _require_stream_response(event.response)
+                cancellation_tracker.record_completed(response.usage)
                 duration_ms = round((time.perf_counter() - started_at) * 1000)
+                buffer_stats = buffer.stats()
                 if settings.enable_throughput_debug_logs:
+                    startup_logger.info("%s", format_stream_buffer_stats(buffer_stats))
+                    startup_logger.info(
+                        "SSE frames before final: %d (%.1f bytes per frame)",
+                        frames.frames,
+                        frames.bytes_per_frame,
+                    )
                     log_throughput_summary(
                         startup_logger,
                         summarize_response_throughput(
@@ -239,36 +943,162 @@ async def _stream_plan(
                             duration_ms,
                             settings.model,
                             estimated_input_tokens=estimated_input_tokens,
+                            prompt_cache=_record_prompt_cache(
+                                response, provider_request, settings
+                            ),
                         ),
                     )
+                finished = True
                 yield _encode_sse_event(
                     "final",
                     _build_final_stream_payload(
                         response,
                         provider_request.message,
                         duration_ms,
+                        buffer_stats=buffer_stats,
+                        frames=frames,
                     ),
                 )
             else:
                 logger.debug("Ignoring unknown provider stream event: %s", event)
+        finished = True
+    except ProviderTimeoutError as exc:
+        logger.warning("Provider stream stalled: %s", exc)
+        finished = True
+        yield _encode_sse_event(
+            "stalled" if yielded_output else "error",
+            {
+                "message": str(exc),
+                "trace": {
+                    "message": provider_request.message,
+                    "totalMs": round((time.perf_counter() - started_at) * 1000),
+                    "timeouts": [exc.phase],
+                },
+            },
+        )
     except ProviderError as exc:
+        finished = True
         yield _stream_error_event("Provider stream failed: %s", exc, unexpected=False)
+    except StreamBufferOverflowError as exc:
+        finished = True
+        yield _stream_error_event(
+            "Abandoned a slow stream client: %s", exc, unexpected=False
+        )
     except Exception as exc:
+        finished = True
         yield _stream_error_event("Unexpected provider stream failure", exc)
+    finally:
+        reader.cancel()
+        with anyio.CancelScope(shield=True), suppress(asyncio.CancelledError):
+            await reader
+        if not finished and not buffer.upstream_complete:
+            _record_cancelled_turn(settings, "".join(streamed_text))
 
 
 def _build_provider_request(
-    request: AgentTurnRequest, settings: Settings
+    request: AgentTurnRequest,
+    settings: Settings,
+    *,
+    record_context_key_order: bool = True,
 ) -> ProviderRequest:
-    """Build the normalized provider request from the API payload."""
+    """Build the normalized provider request from the API payload.
+
+    Session requests that omit the context are resolved from the session store
+    before this point, so the empty fallback is never sent upstream. With
+    context key-order learning enabled, session turns carry the session's
+    learned top-level key order. Requests that are not real turns, such as
+    warm-ups, pass `record_context_key_order=False` so they do not count
+    toward the learner's warm-up.
+    """
+    context = request.context if request.context is not None else {}
     return ProviderRequest(
         system_prompt=settings.system_prompt,
-        context=request.context,
+        context=context,
         volatile_context=request.volatile_context,
         history=request.history,
         message=request.message,
         tools=request.tools,
+        session_id=request.session_id,
+        history_window=(
+            HistoryWindowPolicy(
+                token_budget=settings.history_token_budget,
+                keep_recent_turns=settings.history_keep_recent_turns,
+            )
+            if settings.history_token_budget is not None
+            else None
+        ),
+        tool_output_compaction=(
+            ToolOutputCompactionPolicy(
+                keep_recent_outputs=settings.tool_output_keep_recent
+            )
+            if settings.compact_tool_outputs
+            else None
+        ),
+        context_key_order=(
+            _get_context_key_order(
+                request.session_id, context, record=record_context_key_order
+            )
+            if settings.learn_context_key_order and request.session_id is not None
+            else None
+        ),
+    )
+
+
+def _get_context_key_order(
+    session_id: str, context: dict[str, Any], *, record: bool
+) -> tuple[str, ...] | None:
+    """Return the session's learned context key order."""
+    learner = get_context_key_order_learner()
+    if record:
+        return learner.order_for(session_id, context)
+    return learner.current_order(session_id)
+
+
+def _resolve_session_request(
+    request: AgentTurnRequest,
+) -> tuple[AgentTurnRequest, dict[str, str]]:
+    """Fill in session components that the client sent as hashes.
+
+    Returns the complete request and the response headers that advertise the
+    stored component hashes for the next turn.
+    """
+    try:
+        request, session = resolve_session_request(request, get_session_store())
+    except SessionComponentMissingError as exc:
+        logger.info("Agent session %s: %s", request.session_id, exc)
+        raise HTTPException(
+            status_code=409,
+            detail={"message": str(exc), "missing": exc.missing},
+        ) from exc
+
+    return request, session.hash_headers
+
+
+def _prune_context_to_budget(
+    provider_request: ProviderRequest,
+    token_summary: TokenDebugSummary,
+    settings: Settings,
+    token_budget: int,
+) -> tuple[ProviderRequest, TokenDebugSummary]:
+    """Trim low-priority context branches when the prompt exceeds its budget.
+
+    Logs the pruning decisions and returns the pruned request together with a
+    token summary recomputed for it.
+    """
+    policy = ContextPruningPolicy(token_budget=token_budget)
+    if settings.context_prune_order is not None:
+        policy = replace(policy, prune_order=settings.context_prune_order)
+    if settings.context_prune_depths is not None:
+        policy = replace(policy, depth_limits=settings.context_prune_depths)
+
+    pruned_request, report = prune_context_to_budget(
+        provider_request, token_summary, policy
     )
+    if not report.decisions:
+        return provider_request, token_summary
+
+    log_context_pruning_report(startup_logger, report)
+    return pruned_request, summarize_prompt_tokens(pruned_request, settings.model)
 
 
 def _should_stream_response(
@@ -285,18 +1115,53 @@ def _build_streaming_response(
     settings: Settings,
     *,
     estimated_input_tokens: int | None,
+    headers: dict[str, str] | None = None,
+    coalesce_ms: int = 0,
 ) -> StreamingResponse:
-    """Build the FastAPI streaming response wrapper."""
-    return StreamingResponse(
+    """Build the FastAPI streaming response wrapper.
+
+    With stream resumption enabled, the turn runs in the replay store and the
+    response only follows its replay log, so the client can reconnect to it.
+    """
+    if not settings.enable_stream_resumption:
+        return _build_sse_response(
+            _stream_plan(
+                provider_request,
+                settings,
+                estimated_input_tokens=estimated_input_tokens,
+                coalesce_ms=coalesce_ms,
+            ),
+            headers,
+        )
+
+    turn_id = new_turn_id()
+    store = get_turn_replay_store()
+    turn = store.start(
+        turn_id,
         _stream_plan(
             provider_request,
             settings,
             estimated_input_tokens=estimated_input_tokens,
+            coalesce_ms=coalesce_ms,
+            turn_id=turn_id,
         ),
+    )
+    return _build_sse_response(
+        store.subscribe(turn), {**(headers or {}), TURN_ID_HEADER: turn_id}
+    )
+
+
+def _build_sse_response(
+    body: AsyncIterator[str] | AsyncIterator[bytes], headers: dict[str, str] | None
+) -> StreamingResponse:
+    """Wrap SSE frames in a response that proxies will not buffer."""
+    return StreamingResponse(
+        body,
         media_type="text/event-stream",
         headers={
             "cache-control": "no-cache",
             "x-accel-buffering": "no",
+            **(headers or {}),
         },
     )
 
@@ -319,9 +1184,19 @@ def _require_stream_response(response: ProviderResponse | None) -> ProviderRespo
 
 
 def _build_final_stream_payload(
-    response: ProviderResponse, message: str, duration_ms: int
+    response: ProviderResponse,
+    message: str,
+    duration_ms: int,
+    *,
+    buffer_stats: StreamBufferStats | None = None,
+    frames: StreamFrameCounter | None = None,
 ) -> dict[str, object]:
-    """Build the final SSE payload for a completed provider turn."""
+    """Build the final SSE payload for a completed provider turn.
+
+    The trace includes the stream buffer's high-water marks when the client
+    fell behind the upstream at some point, and the number and mean size of
+    the frames sent before the final one.
+    """
     payload: dict[str, object] = {
         "response": {
             "type": response.type,
@@ -340,6 +1215,32 @@ def _build_final_stream_payload(
         "trace": {
             "message": message,
             "totalMs": duration_ms,
+            **(
+                {"timeouts": list(response.timed_out_phases)}
+                if response.timed_out_phases
+                else {}
+            ),
+            **(
+                {
+                    "buffer": {
+                        "highWaterBytes": buffer_stats.high_water_bytes,
+                        "highWaterEvents": buffer_stats.high_water_events,
+                        "coalescedEvents": buffer_stats.coalesced_events,
+                    }
+                }
+                if buffer_stats is not None and buffer_stats.high_water_events > 1
+                else {}
+            ),
+            **(
+                {
+                    "frames": {
+                        "count": frames.frames,
+                        "bytesPerFrame": round(frames.bytes_per_frame, 1),
+                    }
+                }
+                if frames is not None
+                else {}
+            ),
         },
     }
     return payload
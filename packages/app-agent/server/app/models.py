@@ -3,7 +3,7 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Any, Literal
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 
 
 class HistoryMessage(BaseModel):
@@ -46,17 +46,44 @@ class ProviderToolDefinition(BaseModel):
 
 
 class AgentTurnRequest(BaseModel):
-    """Represent the browser payload for one agent turn request."""
+    """Represent the browser payload for one agent turn request.
+
+    Requests with a `sessionId` may replace unchanged components with the
+    hashes the relay returned for the previous turn: `contextHash` and
+    `toolsHash` stand for the stored context and tools, and `historyBaseHash`
+    turns `history` into the items appended since that turn.
+    """
 
     model_config = ConfigDict(extra="ignore", populate_by_name=True)
 
     message: str
     history: list[HistoryMessage] = Field(default_factory=list)
-    context: dict[str, Any]
+    context: dict[str, Any] | None = None
     volatile_context: dict[str, Any] = Field(
         default_factory=dict, alias="volatileContext"
     )
     tools: list[ProviderToolDefinition] = Field(default_factory=list)
+    session_id: str | None = Field(default=None, alias="sessionId", min_length=1)
+    context_hash: str | None = Field(default=None, alias="contextHash")
+    tools_hash: str | None = Field(default=None, alias="toolsHash")
+    history_base_hash: str | None = Field(default=None, alias="historyBaseHash")
+
+    @model_validator(mode="after")
+    def _check_session_fields(self) -> AgentTurnRequest:
+        if self.context is None and self.context_hash is None:
+            raise ValueError("context is required unless contextHash is given")
+
+        uses_hashes = (
+            self.context_hash is not None
+            or self.tools_hash is not None
+            or self.history_base_hash is not None
+        )
+        if uses_hashes and self.session_id is None:
+            raise ValueError(
+                "contextHash, toolsHash, and historyBaseHash require sessionId"
+            )
+
+        return self
 
 
 class AgentTurnResponse(BaseModel):
@@ -69,6 +96,28 @@ class AgentTurnResponse(BaseModel):
     tool_calls: list[ToolCall] = Field(default_factory=list, alias="toolCalls")
 
 
+class AgentBatchRequest(BaseModel):
+    """Represent many agent turns submitted together for a batch run."""
+
+    model_config = ConfigDict(extra="ignore", populate_by_name=True)
+
+    requests: list[AgentTurnRequest] = Field(min_length=1, max_length=1000)
+    concurrency: int | None = Field(default=None, ge=1)
+
+
+class AgentJobResponse(BaseModel):
+    """Describe the state of one asynchronous agent-turn job."""
+
+    model_config = ConfigDict(extra="ignore", populate_by_name=True)
+
+    job_id: str = Field(alias="jobId")
+    state: Literal["queued", "running", "succeeded", "failed"]
+    queued_ms: int | None = Field(default=None, alias="queuedMs")
+    run_ms: int | None = Field(default=None, alias="runMs")
+    result: AgentTurnResponse | None = None
+    error: str | None = None
+
+
 class AgentServerInfoResponse(BaseModel):
     """Describe the relay's current runtime configuration for diagnostics."""
 
@@ -78,6 +127,62 @@ class AgentServerInfoResponse(BaseModel):
     model: str
     base_url: str
     streaming_enabled: bool = Field(alias="streamingEnabled")
+    model_state: Literal["unknown", "warming", "warm", "cold"] = Field(
+        default="unknown", alias="modelState"
+    )
+    last_cold_start_ms: int | None = Field(default=None, alias="lastColdStartMs")
+    last_cold_start_at: str | None = Field(default=None, alias="lastColdStartAt")
+
+
+class AgentPrewarmResponse(BaseModel):
+    """Report what the relay did with one prefix warm-up request."""
+
+    model_config = ConfigDict(extra="ignore", populate_by_name=True)
+
+    status: Literal[
+        "warmed",
+        "deduplicated",
+        "rate_limited",
+        "failed",
+        "skipped",
+        "unsupported",
+        "disabled",
+    ]
+    prefix_hash: str | None = Field(default=None, alias="prefixHash")
+    duration_ms: int | None = Field(default=None, alias="durationMs")
+
+
+@dataclass(frozen=True, slots=True)
+class ProviderPrewarmResult:
+    """Describe the outcome of warming the upstream prompt cache for a prefix.
+
+    Attributes:
+        status: Whether the warm-up was sent, skipped, or failed.
+        prefix_hash: Stable-prefix hash that was warmed.
+        duration_ms: Upstream round-trip time of a sent warm-up.
+    """
+
+    status: Literal[
+        "warmed", "deduplicated", "rate_limited", "failed", "skipped", "unsupported"
+    ]
+    prefix_hash: str | None = None
+    duration_ms: int | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class ProviderUsage:
+    """Represent upstream-reported token usage for one provider response.
+
+    Attributes:
+        input_tokens: Prompt tokens processed for the response.
+        cached_input_tokens: Prompt tokens served from the provider's prompt
+            cache.
+        output_tokens: Generated tokens, when reported.
+    """
+
+    input_tokens: int
+    cached_input_tokens: int = 0
+    output_tokens: int | None = None
 
 
 class ProviderResponse(BaseModel):
@@ -88,6 +193,40 @@ class ProviderResponse(BaseModel):
     type: Literal["answer", "tool_call"]
     message: str | None = None
     tool_calls: list[ToolCall] = Field(default_factory=list, alias="toolCalls")
+    response_id: str | None = Field(default=None, exclude=True)
+    usage: ProviderUsage | None = Field(default=None, exclude=True)
+    timed_out_phases: tuple[str, ...] = Field(default=(), exclude=True)
+
+
+@dataclass(frozen=True, slots=True)
+class HistoryWindowPolicy:
+    """Describe how much conversation history may be replayed to the provider.
+
+    Attributes:
+        token_budget: Estimated token budget for replayed history items.
+        keep_recent_turns: Number of most recent user turns that are always
+            kept, even when they alone exceed the budget.
+    """
+
+    token_budget: int
+    keep_recent_turns: int = 4
+
+
+@dataclass(frozen=True, slots=True)
+class ToolOutputCompactionPolicy:
+    """Describe how older tool outputs are elided in replayed history.
+
+    Attributes:
+        keep_recent_outputs: Number of most recent tool outputs kept verbatim.
+        max_array_items: Maximum number of array items kept in older outputs.
+        max_string_chars: Maximum number of characters kept per string.
+        max_depth: Maximum container nesting depth kept in older outputs.
+    """
+
+    keep_recent_outputs: int = 2
+    max_array_items: int = 5
+    max_string_chars: int = 400
+    max_depth: int = 4
 
 
 @dataclass(frozen=True, slots=True)
@@ -113,3 +252,7 @@ class ProviderRequest(BaseModel):
     history: list[HistoryMessage]
     message: str
     tools: list[ProviderToolDefinition] = Field(default_factory=list)
+    history_window: HistoryWindowPolicy | None = None
+    tool_output_compaction: ToolOutputCompactionPolicy | None = None
+    session_id: str | None = None
+    context_key_order: tuple[str, ...] | None = None
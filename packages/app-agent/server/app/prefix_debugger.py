@@ -0,0 +1,310 @@
+from __future__ import annotations
+
+import logging
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+from .models import ProviderRequest
+from .prompt_builder import (
+    USER_MESSAGE_SEGMENT,
+    VOLATILE_CONTEXT_SEGMENT,
+    PromptIR,
+    build_prompt_ir,
+    build_responses_input_segments,
+    encode_response_item,
+    get_pre_encoded_response_item,
+)
+from .providers.request_body import encode_tool_definitions
+from .token_debugger import count_tokens, resolve_encoding
+
+PREFIX_ANALYZER_MAX_SESSIONS = 256
+CONTEXT_CHURN_MAX_DEPTH = 3
+CONTEXT_CHURN_MAX_PATHS_PER_TURN = 20
+
+
+@dataclass(frozen=True, slots=True)
+class PrefixStabilityReport:
+    """Describe how much of a session's previous prompt prefix a turn reuses.
+
+    The prefix is laid out in the order models usually render it:
+    instructions, tools, stable context, the windowed-history note, history
+    items, volatile context, and the user message. Each part is compared as
+    encoded JSON, which matches what prompt caches key on closely enough to
+    find the part that changed.
+
+    Attributes:
+        session_id: Relay session the turns belong to.
+        previous_bytes: Encoded size of the previous turn's prompt.
+        current_bytes: Encoded size of the current turn's prompt.
+        common_prefix_bytes: Bytes shared by both prompts from the start.
+        common_prefix_tokens: Estimated tokens in the shared prefix.
+        component: Prompt part of the current turn where the first difference
+            starts, or None when the current prompt extends the previous one.
+        invalidated: Whether the difference starts before the previous turn's
+            volatile context and user message, which are expected to change.
+        context_paths: Context key paths that changed since the previous turn.
+        top_context_churn: Context key paths ranked by how many compared turns
+            changed them, across all sessions.
+    """
+
+    session_id: str
+    previous_bytes: int
+    current_bytes: int
+    common_prefix_bytes: int
+    common_prefix_tokens: int
+    component: str | None
+    invalidated: bool
+    context_paths: tuple[str, ...]
+    top_context_churn: tuple[tuple[str, int], ...]
+
+
+@dataclass(frozen=True, slots=True)
+class _PromptLayout:
+    segments: tuple[tuple[str, bytes], ...]
+    context: dict[str, Any]
+    # Token counts of whole segments, filled in as comparisons need them and
+    # carried over to the next turn's layout for the segments it shares.
+    segment_tokens: list[int | None]
+
+
+class PrefixStabilityAnalyzer:
+    """Compare consecutive prompts per session to explain cache invalidations."""
+
+    def __init__(
+        self,
+        model: str,
+        max_sessions: int = PREFIX_ANALYZER_MAX_SESSIONS,
+    ) -> None:
+        self._model = model
+        self._max_sessions = max_sessions
+        self._layouts: OrderedDict[str, _PromptLayout] = OrderedDict()
+        self._context_churn: Counter[str] = Counter()
+        self._lock = threading.Lock()
+
+    def observe(
+        self, request: ProviderRequest, *, max_context_keys: int = 5
+    ) -> PrefixStabilityReport | None:
+        """Record one session turn and compare it with the previous one.
+
+        Args:
+            request: Provider request for the current relay turn.
+            max_context_keys: Maximum number of ranked churn entries to return.
+
+        Returns:
+            Report for the turn, or None for the first turn of a session and
+            for requests without a session id.
+        """
+        if request.session_id is None:
+            return None
+
+        layout = _build_prompt_layout(build_prompt_ir(request), request)
+        with self._lock:
+            previous = self._layouts.get(request.session_id)
+            self._layouts[request.session_id] = layout
+            self._layouts.move_to_end(request.session_id)
+            while len(self._layouts) > self._max_sessions:
+                self._layouts.popitem(last=False)
+            if previous is None:
+                return None
+
+            context_paths = tuple(_diff_context_paths(previous.context, layout.context))
+            self._context_churn.update(context_paths)
+            top_context_churn = tuple(self._context_churn.most_common(max_context_keys))
+
+        common_prefix_bytes, segment_index = _find_first_difference(
+            previous.segments, layout.segments
+        )
+        return PrefixStabilityReport(
+            session_id=request.session_id,
+            previous_bytes=sum(len(segment) for _, segment in previous.segments),
+            current_bytes=sum(len(segment) for _, segment in layout.segments),
+            common_prefix_bytes=common_prefix_bytes,
+            common_prefix_tokens=_count_common_prefix_tokens(
+                previous,
+                layout,
+                segment_index,
+                common_prefix_bytes,
+                resolve_encoding(self._model),
+            ),
+            component=(
+                layout.segments[segment_index][0]
+                if segment_index < len(layout.segments)
+                else None
+            ),
+            invalidated=segment_index < _find_turn_tail_index(previous.segments),
+            context_paths=context_paths,
+            top_context_churn=top_context_churn,
+        )
+
+
+def log_prefix_stability_report(
+    logger: logging.Logger, report: PrefixStabilityReport
+) -> None:
+    """Log a prefix-stability report for one session turn."""
+    logger.info("%s", format_prefix_stability_report(report))
+
+
+def format_prefix_stability_report(report: PrefixStabilityReport) -> str:
+    """Format a readable prefix-stability report for logs and tests."""
+    lines = [
+        "Agent prompt prefix stability:",
+        f"  session: {report.session_id}",
+        (
+            "  reused prefix: "
+            + f"{report.common_prefix_bytes} of {report.previous_bytes} bytes"
+            + f" (~{report.common_prefix_tokens} tokens)"
+        ),
+    ]
+    if report.component is None:
+        lines.append("  first difference: none, the prompt extends the previous one")
+    else:
+        lines.append(
+            f"  first difference: byte {report.common_prefix_bytes}"
+            f", token ~{report.common_prefix_tokens}, in {report.component}"
+            + (" (prefix invalidated)" if report.invalidated else "")
+        )
+
+    if report.context_paths:
+        lines.append("  changed context keys: " + ", ".join(report.context_paths))
+
+    if report.top_context_churn:
+        lines.append("  context key churn:")
+        lines.extend(
+            f"    {path} = {count} turns" for path, count in report.top_context_churn
+        )
+
+    return "\n".join(lines)
+
+
+def _build_prompt_layout(prompt: PromptIR, request: ProviderRequest) -> _PromptLayout:
+    """Encode the prompt parts in model-prompt order with component labels."""
+    segments: list[tuple[str, bytes]] = [
+        ("instructions", encode_response_item(prompt.instructions)),
+        ("tools", encode_tool_definitions(request.tools)),
+    ]
+    segments.extend(
+        (label, _encode_item(item))
+        for label, item in build_responses_input_segments(prompt)
+    )
+    return _PromptLayout(
+        segments=tuple(segments),
+        context=prompt.context,
+        segment_tokens=[None] * len(segments),
+    )
+
+
+def _encode_item(item: dict[str, Any]) -> bytes:
+    return get_pre_encoded_response_item(item) or encode_response_item(item)
+
+
+def _find_first_difference(
+    previous: tuple[tuple[str, bytes], ...], current: tuple[tuple[str, bytes], ...]
+) -> tuple[int, int]:
+    """Return the shared byte count and the index of the first differing part."""
+    offset = 0
+    for index, (_, current_segment) in enumerate(current):
+        if index >= len(previous):
+            return offset, index
+
+        previous_segment = previous[index][1]
+        if previous_segment != current_segment:
+            return offset + _common_prefix_length(
+                previous_segment, current_segment
+            ), index
+        offset += len(current_segment)
+
+    return offset, len(current)
+
+
+def _common_prefix_length(left: bytes, right: bytes) -> int:
+    """Return the length of the longest common prefix of two byte strings."""
+    # Bisect over slice equality so the bytes are compared in C rather than one
+    # at a time in Python, which matters for multi-megabyte context segments.
+    low = 0
+    high = min(len(left), len(right))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if left[low:middle] == right[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _count_common_prefix_tokens(
+    previous: _PromptLayout,
+    current: _PromptLayout,
+    segment_index: int,
+    common_prefix_bytes: int,
+    encoding: Any | None,
+) -> int:
+    """Estimate the tokens in the shared prefix from per-segment counts.
+
+    Whole shared segments are counted once and the counts are passed on to the
+    current layout, so later turns only tokenize the part of the first
+    differing segment that both prompts share.
+    """
+    tokens = 0
+    shared_bytes = 0
+    for index in range(segment_index):
+        count = previous.segment_tokens[index]
+        segment = previous.segments[index][1]
+        if count is None:
+            count = count_tokens(segment.decode("utf-8", errors="ignore"), encoding)
+            previous.segment_tokens[index] = count
+        current.segment_tokens[index] = count
+        tokens += count
+        shared_bytes += len(segment)
+
+    if segment_index < len(previous.segments) and common_prefix_bytes > shared_bytes:
+        partial = previous.segments[segment_index][1][
+            : common_prefix_bytes - shared_bytes
+        ]
+        tokens += count_tokens(partial.decode("utf-8", errors="ignore"), encoding)
+    return tokens
+
+
+def _find_turn_tail_index(segments: tuple[tuple[str, bytes], ...]) -> int:
+    """Return where the parts that change on every turn start."""
+    for index, (component, _) in enumerate(segments):
+        if component in (VOLATILE_CONTEXT_SEGMENT, USER_MESSAGE_SEGMENT):
+            return index
+    return len(segments)
+
+
+def _diff_context_paths(
+    previous: Any, current: Any, path: str = "", depth: int = 0
+) -> list[str]:
+    """List key paths whose values differ, stopping at a fixed depth."""
+    if previous == current:
+        return []
+
+    if depth >= CONTEXT_CHURN_MAX_DEPTH or type(previous) is not type(current):
+        return [path or "<root>"]
+
+    if isinstance(current, dict):
+        paths: list[str] = []
+        for key in list(previous) + [key for key in current if key not in previous]:
+            key_path = path + "." + str(key) if path else str(key)
+            paths.extend(
+                _diff_context_paths(
+                    previous.get(key), current.get(key), key_path, depth + 1
+                )
+            )
+        return paths[:CONTEXT_CHURN_MAX_PATHS_PER_TURN]
+
+    if isinstance(current, list) and len(previous) == len(current):
+        paths = []
+        for index, (previous_item, current_item) in enumerate(
+            zip(previous, current, strict=True)
+        ):
+            paths.extend(
+                _diff_context_paths(
+                    previous_item, current_item, f"{path}[{index}]", depth + 1
+                )
+            )
+        return paths[:CONTEXT_CHURN_MAX_PATHS_PER_TURN]
+
+    return [path or "<root>"]
@@ -1,10 +1,69 @@
 from __future__ import annotations
 
+import hashlib
 import json
-from dataclasses import dataclass
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from typing import Any
 
+from .history_window import apply_history_window
 from .models import HistoryMessage, ProviderRequest
+from .tool_output_compactor import compact_tool_outputs
+
+RESPONSE_ITEM_CACHE_MAX_ENTRIES = 4096
+CONTEXT_SNAPSHOT_CACHE_MAX_ENTRIES = 4
+CONTEXT_SEGMENT = "context"
+OMITTED_HISTORY_SEGMENT = "omitted history note"
+HISTORY_ITEM_SEGMENT_PREFIX = "history item "
+VOLATILE_CONTEXT_SEGMENT = "volatile context"
+USER_MESSAGE_SEGMENT = "user message"
+_response_item_cache: OrderedDict[tuple[str, bytes], list[dict[str, Any]]] = (
+    OrderedDict()
+)
+# Request-body encodings of cached history items, keyed by item identity. An
+# entry lives exactly as long as its item stays in `_response_item_cache`, so
+# ids cannot be reused by unrelated objects while they are registered here.
+_encoded_response_items: dict[int, bytes | None] = {}
+
+
+class ContextSnapshot:
+    """Hold one serialized context snapshot and its prompt item.
+
+    The context text, the developer input item that carries it, and the JSON
+    encoding of that item are produced at most once per distinct snapshot, no
+    matter how many times the prompt is built, counted, or sent upstream.
+    """
+
+    __slots__ = ("context", "key_order", "text", "item", "_encoded_item", "_digest")
+
+    def __init__(
+        self, context: dict[str, Any], key_order: tuple[str, ...] | None = None
+    ) -> None:
+        self.context = context
+        self.key_order = key_order
+        self.text = build_context_text(context, key_order)
+        self.item = _build_developer_text_item(self.text)
+        self._encoded_item: bytes | None = None
+        self._digest: bytes | None = None
+
+    @property
+    def encoded_item(self) -> bytes:
+        """Return the request-body encoding of the context input item."""
+        if self._encoded_item is None:
+            self._encoded_item = encode_response_item(self.item)
+        return self._encoded_item
+
+    @property
+    def digest(self) -> bytes:
+        """Return a content digest of the context text."""
+        if self._digest is None:
+            self._digest = hashlib.blake2b(
+                self.text.encode("utf-8"), digest_size=16
+            ).digest()
+        return self._digest
+
+
+_context_snapshots: list[ContextSnapshot] = []
 
 
 @dataclass(frozen=True)
@@ -18,31 +77,49 @@ class PromptIR:
     volatile_context_text: str | None
     history: list[HistoryMessage]
     message: str
+    omitted_history_text: str | None = None
+    dropped_history: list[HistoryMessage] = field(default_factory=list)
+    compacted_tool_outputs: int = 0
+    context_item: dict[str, Any] | None = None
+    context_key_order: tuple[str, ...] | None = None
 
 
 def build_prompt_ir(request: ProviderRequest) -> PromptIR:
     """Build the provider-neutral prompt representation for one turn.
 
     Normalizes the request into the relay's shared prompt structure so provider
-    adapters can build their own payloads from one consistent source.
+    adapters can build their own payloads from one consistent source. When the
+    request carries a history window or tool-output compaction policy, older
+    history is trimmed and compacted here so every consumer of the prompt sees
+    the same conversation.
 
     Args:
         request: Provider request containing the system prompt, stable context,
-            volatile context, history, and current user message.
+            volatile context, history, current user message, and optional
+            history policies.
 
     Returns:
         PromptIR containing the canonical prompt pieces for the current turn.
     """
-    context_text = _build_context_text(request.context)
+    context_snapshot = get_context_snapshot(request.context, request.context_key_order)
     volatile_context_text = _build_volatile_context_text(request.volatile_context)
+    history_window = apply_history_window(request.history, request.history_window)
+    history, compacted_tool_outputs = compact_tool_outputs(
+        history_window.kept, request.tool_output_compaction
+    )
     return PromptIR(
         instructions=request.system_prompt,
         context=request.context,
-        context_text=context_text,
+        context_text=context_snapshot.text,
         volatile_context=request.volatile_context,
         volatile_context_text=volatile_context_text,
-        history=request.history,
+        history=history,
         message=request.message,
+        omitted_history_text=history_window.placeholder_text,
+        dropped_history=history_window.dropped,
+        compacted_tool_outputs=compacted_tool_outputs,
+        context_item=context_snapshot.item,
+        context_key_order=request.context_key_order,
     )
 
 
@@ -52,7 +129,8 @@ def build_responses_input(prompt: PromptIR) -> list[dict[str, Any]]:
     Converts the provider-neutral prompt representation into the structured
     message list expected by the Responses API. Stable history and context are
     emitted before the volatile context block, which keeps high-churn browser
-    state near the current user message.
+    state near the current user message. A note about windowed-out history
+    follows the stable context directly.
 
     Args:
         prompt: Shared prompt representation for the current turn.
@@ -60,42 +138,176 @@ def build_responses_input(prompt: PromptIR) -> list[dict[str, Any]]:
     Returns:
         Responses API input items ready for request serialization.
     """
-    messages: list[dict[str, Any]] = []
-    messages.append(_build_developer_text_item(prompt.context_text))
+    return [item for _, item in build_responses_input_segments(prompt)]
+
+
+def build_responses_input_segments(
+    prompt: PromptIR,
+) -> list[tuple[str, dict[str, Any]]]:
+    """Build the Responses API input items labelled with their prompt part.
+
+    Items come in the same order as `build_responses_input`. Each label is one
+    of the `*_SEGMENT` constants, or `HISTORY_ITEM_SEGMENT_PREFIX` followed by
+    the id of the history item the input item was converted from.
+
+    Args:
+        prompt: Shared prompt representation for the current turn.
+
+    Returns:
+        Pairs of segment label and Responses API input item.
+    """
+    segments: list[tuple[str, dict[str, Any]]] = [
+        (
+            CONTEXT_SEGMENT,
+            prompt.context_item or _build_developer_text_item(prompt.context_text),
+        )
+    ]
+    if prompt.omitted_history_text:
+        segments.append(
+            (
+                OMITTED_HISTORY_SEGMENT,
+                _build_developer_text_item(prompt.omitted_history_text),
+            )
+        )
+
+    segments.extend(_build_turn_segments(prompt, prompt.history))
+    return segments
+
 
+def build_responses_turn_input(
+    prompt: PromptIR, history: list[HistoryMessage]
+) -> list[dict[str, Any]]:
+    """Build the conversation items that follow the stable prompt prefix.
+
+    Emits `history`, the volatile context block, and the current user message
+    in the same order `build_responses_input` uses. Callers that continue an
+    upstream conversation pass only the history items the upstream has not
+    seen yet.
+
+    Args:
+        prompt: Shared prompt representation for the current turn.
+        history: History items to emit, usually `prompt.history`.
+
+    Returns:
+        Responses API input items for the given history and current turn.
+    """
+    return [item for _, item in _build_turn_segments(prompt, history)]
+
+
+def _build_turn_segments(
+    prompt: PromptIR, history: list[HistoryMessage]
+) -> list[tuple[str, dict[str, Any]]]:
+    segments: list[tuple[str, dict[str, Any]]] = []
     volatile_context_history_index = _get_volatile_context_history_insertion_index(
-        prompt
+        history, prompt.message
     )
-    for index, history_message in enumerate(prompt.history):
+    for index, history_message in enumerate(history):
         if index == volatile_context_history_index and prompt.volatile_context_text:
-            messages.append(_build_developer_text_item(prompt.volatile_context_text))
-        messages.extend(_build_response_messages([history_message]))
+            segments.append(
+                (
+                    VOLATILE_CONTEXT_SEGMENT,
+                    _build_developer_text_item(prompt.volatile_context_text),
+                )
+            )
+        label = HISTORY_ITEM_SEGMENT_PREFIX + history_message.id
+        segments.extend(
+            (label, item) for item in _get_cached_response_messages(history_message)
+        )
 
     # Keep volatile browser state after the stable prompt prefix and prior
     # conversation, immediately before the current user message when present.
     # This preserves prompt-cache reuse for stable context and makes the state
     # read as the current snapshot that follows the earlier conversation.
-    if (
-        volatile_context_history_index == len(prompt.history)
-        and prompt.volatile_context_text
-    ):
-        messages.append(_build_developer_text_item(prompt.volatile_context_text))
+    if volatile_context_history_index == len(history) and prompt.volatile_context_text:
+        segments.append(
+            (
+                VOLATILE_CONTEXT_SEGMENT,
+                _build_developer_text_item(prompt.volatile_context_text),
+            )
+        )
     if prompt.message:
-        messages.append(
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "input_text",
-                        "text": prompt.message,
-                    }
-                ],
-            }
+        segments.append(
+            (
+                USER_MESSAGE_SEGMENT,
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "input_text",
+                            "text": prompt.message,
+                        }
+                    ],
+                },
+            )
         )
-    return messages
+    return segments
+
 
+def get_context_snapshot(
+    context: dict[str, Any], key_order: tuple[str, ...] | None = None
+) -> ContextSnapshot:
+    """Return the cached serialized snapshot for a context payload.
 
-def _get_volatile_context_history_insertion_index(prompt: PromptIR) -> int:
+    Consecutive turns usually carry the same context object or an equal copy
+    of it. A small most-recently-used cache is checked by identity and then by
+    equality, which is far cheaper than serializing multi-megabyte contexts
+    again with indentation.
+
+    Args:
+        context: Stable context payload from the browser.
+        key_order: Optional order of the top-level context keys. See
+            `canonicalize_context`.
+
+    Returns:
+        Snapshot holding the context text and its prompt item.
+    """
+    for index in range(len(_context_snapshots) - 1, -1, -1):
+        snapshot = _context_snapshots[index]
+        if snapshot.key_order == key_order and (
+            snapshot.context is context or snapshot.context == context
+        ):
+            _context_snapshots.append(_context_snapshots.pop(index))
+            return snapshot
+
+    snapshot = ContextSnapshot(context, key_order)
+    _context_snapshots.append(snapshot)
+    if len(_context_snapshots) > CONTEXT_SNAPSHOT_CACHE_MAX_ENTRIES:
+        _context_snapshots.pop(0)
+    return snapshot
+
+
+def get_pre_encoded_response_item(item: dict[str, Any]) -> bytes | None:
+    """Return cached request-body bytes for an input item, when available.
+
+    Only items owned by the context snapshot or history caches have cached
+    encodings. History items are encoded on first use and then reused by
+    later turns and retries.
+    """
+    item_id = id(item)
+    if item_id in _encoded_response_items:
+        encoded = _encoded_response_items[item_id]
+        if encoded is None:
+            encoded = encode_response_item(item)
+            _encoded_response_items[item_id] = encoded
+        return encoded
+
+    for snapshot in _context_snapshots:
+        if snapshot.item is item:
+            return snapshot.encoded_item
+
+    return None
+
+
+def encode_response_item(item: Any) -> bytes:
+    """Encode one request-body value the same way the HTTP client would."""
+    return json.dumps(
+        item, ensure_ascii=False, separators=(",", ":"), allow_nan=False
+    ).encode("utf-8")
+
+
+def _get_volatile_context_history_insertion_index(
+    history: list[HistoryMessage], current_message: str
+) -> int:
     """Return the history index before which volatile context should be inserted.
 
     Normal user turns keep volatile context after all previous conversation and
@@ -103,12 +315,12 @@ def _get_volatile_context_history_insertion_index(prompt: PromptIR) -> int:
     keep rejected tool outputs after volatile context so the rejection remains
     the most recent actionable item.
     """
-    if prompt.message:
-        return len(prompt.history)
+    if current_message:
+        return len(history)
 
     last_successful_tool_result_index = -1
     last_rejected_tool_result_index = -1
-    for index, message in enumerate(prompt.history):
+    for index, message in enumerate(history):
         if message.role != "tool":
             continue
 
@@ -123,12 +335,48 @@ def _get_volatile_context_history_insertion_index(prompt: PromptIR) -> int:
     if last_rejected_tool_result_index >= 0:
         return last_rejected_tool_result_index
 
-    return len(prompt.history)
+    return len(history)
 
 
-def _build_context_text(context: dict[str, Any]) -> str:
+def canonicalize_context(
+    context: dict[str, Any], key_order: tuple[str, ...] | None = None
+) -> dict[str, Any]:
+    """Return the context with a deterministic key order.
+
+    Browsers may emit equal snapshots with different key orders, which would
+    change the serialized prompt prefix without changing its meaning. Nested
+    object keys are always sorted. Top-level keys follow `key_order` when
+    given, so a session can keep its stable branches first and move branches
+    that change often toward the end of the snapshot. Keys missing from
+    `key_order` follow in sorted order.
+
+    Args:
+        context: Stable context payload from the browser.
+        key_order: Optional order of the top-level context keys.
+
+    Returns:
+        Canonically ordered copy of the context.
+    """
+    ordered_keys = [key for key in key_order or () if key in context]
+    listed_keys = set(ordered_keys)
+    ordered_keys.extend(sorted(key for key in context if key not in listed_keys))
+    return {key: _sort_nested_keys(context[key]) for key in ordered_keys}
+
+
+def _sort_nested_keys(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _sort_nested_keys(value[key]) for key in sorted(value)}
+    if isinstance(value, list):
+        return [_sort_nested_keys(item) for item in value]
+    return value
+
+
+def build_context_text(
+    context: dict[str, Any], key_order: tuple[str, ...] | None = None
+) -> str:
+    """Serialize stable context as the developer text block the model reads."""
     return "Current GenomeSpy context snapshot:\n" + json.dumps(
-        context, indent=2, ensure_ascii=False
+        canonicalize_context(context, key_order), indent=2, ensure_ascii=False
     )
 
 
@@ -162,20 +410,54 @@ def _build_developer_text_item(text: str) -> dict[str, Any]:
     }
 
 
-def _build_response_messages(history: list[HistoryMessage]) -> list[dict[str, Any]]:
-    messages: list[dict[str, Any]] = []
-    for message in history:
-        if message.role == "tool":
-            messages.append(_build_tool_output_message(message))
-            continue
+def clear_response_item_cache() -> None:
+    """Drop all cached Responses API conversions of history items."""
+    _response_item_cache.clear()
+    _encoded_response_items.clear()
 
-        if message.tool_calls:
-            messages.extend(_build_assistant_tool_messages(message))
-            continue
 
-        messages.append(_build_standard_message(message))
+def _get_cached_response_messages(message: HistoryMessage) -> list[dict[str, Any]]:
+    """Return the Responses API items for one history item, reusing earlier work.
 
-    return messages
+    History is append-only apart from its last few items, so the same message
+    is converted again on every later turn. Converted items are cached by
+    message id and a fingerprint of the message fields, which lets edited or
+    compacted messages with a reused id miss the cache. Cached items are shared
+    between turns and must not be mutated by callers.
+    """
+    key = (message.id, fingerprint_history_message(message))
+    cached_items = _response_item_cache.get(key)
+    if cached_items is not None:
+        _response_item_cache.move_to_end(key)
+        return cached_items
+
+    items = _convert_history_message(message)
+    _response_item_cache[key] = items
+    for item in items:
+        _encoded_response_items[id(item)] = None
+    if len(_response_item_cache) > RESPONSE_ITEM_CACHE_MAX_ENTRIES:
+        _, evicted_items = _response_item_cache.popitem(last=False)
+        for item in evicted_items:
+            _encoded_response_items.pop(id(item), None)
+    return items
+
+
+def fingerprint_history_message(message: HistoryMessage) -> bytes:
+    """Return a digest that changes whenever a history item is edited."""
+    # Pydantic's native JSON serializer is much cheaper than the json.loads and
+    # sorted json.dumps round trips that a full conversion performs.
+    serialized = message.__pydantic_serializer__.to_json(message)
+    return hashlib.blake2b(serialized, digest_size=16).digest()
+
+
+def _convert_history_message(message: HistoryMessage) -> list[dict[str, Any]]:
+    if message.role == "tool":
+        return [_build_tool_output_message(message)]
+
+    if message.tool_calls:
+        return _build_assistant_tool_messages(message)
+
+    return [_build_standard_message(message)]
 
 
 def _build_tool_output_message(message: HistoryMessage) -> dict[str, Any]:
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import tempfile
+import threading
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+
+from app.providers.streaming import StreamDialect
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class UpstreamCapabilities:
+    """Describe what one upstream model server accepts and emits.
+
+    Attributes:
+        developer_role: Whether `developer` input messages are accepted.
+            Servers that reject them get relay context folded into the
+            instructions instead.
+        streaming: Whether `stream: true` requests return an SSE stream.
+        stream_dialect: Wire dialect of the server's SSE streams. Streams
+            are decoded with it from the first event instead of detecting
+            the dialect on every stream.
+
+    Fields are None when they have not been determined yet.
+    """
+
+    developer_role: bool | None = None
+    streaming: bool | None = None
+    stream_dialect: StreamDialect | None = None
+
+    @property
+    def complete(self) -> bool:
+        """Return whether every capability has been probed."""
+        return self.developer_role is not None and self.streaming is not None
+
+
+class CapabilityCache:
+    """Keep probed upstream capabilities, optionally in a JSON file.
+
+    Entries are keyed by base URL and model. With a path, every process that
+    points at the same file starts with the capabilities learned by the
+    others, so workers do not each pay a failed round trip to learn, for
+    example, that the server rejects `developer` messages. The file is
+    replaced atomically on every update.
+    """
+
+    def __init__(self, path: Path | None = None) -> None:
+        self._path = path
+        self._entries: dict[str, UpstreamCapabilities] = {}
+        self._lock = threading.Lock()
+
+    def get(self, base_url: str, model: str) -> UpstreamCapabilities | None:
+        """Return the stored capabilities of `model` at `base_url`."""
+        key = _cache_key(base_url, model)
+        with self._lock:
+            if key not in self._entries and self._path is not None:
+                self._entries.update(_read_cache_file(self._path))
+            return self._entries.get(key)
+
+    def put(
+        self, base_url: str, model: str, capabilities: UpstreamCapabilities
+    ) -> None:
+        """Store the capabilities of `model` at `base_url`."""
+        key = _cache_key(base_url, model)
+        with self._lock:
+            self._entries[key] = capabilities
+            if self._path is None:
+                return
+            entries = _read_cache_file(self._path)
+            entries[key] = capabilities
+            try:
+                _write_cache_file(self._path, entries)
+            except OSError as exc:
+                logger.warning(
+                    "Could not write upstream capability cache %s: %s",
+                    self._path,
+                    exc,
+                )
+
+
+def _cache_key(base_url: str, model: str) -> str:
+    return model + "@" + base_url.rstrip("/")
+
+
+def _read_cache_file(path: Path) -> dict[str, UpstreamCapabilities]:
+    """Load cache entries, ignoring a missing or unreadable file."""
+    try:
+        raw_entries = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as exc:
+        logger.warning(
+            "Ignoring unreadable upstream capability cache %s: %s", path, exc
+        )
+        return {}
+
+    if not isinstance(raw_entries, dict):
+        return {}
+
+    known_fields = {field.name for field in fields(UpstreamCapabilities)}
+    return {
+        key: UpstreamCapabilities(
+            **{name: value for name, value in entry.items() if name in known_fields}
+        )
+        for key, entry in raw_entries.items()
+        if isinstance(entry, dict)
+    }
+
+
+def _write_cache_file(path: Path, entries: dict[str, UpstreamCapabilities]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    file_descriptor, temporary_path = tempfile.mkstemp(
+        dir=path.parent, prefix=path.name + ".", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(file_descriptor, "w", encoding="utf-8") as file:
+            json.dump(
+                {key: asdict(entry) for key, entry in sorted(entries.items())},
+                file,
+                indent=2,
+            )
+        os.replace(temporary_path, path)
+    except BaseException:
+        Path(temporary_path).unlink(missing_ok=True)
+        raise
@@ -1,34 +1,75 @@
 from __future__ import annotations
 
 import asyncio
+import dataclasses
 import json
 import logging
 import os
 import re
+import time
 from abc import ABC, abstractmethod
+from contextlib import AsyncExitStack, aclosing
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, AsyncIterator
+from typing import Any, AsyncGenerator
 
+import anyio
 import httpx
 
+from app.compression import (
+    BodyCompressionRecord,
+    compress_body,
+    decompress_body,
+    log_body_compression_record,
+)
 from app.config import Settings, describe_api_key_for_logs
-from app.models import ProviderRequest, ProviderResponse, ProviderStreamEvent
-from app.prompt_builder import build_prompt_ir, build_responses_input
+from app.models import (
+    ProviderPrewarmResult,
+    ProviderRequest,
+    ProviderResponse,
+    ProviderStreamEvent,
+    ProviderToolDefinition,
+)
+from app.prompt_builder import PromptIR, build_prompt_ir, build_responses_input
 from app.providers import ProviderError
+from app.providers.capabilities import CapabilityCache, UpstreamCapabilities
 from app.providers.parsing import (
     _normalize_provider_text,
     _parse_provider_response_text,
     _parse_responses_response,
     _truncate_logged_content,
 )
-from app.providers.streaming import iter_provider_stream_events
+from app.providers.prewarm import PrewarmLimiter
+from app.providers.prompt_cache import build_prompt_cache_key, parse_response_usage
+from app.providers.request_body import encode_responses_payload
+from app.providers.response_chain import ResponseChainStore
+from app.providers.routing import BackendRouter, RouteDecision, format_route_decision
+from app.providers.streaming import (
+    StreamDialect,
+    _iter_sse_events,
+    _load_stream_event_payload,
+    detect_stream_dialect,
+    iter_provider_stream_events,
+)
+from app.providers.timeouts import (
+    PhaseTimeouts,
+    ProviderTimeoutError,
+    RequestDeadlines,
+)
+from app.traffic_recorder import RecordingTransport, TrafficRecorder
 
 logger = logging.getLogger(__name__)
 EMPTY_FINAL_ANSWER_RETRY_DELAY_SECONDS = 1.0
 EMPTY_FINAL_ANSWER_MAX_RETRIES = 1
 RATE_LIMIT_RETRY_FALLBACK_DELAY_SECONDS = 2.0
 RATE_LIMIT_MAX_RETRIES = 1
+MAX_CAPABILITY_DOWNGRADES = 4
+# Hosted Responses backends reject output budgets below 16 tokens.
+PREWARM_MAX_OUTPUT_TOKENS = 16
+STALL_MAX_FAILOVERS = 1
+UPSTREAM_CANCEL_TIMEOUT_SECONDS = 2.0
+CAPABILITY_PROBE_MAX_OUTPUT_TOKENS = 64
+CAPABILITY_PROBE_MESSAGE = "Call the capability_probe tool."
 PROVIDER_ERROR_PAYLOAD_LOG_PATH = Path(
     os.environ.get(
         "GENOMESPY_AGENT_PROVIDER_ERROR_PAYLOAD_LOG_PATH",
@@ -63,7 +104,7 @@ class BaseProvider(ABC):
 
     async def generate_stream(
         self, request: ProviderRequest
-    ) -> AsyncIterator[ProviderStreamEvent]:
+    ) -> AsyncGenerator[ProviderStreamEvent, None]:
         """Stream provider events for a relay turn.
 
         The default implementation falls back to `generate` and emits a single
@@ -73,11 +114,41 @@ class BaseProvider(ABC):
             request: Normalized provider request for the current relay turn.
 
         Returns:
-            Async iterator of normalized provider stream events.
+            Async generator of normalized provider stream events.
         """
         response = await self.generate(request)
         yield ProviderStreamEvent(type="final", response=response)
 
+    async def prewarm(self, request: ProviderRequest) -> ProviderPrewarmResult:
+        """Warm the upstream prompt cache with the turn's stable prefix.
+
+        The default implementation does nothing for providers without prompt
+        caching.
+
+        Args:
+            request: Provider request whose instructions, tools, and stable
+                context should be prefilled.
+
+        Returns:
+            Outcome of the warm-up.
+        """
+        return ProviderPrewarmResult(status="unsupported")
+
+    async def warm_up(self, message: str) -> None:
+        """Send a short request that makes the backend load the model.
+
+        The default implementation runs a regular turn without context.
+
+        Args:
+            message: User message of the warm-up request.
+
+        Raises:
+            ProviderError: If the upstream request fails.
+        """
+        await self.generate(
+            ProviderRequest(system_prompt="", context={}, history=[], message=message)
+        )
+
 
 class OpenAIResponsesProvider(BaseProvider):
     """Implement relay requests against the OpenAI Responses API shape."""
@@ -85,6 +156,29 @@ class OpenAIResponsesProvider(BaseProvider):
     def __init__(self, settings: Settings) -> None:
         self._settings = settings
         self._prefer_role_compat_payload = settings.prefer_responses_role_compat
+        self._upstream_request_compression = settings.upstream_request_compression
+        self._response_chains = ResponseChainStore()
+        self._send_prompt_cache_key = settings.send_prompt_cache_key
+        self._router = (
+            BackendRouter(settings.backend_base_urls, settings.routing_load_factor)
+            if settings.backend_base_urls
+            else None
+        )
+        self._prewarm_limiter = PrewarmLimiter(settings.prewarm_max_per_minute)
+        self._capability_cache = CapabilityCache(
+            Path(settings.capability_cache_path)
+            if settings.capability_cache_path is not None
+            else None
+        )
+        self._capabilities: UpstreamCapabilities | None = None
+        self._timeouts = PhaseTimeouts.from_settings(settings)
+        self._traffic_recorder = (
+            TrafficRecorder(
+                Path(settings.traffic_record_path), settings.traffic_record_max_bytes
+            )
+            if settings.traffic_record_path is not None
+            else None
+        )
 
     async def generate(self, request: ProviderRequest) -> ProviderResponse:
         """Generate one complete response through the Responses API.
@@ -99,14 +193,42 @@ class OpenAIResponsesProvider(BaseProvider):
             ProviderError: If the HTTP request fails or the provider response
                 is invalid.
         """
-        payload = self._build_payload(request)
-        total_attempts = max(
-            EMPTY_FINAL_ANSWER_MAX_RETRIES,
-            RATE_LIMIT_MAX_RETRIES,
-        )
-        for attempt in range(total_attempts + 1):
+        await self._ensure_capabilities()
+        prompt = build_prompt_ir(request)
+        stalled_backends: tuple[str, ...] = ()
+        timed_out_phases: tuple[str, ...] = ()
+        while True:
+            route = self._acquire_route(request, prompt, exclude=stalled_backends)
+            try:
+                response = await self._generate(
+                    request, prompt, self._endpoint_for(route)
+                )
+            except ProviderTimeoutError as exc:
+                if not self._can_fail_over(route, stalled_backends):
+                    raise
+                assert route is not None
+                self._log_stall_failover(route, exc)
+                stalled_backends += (route.backend,)
+                timed_out_phases += (exc.phase,)
+                continue
+            finally:
+                self._release_route(route)
+            if timed_out_phases:
+                response = response.model_copy(
+                    update={"timed_out_phases": timed_out_phases}
+                )
+            return response
+
+    async def _generate(
+        self, request: ProviderRequest, prompt: PromptIR, endpoint: str
+    ) -> ProviderResponse:
+        """Run the non-streaming retry loop against one routed endpoint."""
+        payload = self._build_payload(request, prompt=prompt)
+        attempt = 0
+        downgrades = 0
+        while True:
             try:
-                response = await self._post_response(payload)
+                response = await self._post_response(payload, endpoint)
                 response_json = _load_response_json(response)
 
                 logger.debug(
@@ -142,21 +264,35 @@ class OpenAIResponsesProvider(BaseProvider):
                             await asyncio.sleep(
                                 EMPTY_FINAL_ANSWER_RETRY_DELAY_SECONDS
                             )
+                            attempt += 1
                             continue
                     raise
                 logger.debug(
                     "Provider parsed response from Responses API: %r",
                     response_payload.model_dump(),
                 )
+                response_id = response_json.get("id")
+                response_payload = response_payload.model_copy(
+                    update={
+                        "response_id": (
+                            response_id if isinstance(response_id, str) else None
+                        ),
+                        "usage": parse_response_usage(response_json),
+                    }
+                )
+                self._record_response_chain(request, prompt, response_payload)
                 return response_payload
             except ProviderError as exc:
-                fallback_payload = _build_unexpected_role_fallback_payload(payload, exc)
-                if fallback_payload is not None:
-                    self._prefer_role_compat_payload = True
-                    logger.warning(
-                        "Retrying provider request with developer-role fallback after upstream role validation error."
+                downgraded_payload = (
+                    self._downgrade_rejected_payload(
+                        request, prompt, payload, exc, stream=False
                     )
-                    payload = fallback_payload
+                    if downgrades < MAX_CAPABILITY_DOWNGRADES
+                    else None
+                )
+                if downgraded_payload is not None:
+                    downgrades += 1
+                    payload = downgraded_payload
                     continue
                 retry_delay_seconds = _get_rate_limit_retry_delay_seconds(exc)
                 if (
@@ -170,74 +306,146 @@ class OpenAIResponsesProvider(BaseProvider):
                         retry_delay_seconds,
                     )
                     await asyncio.sleep(retry_delay_seconds)
+                    attempt += 1
                     continue
                 raise
 
-        raise AssertionError("Unreachable provider retry state.")
-
     async def generate_stream(
         self, request: ProviderRequest
-    ) -> AsyncIterator[ProviderStreamEvent]:
+    ) -> AsyncGenerator[ProviderStreamEvent, None]:
         """Stream a response through the Responses API.
 
+        Upstreams known not to support streaming get a non-streaming request
+        whose response is emitted as a single final event. A stream that
+        stalls before any substantive event is retried on another backend.
+
         Args:
             request: Normalized provider request for the current relay turn.
 
         Returns:
-            Async iterator of normalized provider stream events.
+            Async generator of normalized provider stream events.
 
         Raises:
             ProviderError: If the HTTP request fails or the provider response
                 is invalid.
         """
-        payload = self._build_payload(request, stream=True)
-        total_attempts = max(
-            EMPTY_FINAL_ANSWER_MAX_RETRIES,
-            RATE_LIMIT_MAX_RETRIES,
-        )
-        for attempt in range(total_attempts + 1):
+        await self._ensure_capabilities()
+        if self._capabilities is not None and self._capabilities.streaming is False:
+            async for event in super().generate_stream(request):
+                yield event
+            return
+
+        prompt = build_prompt_ir(request)
+        stalled_backends: tuple[str, ...] = ()
+        timed_out_phases: tuple[str, ...] = ()
+        while True:
+            route = self._acquire_route(request, prompt, exclude=stalled_backends)
+            yielded_substantive_event = False
+            try:
+                async with aclosing(
+                    self._generate_stream(request, prompt, self._endpoint_for(route))
+                ) as events:
+                    async for event in events:
+                        if event.type != "heartbeat":
+                            yielded_substantive_event = True
+                        if (
+                            timed_out_phases
+                            and event.type == "final"
+                            and event.response is not None
+                        ):
+                            event = dataclasses.replace(
+                                event,
+                                response=event.response.model_copy(
+                                    update={"timed_out_phases": timed_out_phases}
+                                ),
+                            )
+                        yield event
+                return
+            except ProviderTimeoutError as exc:
+                if yielded_substantive_event or not self._can_fail_over(
+                    route, stalled_backends
+                ):
+                    raise
+                assert route is not None
+                self._log_stall_failover(route, exc)
+                stalled_backends += (route.backend,)
+                timed_out_phases += (exc.phase,)
+            finally:
+                self._release_route(route)
+
+    async def _generate_stream(
+        self, request: ProviderRequest, prompt: PromptIR, endpoint: str
+    ) -> AsyncGenerator[ProviderStreamEvent, None]:
+        """Run the streaming retry loop against one routed endpoint."""
+        payload = self._build_payload(request, stream=True, prompt=prompt)
+        attempt = 0
+        downgrades = 0
+        while True:
             yielded_substantive_event = False
             request_payload = payload
-            async with httpx.AsyncClient(
-                timeout=self._settings.timeout_seconds
-            ) as client:
+            content, headers = self._encode_request_body(request_payload)
+            deadlines = RequestDeadlines(self._timeouts)
+            upstream_response_ids: list[str] = []
+            async with self._client(self._timeouts.httpx_timeout()) as client:
                 try:
-                    async with client.stream(
-                        "POST",
-                        self._endpoint,
-                        json=request_payload,
-                        headers=_build_auth_headers(self._settings),
-                    ) as response:
+                    async with AsyncExitStack() as response_stack:
+                        with deadlines.watch():
+                            response = await response_stack.enter_async_context(
+                                client.stream(
+                                    "POST",
+                                    endpoint,
+                                    content=content,
+                                    headers=headers,
+                                )
+                            )
                         await _raise_for_error_response(
-                            response, self._settings, self._endpoint
+                            response, self._settings, endpoint
                         )
                         async for event in iter_provider_stream_events(
                             response,
                             parse_provider_response_text=_parse_provider_response_text,
                             normalize_provider_text=_normalize_provider_text,
                             truncate_logged_content=_truncate_logged_content,
+                            deadlines=deadlines,
+                            on_response_id=upstream_response_ids.append,
+                            dialect=(
+                                self._capabilities.stream_dialect
+                                if self._capabilities is not None
+                                else None
+                            ),
                         ):
                             if event.type != "heartbeat":
                                 yielded_substantive_event = True
+                            if event.type == "final" and event.response is not None:
+                                self._record_response_chain(
+                                    request, prompt, event.response
+                                )
                             yield event
                     return
+                except (GeneratorExit, anyio.get_cancelled_exc_class()):
+                    if upstream_response_ids:
+                        await self._cancel_upstream_response(
+                            endpoint, upstream_response_ids[-1]
+                        )
+                    raise
+                except httpx.ConnectTimeout as exc:
+                    raise self._connect_timeout_error(exc) from exc
                 except httpx.ReadTimeout as exc:
                     raise _provider_request_failed(self._settings, exc) from exc
                 except Exception as exc:
-                    if isinstance(exc, ProviderError):
-                        fallback_payload = _build_unexpected_role_fallback_payload(
-                            request_payload, exc
+                    downgraded_payload = (
+                        self._downgrade_rejected_payload(
+                            request, prompt, request_payload, exc, stream=True
                         )
-                        if (
-                            fallback_payload is not None
-                            and not yielded_substantive_event
-                        ):
-                            self._prefer_role_compat_payload = True
-                            logger.warning(
-                                "Retrying streaming provider request with developer-role fallback after upstream role validation error."
-                            )
-                            payload = fallback_payload
-                            continue
+                        if isinstance(exc, ProviderError)
+                        and not yielded_substantive_event
+                        and downgrades < MAX_CAPABILITY_DOWNGRADES
+                        else None
+                    )
+                    if downgraded_payload is not None:
+                        downgrades += 1
+                        payload = downgraded_payload
+                        continue
                     retry_delay_seconds = (
                         _get_rate_limit_retry_delay_seconds(exc)
                         if isinstance(exc, ProviderError)
@@ -255,6 +463,7 @@ class OpenAIResponsesProvider(BaseProvider):
                             retry_delay_seconds,
                         )
                         await asyncio.sleep(retry_delay_seconds)
+                        attempt += 1
                         continue
                     if (
                         isinstance(exc, ProviderError)
@@ -270,29 +479,413 @@ class OpenAIResponsesProvider(BaseProvider):
                         await asyncio.sleep(
                             EMPTY_FINAL_ANSWER_RETRY_DELAY_SECONDS
                         )
+                        attempt += 1
                         continue
                     if isinstance(exc, ProviderError):
                         raise
                     raise _provider_request_failed(self._settings, exc) from exc
 
-        raise AssertionError("Unreachable provider retry state.")
+    async def prewarm(self, request: ProviderRequest) -> ProviderPrewarmResult:
+        """Send the stable prompt prefix upstream with a minimal output budget.
+
+        The warm-up carries the instructions, tools, and stable context
+        exactly as the next turn will send them, and it is routed like that
+        turn, so the backend that serves it has the prefix prefilled. Warm-ups
+        are deduplicated per prefix hash and backend and rate-limited.
+
+        Args:
+            request: Provider request whose stable prefix should be warmed.
+
+        Returns:
+            Outcome of the warm-up. Upstream failures are logged and reported
+            as `failed` instead of being raised. A prefix with no input items,
+            which happens when the developer context is folded into the
+            instructions for servers that reject the `developer` role, is
+            `skipped` because such servers reject an empty `input`.
+        """
+        prompt = build_prompt_ir(request)
+        prefix_hash = build_prompt_cache_key(prompt, request.tools)
+        payload = self._build_prewarm_payload(request, prompt)
+        if not payload.get("input"):
+            return ProviderPrewarmResult(status="skipped", prefix_hash=prefix_hash)
+
+        route = self._acquire_route(request, prompt)
+        try:
+            endpoint = self._endpoint_for(route)
+            claim_key = endpoint + "#" + prefix_hash
+            claim = self._prewarm_limiter.claim(claim_key)
+            if claim != "accepted":
+                return ProviderPrewarmResult(status=claim, prefix_hash=prefix_hash)
+
+            started_at = time.perf_counter()
+            try:
+                await self._post_response(payload, endpoint)
+            except ProviderError as exc:
+                logger.warning("Provider prefix warm-up failed: %s", exc)
+                self._prewarm_limiter.forget(claim_key)
+                return ProviderPrewarmResult(status="failed", prefix_hash=prefix_hash)
+
+            return ProviderPrewarmResult(
+                status="warmed",
+                prefix_hash=prefix_hash,
+                duration_ms=round((time.perf_counter() - started_at) * 1000),
+            )
+        finally:
+            self._release_route(route)
+
+    async def warm_up(self, message: str) -> None:
+        """Load the model on every configured backend with a minimal request.
+
+        The request carries only `message` and a minimal output budget, plus
+        the configured `keep_alive` hint, so local servers that unload idle
+        models keep them resident.
+
+        Args:
+            message: User message of the warm-up request.
+
+        Raises:
+            ProviderError: If a backend rejects the request or is unreachable.
+        """
+        payload: dict[str, Any] = {
+            "model": self._settings.model,
+            "input": message,
+            "max_output_tokens": PREWARM_MAX_OUTPUT_TOKENS,
+        }
+        if self._settings.model_keep_alive is not None:
+            payload["keep_alive"] = self._settings.model_keep_alive
+        backends = (
+            self._router.backends
+            if self._router is not None
+            else (self._settings.base_url,)
+        )
+        for backend in backends:
+            await self._post_response(payload, backend + "/responses")
+
+    async def _cancel_upstream_response(self, endpoint: str, response_id: str) -> None:
+        """Ask the upstream to stop a response whose client went away.
+
+        Closing the stream already makes most servers stop generating; the
+        explicit cancel covers backends that keep generating detached
+        responses. It is best-effort: it runs shielded from the cancellation
+        that triggered it, is bounded by a short timeout, and failures are
+        only logged.
+        """
+        if not self._settings.send_upstream_cancel:
+            return
+
+        with (
+            anyio.CancelScope(shield=True),
+            anyio.move_on_after(UPSTREAM_CANCEL_TIMEOUT_SECONDS),
+        ):
+            try:
+                await self._post_response({}, f"{endpoint}/{response_id}/cancel")
+            except ProviderError as exc:
+                logger.info(
+                    "Upstream cancel of response %s failed: %s", response_id, exc
+                )
+                return
+            logger.info("Cancelled upstream response %s", response_id)
+
+    def _build_prewarm_payload(
+        self, request: ProviderRequest, prompt: PromptIR
+    ) -> dict[str, Any]:
+        """Build a request that holds only the stable prompt prefix."""
+        prefix_prompt = dataclasses.replace(
+            prompt,
+            history=[],
+            message="",
+            volatile_context_text=None,
+            omitted_history_text=None,
+        )
+        payload = self._build_payload(
+            request, prompt=prefix_prompt, allow_chaining=False
+        )
+        payload.pop("store", None)
+        payload["max_output_tokens"] = PREWARM_MAX_OUTPUT_TOKENS
+        return payload
+
+    async def _ensure_capabilities(self) -> None:
+        """Load or probe the upstream capabilities on first contact.
+
+        Capabilities come from the capability cache when another process has
+        already learned them. Otherwise, when probing is enabled, two short
+        requests detect them before the first turn and the result is stored
+        in the cache. A failed probe is retried on the next turn.
+        """
+        if self._capabilities is not None:
+            return
+
+        base_url = self._capability_base_url()
+        capabilities = self._capability_cache.get(base_url, self._settings.model)
+        if (
+            capabilities is None or not capabilities.complete
+        ) and self._settings.probe_upstream_capabilities:
+            probed = await self._probe_capabilities(base_url + "/responses")
+            if probed is None:
+                return
+            capabilities = probed
+            self._capability_cache.put(base_url, self._settings.model, capabilities)
+            logger.info(
+                "Probed upstream capabilities of %s at %s: %s",
+                self._settings.model,
+                base_url,
+                capabilities,
+            )
+        self._apply_capabilities(capabilities or UpstreamCapabilities())
+
+    def _apply_capabilities(self, capabilities: UpstreamCapabilities) -> None:
+        self._capabilities = capabilities
+        if capabilities.developer_role is False:
+            self._prefer_role_compat_payload = True
+
+    def _remember_capabilities(self, **changes: Any) -> None:
+        """Record a capability learned from a turn and share it via the cache."""
+        capabilities = dataclasses.replace(
+            self._capabilities or UpstreamCapabilities(), **changes
+        )
+        self._apply_capabilities(capabilities)
+        self._capability_cache.put(
+            self._capability_base_url(), self._settings.model, capabilities
+        )
+
+    def _capability_base_url(self) -> str:
+        """Return the base URL that capability cache entries are keyed on.
+
+        Routed backends are equivalent replicas, so the first one stands for
+        all of them.
+        """
+        if self._router is not None:
+            return self._router.backends[0]
+        return self._settings.base_url
+
+    async def _probe_capabilities(self, endpoint: str) -> UpstreamCapabilities | None:
+        """Detect upstream capabilities with two minimal requests.
+
+        A non-streaming request with a `developer` message shows whether the
+        role is accepted. A streaming request then shows whether SSE is
+        supported and which wire dialect the server streams.
+
+        Returns:
+            Probed capabilities, or None if the upstream could not be reached.
+        """
+        payload: dict[str, Any] = {
+            "model": self._settings.model,
+            "instructions": "Follow the developer message.",
+            "input": [
+                {
+                    "role": "developer",
+                    "content": [
+                        {
+                            "type": "input_text",
+                            "text": "Answer by calling the capability_probe tool.",
+                        }
+                    ],
+                },
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "input_text", "text": CAPABILITY_PROBE_MESSAGE}
+                    ],
+                },
+            ],
+            "tools": [
+                {
+                    "type": "function",
+                    "name": "capability_probe",
+                    "description": "Report that tool calls work.",
+                    "parameters": {
+                        "type": "object",
+                        "properties": {},
+                        "additionalProperties": False,
+                    },
+                    "strict": True,
+                }
+            ],
+            "tool_choice": "auto",
+            "max_output_tokens": CAPABILITY_PROBE_MAX_OUTPUT_TOKENS,
+        }
+        developer_role = True
+        try:
+            await self._post_response(payload, endpoint)
+        except ProviderError as exc:
+            fallback_payload = _build_unexpected_role_fallback_payload(payload, exc)
+            if fallback_payload is None:
+                logger.warning("Upstream capability probe failed: %s", exc)
+                return None
+            developer_role = False
+            payload = fallback_payload
+            try:
+                await self._post_response(payload, endpoint)
+            except ProviderError as fallback_exc:
+                logger.warning("Upstream capability probe failed: %s", fallback_exc)
+                return None
+
+        stream_payload = {
+            key: value
+            for key, value in payload.items()
+            if key not in {"tools", "tool_choice"}
+        }
+        stream_payload["stream"] = True
+        streaming, events = await self._probe_stream(stream_payload, endpoint)
+        if streaming is None:
+            return None
+        return UpstreamCapabilities(
+            developer_role=developer_role,
+            streaming=streaming,
+            stream_dialect=_probed_stream_dialect(events) if streaming else None,
+        )
+
+    async def _probe_stream(
+        self, payload: dict[str, Any], endpoint: str
+    ) -> tuple[bool | None, list[tuple[str, Any]]]:
+        """Send a streaming probe and collect its parsed SSE events.
+
+        Returns:
+            Whether the upstream streamed the response, or None if it failed
+            for a reason unrelated to streaming support, and the events.
+        """
+        content, headers = self._encode_request_body(payload)
+        events: list[tuple[str, Any]] = []
+        async with self._client(self._settings.timeout_seconds) as client:
+            try:
+                async with client.stream(
+                    "POST", endpoint, content=content, headers=headers
+                ) as response:
+                    if 400 <= response.status_code < 500:
+                        logger.info(
+                            "Upstream rejected the streaming probe with HTTP %s.",
+                            response.status_code,
+                        )
+                        return False, events
+                    await _raise_for_error_response(response, self._settings, endpoint)
+                    if not response.headers.get("content-type", "").startswith(
+                        "text/event-stream"
+                    ):
+                        return False, events
+                    async for event_name, data_text in _iter_sse_events(response):
+                        if data_text == "[DONE]":
+                            break
+                        events.append(
+                            (event_name, _load_stream_event_payload(data_text))
+                        )
+            except (ProviderError, httpx.HTTPError) as exc:
+                logger.warning("Upstream streaming probe failed: %s", exc)
+                return None, events
+        return True, events
+
+    def _endpoint_for(self, route: RouteDecision | None) -> str:
+        """Return the Responses API endpoint URL of the routed backend."""
+        base_url = route.backend if route is not None else self._settings.base_url
+        return base_url + "/responses"
+
+    def _acquire_route(
+        self,
+        request: ProviderRequest,
+        prompt: PromptIR,
+        exclude: tuple[str, ...] = (),
+    ) -> RouteDecision | None:
+        """Pick the backend for this turn when several backends are configured.
+
+        Turns are keyed on the session id, or on the stable-prefix hash when
+        configured or when the client sent no session id, so consecutive turns
+        of a conversation reach the replica that holds their prefix cache.
+        """
+        if self._router is None:
+            return None
+
+        key = (
+            request.session_id
+            if self._settings.routing_key == "session"
+            and request.session_id is not None
+            else build_prompt_cache_key(prompt, request.tools)
+        )
+        route = self._router.acquire(key, exclude)
+        if self._settings.enable_throughput_debug_logs:
+            logger.info("%s", format_route_decision(route))
+        return route
+
+    def _can_fail_over(
+        self, route: RouteDecision | None, stalled_backends: tuple[str, ...]
+    ) -> bool:
+        """Return whether a stalled turn can be retried on another backend."""
+        return (
+            route is not None
+            and self._router is not None
+            and len(stalled_backends) < STALL_MAX_FAILOVERS
+            and len(self._router.backends) > len(stalled_backends) + 1
+        )
+
+    def _log_stall_failover(
+        self, route: RouteDecision, error: ProviderTimeoutError
+    ) -> None:
+        logger.warning(
+            "Provider backend %s stalled (%s timeout after %gs); "
+            "retrying on another backend.",
+            route.backend,
+            error.phase,
+            error.timeout_seconds,
+        )
 
-    @property
-    def _endpoint(self) -> str:
-        """Return the Responses API endpoint URL."""
-        return self._settings.base_url + "/responses"
+    def _connect_timeout_error(self, exc: httpx.ConnectTimeout) -> ProviderError:
+        """Report a connect timeout as a stall when a connect budget is set."""
+        if self._timeouts.connect_seconds is None:
+            return _provider_request_failed(self._settings, exc)
+        return ProviderTimeoutError("connect", self._timeouts.connect_seconds)
+
+    def _release_route(self, route: RouteDecision | None) -> None:
+        """Stop counting a routed turn as in flight."""
+        if self._router is not None and route is not None:
+            self._router.release(route)
 
     def _build_payload(
-        self, request: ProviderRequest, stream: bool = False
+        self,
+        request: ProviderRequest,
+        stream: bool = False,
+        prompt: PromptIR | None = None,
+        allow_chaining: bool = True,
     ) -> dict[str, Any]:
-        """Build the request payload sent to the provider."""
-        prompt = build_prompt_ir(request)
-        tools = [tool.model_dump() for tool in request.tools]
+        """Build the request payload sent to the provider.
+
+        Tool definitions stay as validated models so the request-body encoder
+        can reuse the encoded tools array across turns and retries. With
+        response chaining enabled, session turns whose prompt still extends
+        the previous upstream response send only the new input items together
+        with `previous_response_id`. When enabled, the stable-prefix hash is
+        sent as `prompt_cache_key` so the backend can route turns that share
+        instructions, tools, and context to the same prompt cache.
+        """
+        if prompt is None:
+            prompt = build_prompt_ir(request)
+        tools = request.tools
+        chained_input = None
+        if (
+            allow_chaining
+            and self._uses_response_chaining(request)
+            and request.session_id is not None
+        ):
+            chained_input = self._response_chains.build_chained_input(
+                request.session_id, prompt, tools
+            )
         payload: dict[str, Any] = {
             "model": self._settings.model,
             "instructions": prompt.instructions,
-            "input": build_responses_input(prompt),
+            "input": (
+                chained_input[1]
+                if chained_input is not None
+                else build_responses_input(prompt)
+            ),
         }
+        if chained_input is not None:
+            payload["previous_response_id"] = chained_input[0]
+            logger.debug(
+                "Chaining provider request to %s with %d new input items.",
+                chained_input[0],
+                len(chained_input[1]),
+            )
+        if self._uses_response_chaining(request):
+            payload["store"] = True
+        if self._send_prompt_cache_key:
+            payload["prompt_cache_key"] = build_prompt_cache_key(prompt, tools)
         if stream:
             payload["stream"] = True
         if tools:
@@ -302,6 +895,8 @@ class OpenAIResponsesProvider(BaseProvider):
             compat_payload = _build_role_compat_payload(payload)
             if compat_payload is not None:
                 payload = compat_payload
+        if self._settings.model_keep_alive is not None:
+            payload["keep_alive"] = self._settings.model_keep_alive
         _log_model_request(
             prompt.instructions,
             prompt.context_text,
@@ -310,29 +905,196 @@ class OpenAIResponsesProvider(BaseProvider):
         )
         return payload
 
-    async def _post_response(self, payload: dict[str, Any]) -> httpx.Response:
+    def _downgrade_rejected_payload(
+        self,
+        request: ProviderRequest,
+        prompt: PromptIR,
+        payload: dict[str, Any],
+        error: ProviderError,
+        *,
+        stream: bool,
+    ) -> dict[str, Any] | None:
+        """Return the payload to resend after the upstream rejected a feature.
+
+        Each downgrade drops one optional feature the upstream refused:
+        request compression, the prompt cache key, response chaining, or the
+        developer role. Downgrades are retried separately from rate limits
+        and empty answers, so they do not use up those retries.
+
+        Returns:
+            The downgraded payload, or None if `error` is not such a
+            rejection.
+        """
+        if self._disable_rejected_request_compression(error):
+            return payload
+        keyless_payload = self._strip_rejected_prompt_cache_key(payload, error)
+        if keyless_payload is not None:
+            return keyless_payload
+        if self._discard_rejected_response_chain(request, payload, error):
+            return self._build_payload(
+                request, stream=stream, prompt=prompt, allow_chaining=False
+            )
+        fallback_payload = _build_unexpected_role_fallback_payload(payload, error)
+        if fallback_payload is not None:
+            self._remember_capabilities(developer_role=False)
+            logger.warning(
+                "Retrying %s provider request with developer-role fallback "
+                "after upstream role validation error.",
+                "streaming" if stream else "non-streaming",
+            )
+            return fallback_payload
+        return None
+
+    def _uses_response_chaining(self, request: ProviderRequest) -> bool:
+        """Return whether this turn may continue an upstream conversation."""
+        return (
+            self._settings.enable_response_chaining and request.session_id is not None
+        )
+
+    def _record_response_chain(
+        self, request: ProviderRequest, prompt: PromptIR, response: ProviderResponse
+    ) -> None:
+        """Remember the upstream response that holds this session turn."""
+        if (
+            not self._uses_response_chaining(request)
+            or request.session_id is None
+            or response.response_id is None
+        ):
+            return
+
+        self._response_chains.record(
+            request.session_id, response.response_id, prompt, request.tools, response
+        )
+
+    def _discard_rejected_response_chain(
+        self,
+        request: ProviderRequest,
+        payload: dict[str, Any],
+        error: ProviderError,
+    ) -> bool:
+        """Drop a chain the upstream no longer holds.
+
+        Returns:
+            Whether the request should be retried with a full replay.
+        """
+        if (
+            "previous_response_id" not in payload
+            or request.session_id is None
+            or not _is_missing_previous_response_error(error)
+        ):
+            return False
+
+        logger.warning(
+            "Provider no longer holds response %s; replaying the full conversation.",
+            payload["previous_response_id"],
+        )
+        self._response_chains.discard(request.session_id)
+        return True
+
+    def _strip_rejected_prompt_cache_key(
+        self, payload: dict[str, Any], error: ProviderError
+    ) -> dict[str, Any] | None:
+        """Stop sending `prompt_cache_key` after the backend rejects it.
+
+        Returns:
+            Payload without the cache key to retry with, or None when the
+            error is unrelated.
+        """
+        if "prompt_cache_key" not in payload or "prompt_cache_key" not in str(error):
+            return None
+
+        logger.warning(
+            "Provider rejected prompt_cache_key; "
+            "sending requests without it from now on."
+        )
+        self._send_prompt_cache_key = False
+        return {
+            key: value for key, value in payload.items() if key != "prompt_cache_key"
+        }
+
+    async def _post_response(
+        self, payload: dict[str, Any], endpoint: str
+    ) -> httpx.Response:
         """Send one non-streaming request to the provider."""
-        async with httpx.AsyncClient(timeout=self._settings.timeout_seconds) as client:
+        content, headers = self._encode_request_body(payload)
+        deadlines = RequestDeadlines(self._timeouts)
+        async with self._client(self._timeouts.httpx_timeout()) as client:
             try:
-                response = await client.post(
-                    self._endpoint,
-                    json=payload,
-                    headers=_build_auth_headers(self._settings),
-                )
+                with deadlines.watch_total():
+                    response = await client.post(
+                        endpoint,
+                        content=content,
+                        headers=headers,
+                    )
+            except ProviderTimeoutError:
+                raise
+            except httpx.ConnectTimeout as exc:
+                raise self._connect_timeout_error(exc) from exc
             except httpx.ReadTimeout as exc:
                 raise _provider_request_failed(self._settings, exc) from exc
             except Exception as exc:
                 raise _provider_request_failed(self._settings, exc) from exc
 
-        await _raise_for_error_response(response, self._settings, self._endpoint)
+        await _raise_for_error_response(response, self._settings, endpoint)
         return response
 
+    def _client(self, timeout: httpx.Timeout | float) -> httpx.AsyncClient:
+        """Return a new upstream HTTP client, recording traffic if enabled."""
+        if self._traffic_recorder is None:
+            return httpx.AsyncClient(timeout=timeout)
+        return httpx.AsyncClient(
+            timeout=timeout, transport=RecordingTransport(self._traffic_recorder)
+        )
+
+    def _encode_request_body(
+        self, payload: dict[str, Any]
+    ) -> tuple[bytes, dict[str, str]]:
+        """Encode the upstream body and headers, compressing when configured."""
+        body = encode_responses_payload(payload)
+        headers = _build_auth_headers(self._settings)
+        encoding = self._upstream_request_compression
+        if encoding is None:
+            return body, headers
+
+        compressed = compress_body(body, encoding)
+        headers["content-encoding"] = encoding
+        if self._settings.enable_throughput_debug_logs:
+            log_body_compression_record(
+                logger,
+                BodyCompressionRecord(
+                    direction="upstream request",
+                    encoding=encoding,
+                    wire_bytes=len(compressed),
+                    decoded_bytes=len(body),
+                ),
+            )
+        return compressed, headers
+
+    def _disable_rejected_request_compression(self, error: ProviderError) -> bool:
+        """Turn off upstream body compression after the backend rejects it.
+
+        Returns:
+            Whether compression was disabled and the request should be retried.
+        """
+        if self._upstream_request_compression is None or "HTTP 415" not in str(
+            error
+        ):
+            return False
+
+        logger.warning(
+            "Provider rejected %s-compressed request bodies; "
+            "sending uncompressed bodies from now on.",
+            self._upstream_request_compression,
+        )
+        self._upstream_request_compression = None
+        return True
+
 
 def _log_model_request(
     instructions: str,
     context_text: str,
     volatile_context_text: str | None,
-    tools: list[dict[str, Any]],
+    tools: list[ProviderToolDefinition],
 ) -> None:
     """Write a debug preflight snapshot for one provider request."""
     if not logger.isEnabledFor(logging.DEBUG):
@@ -354,7 +1116,9 @@ def _log_model_request(
         + context_text
         + volatile_dump
         + "\n\nTools:\n"
-        + json.dumps(tools, ensure_ascii=False, indent=2)
+        + json.dumps(
+            [tool.model_dump() for tool in tools], ensure_ascii=False, indent=2
+        )
         + "\n=== End preflight ===\n"
     )
     _append_preflight_log(dump)
@@ -436,6 +1200,12 @@ def _build_role_compat_payload(payload: dict[str, Any]) -> dict[str, Any] | None
     }
 
 
+def _is_missing_previous_response_error(error: ProviderError) -> bool:
+    """Detect upstream errors about an unknown `previous_response_id`."""
+    message = str(error).lower()
+    return "previous_response" in message or "previous response" in message
+
+
 def _is_empty_final_answer_error(error: ProviderError) -> bool:
     """Detect relay errors caused by an upstream empty final answer."""
     return "empty final answer" in str(error)
@@ -505,7 +1275,7 @@ async def _raise_for_error_response(
                 "model": settings.model,
                 "baseUrl": settings.base_url,
                 "responseBody": body_preview,
-                "requestBody": _safe_json_loads(response.request.content),
+                "requestBody": _safe_json_loads(_decode_request_content(response)),
             }
         )
     raise ProviderError(
@@ -516,6 +1286,15 @@ async def _raise_for_error_response(
     )
 
 
+def _probed_stream_dialect(events: list[tuple[str, Any]]) -> StreamDialect | None:
+    """Return the first wire dialect a probe stream's events identify."""
+    for event_name, payload in events:
+        dialect = detect_stream_dialect(event_name, payload)
+        if dialect is not None:
+            return dialect
+    return None
+
+
 def _load_response_json(response: httpx.Response) -> dict[str, Any]:
     """Parse the outer provider response body as a JSON object."""
     try:
@@ -568,6 +1347,19 @@ def _append_provider_error_payload_log(payload: dict[str, Any]) -> None:
         handle.write("\n")
 
 
+def _decode_request_content(response: httpx.Response) -> bytes:
+    """Return the uncompressed body of the request behind `response`."""
+    content = response.request.content
+    encoding = response.request.headers.get("content-encoding")
+    if not encoding:
+        return content
+
+    try:
+        return decompress_body(content, encoding)
+    except ValueError:
+        return content
+
+
 def _safe_json_loads(value: bytes | str | None) -> Any:
     """Best-effort decode of request content for provider error logging."""
     if value is None:
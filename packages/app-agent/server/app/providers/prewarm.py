@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Literal
+
+PREWARM_DEDUP_TTL_SECONDS = 300.0
+PREWARM_DEDUP_MAX_ENTRIES = 1024
+PREWARM_RATE_WINDOW_SECONDS = 60.0
+
+
+class PrewarmLimiter:
+    """Deduplicate and rate-limit prefix warm-up requests.
+
+    A prefix key is claimed when its warm-up starts, so concurrent or repeated
+    warm-ups of the same prefix on the same backend are skipped until the
+    claim expires. Accepted warm-ups are also limited to a fixed number per
+    sliding minute, because each one costs a full prefill upstream.
+    """
+
+    def __init__(
+        self,
+        max_per_minute: int,
+        dedup_ttl_seconds: float = PREWARM_DEDUP_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._max_per_minute = max_per_minute
+        self._dedup_ttl_seconds = dedup_ttl_seconds
+        self._clock = clock
+        self._claims: OrderedDict[str, float] = OrderedDict()
+        self._accepted_at: deque[float] = deque()
+        self._lock = threading.Lock()
+
+    def claim(self, key: str) -> Literal["accepted", "deduplicated", "rate_limited"]:
+        """Try to start a warm-up for `key`.
+
+        Args:
+            key: Prefix hash combined with the backend it is warmed on.
+
+        Returns:
+            `accepted` when the caller should send the warm-up request,
+            otherwise the reason it must be skipped.
+        """
+        with self._lock:
+            now = self._clock()
+            while self._claims:
+                oldest_key, claimed_at = next(iter(self._claims.items()))
+                if now - claimed_at < self._dedup_ttl_seconds:
+                    break
+                del self._claims[oldest_key]
+            while (
+                self._accepted_at
+                and now - self._accepted_at[0] >= PREWARM_RATE_WINDOW_SECONDS
+            ):
+                self._accepted_at.popleft()
+
+            if key in self._claims:
+                return "deduplicated"
+            if len(self._accepted_at) >= self._max_per_minute:
+                return "rate_limited"
+
+            self._claims[key] = now
+            while len(self._claims) > PREWARM_DEDUP_MAX_ENTRIES:
+                self._claims.popitem(last=False)
+            self._accepted_at.append(now)
+            return "accepted"
+
+    def forget(self, key: str) -> None:
+        """Release a claim whose warm-up failed so it can be retried."""
+        with self._lock:
+            self._claims.pop(key, None)
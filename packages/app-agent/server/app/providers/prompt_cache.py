@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import hashlib
+from typing import Any
+
+from app.models import ProviderToolDefinition, ProviderUsage
+from app.prompt_builder import PromptIR, get_context_snapshot
+from app.providers.request_body import encode_tool_definitions
+
+
+def build_prompt_cache_key(
+    prompt: PromptIR, tools: list[ProviderToolDefinition]
+) -> str:
+    """Return a stable hash of the prompt prefix that providers can cache.
+
+    The key covers the instructions, the tool definitions, and the stable
+    context snapshot, which together form the byte prefix that
+    `build_responses_input` keeps identical across turns. Turns that share
+    the key can be routed to the same prompt cache.
+
+    Args:
+        prompt: Prompt built for the current turn.
+        tools: Tool definitions sent with the current turn.
+
+    Returns:
+        Hex digest suitable for the Responses API `prompt_cache_key` field.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(prompt.instructions.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(encode_tool_definitions(tools))
+    digest.update(b"\0")
+    digest.update(get_context_snapshot(prompt.context, prompt.context_key_order).digest)
+    return digest.hexdigest()
+
+
+def parse_response_usage(payload: Any) -> ProviderUsage | None:
+    """Parse upstream token usage, including cached prompt tokens.
+
+    Accepts the Responses API `usage.input_tokens_details.cached_tokens`
+    shape and the Chat Completions `usage.prompt_tokens_details` shape that
+    some compatible servers report instead.
+
+    Args:
+        payload: Response object, or a streaming event's `response` object.
+
+    Returns:
+        Parsed usage, or None when the payload reports no input tokens.
+    """
+    usage = payload.get("usage") if isinstance(payload, dict) else None
+    if not isinstance(usage, dict):
+        return None
+
+    input_tokens = usage.get("input_tokens", usage.get("prompt_tokens"))
+    if not isinstance(input_tokens, int):
+        return None
+
+    details = usage.get("input_tokens_details") or usage.get("prompt_tokens_details")
+    cached_tokens = details.get("cached_tokens") if isinstance(details, dict) else 0
+    output_tokens = usage.get("output_tokens", usage.get("completion_tokens"))
+    return ProviderUsage(
+        input_tokens=input_tokens,
+        cached_input_tokens=cached_tokens if isinstance(cached_tokens, int) else 0,
+        output_tokens=output_tokens if isinstance(output_tokens, int) else None,
+    )
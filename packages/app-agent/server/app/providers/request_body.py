@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any
+
+from pydantic import TypeAdapter
+
+from app.models import ProviderToolDefinition
+from app.prompt_builder import encode_response_item, get_pre_encoded_response_item
+
+TEXT_SEGMENT_CACHE_MAX_ENTRIES = 16
+TOOL_SEGMENT_CACHE_MAX_ENTRIES = 4
+_TOOL_DEFINITIONS_ADAPTER = TypeAdapter(list[ProviderToolDefinition])
+_text_segments: OrderedDict[str, bytes] = OrderedDict()
+_tool_segments: list[tuple[list[ProviderToolDefinition], bytes]] = []
+
+
+def encode_responses_payload(payload: dict[str, Any]) -> bytes:
+    """Serialize a Responses API payload into the upstream request body.
+
+    The body is assembled from encoded segments. Immutable parts that repeat
+    across turns and retries, such as the instructions, the tools array, the
+    context snapshot, and converted history items, come from caches and are
+    joined as-is instead of being escaped and copied again. Everything else is
+    encoded with the same compact settings the HTTP client uses for `json=`
+    bodies.
+
+    Args:
+        payload: Provider payload built for the current relay turn. The
+            `tools` entry may hold `ProviderToolDefinition` models, which are
+            encoded with their JSON serializer.
+
+    Returns:
+        UTF-8 JSON request body.
+    """
+    parts = []
+    for key, value in payload.items():
+        parts.append(_encode_text_segment(key) + b":" + _encode_segment(key, value))
+    return b"{" + b",".join(parts) + b"}"
+
+
+def clear_request_body_segment_cache() -> None:
+    """Drop cached instruction and tool segments."""
+    _text_segments.clear()
+    _tool_segments.clear()
+
+
+def encode_tool_definitions(tools: list[ProviderToolDefinition]) -> bytes:
+    """Return the encoded tools array, reusing it for identical definitions.
+
+    Tool schemas rarely change within a session. Comparing the validated
+    models with a cached list is much cheaper than dumping and encoding large
+    JSON schemas again on every turn.
+    """
+    for index in range(len(_tool_segments) - 1, -1, -1):
+        cached_tools, encoded = _tool_segments[index]
+        if cached_tools is tools or cached_tools == tools:
+            _tool_segments.append(_tool_segments.pop(index))
+            return encoded
+
+    encoded = _TOOL_DEFINITIONS_ADAPTER.dump_json(tools)
+    _tool_segments.append((list(tools), encoded))
+    if len(_tool_segments) > TOOL_SEGMENT_CACHE_MAX_ENTRIES:
+        _tool_segments.pop(0)
+    return encoded
+
+
+def _encode_segment(key: str, value: Any) -> bytes:
+    """Encode one top-level payload value, reusing cached segments."""
+    if key == "input" and isinstance(value, list):
+        return b"[" + b",".join(_encode_input_items(value)) + b"]"
+
+    if key == "tools" and _is_tool_definition_list(value):
+        return encode_tool_definitions(value)
+
+    if isinstance(value, str):
+        return _encode_text_segment(value)
+
+    return encode_response_item(value)
+
+
+def _encode_input_items(items: list[Any]) -> list[bytes]:
+    """Encode input items, reusing cached encodings where available."""
+    return [
+        (isinstance(item, dict) and get_pre_encoded_response_item(item))
+        or encode_response_item(item)
+        for item in items
+    ]
+
+
+def _encode_text_segment(text: str) -> bytes:
+    """Encode a JSON string, reusing the encoding of recently seen text."""
+    encoded = _text_segments.get(text)
+    if encoded is not None:
+        _text_segments.move_to_end(text)
+        return encoded
+
+    encoded = encode_response_item(text)
+    _text_segments[text] = encoded
+    if len(_text_segments) > TEXT_SEGMENT_CACHE_MAX_ENTRIES:
+        _text_segments.popitem(last=False)
+    return encoded
+
+
+def _is_tool_definition_list(value: Any) -> bool:
+    return (
+        isinstance(value, list)
+        and bool(value)
+        and all(isinstance(tool, ProviderToolDefinition) for tool in value)
+    )
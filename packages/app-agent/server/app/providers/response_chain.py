@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+from app.models import HistoryMessage, ProviderResponse, ProviderToolDefinition
+from app.prompt_builder import (
+    PromptIR,
+    build_responses_turn_input,
+    fingerprint_history_message,
+)
+from app.providers.prompt_cache import build_prompt_cache_key
+
+RESPONSE_CHAIN_MAX_ENTRIES = 256
+
+
+@dataclass(frozen=True, slots=True)
+class ResponseChainLink:
+    """Remember what an upstream response already holds for one session.
+
+    Attributes:
+        response_id: Upstream id of the latest stored response.
+        prefix_digest: Digest of the instructions, tools, context, and history
+            note that the upstream conversation started from.
+        history_digests: Fingerprints of the history items replayed so far.
+        message: User message sent with the latest response.
+        volatile_digest: Digest of the volatile context snapshot that the
+            upstream conversation holds, or of nothing without one.
+        output_text: Answer or commentary text of the latest response.
+        output_call_ids: Ids of the tool calls the latest response made.
+    """
+
+    response_id: str
+    prefix_digest: bytes
+    history_digests: tuple[bytes, ...]
+    message: str
+    volatile_digest: bytes
+    output_text: str
+    output_call_ids: tuple[str, ...]
+
+
+class ResponseChainStore:
+    """Track the latest upstream response id per relay session.
+
+    Links are kept in a small LRU. A link is only reused while the stable
+    prompt prefix, the replayed history, and the volatile context snapshot it
+    was built from are unchanged, so context or state updates, history
+    windowing, or edited history fall back to a full replay. The upstream
+    conversation thus holds exactly one volatile context snapshot, the
+    current one, just like a full replay.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CHAIN_MAX_ENTRIES) -> None:
+        self._max_entries = max_entries
+        self._links: OrderedDict[str, ResponseChainLink] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def build_chained_input(
+        self,
+        session_id: str,
+        prompt: PromptIR,
+        tools: list[ProviderToolDefinition],
+    ) -> tuple[str, list[dict[str, Any]]] | None:
+        """Return the previous response id and the new input items.
+
+        The upstream conversation already holds the previous turn's input,
+        including the unchanged volatile context snapshot, and the model's own
+        output, so only history items added by the browser since then, such
+        as tool outputs, are sent together with the current user message.
+
+        Args:
+            session_id: Relay session that owns the chain.
+            prompt: Prompt built for the current turn.
+            tools: Tool definitions sent with the current turn.
+
+        Returns:
+            Tuple of the previous response id and the input items to send, or
+            None when the chain is unknown, no longer matches the prompt, the
+            new history holds items the chained response did not produce, or
+            there is nothing new to send.
+        """
+        with self._lock:
+            link = self._links.get(session_id)
+        if link is None or link.prefix_digest != _digest_prompt_prefix(prompt, tools):
+            return None
+        if link.volatile_digest != _digest_volatile_context(prompt):
+            return None
+
+        known_count = len(link.history_digests)
+        replayed_digests = tuple(
+            fingerprint_history_message(message)
+            for message in prompt.history[:known_count]
+        )
+        if replayed_digests != link.history_digests:
+            return None
+
+        new_history = _drop_upstream_items(prompt.history[known_count:], link)
+        if new_history is None:
+            return None
+        new_items = build_responses_turn_input(
+            dataclasses.replace(prompt, volatile_context_text=None), new_history
+        )
+        if not new_items:
+            return None
+
+        return link.response_id, new_items
+
+    def record(
+        self,
+        session_id: str,
+        response_id: str,
+        prompt: PromptIR,
+        tools: list[ProviderToolDefinition],
+        response: ProviderResponse,
+    ) -> None:
+        """Store the upstream response that now holds the session's turn."""
+        link = ResponseChainLink(
+            response_id=response_id,
+            prefix_digest=_digest_prompt_prefix(prompt, tools),
+            history_digests=tuple(
+                fingerprint_history_message(message) for message in prompt.history
+            ),
+            message=prompt.message,
+            volatile_digest=_digest_volatile_context(prompt),
+            output_text=response.message or "",
+            output_call_ids=tuple(call.call_id for call in response.tool_calls),
+        )
+        with self._lock:
+            self._links[session_id] = link
+            self._links.move_to_end(session_id)
+            while len(self._links) > self._max_entries:
+                self._links.popitem(last=False)
+
+    def discard(self, session_id: str) -> None:
+        """Forget the chain of a session, forcing a full replay next time."""
+        with self._lock:
+            self._links.pop(session_id, None)
+
+
+def _digest_prompt_prefix(
+    prompt: PromptIR, tools: list[ProviderToolDefinition]
+) -> bytes:
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(build_prompt_cache_key(prompt, tools).encode("ascii"))
+    digest.update(b"\0")
+    digest.update((prompt.omitted_history_text or "").encode("utf-8"))
+    return digest.digest()
+
+
+def _digest_volatile_context(prompt: PromptIR) -> bytes:
+    text = prompt.volatile_context_text or ""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def _drop_upstream_items(
+    history: list[HistoryMessage], link: ResponseChainLink
+) -> list[HistoryMessage] | None:
+    """Remove the history items that the linked response already holds.
+
+    The upstream conversation ends with the previous user message and the
+    linked response's own output. The browser sends those back first, so
+    they must lead the new history. Any other assistant item, such as the
+    output of a turn that was never recorded, is missing upstream.
+
+    Returns:
+        The history items to send, or None when the new history does not
+        continue the linked response and the input must be replayed in full.
+    """
+    index = 0
+    if link.message:
+        if not history or history[0].role != "user" or history[0].text != link.message:
+            return None
+        index = 1
+
+    pending_call_ids = set(link.output_call_ids)
+    pending_text = link.output_text
+    while index < len(history) and history[index].role == "assistant":
+        message = history[index]
+        call_ids = {call.call_id for call in message.tool_calls}
+        if not call_ids <= pending_call_ids:
+            return None
+        if message.text:
+            if message.text != pending_text:
+                return None
+            pending_text = ""
+        elif not call_ids:
+            return None
+        pending_call_ids -= call_ids
+        index += 1
+    if pending_call_ids or pending_text:
+        return None
+
+    new_history = history[index:]
+    if any(message.role == "assistant" for message in new_history):
+        return None
+    return new_history
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import bisect
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+ROUTING_VIRTUAL_NODES = 64
+ROUTING_AFFINITY_MAX_KEYS = 4096
+DEFAULT_ROUTING_LOAD_FACTOR = 1.25
+
+
+@dataclass(frozen=True, slots=True)
+class RouteDecision:
+    """Describe which backend serves one relay turn and why.
+
+    Attributes:
+        key: Routing key, either the session id or the stable-prefix hash.
+        backend: Base URL the turn was sent to.
+        preferred_backend: First backend on the hash ring for the key.
+        previous_backend: Backend that served the key's previous turn, if any.
+        in_flight: Requests in flight on `backend`, including this one.
+        capacity: Bounded-load limit that applied when the turn was routed.
+        affinity_hits: Turns routed to the same backend as their key's
+            previous turn, across all keys.
+        repeat_turns: Turns whose key had been routed before.
+    """
+
+    key: str
+    backend: str
+    preferred_backend: str
+    previous_backend: str | None
+    in_flight: int
+    capacity: int
+    affinity_hits: int
+    repeat_turns: int
+
+    @property
+    def affinity_hit(self) -> bool | None:
+        """Return whether the turn reached its key's previous backend."""
+        if self.previous_backend is None:
+            return None
+        return self.backend == self.previous_backend
+
+
+class BackendRouter:
+    """Route turns to backends with bounded-load consistent hashing.
+
+    Each backend owns several points on a hash ring. A key goes to the first
+    backend clockwise from its hash whose in-flight count is below
+    `ceil(load_factor * (total_in_flight + 1) / backend_count)`, so turns of
+    one session keep reaching the replica that holds their prefix cache while
+    a hot session cannot pile more than its fair share onto one replica.
+    Adding or removing a backend only moves the keys whose ring segment
+    changed owner.
+    """
+
+    def __init__(
+        self,
+        backends: tuple[str, ...],
+        load_factor: float = DEFAULT_ROUTING_LOAD_FACTOR,
+        virtual_nodes: int = ROUTING_VIRTUAL_NODES,
+    ) -> None:
+        if load_factor < 1.0:
+            raise ValueError("Routing load factor must be at least 1.")
+
+        self._load_factor = load_factor
+        self._virtual_nodes = virtual_nodes
+        self._ring_hashes: list[int] = []
+        self._ring_backends: list[str] = []
+        self._in_flight: dict[str, int] = {}
+        self._last_backends: OrderedDict[str, str] = OrderedDict()
+        self._affinity_hits = 0
+        self._repeat_turns = 0
+        self._lock = threading.Lock()
+        self.set_backends(backends)
+
+    @property
+    def backends(self) -> tuple[str, ...]:
+        """Return the configured backends in insertion order."""
+        return tuple(self._in_flight)
+
+    def set_backends(self, backends: tuple[str, ...]) -> None:
+        """Replace the backend set, keeping in-flight counts of kept backends.
+
+        Raises:
+            ValueError: If no backend is given.
+        """
+        if not backends:
+            raise ValueError("At least one routing backend is required.")
+
+        points = sorted(
+            (_hash_key(backend + "#" + str(index)), backend)
+            for backend in dict.fromkeys(backends)
+            for index in range(self._virtual_nodes)
+        )
+        with self._lock:
+            self._in_flight = {
+                backend: self._in_flight.get(backend, 0)
+                for backend in dict.fromkeys(backends)
+            }
+            self._ring_hashes = [point for point, _ in points]
+            self._ring_backends = [backend for _, backend in points]
+
+    def preferred_backend(self, key: str) -> str:
+        """Return the backend that owns `key` on the hash ring, ignoring load."""
+        with self._lock:
+            return self._iter_ring_backends(_hash_key(key))[0]
+
+    def acquire(self, key: str, exclude: tuple[str, ...] = ()) -> RouteDecision:
+        """Pick the backend for one turn and count it as in flight.
+
+        Callers must pass the returned decision to `release` once the
+        upstream request has finished.
+
+        Args:
+            key: Routing key of the turn.
+            exclude: Backends to skip, such as one that just stalled. They
+                are used only when every backend is excluded.
+        """
+        with self._lock:
+            capacity = math.ceil(
+                self._load_factor
+                * (sum(self._in_flight.values()) + 1)
+                / len(self._in_flight)
+            )
+            candidates = self._iter_ring_backends(_hash_key(key))
+            preferred_backend = candidates[0]
+            candidates = [
+                candidate for candidate in candidates if candidate not in exclude
+            ] or candidates
+            backend = next(
+                (
+                    candidate
+                    for candidate in candidates
+                    if self._in_flight[candidate] < capacity
+                ),
+                candidates[0],
+            )
+            self._in_flight[backend] += 1
+
+            previous_backend = self._last_backends.get(key)
+            if previous_backend is not None:
+                self._repeat_turns += 1
+                if previous_backend == backend:
+                    self._affinity_hits += 1
+            self._last_backends[key] = backend
+            self._last_backends.move_to_end(key)
+            while len(self._last_backends) > ROUTING_AFFINITY_MAX_KEYS:
+                self._last_backends.popitem(last=False)
+
+            return RouteDecision(
+                key=key,
+                backend=backend,
+                preferred_backend=preferred_backend,
+                previous_backend=previous_backend,
+                in_flight=self._in_flight[backend],
+                capacity=capacity,
+                affinity_hits=self._affinity_hits,
+                repeat_turns=self._repeat_turns,
+            )
+
+    def release(self, decision: RouteDecision) -> None:
+        """Mark the turn routed by `decision` as finished."""
+        with self._lock:
+            if self._in_flight.get(decision.backend, 0) > 0:
+                self._in_flight[decision.backend] -= 1
+
+    def _iter_ring_backends(self, key_hash: int) -> list[str]:
+        """Return distinct backends in ring order starting at `key_hash`."""
+        start = bisect.bisect(self._ring_hashes, key_hash)
+        backends: dict[str, None] = {}
+        for offset in range(len(self._ring_backends)):
+            backend = self._ring_backends[(start + offset) % len(self._ring_backends)]
+            backends.setdefault(backend, None)
+            if len(backends) == len(self._in_flight):
+                break
+        return list(backends)
+
+
+def format_route_decision(decision: RouteDecision) -> str:
+    """Format a one-line routing report for logs and tests."""
+    if decision.affinity_hit is None:
+        affinity = "new key"
+    elif decision.affinity_hit:
+        affinity = "hit"
+    else:
+        affinity = "moved from " + str(decision.previous_backend)
+    hit_rate = (
+        f"{decision.affinity_hits / decision.repeat_turns * 100:.1f}%"
+        if decision.repeat_turns
+        else "n/a"
+    )
+    return (
+        f"Provider route: backend={decision.backend}"
+        f" preferred={decision.preferred_backend}"
+        f" load={decision.in_flight}/{decision.capacity}"
+        f" affinity={affinity}"
+        f" affinity hit rate={hit_rate}"
+        f" ({decision.affinity_hits}/{decision.repeat_turns})"
+    )
+
+
+def _hash_key(value: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big"
+    )
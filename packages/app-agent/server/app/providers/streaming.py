@@ -2,19 +2,52 @@ from __future__ import annotations
 
 import json
 import logging
-from typing import Any, AsyncIterator, Callable
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Literal
 
 import httpx
 
-from app.models import ProviderResponse, ProviderStreamEvent, ToolCall
+from app.models import ProviderResponse, ProviderStreamEvent, ProviderUsage, ToolCall
 from app.providers.parsing import (
     _classify_stream_text,
     _looks_like_structured_response,
     _looks_like_tool_markup,
     _parse_tool_arguments,
 )
+from app.providers.prompt_cache import parse_response_usage
+from app.providers.timeouts import RequestDeadlines
 
 logger = logging.getLogger(__name__)
+STREAM_DIALECT_DETECTION_EVENTS = 4
+
+StreamDialect = Literal["responses", "chat_completions"]
+
+
+@dataclass(frozen=True, slots=True)
+class DecodedStreamEvent:
+    """Hold the fields the relay reads from one upstream SSE event.
+
+    Attributes:
+        text: Answer text delta, or the full text snapshot of a `.done` event.
+        reasoning: Reasoning text delta.
+        heartbeat: Whether the event only signals progress.
+        done: Whether the event is a `.done` snapshot rather than a delta.
+        tool_calls: Tool calls completed by the event.
+        response_id: Upstream response id carried by the event.
+        usage: Token usage reported by the event.
+    """
+
+    text: str = ""
+    reasoning: str = ""
+    heartbeat: bool = False
+    done: bool = False
+    tool_calls: tuple[ToolCall, ...] = ()
+    response_id: str | None = None
+    usage: ProviderUsage | None = None
+
+
+StreamDecoder = Callable[[str, Any], DecodedStreamEvent]
+_EMPTY_DECODED_EVENT = DecodedStreamEvent()
 
 
 async def iter_provider_stream_events(
@@ -22,15 +55,36 @@ async def iter_provider_stream_events(
     parse_provider_response_text: Callable[[str, bool], ProviderResponse],
     normalize_provider_text: Callable[[str], str],
     truncate_logged_content: Callable[[str], str],
+    deadlines: RequestDeadlines | None = None,
+    on_response_id: Callable[[str], None] | None = None,
+    dialect: StreamDialect | None = None,
 ) -> AsyncIterator[ProviderStreamEvent]:
-    """Yield normalized stream events from a provider SSE response."""
+    """Yield normalized stream events from a provider SSE response.
+
+    With `deadlines`, a stream whose next upstream event takes longer than
+    the first-event, idle, or total budget fails with `ProviderTimeoutError`.
+    `on_response_id` is called as soon as the upstream response id is known,
+    so callers can cancel the response before the stream completes. A known
+    `dialect`, such as a probed one, skips dialect detection.
+    """
     text_parts: list[str] = []
     reasoning_parts: list[str] = []
     tool_calls_by_id: dict[str, ToolCall] = {}
     stream_mode: str | None = None
     final_snapshot_text = ""
+    response_id: str | None = None
+    usage: ProviderUsage | None = None
+
+    decoder: StreamDecoder = (
+        STREAM_DECODERS[dialect] if dialect is not None else decode_generic_stream_event
+    )
+    detection_events = 0
 
-    async for event_name, data_text in _iter_sse_events(response):
+    sse_events = _iter_sse_events(response)
+    if deadlines is not None:
+        sse_events = deadlines.iter_events(sse_events)
+
+    async for event_name, data_text in sse_events:
         logger.debug(
             "Provider raw SSE event %s from Responses API:\n%s",
             event_name,
@@ -40,14 +94,27 @@ async def iter_provider_stream_events(
             break
 
         payload = _load_stream_event_payload(data_text)
-        _collect_stream_tool_calls(tool_calls_by_id, payload, event_name)
-        if event_name.endswith(".done"):
-            snapshot_text = _extract_stream_text(payload, event_name)
-            if snapshot_text:
-                final_snapshot_text = normalize_provider_text(snapshot_text)
+        if dialect is None and detection_events < STREAM_DIALECT_DETECTION_EVENTS:
+            detection_events += 1
+            dialect = detect_stream_dialect(event_name, payload)
+            if dialect is not None:
+                decoder = STREAM_DECODERS[dialect]
+                logger.debug("Provider stream dialect detected: %s", dialect)
+
+        decoded = decoder(event_name, payload)
+        if decoded.response_id is not None and decoded.response_id != response_id:
+            response_id = decoded.response_id
+            if on_response_id is not None:
+                on_response_id(response_id)
+        usage = decoded.usage or usage
+        for tool_call in decoded.tool_calls:
+            tool_calls_by_id[tool_call.call_id] = tool_call
+        if decoded.done:
+            if decoded.text:
+                final_snapshot_text = normalize_provider_text(decoded.text)
             continue
 
-        text_delta = _extract_stream_text(payload, event_name)
+        text_delta = decoded.text
         if text_delta:
             text_delta = normalize_provider_text(text_delta)
             text_parts.append(text_delta)
@@ -64,7 +131,7 @@ async def iter_provider_stream_events(
                     delta=text_delta,
                 )
 
-        reasoning_delta = _extract_stream_reasoning(payload, event_name)
+        reasoning_delta = decoded.reasoning
         if reasoning_delta:
             reasoning_delta = normalize_provider_text(reasoning_delta)
             reasoning_parts.append(reasoning_delta)
@@ -73,7 +140,7 @@ async def iter_provider_stream_events(
                 reasoning=reasoning_delta,
             )
 
-        if _is_stream_heartbeat(event_name, payload):
+        if decoded.heartbeat:
             yield ProviderStreamEvent(type="heartbeat")
 
     final_text = final_snapshot_text or "".join(text_parts).strip()
@@ -95,6 +162,8 @@ async def iter_provider_stream_events(
                 type="tool_call",
                 message=normalize_provider_text(final_text) if final_text else None,
                 tool_calls=list(tool_calls_by_id.values()),
+                response_id=response_id,
+                usage=usage,
             ),
         )
         return
@@ -113,6 +182,10 @@ async def iter_provider_stream_events(
             )
         raise
 
+    if response_id is not None or usage is not None:
+        final_response = final_response.model_copy(
+            update={"response_id": response_id, "usage": usage}
+        )
     yield ProviderStreamEvent(
         type="final",
         response=final_response,
@@ -153,6 +226,125 @@ async def _iter_sse_events(
         yield event_name, "\n".join(data_lines)
 
 
+def detect_stream_dialect(event_name: str, payload: Any) -> StreamDialect | None:
+    """Recognize the wire dialect of an upstream stream from one event.
+
+    Responses-compatible servers (OpenAI, vLLM, Ollama, LM Studio, and MLX
+    servers on `/v1/responses`) send typed `response.*` events. Servers that
+    relay Chat Completions chunks send untyped `chat.completion.chunk`
+    payloads.
+
+    Returns:
+        The dialect, or None when the event does not identify one.
+    """
+    if event_name.startswith("response.") or (
+        isinstance(payload, dict)
+        and isinstance(payload.get("type"), str)
+        and payload["type"].startswith("response.")
+    ):
+        return "responses"
+    if isinstance(payload, dict) and payload.get("object") == "chat.completion.chunk":
+        return "chat_completions"
+    return None
+
+
+def decode_generic_stream_event(event_name: str, payload: Any) -> DecodedStreamEvent:
+    """Decode one event of any dialect by probing every known field shape."""
+    tool_calls_by_id: dict[str, ToolCall] = {}
+    _collect_stream_tool_calls(tool_calls_by_id, payload, event_name)
+    tool_calls = tuple(tool_calls_by_id.values())
+    response_id = _extract_stream_response_id(payload)
+    usage = _extract_stream_usage(payload)
+    if event_name.endswith(".done"):
+        return DecodedStreamEvent(
+            text=_extract_stream_text(payload, event_name),
+            done=True,
+            tool_calls=tool_calls,
+            response_id=response_id,
+            usage=usage,
+        )
+
+    return DecodedStreamEvent(
+        text=_extract_stream_text(payload, event_name),
+        reasoning=_extract_stream_reasoning(payload, event_name),
+        heartbeat=_is_stream_heartbeat(event_name, payload),
+        tool_calls=tool_calls,
+        response_id=response_id,
+        usage=usage,
+    )
+
+
+def decode_responses_stream_event(event_name: str, payload: Any) -> DecodedStreamEvent:
+    """Decode one Responses event, reading only `delta` for text deltas.
+
+    Output-text deltas make up almost every event of a Responses stream and
+    carry nothing but the delta. The few other events fall back to the
+    generic decoder.
+    """
+    if event_name == "response.output_text.delta" and type(payload) is dict:
+        delta = payload.get("delta")
+        if type(delta) is str:
+            return DecodedStreamEvent(text=_normalize_stream_text_delta(delta))
+    return decode_generic_stream_event(event_name, payload)
+
+
+def decode_chat_completions_stream_event(
+    event_name: str, payload: Any
+) -> DecodedStreamEvent:
+    """Decode one Chat Completions chunk from `choices[0].delta` only.
+
+    Chunks carry no typed events, tool items, or response envelopes, so the
+    text and reasoning deltas are the only fields to read. Anything else falls
+    back to the generic decoder.
+    """
+    if (
+        event_name != "message"
+        or type(payload) is not dict
+        or payload.get("object") != "chat.completion.chunk"
+    ):
+        return decode_generic_stream_event(event_name, payload)
+
+    choices = payload.get("choices")
+    if not choices or type(choices) is not list or type(choices[0]) is not dict:
+        return _EMPTY_DECODED_EVENT
+    delta = choices[0].get("delta")
+    if type(delta) is not dict:
+        return _EMPTY_DECODED_EVENT
+
+    text = delta.get("content")
+    if type(text) is not str:
+        text = delta.get("text")
+    reasoning = delta.get("reasoning_content")
+    return DecodedStreamEvent(
+        text=_normalize_stream_text_delta(text) if type(text) is str else "",
+        reasoning=reasoning if type(reasoning) is str else "",
+    )
+
+
+STREAM_DECODERS: dict[StreamDialect, StreamDecoder] = {
+    "responses": decode_responses_stream_event,
+    "chat_completions": decode_chat_completions_stream_event,
+}
+
+
+def _extract_stream_response_id(payload: Any) -> str | None:
+    """Return the upstream response id carried by `response.*` events."""
+    if not isinstance(payload, dict):
+        return None
+
+    response = payload.get("response")
+    response_id = response.get("id") if isinstance(response, dict) else None
+    return response_id if isinstance(response_id, str) else None
+
+
+def _extract_stream_usage(payload: Any) -> ProviderUsage | None:
+    """Return token usage reported by `response.completed` events."""
+    if not isinstance(payload, dict):
+        return None
+
+    return parse_response_usage(payload.get("response"))
+
+
 def _load_stream_event_payload(data_text: str) -> Any:
     """Parse one SSE data payload when it is JSON."""
     try:
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Iterator, Literal, TypeVar
+
+import anyio
+import httpx
+
+from app.config import Settings
+from app.providers import ProviderError
+
+TimeoutPhase = Literal["connect", "first_event", "idle", "total"]
+
+_T = TypeVar("_T")
+
+_PHASE_DESCRIPTIONS: dict[TimeoutPhase, str] = {
+    "connect": "connecting to the provider",
+    "first_event": "waiting for the first provider event",
+    "idle": "waiting for the next provider event",
+    "total": "waiting for the provider response to complete",
+}
+
+
+class ProviderTimeoutError(ProviderError):
+    """Raised when an upstream request exceeds one of its phase budgets.
+
+    Attributes:
+        phase: Budget that ran out.
+        timeout_seconds: Configured length of that budget.
+    """
+
+    def __init__(self, phase: TimeoutPhase, timeout_seconds: float) -> None:
+        super().__init__(
+            "Provider request stalled: no progress after "
+            + f"{timeout_seconds:g}s "
+            + _PHASE_DESCRIPTIONS[phase]
+            + "."
+        )
+        self.phase: TimeoutPhase = phase
+        self.timeout_seconds = timeout_seconds
+
+
+@dataclass(frozen=True, slots=True)
+class PhaseTimeouts:
+    """Describe the time budgets of one upstream request.
+
+    Attributes:
+        timeout_seconds: httpx timeout for every network operation that no
+            finer budget covers.
+        connect_seconds: Budget for opening the connection.
+        first_event_seconds: Budget from sending a streaming request until
+            the first upstream event arrives.
+        idle_seconds: Budget between two upstream stream events.
+        total_seconds: Budget for the whole request, including the stream.
+    """
+
+    timeout_seconds: float
+    connect_seconds: float | None = None
+    first_event_seconds: float | None = None
+    idle_seconds: float | None = None
+    total_seconds: float | None = None
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> PhaseTimeouts:
+        """Build the budgets configured for the relay."""
+        return cls(
+            timeout_seconds=settings.timeout_seconds,
+            connect_seconds=settings.connect_timeout_seconds,
+            first_event_seconds=settings.first_event_timeout_seconds,
+            idle_seconds=settings.stream_idle_timeout_seconds,
+            total_seconds=settings.total_timeout_seconds,
+        )
+
+    def httpx_timeout(self) -> httpx.Timeout:
+        """Return the httpx timeout, with the connect budget when configured."""
+        return httpx.Timeout(
+            self.timeout_seconds,
+            connect=(
+                self.connect_seconds
+                if self.connect_seconds is not None
+                else self.timeout_seconds
+            ),
+        )
+
+
+class RequestDeadlines:
+    """Enforce the phase budgets of one upstream request.
+
+    The first-event budget runs from the start of the request, so it covers
+    waiting for response headers as well. Every later wait gets the idle
+    budget, and every wait is also capped by what remains of the total budget.
+    """
+
+    def __init__(
+        self, timeouts: PhaseTimeouts, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self._timeouts = timeouts
+        self._clock = clock
+        self._started_at = clock()
+        self._seen_event = False
+
+    @contextmanager
+    def watch(self) -> Iterator[None]:
+        """Bound one wait for upstream progress by the current phase budget.
+
+        Raises:
+            ProviderTimeoutError: If the budget runs out.
+        """
+        if self._seen_event:
+            with self._bounded("idle", self._timeouts.idle_seconds, 0.0):
+                yield
+        else:
+            with self._bounded(
+                "first_event",
+                self._timeouts.first_event_seconds,
+                self._clock() - self._started_at,
+            ):
+                yield
+
+    @contextmanager
+    def watch_total(self) -> Iterator[None]:
+        """Bound one wait by what remains of the total budget only.
+
+        Raises:
+            ProviderTimeoutError: If the total budget runs out.
+        """
+        with self._bounded(None, None, 0.0):
+            yield
+
+    async def iter_events(self, events: AsyncIterator[_T]) -> AsyncIterator[_T]:
+        """Yield upstream events, failing when one takes too long to arrive.
+
+        Raises:
+            ProviderTimeoutError: If the first event, a later event, or the
+                end of the stream does not arrive within its budget.
+        """
+        while True:
+            with self.watch():
+                try:
+                    event = await anext(events)
+                except StopAsyncIteration:
+                    return
+            self._seen_event = True
+            yield event
+
+    @contextmanager
+    def _bounded(
+        self,
+        phase: TimeoutPhase | None,
+        phase_seconds: float | None,
+        phase_elapsed_seconds: float,
+    ) -> Iterator[None]:
+        """Bound one wait by a phase budget and by the total budget."""
+        budgets: list[tuple[float, TimeoutPhase, float]] = []
+        if phase is not None and phase_seconds is not None:
+            budgets.append(
+                (
+                    max(phase_seconds - phase_elapsed_seconds, 0.0),
+                    phase,
+                    phase_seconds,
+                )
+            )
+        total_seconds = self._timeouts.total_seconds
+        if total_seconds is not None:
+            remaining = total_seconds - (self._clock() - self._started_at)
+            budgets.append((max(remaining, 0.0), "total", total_seconds))
+        if not budgets:
+            yield
+            return
+
+        seconds, fired_phase, configured_seconds = min(budgets)
+        try:
+            with anyio.fail_after(seconds):
+                yield
+        except TimeoutError as exc:
+            raise ProviderTimeoutError(fired_phase, configured_seconds) from exc
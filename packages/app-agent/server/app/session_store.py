@@ -0,0 +1,404 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any, Callable
+
+from pydantic import TypeAdapter
+
+from .models import AgentTurnRequest, HistoryMessage, ProviderToolDefinition
+
+DEFAULT_SESSION_MAX_ENTRIES = 32
+DEFAULT_SESSION_IDLE_TTL_SECONDS = 3600.0
+CONTEXT_HASH_HEADER = "x-genomespy-context-hash"
+TOOLS_HASH_HEADER = "x-genomespy-tools-hash"
+HISTORY_HASH_HEADER = "x-genomespy-history-hash"
+SESSION_HASH_HEADERS = (CONTEXT_HASH_HEADER, TOOLS_HASH_HEADER, HISTORY_HASH_HEADER)
+_HISTORY_ADAPTER = TypeAdapter(list[HistoryMessage])
+_TOOLS_ADAPTER = TypeAdapter(list[ProviderToolDefinition])
+
+
+class SessionComponentMissingError(Exception):
+    """Raised when a turn refers to session data the relay no longer holds.
+
+    Attributes:
+        missing: Components the client must resend in full, in request order.
+    """
+
+    def __init__(self, missing: list[str]) -> None:
+        super().__init__(
+            "Session components must be resent in full: " + ", ".join(missing)
+        )
+        self.missing = missing
+
+
+@dataclass(frozen=True, slots=True)
+class AgentSession:
+    """Hold the last full turn payload of one browser conversation.
+
+    Attributes:
+        session_id: Client-chosen conversation identifier.
+        context: Stable context snapshot from the latest turn.
+        context_hash: Content hash of `context`.
+        tools: Tool definitions from the latest turn.
+        tools_hash: Content hash of `tools`.
+        history: Full conversation history sent with the latest turn.
+        history_hash: Chained content hash of `history`.
+        last_used: Monotonic timestamp of the latest turn.
+    """
+
+    session_id: str
+    context: dict[str, Any]
+    context_hash: str
+    tools: list[ProviderToolDefinition]
+    tools_hash: str
+    history: list[HistoryMessage]
+    history_hash: str
+    last_used: float = 0.0
+
+    @property
+    def hash_headers(self) -> dict[str, str]:
+        """Return the response headers that advertise the stored hashes."""
+        return {
+            CONTEXT_HASH_HEADER: self.context_hash,
+            TOOLS_HASH_HEADER: self.tools_hash,
+            HISTORY_HASH_HEADER: self.history_hash,
+        }
+
+
+class SessionStore(ABC):
+    """Store recent conversation payloads keyed by session id."""
+
+    @abstractmethod
+    def get(self, session_id: str) -> AgentSession | None:
+        """Return the stored session, or None when it is unknown or expired."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def put(self, session: AgentSession) -> None:
+        """Store the latest payload of a session and refresh its idle timer."""
+        raise NotImplementedError
+
+
+class InMemorySessionStore(SessionStore):
+    """Keep sessions in process memory with LRU and idle-TTL eviction."""
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_SESSION_MAX_ENTRIES,
+        idle_ttl_seconds: float = DEFAULT_SESSION_IDLE_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._max_entries = max_entries
+        self._idle_ttl_seconds = idle_ttl_seconds
+        self._clock = clock
+        self._sessions: OrderedDict[str, AgentSession] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> AgentSession | None:
+        with self._lock:
+            self._evict_idle()
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def put(self, session: AgentSession) -> None:
+        with self._lock:
+            self._sessions[session.session_id] = replace(
+                session, last_used=self._clock()
+            )
+            self._sessions.move_to_end(session.session_id)
+            while len(self._sessions) > self._max_entries:
+                self._sessions.popitem(last=False)
+
+    def _evict_idle(self) -> None:
+        cutoff = self._clock() - self._idle_ttl_seconds
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if oldest.last_used >= cutoff:
+                break
+            self._sessions.popitem(last=False)
+
+
+class SqliteSessionStore(SessionStore):
+    """Persist sessions in SQLite so they survive relay restarts.
+
+    Components are stored as JSON next to their hashes, and only components
+    whose hash changed are rewritten. Wall-clock time is used for the idle
+    timer because it must stay meaningful across processes.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        max_entries: int = DEFAULT_SESSION_MAX_ENTRIES,
+        idle_ttl_seconds: float = DEFAULT_SESSION_IDLE_TTL_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._max_entries = max_entries
+        self._idle_ttl_seconds = idle_ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(path), check_same_thread=False)
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS agent_sessions (
+                session_id TEXT PRIMARY KEY,
+                context_json TEXT NOT NULL,
+                context_hash TEXT NOT NULL,
+                tools_json TEXT NOT NULL,
+                tools_hash TEXT NOT NULL,
+                history_json TEXT NOT NULL,
+                history_hash TEXT NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._connection.commit()
+
+    def get(self, session_id: str) -> AgentSession | None:
+        with self._lock:
+            self._evict_idle()
+            row = self._connection.execute(
+                "SELECT context_json, context_hash, tools_json, tools_hash, "
+                "history_json, history_hash, last_used "
+                "FROM agent_sessions WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+            self._connection.commit()
+
+        if row is None:
+            return None
+
+        return AgentSession(
+            session_id=session_id,
+            context=json.loads(row[0]),
+            context_hash=row[1],
+            tools=_TOOLS_ADAPTER.validate_json(row[2]),
+            tools_hash=row[3],
+            history=_HISTORY_ADAPTER.validate_json(row[4]),
+            history_hash=row[5],
+            last_used=row[6],
+        )
+
+    def put(self, session: AgentSession) -> None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT context_hash, tools_hash, history_hash "
+                "FROM agent_sessions WHERE session_id = ?",
+                (session.session_id,),
+            ).fetchone()
+            now = self._clock()
+            if row is None:
+                self._connection.execute(
+                    "INSERT INTO agent_sessions VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        session.session_id,
+                        _encode_context(session.context),
+                        session.context_hash,
+                        _TOOLS_ADAPTER.dump_json(session.tools).decode("utf-8"),
+                        session.tools_hash,
+                        _HISTORY_ADAPTER.dump_json(session.history).decode("utf-8"),
+                        session.history_hash,
+                        now,
+                    ),
+                )
+            else:
+                self._update_changed_components(session, row, now)
+            self._connection.execute(
+                "DELETE FROM agent_sessions WHERE session_id IN ("
+                "SELECT session_id FROM agent_sessions "
+                "ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self._max_entries,),
+            )
+            self._connection.commit()
+
+    def _update_changed_components(
+        self, session: AgentSession, row: tuple[str, str, str], now: float
+    ) -> None:
+        columns = ["last_used = ?"]
+        values: list[Any] = [now]
+        if row[0] != session.context_hash:
+            columns.append("context_json = ?, context_hash = ?")
+            values.extend([_encode_context(session.context), session.context_hash])
+        if row[1] != session.tools_hash:
+            columns.append("tools_json = ?, tools_hash = ?")
+            values.extend(
+                [
+                    _TOOLS_ADAPTER.dump_json(session.tools).decode("utf-8"),
+                    session.tools_hash,
+                ]
+            )
+        if row[2] != session.history_hash:
+            columns.append("history_json = ?, history_hash = ?")
+            values.extend(
+                [
+                    _HISTORY_ADAPTER.dump_json(session.history).decode("utf-8"),
+                    session.history_hash,
+                ]
+            )
+        self._connection.execute(
+            "UPDATE agent_sessions SET " + ", ".join(columns) + " WHERE session_id = ?",
+            (*values, session.session_id),
+        )
+
+    def _evict_idle(self) -> None:
+        self._connection.execute(
+            "DELETE FROM agent_sessions WHERE last_used < ?",
+            (self._clock() - self._idle_ttl_seconds,),
+        )
+
+
+def resolve_session_request(
+    request: AgentTurnRequest, store: SessionStore
+) -> tuple[AgentTurnRequest, AgentSession]:
+    """Rebuild a full turn request from a session delta and store the result.
+
+    Components sent in full replace the stored ones. `contextHash` and
+    `toolsHash` mark the context and tools as unchanged since the turn that
+    returned that hash, and `historyBaseHash` marks `history` as the items
+    appended since then.
+
+    Args:
+        request: Browser payload that carries a session id.
+        store: Store holding the latest payload of each session.
+
+    Returns:
+        Tuple of the request with every component filled in and the session
+        stored for it.
+
+    Raises:
+        SessionComponentMissingError: If a hash does not match the stored
+            session, for example because the session was evicted.
+    """
+    if request.session_id is None:
+        raise ValueError("Session requests must carry a session id.")
+
+    session = store.get(request.session_id)
+    context = _resolve_context(request, session)
+    tools = _resolve_tools(request, session)
+    history = _resolve_history(request, session)
+    if context is None or tools is None or history is None:
+        raise SessionComponentMissingError(
+            [
+                name
+                for name, component in (
+                    ("context", context),
+                    ("tools", tools),
+                    ("history", history),
+                )
+                if component is None
+            ]
+        )
+
+    resolved_session = AgentSession(
+        session_id=request.session_id,
+        context=context[0],
+        context_hash=context[1],
+        tools=tools[0],
+        tools_hash=tools[1],
+        history=history[0],
+        history_hash=history[1],
+    )
+    store.put(resolved_session)
+    return (
+        request.model_copy(
+            update={
+                "context": resolved_session.context,
+                "tools": resolved_session.tools,
+                "history": resolved_session.history,
+            }
+        ),
+        resolved_session,
+    )
+
+
+def _resolve_context(
+    request: AgentTurnRequest, session: AgentSession | None
+) -> tuple[dict[str, Any], str] | None:
+    if request.context is not None:
+        return request.context, hash_context(request.context)
+
+    if session is not None and request.context_hash == session.context_hash:
+        return session.context, session.context_hash
+
+    return None
+
+
+def _resolve_tools(
+    request: AgentTurnRequest, session: AgentSession | None
+) -> tuple[list[ProviderToolDefinition], str] | None:
+    if request.tools_hash is None:
+        return request.tools, hash_tools(request.tools)
+
+    if session is not None and request.tools_hash == session.tools_hash:
+        return session.tools, session.tools_hash
+
+    return None
+
+
+def _resolve_history(
+    request: AgentTurnRequest, session: AgentSession | None
+) -> tuple[list[HistoryMessage], str] | None:
+    if request.history_base_hash is None:
+        return request.history, hash_history(request.history)
+
+    if session is not None and request.history_base_hash == session.history_hash:
+        return (
+            [*session.history, *request.history],
+            hash_history(request.history, session.history_hash),
+        )
+
+    return None
+
+
+def hash_context(context: dict[str, Any]) -> str:
+    """Return the content hash of a context snapshot."""
+    return _digest(_encode_context(context).encode("utf-8"))
+
+
+def hash_tools(tools: list[ProviderToolDefinition]) -> str:
+    """Return the content hash of a tool definition list."""
+    return _digest(_TOOLS_ADAPTER.dump_json(tools))
+
+
+def hash_history(history: list[HistoryMessage], base_hash: str | None = None) -> str:
+    """Return the chained content hash of history items.
+
+    Each item is folded into the hash of the items before it, so the hash of
+    appended items can be computed from the stored hash without revisiting
+    earlier history.
+
+    Args:
+        history: History items to fold in, oldest first.
+        base_hash: Hash of the items that precede `history`, or None when
+            `history` starts the conversation.
+
+    Returns:
+        Hex digest covering the base items and `history`.
+    """
+    digest = base_hash if base_hash is not None else _digest(b"")
+    for message in history:
+        digest = _digest(
+            digest.encode("ascii") + message.__pydantic_serializer__.to_json(message)
+        )
+    return digest
+
+
+def _encode_context(context: dict[str, Any]) -> str:
+    return json.dumps(
+        context, ensure_ascii=False, sort_keys=True, separators=(",", ":")
+    )
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
@@ -0,0 +1,285 @@
+"""Bounded buffering between the upstream stream reader and the SSE writer.
+
+The upstream reader queues provider events without ever waiting for the
+browser, so a slow client does not hold the backend's generation slot open.
+While the writer lags, consecutive text deltas are coalesced into a single
+event. A client that falls further behind than the per-stream byte cap is
+abandoned. The writer can also hold a delta back for a few milliseconds so
+fast backends produce fewer, larger SSE frames.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+from collections import deque
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import AsyncGenerator
+
+from app.config import DEFAULT_STREAM_BUFFER_MAX_BYTES
+from app.models import ProviderStreamEvent
+
+
+class StreamBufferOverflowError(RuntimeError):
+    """Raised when a client reads a stream too slowly for the buffer cap."""
+
+    def __init__(self, max_bytes: int) -> None:
+        super().__init__(
+            f"Client fell more than {max_bytes} bytes behind the provider stream."
+        )
+        self.max_bytes = max_bytes
+
+
+@dataclass(frozen=True, slots=True)
+class StreamBufferStats:
+    """Describe how far the writer of one stream fell behind its reader.
+
+    Attributes:
+        high_water_bytes: Most text bytes queued at any one time.
+        high_water_events: Most events queued at any one time.
+        coalesced_events: Deltas merged into an already queued delta.
+    """
+
+    high_water_bytes: int
+    high_water_events: int
+    coalesced_events: int
+
+
+@dataclass(slots=True)
+class _QueuedEvent:
+    """Hold one queued event and the text of the deltas merged into it.
+
+    Merged text is kept as parts and joined only when the event is taken,
+    so merging many small deltas costs linear rather than quadratic time.
+    """
+
+    event: ProviderStreamEvent
+    parts: list[str]
+    size: int
+
+    @classmethod
+    def wrap(cls, event: ProviderStreamEvent) -> _QueuedEvent:
+        """Queue one event on its own."""
+        text = _event_text(event)
+        return cls(event, [text] if text else [], _text_size(text))
+
+    def merge(self, other: _QueuedEvent) -> None:
+        """Append the text of a queued delta of the same type."""
+        self.parts.extend(other.parts)
+        self.size += other.size
+
+    def build(self) -> ProviderStreamEvent:
+        """Return the event with all merged text joined."""
+        if len(self.parts) <= 1:
+            return self.event
+        text = "".join(self.parts)
+        if self.event.type == "delta":
+            return dataclasses.replace(self.event, delta=text)
+        return dataclasses.replace(self.event, reasoning=text)
+
+
+class StreamBuffer:
+    """Queue provider stream events between one reader and one writer."""
+
+    def __init__(self, max_bytes: int = DEFAULT_STREAM_BUFFER_MAX_BYTES) -> None:
+        self._max_bytes = max_bytes
+        self._events: deque[_QueuedEvent] = deque()
+        self._buffered_bytes = 0
+        self._high_water_bytes = 0
+        self._high_water_events = 0
+        self._coalesced_events = 0
+        self._ready = asyncio.Event()
+        self._closed = False
+        self._overflowed = False
+        self._error: Exception | None = None
+
+    @property
+    def upstream_complete(self) -> bool:
+        """Whether the upstream stream was read to its end without failing."""
+        return self._closed and self._error is None and not self._overflowed
+
+    def stats(self) -> StreamBufferStats:
+        """Return the buffer's high-water marks so far."""
+        return StreamBufferStats(
+            high_water_bytes=self._high_water_bytes,
+            high_water_events=self._high_water_events,
+            coalesced_events=self._coalesced_events,
+        )
+
+    def put(self, event: ProviderStreamEvent) -> bool:
+        """Queue one upstream event without waiting for the writer.
+
+        A delta that follows a queued delta of the same type is merged into
+        it. Heartbeats are dropped while other events are waiting.
+
+        Returns:
+            False once the buffer overflowed and the stream should be
+            abandoned.
+        """
+        if self._overflowed:
+            return False
+
+        if event.type == "heartbeat":
+            if self._events:
+                return True
+            self._events.append(_QueuedEvent.wrap(event))
+        else:
+            queued = _QueuedEvent.wrap(event)
+            last = self._events[-1] if self._events else None
+            if last is not None and _can_merge(last.event, event):
+                last.merge(queued)
+                self._coalesced_events += 1
+            else:
+                self._events.append(queued)
+            self._buffered_bytes += queued.size
+            if self._buffered_bytes > self._max_bytes:
+                self._overflowed = True
+
+        self._high_water_bytes = max(self._high_water_bytes, self._buffered_bytes)
+        self._high_water_events = max(self._high_water_events, len(self._events))
+        self._ready.set()
+        return not self._overflowed
+
+    def close(self, error: Exception | None = None) -> None:
+        """Mark the upstream stream as finished, optionally with its failure."""
+        self._closed = True
+        self._error = error
+        self._ready.set()
+
+    async def get(self) -> ProviderStreamEvent | None:
+        """Return the next queued event, waiting for the reader if necessary.
+
+        Returns:
+            The next event, or None once the upstream stream has ended and
+            every queued event was returned.
+
+        Raises:
+            StreamBufferOverflowError: If the writer fell too far behind.
+            Exception: The upstream failure, after the events queued before it.
+        """
+        queued = await self._take()
+        return queued.build() if queued is not None else None
+
+    async def get_coalesced(
+        self, max_delay_seconds: float, max_bytes: int
+    ) -> ProviderStreamEvent | None:
+        """Return the next event, holding a delta back to merge later ones.
+
+        A delta is returned once it holds `max_bytes`, once
+        `max_delay_seconds` have passed since it was taken, or as soon as a
+        different event is queued or the stream ends.
+
+        Raises:
+            StreamBufferOverflowError: If the writer fell too far behind.
+            Exception: The upstream failure, after the events queued before it.
+        """
+        pending = await self._take()
+        if pending is None:
+            return None
+        if max_delay_seconds <= 0 or pending.event.type not in (
+            "delta",
+            "reasoning_delta",
+        ):
+            return pending.build()
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_delay_seconds
+        while pending.size < max_bytes:
+            if self._events:
+                if not _can_merge(pending.event, self._events[0].event):
+                    break
+                queued = self._events.popleft()
+                self._buffered_bytes -= queued.size
+                pending.merge(queued)
+                self._coalesced_events += 1
+                continue
+            remaining = deadline - loop.time()
+            if self._closed or self._overflowed or remaining <= 0:
+                break
+            self._ready.clear()
+            try:
+                async with asyncio.timeout(remaining):
+                    await self._ready.wait()
+            except TimeoutError:
+                break
+        return pending.build()
+
+    async def _take(self) -> _QueuedEvent | None:
+        """Dequeue the next event, waiting for the reader if necessary."""
+        while True:
+            if self._overflowed:
+                raise StreamBufferOverflowError(self._max_bytes)
+            if self._events:
+                queued = self._events.popleft()
+                self._buffered_bytes -= queued.size
+                return queued
+            if self._closed:
+                if self._error is not None:
+                    raise self._error
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+
+
+@dataclass(slots=True)
+class StreamFrameCounter:
+    """Count the SSE frames written for one turn and their total size."""
+
+    frames: int = 0
+    bytes: int = 0
+
+    def record(self, frame: str) -> str:
+        """Count one encoded frame and return it unchanged."""
+        self.frames += 1
+        self.bytes += len(frame.encode("utf-8"))
+        return frame
+
+    @property
+    def bytes_per_frame(self) -> float:
+        """Return the mean frame size, or zero before the first frame."""
+        return self.bytes / self.frames if self.frames else 0.0
+
+
+async def fill_stream_buffer(
+    events: AsyncGenerator[ProviderStreamEvent, None], buffer: StreamBuffer
+) -> None:
+    """Drain a provider stream into `buffer` at the upstream's own pace.
+
+    The stream is closed early when the buffer overflows. Failures are handed
+    to the writer through the buffer.
+    """
+    try:
+        async with aclosing(events):
+            async for event in events:
+                if not buffer.put(event):
+                    return
+    except Exception as exc:
+        buffer.close(exc)
+        return
+    buffer.close()
+
+
+def format_stream_buffer_stats(stats: StreamBufferStats) -> str:
+    """Format a one-line stream buffer summary for logs and tests."""
+    return (
+        "Stream buffer high-water:"
+        f" bytes={stats.high_water_bytes}"
+        f" events={stats.high_water_events}"
+        f" coalesced deltas={stats.coalesced_events}"
+    )
+
+
+def _can_merge(queued: ProviderStreamEvent, event: ProviderStreamEvent) -> bool:
+    """Return whether `event` can be appended to the queued delta."""
+    return queued.type == event.type and event.type in ("delta", "reasoning_delta")
+
+
+def _event_text(event: ProviderStreamEvent) -> str:
+    """Return the text an event holds while queued."""
+    return event.delta or event.reasoning or ""
+
+
+def _text_size(text: str) -> int:
+    """Return the UTF-8 size of queued text."""
+    return len(text.encode("utf-8")) if text else 0
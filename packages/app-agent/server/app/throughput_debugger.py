@@ -3,12 +3,158 @@ from __future__ import annotations
 import json
 import logging
 import math
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass
 from typing import Any
 
 import tiktoken
 
-from .models import ProviderResponse
+from .models import ProviderResponse, ProviderUsage
+
+PROMPT_CACHE_TRACKER_MAX_SESSIONS = 1024
+
+
+@dataclass(frozen=True, slots=True)
+class PromptCacheSummary:
+    """Describe upstream prompt-cache hits for one turn and its aggregates.
+
+    Hit ratios are cached input tokens divided by input tokens, accumulated
+    over the session's and the model's turns seen by this relay process.
+    """
+
+    input_tokens: int
+    cached_input_tokens: int
+    session_hit_ratio: float | None
+    session_turns: int
+    model_hit_ratio: float
+    model_turns: int
+
+
+class PromptCacheTracker:
+    """Accumulate provider-reported cached input tokens per session and model."""
+
+    def __init__(self, max_sessions: int = PROMPT_CACHE_TRACKER_MAX_SESSIONS) -> None:
+        self._max_sessions = max_sessions
+        self._sessions: OrderedDict[str, tuple[int, int, int]] = OrderedDict()
+        self._models: dict[str, tuple[int, int, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self, model: str, session_id: str | None, usage: ProviderUsage
+    ) -> PromptCacheSummary:
+        """Add one turn's usage and return the updated hit ratios.
+
+        Args:
+            model: Upstream model that served the turn.
+            session_id: Relay session of the turn, if the client sent one.
+            usage: Token usage reported by the provider.
+
+        Returns:
+            Summary of the turn's cache hits and the accumulated ratios.
+        """
+        with self._lock:
+            model_totals = _add_usage(self._models.get(model), usage)
+            self._models[model] = model_totals
+            session_totals = None
+            if session_id is not None:
+                session_totals = _add_usage(self._sessions.get(session_id), usage)
+                self._sessions[session_id] = session_totals
+                self._sessions.move_to_end(session_id)
+                while len(self._sessions) > self._max_sessions:
+                    self._sessions.popitem(last=False)
+
+        return PromptCacheSummary(
+            input_tokens=usage.input_tokens,
+            cached_input_tokens=usage.cached_input_tokens,
+            session_hit_ratio=(
+                _hit_ratio(session_totals) if session_totals is not None else None
+            ),
+            session_turns=session_totals[2] if session_totals is not None else 0,
+            model_hit_ratio=_hit_ratio(model_totals),
+            model_turns=model_totals[2],
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class CancellationSummary:
+    """Describe one turn abandoned by its client and the running totals.
+
+    Saved tokens are estimated as the average output of completed turns minus
+    what the cancelled turn had already generated, so they are only known
+    once at least one turn has reported its output tokens.
+    """
+
+    streamed_output_tokens: int
+    estimated_tokens_saved: int | None
+    cancelled_turns: int
+    total_estimated_tokens_saved: int
+
+
+class CancellationTracker:
+    """Count turns cancelled because their client disconnected."""
+
+    def __init__(self) -> None:
+        self._completed_turns = 0
+        self._completed_output_tokens = 0
+        self._cancelled_turns = 0
+        self._total_tokens_saved = 0
+        self._lock = threading.Lock()
+
+    def record_completed(self, usage: ProviderUsage | None) -> None:
+        """Add the output of one completed turn to the saved-token baseline."""
+        if usage is None or usage.output_tokens is None:
+            return
+
+        with self._lock:
+            self._completed_turns += 1
+            self._completed_output_tokens += usage.output_tokens
+
+    def record_cancelled(self, streamed_text: str, model: str) -> CancellationSummary:
+        """Count one cancelled turn and estimate the generation it saved.
+
+        Args:
+            streamed_text: Output the client received before disconnecting.
+            model: Upstream model that served the turn, used for tokenizing.
+
+        Returns:
+            Summary of the cancelled turn and the accumulated totals.
+        """
+        streamed_tokens = _count_tokens(streamed_text, _resolve_encoding(model))
+        with self._lock:
+            tokens_saved = (
+                max(
+                    round(self._completed_output_tokens / self._completed_turns)
+                    - streamed_tokens,
+                    0,
+                )
+                if self._completed_turns > 0
+                else None
+            )
+            self._cancelled_turns += 1
+            self._total_tokens_saved += tokens_saved or 0
+            return CancellationSummary(
+                streamed_output_tokens=streamed_tokens,
+                estimated_tokens_saved=tokens_saved,
+                cancelled_turns=self._cancelled_turns,
+                total_estimated_tokens_saved=self._total_tokens_saved,
+            )
+
+
+def format_cancellation_summary(summary: CancellationSummary) -> str:
+    """Format a one-line cancellation summary for logs and tests."""
+    saved = (
+        str(summary.estimated_tokens_saved)
+        if summary.estimated_tokens_saved is not None
+        else "n/a"
+    )
+    return (
+        "Cancelled turn after client disconnect:"
+        f" streamed output tokens={summary.streamed_output_tokens}"
+        f" estimated tokens saved={saved}"
+        f" cancelled turns={summary.cancelled_turns}"
+        f" total estimated tokens saved={summary.total_estimated_tokens_saved}"
+    )
 
 
 @dataclass(frozen=True, slots=True)
@@ -28,6 +174,7 @@ class ThroughputDebugSummary:
     estimated_input_tokens: int | None = None
     estimated_total_tokens: int | None = None
     estimated_total_tokens_per_second: float | None = None
+    prompt_cache: PromptCacheSummary | None = None
 
 
 def summarize_response_throughput(
@@ -36,6 +183,7 @@ def summarize_response_throughput(
     model: str,
     *,
     estimated_input_tokens: int | None = None,
+    prompt_cache: PromptCacheSummary | None = None,
 ) -> ThroughputDebugSummary:
     """Estimate client-observed throughput for one completed provider response.
 
@@ -45,6 +193,8 @@ def summarize_response_throughput(
         model: Model name used for tokenizer selection when available.
         estimated_input_tokens: Optional prompt-token estimate to include in the
             total-throughput fields.
+        prompt_cache: Optional provider-reported prompt-cache accounting for
+            the turn.
 
     Returns:
         Compact throughput summary derived from relay-observed timing and token
@@ -87,6 +237,7 @@ def summarize_response_throughput(
         estimated_input_tokens=estimated_input_tokens,
         estimated_total_tokens=estimated_total_tokens,
         estimated_total_tokens_per_second=estimated_total_tokens_per_second,
+        prompt_cache=prompt_cache,
     )
 
 
@@ -127,6 +278,25 @@ def format_throughput_summary(summary: ThroughputDebugSummary) -> str:
             + _format_rate(summary.estimated_total_tokens_per_second)
         )
 
+    prompt_cache = summary.prompt_cache
+    if prompt_cache is not None:
+        lines.append(
+            f"  upstream input tokens: {prompt_cache.input_tokens}"
+            f" (cached {prompt_cache.cached_input_tokens})"
+        )
+        session_ratio = (
+            _format_ratio(prompt_cache.session_hit_ratio)
+            + f" over {prompt_cache.session_turns} turns"
+            if prompt_cache.session_hit_ratio is not None
+            else "n/a"
+        )
+        lines.append(f"  prompt cache hit ratio (session): {session_ratio}")
+        lines.append(
+            "  prompt cache hit ratio (model): "
+            + _format_ratio(prompt_cache.model_hit_ratio)
+            + f" over {prompt_cache.model_turns} turns"
+        )
+
     return "\n".join(lines)
 
 
@@ -166,3 +336,23 @@ def _count_tokens(text: str, encoding: Any | None) -> int:
 
 def _format_rate(rate: float) -> str:
     return f"{rate:.2f}"
+
+
+def _format_ratio(ratio: float) -> str:
+    return f"{ratio * 100:.1f}%"
+
+
+def _add_usage(
+    totals: tuple[int, int, int] | None, usage: ProviderUsage
+) -> tuple[int, int, int]:
+    input_tokens, cached_input_tokens, turns = totals or (0, 0, 0)
+    return (
+        input_tokens + usage.input_tokens,
+        cached_input_tokens + usage.cached_input_tokens,
+        turns + 1,
+    )
+
+
+def _hit_ratio(totals: tuple[int, int, int]) -> float:
+    input_tokens, cached_input_tokens, _ = totals
+    return cached_input_tokens / input_tokens if input_tokens > 0 else 0.0
@@ -10,7 +10,7 @@ import tiktoken
 
 from .models import ProviderRequest
 from .prompt_builder import (
-    _build_context_text,
+    build_context_text,
     build_prompt_ir,
 )
 
@@ -34,6 +34,11 @@ class TokenDebugSummary:
         message: Estimated tokens for the current user message.
         total: Sum of the main prompt buckets.
         context_by_key: Estimated tokens for each top-level prompt-context key.
+        history_dropped_messages: Number of history items left out by the
+            history window.
+        history_dropped_tokens: Estimated tokens for the dropped history items.
+        compacted_tool_outputs: Number of older tool outputs that were
+            structurally compacted before counting.
     """
 
     model: str
@@ -45,6 +50,9 @@ class TokenDebugSummary:
     message: int
     total: int
     context_by_key: dict[str, int]
+    history_dropped_messages: int = 0
+    history_dropped_tokens: int = 0
+    compacted_tool_outputs: int = 0
 
 
 def summarize_prompt_tokens(request: ProviderRequest, model: str) -> TokenDebugSummary:
@@ -85,23 +93,29 @@ def summarize_prompt_tokens(request: ProviderRequest, model: str) -> TokenDebugS
         raise ValueError("Model name must not be blank.")
 
     prompt = build_prompt_ir(request)
-    encoding = _resolve_encoding(model)
+    encoding = resolve_encoding(model)
     history_messages = _build_history_texts(prompt.history)
-    history_tokens = sum(_count_tokens(text, encoding) for text in history_messages)
+    if prompt.omitted_history_text:
+        history_messages.append(prompt.omitted_history_text)
+    history_tokens = sum(count_tokens(text, encoding) for text in history_messages)
+    history_dropped_tokens = sum(
+        count_tokens(text, encoding)
+        for text in _build_history_texts(prompt.dropped_history)
+    )
     context_by_key = {
-        key: _count_tokens(_build_context_text({key: value}), encoding)
+        key: count_tokens(build_context_text({key: value}), encoding)
         for key, value in prompt.context.items()
     }
 
-    system_prompt_tokens = _count_tokens(prompt.instructions, encoding)
-    context_tokens = _count_tokens(prompt.context_text, encoding)
+    system_prompt_tokens = count_tokens(prompt.instructions, encoding)
+    context_tokens = count_tokens(prompt.context_text, encoding)
     volatile_context_tokens = (
-        _count_tokens(prompt.volatile_context_text, encoding)
+        count_tokens(prompt.volatile_context_text, encoding)
         if prompt.volatile_context_text
         else 0
     )
-    tools_tokens = _count_tokens(_build_tools_text(request), encoding)
-    message_tokens = _count_tokens(prompt.message, encoding)
+    tools_tokens = count_tokens(_build_tools_text(request), encoding)
+    message_tokens = count_tokens(prompt.message, encoding)
 
     return TokenDebugSummary(
         model=model,
@@ -120,6 +134,9 @@ def summarize_prompt_tokens(request: ProviderRequest, model: str) -> TokenDebugS
             + message_tokens
         ),
         context_by_key=context_by_key,
+        history_dropped_messages=len(prompt.dropped_history),
+        history_dropped_tokens=history_dropped_tokens,
+        compacted_tool_outputs=prompt.compacted_tool_outputs,
     )
 
 
@@ -180,6 +197,7 @@ def format_token_summary(
             + _format_percentage(summary.history, total)
             + ")"
         ),
+        *_format_history_window_lines(summary),
         (
             "    tools (rough estimate) = "
             + str(summary.tools)
@@ -200,7 +218,8 @@ def format_token_summary(
     return "\n".join(lines)
 
 
-def _resolve_encoding(model: str) -> Any | None:
+def resolve_encoding(model: str) -> Any | None:
+    """Return the tiktoken encoding of `model`, or None when unavailable."""
     try:
         return tiktoken.encoding_for_model(model)
     except Exception:
@@ -210,7 +229,8 @@ def _resolve_encoding(model: str) -> Any | None:
             return None
 
 
-def _count_tokens(text: str, encoding: Any | None) -> int:
+def count_tokens(text: str, encoding: Any | None) -> int:
+    """Count tokens with `encoding`, estimating four characters per token."""
     if encoding is not None:
         return len(encoding.encode(text))
 
@@ -220,6 +240,26 @@ def _count_tokens(text: str, encoding: Any | None) -> int:
     return math.ceil(len(text) / 4)
 
 
+def _format_history_window_lines(summary: TokenDebugSummary) -> list[str]:
+    lines: list[str] = []
+    if summary.history_dropped_messages > 0:
+        lines.append(
+            "    history dropped by window = "
+            + str(summary.history_dropped_tokens)
+            + " ("
+            + str(summary.history_dropped_messages)
+            + " messages, not sent)"
+        )
+
+    if summary.compacted_tool_outputs > 0:
+        lines.append(
+            "    history compacted tool outputs = "
+            + str(summary.compacted_tool_outputs)
+        )
+
+    return lines
+
+
 def _format_context_breakdown_lines(
     summary: TokenDebugSummary, *, max_context_keys: int
 ) -> list[str]:
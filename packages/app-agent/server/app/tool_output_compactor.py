@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+from typing import Any
+
+from .models import HistoryMessage, ToolOutputCompactionPolicy
+
+
+def compact_tool_outputs(
+    history: list[HistoryMessage], policy: ToolOutputCompactionPolicy | None
+) -> tuple[list[HistoryMessage], int]:
+    """Structurally shrink older tool outputs in conversation history.
+
+    The most recent `keep_recent_outputs` tool outputs stay verbatim. Older
+    outputs are replaced by copies whose text and structured content have been
+    elided with `compact_json_value`. Compaction only depends on the output
+    itself and its position among tool outputs, so an output is rewritten at
+    most once as the conversation grows and the serialized prompt prefix stays
+    stable afterwards.
+
+    Args:
+        history: Conversation history in chronological order.
+        policy: Compaction policy, or `None` to keep every output verbatim.
+
+    Returns:
+        Tuple of the possibly rewritten history and the number of tool outputs
+        that were compacted.
+    """
+    if policy is None:
+        return history, 0
+
+    tool_output_indices = [
+        index for index, message in enumerate(history) if message.role == "tool"
+    ]
+    cutoff = len(tool_output_indices) - policy.keep_recent_outputs
+    if cutoff <= 0:
+        return history, 0
+
+    compacted_history = list(history)
+    compacted_count = 0
+    for index in tool_output_indices[:cutoff]:
+        message = history[index]
+        text = _clip_string(message.text, policy.max_string_chars)
+        content = (
+            compact_json_value(message.content, policy)
+            if message.content is not None
+            else None
+        )
+        if text == message.text and content == message.content:
+            continue
+
+        compacted_history[index] = message.model_copy(
+            update={"text": text, "content": content}
+        )
+        compacted_count += 1
+
+    return compacted_history, compacted_count
+
+
+def compact_json_value(
+    value: Any, policy: ToolOutputCompactionPolicy, depth: int = 0
+) -> Any:
+    """Return a deterministic, structurally elided copy of a JSON value.
+
+    Arrays keep their first `max_array_items` items followed by a marker with
+    the number of omitted items, strings are clipped to `max_string_chars`, and
+    containers nested deeper than `max_depth` are replaced by a short summary
+    of their size. Object key order is preserved.
+
+    Args:
+        value: JSON-compatible value taken from a tool output.
+        policy: Limits that control how aggressively the value is elided.
+        depth: Nesting depth of `value` within the original output.
+
+    Returns:
+        Elided JSON-compatible value.
+    """
+    return _elide_json_value(
+        value,
+        policy.max_depth,
+        policy.max_array_items,
+        policy.max_string_chars,
+        depth,
+    )
+
+
+def limit_json_depth(value: Any, max_depth: int) -> Any:
+    """Return a copy of a JSON value with deeply nested containers summarized.
+
+    Containers nested deeper than `max_depth` are replaced with the same size
+    summaries that `compact_json_value` uses. Arrays and strings are otherwise
+    kept whole.
+
+    Args:
+        value: JSON-compatible value.
+        max_depth: Maximum container nesting depth to keep.
+
+    Returns:
+        Depth-limited JSON-compatible value.
+    """
+    return _elide_json_value(value, max_depth, None, None, 0)
+
+
+def _elide_json_value(
+    value: Any,
+    max_depth: int,
+    max_array_items: int | None,
+    max_string_chars: int | None,
+    depth: int,
+) -> Any:
+    if isinstance(value, str):
+        if max_string_chars is None:
+            return value
+        return _clip_string(value, max_string_chars)
+
+    if isinstance(value, dict):
+        if depth >= max_depth:
+            return "[object with " + str(len(value)) + " keys omitted]"
+
+        return {
+            key: _elide_json_value(
+                item, max_depth, max_array_items, max_string_chars, depth + 1
+            )
+            for key, item in value.items()
+        }
+
+    if isinstance(value, list):
+        if depth >= max_depth:
+            return "[array with " + str(len(value)) + " items omitted]"
+
+        kept = value if max_array_items is None else value[:max_array_items]
+        items = [
+            _elide_json_value(
+                item, max_depth, max_array_items, max_string_chars, depth + 1
+            )
+            for item in kept
+        ]
+        omitted_count = len(value) - len(items)
+        if omitted_count > 0:
+            items.append("[" + str(omitted_count) + " more items omitted]")
+        return items
+
+    return value
+
+
+def _clip_string(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+
+    return (
+        text[:max_chars]
+        + "… ["
+        + str(len(text) - max_chars)
+        + " more characters omitted]"
+    )
@@ -0,0 +1,323 @@
+"""Opt-in recording of upstream traffic for repeatable load tests.
+
+When enabled, the provider's HTTP clients send requests through a recording
+transport that writes one JSONL record per upstream exchange. Each record
+holds the relay turn's provider request, the upstream request payload, and
+the raw upstream response body in the chunks the upstream sent, each with
+its offset from the start of the request. Records are serialized and
+written on a worker thread once the response body is closed, so recording
+does not block the event loop. Files rotate by size.
+`app.traffic_replay` serves recorded responses back as a mock upstream and
+drives a relay with the recorded turns.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Iterator
+
+import anyio
+import httpx
+
+from app.compression import decompress_body
+from app.config import DEFAULT_TRAFFIC_RECORD_MAX_BYTES
+from app.models import ProviderRequest
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TRAFFIC_RECORD_BACKUPS = 5
+RECORDED_RESPONSE_HEADERS = ("content-type", "content-encoding")
+
+_recorded_turn: ContextVar[tuple[str, ProviderRequest] | None] = ContextVar(
+    "recorded_turn", default=None
+)
+
+
+def bind_recorded_turn(request: ProviderRequest) -> None:
+    """Attribute the upstream requests of the current task to one relay turn.
+
+    Tasks started afterwards inherit the binding, so background stream
+    readers and jobs record the turn that started them.
+    """
+    _recorded_turn.set((uuid.uuid4().hex, request))
+
+
+@dataclass(frozen=True, slots=True)
+class RecordedChunk:
+    """One chunk of a recorded upstream response body.
+
+    Attributes:
+        at_ms: Time since the upstream request was sent.
+        data: Raw bytes as received, before content decoding.
+    """
+
+    at_ms: float
+    data: bytes
+
+
+@dataclass(frozen=True, slots=True)
+class TrafficRecord:
+    """One recorded upstream exchange.
+
+    Attributes:
+        turn_id: Relay turn that made the request, shared by its retries.
+        request: Provider request of that turn, or None for requests made
+            outside a turn, such as capability probes and warm-ups.
+        method: HTTP method of the upstream request.
+        path: URL path of the upstream request.
+        payload: Decoded JSON body of the upstream request.
+        status_code: HTTP status of the upstream response.
+        headers: Content headers of the upstream response.
+        chunks: Upstream response body as received.
+        recorded_at: Wall-clock time the request was sent.
+    """
+
+    turn_id: str | None
+    request: dict[str, Any] | None
+    method: str
+    path: str
+    payload: Any
+    status_code: int
+    headers: dict[str, str]
+    chunks: tuple[RecordedChunk, ...]
+    recorded_at: float
+
+    @property
+    def body(self) -> bytes:
+        """Return the complete recorded response body."""
+        return b"".join(chunk.data for chunk in self.chunks)
+
+    def to_json(self) -> dict[str, Any]:
+        """Return the JSONL payload of this record.
+
+        Chunk data is decoded as UTF-8 with surrogate escapes, which keeps
+        text bodies readable and still round-trips arbitrary bytes.
+        """
+        return {
+            "turnId": self.turn_id,
+            "request": self.request,
+            "method": self.method,
+            "path": self.path,
+            "payload": self.payload,
+            "status": self.status_code,
+            "headers": self.headers,
+            "chunks": [
+                {
+                    "atMs": round(chunk.at_ms, 3),
+                    "data": chunk.data.decode("utf-8", errors="surrogateescape"),
+                }
+                for chunk in self.chunks
+            ],
+            "recordedAt": self.recorded_at,
+        }
+
+    @classmethod
+    def from_json(cls, data: dict[str, Any]) -> TrafficRecord:
+        """Parse a record written by `to_json`."""
+        return cls(
+            turn_id=data.get("turnId"),
+            request=data.get("request"),
+            method=data["method"],
+            path=data["path"],
+            payload=data.get("payload"),
+            status_code=data["status"],
+            headers=data.get("headers", {}),
+            chunks=tuple(
+                RecordedChunk(
+                    chunk["atMs"],
+                    chunk["data"].encode("utf-8", errors="surrogateescape"),
+                )
+                for chunk in data.get("chunks", [])
+            ),
+            recorded_at=data.get("recordedAt", 0.0),
+        )
+
+
+class TrafficRecorder:
+    """Append traffic records to a JSONL file that rotates by size.
+
+    Once the file would exceed `max_bytes`, it is renamed to `<path>.1`,
+    older files shift up by one, and the oldest beyond `backups` is removed.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        max_bytes: int = DEFAULT_TRAFFIC_RECORD_MAX_BYTES,
+        backups: int = DEFAULT_TRAFFIC_RECORD_BACKUPS,
+    ) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._path = path
+        self._max_bytes = max_bytes
+        self._backups = backups
+        self._lock = threading.Lock()
+
+    def write(self, record: TrafficRecord) -> None:
+        """Append one record, rotating the file first when it is full.
+
+        Writes block on file I/O and may come from several threads at once.
+        """
+        line = (json.dumps(record.to_json(), ensure_ascii=False) + "\n").encode(
+            "utf-8", errors="surrogateescape"
+        )
+        with self._lock:
+            size = self._path.stat().st_size if self._path.exists() else 0
+            if size > 0 and size + len(line) > self._max_bytes:
+                self._rotate()
+            with self._path.open("ab") as handle:
+                handle.write(line)
+
+    def _rotate(self) -> None:
+        for index in range(self._backups, 0, -1):
+            source = self._path if index == 1 else _backup_path(self._path, index - 1)
+            if source.exists():
+                source.replace(_backup_path(self._path, index))
+
+
+def traffic_record_files(path: Path) -> list[Path]:
+    """Return a recording's existing files, oldest first."""
+    backups = sorted(
+        (
+            candidate
+            for candidate in path.parent.glob(path.name + ".*")
+            if candidate.suffix[1:].isdigit()
+        ),
+        key=lambda candidate: int(candidate.suffix[1:]),
+        reverse=True,
+    )
+    return [*backups, *([path] if path.exists() else [])]
+
+
+def read_traffic_records(path: Path) -> Iterator[TrafficRecord]:
+    """Yield every record of a recording, including its rotated files."""
+    for record_file in traffic_record_files(path):
+        with record_file.open(
+            "r", encoding="utf-8", errors="surrogateescape"
+        ) as handle:
+            for line in handle:
+                if line.strip():
+                    yield TrafficRecord.from_json(json.loads(line))
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """Record each exchange that passes through an HTTP transport.
+
+    Clients close their transport when they close, so each client needs its
+    own recording transport.
+    """
+
+    def __init__(
+        self,
+        recorder: TrafficRecorder,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        self._recorder = recorder
+        self._transport = (
+            transport if transport is not None else httpx.AsyncHTTPTransport()
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        recorded_at = time.time()
+        started_at = time.perf_counter()
+        response = await self._transport.handle_async_request(request)
+        turn = _recorded_turn.get()
+
+        def write(chunks: tuple[RecordedChunk, ...]) -> None:
+            try:
+                self._recorder.write(
+                    TrafficRecord(
+                        turn_id=turn[0] if turn is not None else None,
+                        request=(
+                            turn[1].model_dump(mode="json", by_alias=True)
+                            if turn is not None
+                            else None
+                        ),
+                        method=request.method,
+                        path=request.url.path,
+                        payload=_decode_payload(request),
+                        status_code=response.status_code,
+                        headers={
+                            name: response.headers[name]
+                            for name in RECORDED_RESPONSE_HEADERS
+                            if name in response.headers
+                        },
+                        chunks=chunks,
+                        recorded_at=recorded_at,
+                    )
+                )
+            except OSError:
+                logger.exception("Could not write a traffic record")
+
+        assert isinstance(response.stream, httpx.AsyncByteStream)
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_RecordingStream(response.stream, started_at, write),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class _RecordingStream(httpx.AsyncByteStream):
+    """Pass a response body through while timing each chunk.
+
+    `on_close` runs on a worker thread, shielded from cancellation so that
+    streams closed by a disconnecting client are still recorded.
+    """
+
+    def __init__(
+        self,
+        stream: httpx.AsyncByteStream,
+        started_at: float,
+        on_close: Callable[[tuple[RecordedChunk, ...]], None],
+    ) -> None:
+        self._stream = stream
+        self._started_at = started_at
+        self._on_close: Callable[[tuple[RecordedChunk, ...]], None] | None = on_close
+        self._chunks: list[RecordedChunk] = []
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            self._chunks.append(
+                RecordedChunk((time.perf_counter() - self._started_at) * 1000, chunk)
+            )
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            on_close, self._on_close = self._on_close, None
+            if on_close is not None:
+                with anyio.CancelScope(shield=True):
+                    await anyio.to_thread.run_sync(on_close, tuple(self._chunks))
+
+
+def _backup_path(path: Path, index: int) -> Path:
+    return path.with_name(f"{path.name}.{index}")
+
+
+def _decode_payload(request: httpx.Request) -> Any:
+    """Return the JSON body of an upstream request, or None without one."""
+    content = request.content
+    if not content:
+        return None
+    encoding = request.headers.get("content-encoding")
+    if encoding:
+        try:
+            content = decompress_body(content, encoding)
+        except ValueError:
+            return None
+    try:
+        return json.loads(content)
+    except ValueError:
+        return None
@@ -0,0 +1,207 @@
+"""Replay recorded upstream traffic for repeatable relay load tests.
+
+`build_mock_upstream` serves a recording from `app.traffic_recorder` as a
+stand-in for the upstream model server. It streams each recorded response
+with its original chunk timing, optionally sped up or slowed down.
+`drive_relay` sends the recorded turns to a relay with bounded concurrency
+and reports each result as it completes. Together they run realistic,
+repeatable load tests without a GPU or network access.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from collections import defaultdict, deque
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Iterable, Sequence
+
+import httpx
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.batch import BatchItemResult, run_batch
+from app.compression import decompress_body
+from app.jobs import JobFailedError
+from app.traffic_recorder import TrafficRecord
+
+REPLAY_METHODS = ["GET", "POST", "PUT", "PATCH", "DELETE"]
+
+
+class RecordedResponses:
+    """Match upstream requests to recorded responses.
+
+    A request gets the next record with the same method, path, and payload.
+    When the relay's payload drifted from the recording, for example after a
+    prompt change, it gets the next record for the same method and path
+    instead. Records are handed out in recorded order and reused in turn
+    once every one of them was served.
+    """
+
+    def __init__(self, records: Iterable[TrafficRecord]) -> None:
+        self._by_payload: defaultdict[tuple[str, str, str], deque[TrafficRecord]] = (
+            defaultdict(deque)
+        )
+        self._by_path: defaultdict[tuple[str, str], deque[TrafficRecord]] = defaultdict(
+            deque
+        )
+        for record in records:
+            self._by_payload[
+                _payload_key(record.method, record.path, record.payload)
+            ].append(record)
+            self._by_path[(record.method, record.path)].append(record)
+
+    def match(self, method: str, path: str, payload: Any) -> TrafficRecord | None:
+        """Return the recorded response for one upstream request."""
+        candidates = self._by_payload.get(_payload_key(method, path, payload))
+        if not candidates:
+            candidates = self._by_path.get((method, path))
+        if not candidates:
+            return None
+        record = candidates.popleft()
+        candidates.append(record)
+        return record
+
+
+def build_mock_upstream(records: Iterable[TrafficRecord], speed: float) -> FastAPI:
+    """Build an app that answers upstream requests from a recording.
+
+    Args:
+        records: Recorded upstream exchanges.
+        speed: Playback speed of the recorded chunk timing. `1` reproduces
+            the original timing, `2` plays twice as fast, and `0` sends
+            every chunk right away.
+
+    Returns:
+        ASGI app to serve in place of the upstream model server.
+    """
+    responses = RecordedResponses(records)
+    upstream = FastAPI()
+
+    @upstream.api_route("/{path:path}", methods=REPLAY_METHODS)
+    async def replay(request: Request) -> Response:
+        record = responses.match(
+            request.method, request.url.path, await _read_payload(request)
+        )
+        if record is None:
+            return JSONResponse(
+                status_code=404,
+                content={
+                    "error": {
+                        "message": "No recorded response for "
+                        + request.method
+                        + " "
+                        + request.url.path
+                    }
+                },
+            )
+        return StreamingResponse(
+            replay_chunks(record, speed),
+            status_code=record.status_code,
+            headers=record.headers,
+        )
+
+    return upstream
+
+
+async def replay_chunks(record: TrafficRecord, speed: float) -> AsyncIterator[bytes]:
+    """Yield a recorded response body with its chunk timing scaled by `speed`."""
+    loop = asyncio.get_running_loop()
+    started_at = loop.time()
+    for chunk in record.chunks:
+        if speed > 0:
+            delay = chunk.at_ms / 1000 / speed - (loop.time() - started_at)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        yield chunk.data
+
+
+def recorded_turns(records: Iterable[TrafficRecord]) -> list[dict[str, Any]]:
+    """Return an agent-turn body for every recorded relay turn.
+
+    Retries of a turn share its turn id, so each turn appears once. Bodies
+    carry the full context and history, so they do not depend on session
+    state from earlier turns.
+    """
+    turns: list[dict[str, Any]] = []
+    seen: set[str] = set()
+    for record in records:
+        if record.turn_id is None or record.request is None:
+            continue
+        if record.turn_id in seen:
+            continue
+        seen.add(record.turn_id)
+        request = record.request
+        body: dict[str, Any] = {
+            "message": request["message"],
+            "history": request["history"],
+            "context": request["context"],
+            "volatileContext": request.get("volatileContext", {}),
+            "tools": request.get("tools", []),
+        }
+        if request.get("session_id") is not None:
+            body["sessionId"] = request["session_id"]
+        turns.append(body)
+    return turns
+
+
+async def drive_relay(
+    turns: Sequence[dict[str, Any]],
+    client: httpx.AsyncClient,
+    *,
+    concurrency: int,
+    stream: bool = False,
+) -> AsyncIterator[BatchItemResult]:
+    """Send recorded turns to a relay and yield each result as it completes.
+
+    Args:
+        turns: Agent-turn bodies, as returned by `recorded_turns`.
+        client: HTTP client whose base URL points at the relay.
+        concurrency: Most turns in flight at once.
+        stream: Whether to request SSE responses and read them to the end.
+
+    Returns:
+        Async iterator of results in completion order. Use
+        `app.batch.summarize_batch` for throughput and latency percentiles.
+    """
+
+    async def run_one(body: dict[str, Any]) -> dict[str, Any]:
+        response = await client.post(
+            "/v1/agent-turn",
+            json=body,
+            params={"stream": "true"} if stream else None,
+        )
+        if response.status_code != 200:
+            raise JobFailedError(response.text, response.status_code)
+        if stream:
+            return {"frames": response.text.count("\n\n")}
+        result: dict[str, Any] = response.json()
+        return result
+
+    results = run_batch(
+        turns,
+        run_one,
+        concurrency=concurrency,
+        admission=asyncio.Semaphore(concurrency),
+    )
+    async with aclosing(results):
+        async for result in results:
+            yield result
+
+
+async def _read_payload(request: Request) -> Any:
+    """Return the decoded JSON body of an upstream request, if any."""
+    content = await request.body()
+    if not content:
+        return None
+    encoding = request.headers.get("content-encoding")
+    try:
+        if encoding:
+            content = decompress_body(content, encoding)
+        return json.loads(content)
+    except ValueError:
+        return None
+
+
+def _payload_key(method: str, path: str, payload: Any) -> tuple[str, str, str]:
+    return (method, path, json.dumps(payload, sort_keys=True))
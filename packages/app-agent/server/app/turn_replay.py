@@ -0,0 +1,283 @@
+"""Replay logs that let clients resume interrupted streaming turns.
+
+A resumable turn runs in a background task that appends every SSE frame,
+numbered with an SSE `id`, to a bounded per-turn log. Client connections only
+read from the log, so a client whose stream dropped can reconnect with
+`Last-Event-ID` and continue from the next frame without a new upstream
+request. When no client has been connected for the grace period, the turn is
+cancelled like a regular abandoned stream.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import aclosing
+from typing import AsyncGenerator, AsyncIterator, Callable, Coroutine
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REPLAY_MAX_TURNS = 256
+DEFAULT_REPLAY_MAX_BYTES_PER_TURN = 1024 * 1024
+TURN_ID_HEADER = "x-genomespy-turn-id"
+
+
+class TurnEventsExpiredError(Exception):
+    """Raised when a client resumes after frames the relay no longer holds.
+
+    Attributes:
+        turn_id: Turn the client tried to resume.
+        last_event_id: Last frame id the client received.
+        first_available_id: Oldest frame id still in the replay log.
+    """
+
+    def __init__(
+        self, turn_id: str, last_event_id: int, first_available_id: int
+    ) -> None:
+        super().__init__(
+            f"Turn {turn_id} no longer holds the events after {last_event_id}; "
+            f"the oldest available event is {first_available_id}."
+        )
+        self.turn_id = turn_id
+        self.last_event_id = last_event_id
+        self.first_available_id = first_available_id
+
+
+def new_turn_id() -> str:
+    """Return a fresh, unguessable turn id."""
+    return uuid.uuid4().hex
+
+
+class ReplayableTurn:
+    """Hold the encoded SSE frames of one streaming turn for replay.
+
+    Frames are numbered from 1 in the order they are produced. The oldest
+    frames are dropped once the log exceeds its byte cap, so only clients
+    that fell that far behind lose the ability to resume.
+    """
+
+    def __init__(
+        self, turn_id: str, max_bytes: int = DEFAULT_REPLAY_MAX_BYTES_PER_TURN
+    ) -> None:
+        self.turn_id = turn_id
+        self.finished_at: float | None = None
+        self.subscribers = 0
+        self._max_bytes = max_bytes
+        self._frames: deque[bytes] = deque()
+        self._first_id = 1
+        self._bytes = 0
+        self._changed = asyncio.Event()
+        self._producer: asyncio.Task[None] | None = None
+        self._grace_timer: asyncio.TimerHandle | None = None
+
+    @property
+    def done(self) -> bool:
+        """Whether the turn produced its last frame."""
+        return self.finished_at is not None
+
+    @property
+    def last_event_id(self) -> int:
+        """Return the id of the newest frame, or zero before the first one."""
+        return self._first_id + len(self._frames) - 1
+
+    def append(self, frame: str) -> None:
+        """Number one SSE frame and add it to the log."""
+        encoded = f"id: {self.last_event_id + 1}\n{frame}".encode("utf-8")
+        self._frames.append(encoded)
+        self._bytes += len(encoded)
+        while self._bytes > self._max_bytes and len(self._frames) > 1:
+            self._bytes -= len(self._frames.popleft())
+            self._first_id += 1
+        self._notify()
+
+    def finish(self, finished_at: float) -> None:
+        """Mark the turn as complete."""
+        self.finished_at = finished_at
+        self._notify()
+
+    def frames_after(self, last_event_id: int) -> list[bytes]:
+        """Return the logged frames that follow `last_event_id`.
+
+        Raises:
+            TurnEventsExpiredError: If some of those frames were dropped.
+        """
+        if last_event_id + 1 < self._first_id:
+            raise TurnEventsExpiredError(self.turn_id, last_event_id, self._first_id)
+        start = max(last_event_id + 1 - self._first_id, 0)
+        return list(itertools.islice(self._frames, start, None))
+
+    @property
+    def changed(self) -> asyncio.Event:
+        """Return the event set by the next frame or by the turn finishing."""
+        return self._changed
+
+    def start_producer(self, producer: Coroutine[None, None, None]) -> None:
+        """Run the coroutine that appends the turn's frames as a task."""
+        self._producer = asyncio.create_task(producer)
+
+    def cancel_producer(self) -> None:
+        """Cancel the producer task, if the turn has one."""
+        if self._producer is not None:
+            self._producer.cancel()
+
+    def arm_grace_timer(self, delay: float, callback: Callable[[], None]) -> None:
+        """Call `callback` after `delay` seconds unless the timer is cancelled."""
+        self.cancel_grace_timer()
+        self._grace_timer = asyncio.get_running_loop().call_later(
+            delay, self._fire_grace_timer, callback
+        )
+
+    def cancel_grace_timer(self) -> None:
+        """Cancel a pending grace timer."""
+        if self._grace_timer is not None:
+            self._grace_timer.cancel()
+            self._grace_timer = None
+
+    def _fire_grace_timer(self, callback: Callable[[], None]) -> None:
+        self._grace_timer = None
+        callback()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+
+class TurnReplayStore:
+    """Run resumable streaming turns and keep their frames for a while."""
+
+    def __init__(
+        self,
+        ttl_seconds: float,
+        grace_seconds: float,
+        max_turns: int = DEFAULT_REPLAY_MAX_TURNS,
+        max_bytes_per_turn: int = DEFAULT_REPLAY_MAX_BYTES_PER_TURN,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._ttl_seconds = ttl_seconds
+        self._grace_seconds = grace_seconds
+        self._max_turns = max_turns
+        self._max_bytes_per_turn = max_bytes_per_turn
+        self._clock = clock
+        self._turns: OrderedDict[str, ReplayableTurn] = OrderedDict()
+
+    def start(self, turn_id: str, frames: AsyncGenerator[str, None]) -> ReplayableTurn:
+        """Start producing a turn's frames in the background.
+
+        Args:
+            turn_id: Id that clients use to resume the turn.
+            frames: Encoded SSE frames of the turn, without ids.
+
+        Returns:
+            The turn, ready for `subscribe`.
+        """
+        self._evict_expired()
+        turn = ReplayableTurn(turn_id, self._max_bytes_per_turn)
+        self._turns[turn_id] = turn
+        self._evict_excess()
+        turn.start_producer(self._produce(turn, frames))
+        return turn
+
+    def get(self, turn_id: str) -> ReplayableTurn | None:
+        """Return an in-progress or recently finished turn."""
+        self._evict_expired()
+        return self._turns.get(turn_id)
+
+    async def subscribe(
+        self, turn: ReplayableTurn, last_event_id: int = 0
+    ) -> AsyncIterator[bytes]:
+        """Yield the turn's frames after `last_event_id`, following new ones.
+
+        When the last client of an unfinished turn goes away, the turn is
+        cancelled unless a client reconnects within the grace period. A client
+        that falls so far behind that the frames it needs were dropped from
+        the log gets an SSE `error` event, and its stream ends.
+        """
+        turn.subscribers += 1
+        turn.cancel_grace_timer()
+        try:
+            while True:
+                changed = turn.changed
+                try:
+                    frames = turn.frames_after(last_event_id)
+                except TurnEventsExpiredError as exc:
+                    logger.warning("Ending a slow client's stream: %s", exc)
+                    yield _encode_error_frame(str(exc))
+                    return
+                for frame in frames:
+                    yield frame
+                last_event_id += len(frames)
+                if turn.done and last_event_id >= turn.last_event_id:
+                    return
+                if not frames:
+                    await changed.wait()
+        finally:
+            turn.subscribers -= 1
+            if turn.subscribers == 0 and not turn.done:
+                turn.arm_grace_timer(
+                    self._grace_seconds, lambda: self._cancel_if_abandoned(turn)
+                )
+
+    async def _produce(
+        self, turn: ReplayableTurn, frames: AsyncGenerator[str, None]
+    ) -> None:
+        """Append every frame of the turn to its log."""
+        try:
+            async with aclosing(frames):
+                async for frame in frames:
+                    turn.append(frame)
+        except Exception:
+            logger.exception("Resumable turn %s failed", turn.turn_id)
+        finally:
+            turn.finish(self._clock())
+
+    def _cancel_if_abandoned(self, turn: ReplayableTurn) -> None:
+        """Cancel a turn that no client reconnected to."""
+        if turn.subscribers > 0 or turn.done:
+            return
+        logger.info(
+            "No client resumed turn %s within %gs; cancelling it.",
+            turn.turn_id,
+            self._grace_seconds,
+        )
+        turn.cancel_producer()
+
+    def _evict_excess(self) -> None:
+        """Drop turns beyond `max_turns`, oldest finished turns first.
+
+        An unfinished turn is evicted only when every stored turn is
+        unfinished, and its producer is cancelled so it does not keep
+        generating for clients that can no longer reach it.
+        """
+        excess = len(self._turns) - self._max_turns
+        if excess <= 0:
+            return
+        finished = [turn_id for turn_id, turn in self._turns.items() if turn.done]
+        for turn_id in finished[:excess]:
+            del self._turns[turn_id]
+        while len(self._turns) > self._max_turns:
+            _, turn = self._turns.popitem(last=False)
+            logger.warning(
+                "Replay store is full of unfinished turns; cancelling turn %s.",
+                turn.turn_id,
+            )
+            turn.cancel_producer()
+
+    def _evict_expired(self) -> None:
+        cutoff = self._clock() - self._ttl_seconds
+        for turn_id, turn in list(self._turns.items()):
+            if turn.finished_at is not None and turn.finished_at < cutoff:
+                del self._turns[turn_id]
+
+
+def _encode_error_frame(message: str) -> bytes:
+    """Encode an SSE `error` event that is not part of the replay log."""
+    return (
+        "event: error\ndata: "
+        + json.dumps({"message": message}, ensure_ascii=False)
+        + "\n\n"
+    ).encode("utf-8")
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Literal
+
+MODEL_COLD_START_THRESHOLD_SECONDS = 5.0
+
+logger = logging.getLogger(__name__)
+
+ModelWarmthState = Literal["unknown", "warming", "warm", "cold"]
+
+
+@dataclass(frozen=True, slots=True)
+class ModelWarmthSnapshot:
+    """Describe whether the upstream model is believed to be loaded.
+
+    Attributes:
+        state: `warm` after a successful warm-up or keep-alive request,
+            `cold` after one failed, `warming` while the first one runs, and
+            `unknown` before any was sent.
+        last_cold_start_ms: Duration of the latest warm-up request that had
+            to wait for a model load.
+        last_cold_start_at: UTC timestamp of that cold start.
+    """
+
+    state: ModelWarmthState
+    last_cold_start_ms: int | None = None
+    last_cold_start_at: str | None = None
+
+
+class ModelWarmthManager:
+    """Keep a local model loaded so real turns do not pay cold starts.
+
+    Local servers such as Ollama load a model on its first request and unload
+    it after an idle period. The manager can send one warm-up request at
+    startup and then a cheap keep-alive request whenever no turn reached the
+    backend for `keep_alive_interval_seconds`. Requests that take longer than
+    `cold_start_threshold_seconds` are recorded as cold starts.
+    """
+
+    def __init__(
+        self,
+        warm_up: Callable[[], Awaitable[None]],
+        *,
+        warm_up_on_start: bool = False,
+        keep_alive_interval_seconds: int | None = None,
+        cold_start_threshold_seconds: float = MODEL_COLD_START_THRESHOLD_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._warm_up = warm_up
+        self._warm_up_on_start = warm_up_on_start
+        self._keep_alive_interval_seconds = keep_alive_interval_seconds
+        self._cold_start_threshold_seconds = cold_start_threshold_seconds
+        self._clock = clock
+        self._last_activity = clock()
+        self._snapshot = ModelWarmthSnapshot(state="unknown")
+
+    @property
+    def enabled(self) -> bool:
+        """Return whether the manager sends any requests."""
+        return self._warm_up_on_start or self._keep_alive_interval_seconds is not None
+
+    def snapshot(self) -> ModelWarmthSnapshot:
+        """Return the current warmth state."""
+        return self._snapshot
+
+    def record_activity(self) -> None:
+        """Note a real turn, which keeps the model loaded by itself."""
+        self._last_activity = self._clock()
+
+    async def run(self) -> None:
+        """Warm the model at startup and keep it loaded while idle.
+
+        Runs until cancelled when keep-alive is configured.
+        """
+        if self._warm_up_on_start:
+            await self.warm_up()
+
+        interval = self._keep_alive_interval_seconds
+        if interval is None:
+            return
+
+        while True:
+            idle_seconds = self._clock() - self._last_activity
+            if idle_seconds < interval:
+                await asyncio.sleep(interval - idle_seconds)
+                continue
+            await self.warm_up()
+
+    async def warm_up(self) -> bool:
+        """Send one warm-up request and update the warmth state.
+
+        Returns:
+            Whether the request succeeded.
+        """
+        if self._snapshot.state in ("unknown", "cold"):
+            self._snapshot = ModelWarmthSnapshot(
+                state="warming",
+                last_cold_start_ms=self._snapshot.last_cold_start_ms,
+                last_cold_start_at=self._snapshot.last_cold_start_at,
+            )
+        started_at = self._clock()
+        try:
+            await self._warm_up()
+        except Exception as exc:
+            logger.warning("Model warm-up request failed: %s", exc)
+            self._snapshot = ModelWarmthSnapshot(
+                state="cold",
+                last_cold_start_ms=self._snapshot.last_cold_start_ms,
+                last_cold_start_at=self._snapshot.last_cold_start_at,
+            )
+            self._last_activity = self._clock()
+            return False
+
+        finished_at = self._clock()
+        self._last_activity = finished_at
+        duration_seconds = finished_at - started_at
+        if duration_seconds >= self._cold_start_threshold_seconds:
+            logger.info(
+                "Model warm-up waited %.1fs for a cold model load.", duration_seconds
+            )
+            self._snapshot = ModelWarmthSnapshot(
+                state="warm",
+                last_cold_start_ms=round(duration_seconds * 1000),
+                last_cold_start_at=datetime.now(timezone.utc).isoformat(),
+            )
+        else:
+            self._snapshot = ModelWarmthSnapshot(
+                state="warm",
+                last_cold_start_ms=self._snapshot.last_cold_start_ms,
+                last_cold_start_at=self._snapshot.last_cold_start_at,
+            )
+        return True
@@ -0,0 +1,106 @@
+"""Benchmark Responses input construction over a long simulated session.
+
+Run from `packages/app-agent/server`:
+
+    uv run python -m benchmarks.prompt_builder_benchmark --turns 100
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from app.models import HistoryMessage, ProviderRequest, ToolCall
+from app.prompt_builder import (
+    build_prompt_ir,
+    build_responses_input,
+    clear_response_item_cache,
+)
+
+
+def build_session_history(turns: int) -> list[HistoryMessage]:
+    """Build a synthetic history with one tool round trip per user turn."""
+    history: list[HistoryMessage] = []
+    for turn in range(turns):
+        call_id = "call_" + str(turn)
+        history.extend(
+            [
+                HistoryMessage(
+                    id="u" + str(turn),
+                    role="user",
+                    text="Summarize attribute " + str(turn) + " by group.",
+                ),
+                HistoryMessage(
+                    id="a" + str(turn),
+                    role="assistant",
+                    text="I will summarize it.",
+                    tool_calls=[
+                        ToolCall(
+                            call_id=call_id,
+                            name="getAttributeSummary",
+                            arguments={
+                                "attribute": {"type": "SAMPLE_ATTRIBUTE"},
+                                "groups": ["g" + str(index) for index in range(20)],
+                            },
+                        )
+                    ],
+                ),
+                HistoryMessage(
+                    id="t" + str(turn),
+                    role="tool",
+                    text="Summarized attribute " + str(turn) + ".",
+                    tool_call_id=call_id,
+                    content={
+                        "kind": "attribute_summary",
+                        "groups": [
+                            {"group": "g" + str(index), "mean": index / 3}
+                            for index in range(40)
+                        ],
+                    },
+                ),
+                HistoryMessage(
+                    id="f" + str(turn),
+                    role="assistant",
+                    text="The groups differ mostly in the upper quartile.",
+                    phase="final_answer",
+                ),
+            ]
+        )
+    return history
+
+
+def run_session(history: list[HistoryMessage], turns: int, cached: bool) -> float:
+    """Build every turn's input once and return the total time in seconds."""
+    clear_response_item_cache()
+    messages_per_turn = len(history) // turns
+    started_at = time.perf_counter()
+    for turn in range(1, turns + 1):
+        if not cached:
+            clear_response_item_cache()
+        request = ProviderRequest(
+            system_prompt="system prompt",
+            context={"schemaVersion": 1},
+            history=history[: turn * messages_per_turn],
+            message="Next question",
+        )
+        build_responses_input(build_prompt_ir(request))
+    return time.perf_counter() - started_at
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    history = build_session_history(args.turns)
+    for label, cached in (("uncached", False), ("cached", True)):
+        best = min(run_session(history, args.turns, cached) for _ in range(args.repeat))
+        print(
+            f"{label}: {best * 1000:.1f} ms for {args.turns} turns "
+            f"({best * 1000 / args.turns:.2f} ms/turn)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Benchmark per-event stream decoding for each upstream dialect.
+
+Compares the generic decoder, which probes every known field shape, with the
+decoder specialized for the dialect detected from the first events.
+
+Run from `packages/app-agent/server`:
+
+    uv run python -m benchmarks.stream_decoder_benchmark --events 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Any, Callable
+
+from app.providers.streaming import (
+    STREAM_DECODERS,
+    StreamDecoder,
+    StreamDialect,
+    decode_generic_stream_event,
+)
+
+
+def build_responses_events(count: int) -> list[tuple[str, Any]]:
+    """Build a Responses stream as sent by OpenAI, vLLM, Ollama, or LM Studio."""
+    events: list[tuple[str, Any]] = [
+        (
+            "response.created",
+            {"type": "response.created", "response": {"id": "resp_1"}},
+        )
+    ]
+    events.extend(
+        (
+            "response.output_text.delta",
+            {
+                "type": "response.output_text.delta",
+                "item_id": "msg_1",
+                "output_index": 0,
+                "content_index": 0,
+                "delta": "token" + str(index % 10) + " ",
+                "sequence_number": index + 1,
+            },
+        )
+        for index in range(count)
+    )
+    events.append(
+        (
+            "response.completed",
+            {
+                "type": "response.completed",
+                "response": {
+                    "id": "resp_1",
+                    "usage": {"input_tokens": 1000, "output_tokens": count},
+                },
+            },
+        )
+    )
+    return events
+
+
+def build_chat_completions_events(count: int) -> list[tuple[str, Any]]:
+    """Build a Chat Completions chunk stream, as relayed by MLX or LM Studio."""
+    return [
+        (
+            "message",
+            {
+                "id": "chatcmpl-1",
+                "object": "chat.completion.chunk",
+                "created": 1,
+                "model": "local-model",
+                "choices": [
+                    {
+                        "index": 0,
+                        "delta": (
+                            {"reasoning_content": "thinking "}
+                            if index % 4 == 0
+                            else {"content": "token" + str(index % 10) + " "}
+                        ),
+                        "finish_reason": None,
+                    }
+                ],
+            },
+        )
+        for index in range(count)
+    ]
+
+
+DIALECT_EVENTS: dict[StreamDialect, Callable[[int], list[tuple[str, Any]]]] = {
+    "responses": build_responses_events,
+    "chat_completions": build_chat_completions_events,
+}
+
+
+def decode_all(decoder: StreamDecoder, events: list[tuple[str, Any]]) -> float:
+    """Decode every event once and return the elapsed time in seconds."""
+    started_at = time.perf_counter()
+    for event_name, payload in events:
+        decoder(event_name, payload)
+    return time.perf_counter() - started_at
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for dialect, build_events in DIALECT_EVENTS.items():
+        events = build_events(args.events)
+        for label, decoder in (
+            ("generic", decode_generic_stream_event),
+            ("specialized", STREAM_DECODERS[dialect]),
+        ):
+            best = min(decode_all(decoder, events) for _ in range(args.repeat))
+            print(
+                f"{dialect} {label}: {best * 1000:.1f} ms for {len(events)} events "
+                f"({best * 1e9 / len(events):.0f} ns/event)"
+            )
+
+
+if __name__ == "__main__":
+    main()
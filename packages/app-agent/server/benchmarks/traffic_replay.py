@@ -0,0 +1,81 @@
+"""Replay recorded relay traffic for load and regression testing.
+
+Record traffic by starting the relay with
+`GENOMESPY_AGENT_TRAFFIC_RECORD_PATH=traffic.jsonl`. Then serve the
+recording as the upstream, at the original or a scaled speed, and point a
+relay at it with `GENOMESPY_AGENT_BASE_URL=http://127.0.0.1:8001/v1`:
+
+    uv run python -m benchmarks.traffic_replay serve traffic.jsonl --speed 2
+
+Drive that relay with the recorded turns and report throughput and
+latency percentiles:
+
+    uv run python -m benchmarks.traffic_replay drive traffic.jsonl \\
+        --relay-url http://127.0.0.1:8000 --concurrency 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+
+import httpx
+import uvicorn
+
+from app.batch import BatchItemResult, summarize_batch
+from app.traffic_recorder import read_traffic_records
+from app.traffic_replay import build_mock_upstream, drive_relay, recorded_turns
+
+
+async def drive(args: argparse.Namespace) -> None:
+    """Send the recorded turns to the relay and print their results."""
+    turns = recorded_turns(read_traffic_records(Path(args.recording)))
+    results: list[BatchItemResult] = []
+    started_at = time.perf_counter()
+    async with httpx.AsyncClient(base_url=args.relay_url, timeout=None) as client:
+        async for result in drive_relay(
+            turns, client, concurrency=args.concurrency, stream=args.stream
+        ):
+            results.append(result)
+            print(
+                f"turn {result.index}: HTTP {result.status_code} "
+                f"in {result.duration_ms} ms"
+            )
+    summary = summarize_batch(results, round((time.perf_counter() - started_at) * 1000))
+    print(json.dumps(summary.to_json()["summary"]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="serve a mock upstream")
+    serve_parser.add_argument("recording")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8001)
+    serve_parser.add_argument("--speed", type=float, default=1.0)
+
+    drive_parser = commands.add_parser("drive", help="replay turns to a relay")
+    drive_parser.add_argument("recording")
+    drive_parser.add_argument("--relay-url", default="http://127.0.0.1:8000")
+    drive_parser.add_argument("--concurrency", type=int, default=4)
+    drive_parser.add_argument("--stream", action="store_true")
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        records = list(read_traffic_records(Path(args.recording)))
+        print(f"Serving {len(records)} recorded exchanges at {args.speed}x speed")
+        uvicorn.run(
+            build_mock_upstream(records, args.speed), host=args.host, port=args.port
+        )
+    else:
+        asyncio.run(drive(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""In-process stand-in for a stateful OpenAI-compatible Responses server."""
+
+import dataclasses
+import json
+from typing import Any
+
+import httpx
+
+from app.config import Settings
+from app.providers.openai_responses import OpenAIResponsesProvider
+
+
+def build_settings(**overrides: Any) -> Settings:
+    """Return provider test settings with `overrides` applied."""
+    settings = Settings(
+        model="test-model",
+        base_url="http://127.0.0.1:8000/v1",
+        api_key="placeholder",
+        timeout_seconds=10.0,
+        system_prompt="system prompt",
+        enable_streaming=True,
+        prefer_responses_role_compat=False,
+        enable_token_debug_logs=False,
+        enable_throughput_debug_logs=False,
+    )
+    return dataclasses.replace(settings, **overrides)
+
+
+def build_provider(**overrides: Any) -> OpenAIResponsesProvider:
+    """Return a provider for the stand-in with `overrides` applied."""
+    return OpenAIResponsesProvider(build_settings(**overrides))
+
+
+class ResponsesStandIn:
+    """Answer Responses API requests and keep stored conversations.
+
+    Each stored response holds the full item list of its conversation, so
+    requests with `previous_response_id` continue from it like a hosted
+    backend would. `model_inputs` holds the full item list the model saw for
+    each request. Every answer reports how many items the model saw, and
+    its usage counts ten input tokens per item, with the items continued
+    from a stored response counted as cached.
+    """
+
+    def __init__(self) -> None:
+        self.requests: list[dict[str, Any]] = []
+        self.model_inputs: list[list[Any]] = []
+        self._conversations: dict[str, list[Any]] = {}
+
+    def install(self, monkeypatch: Any) -> None:
+        """Route the provider's HTTP clients to this stand-in."""
+        real_async_client = httpx.AsyncClient
+        transport = httpx.MockTransport(self.handle)
+        monkeypatch.setattr(
+            httpx,
+            "AsyncClient",
+            lambda **kwargs: real_async_client(transport=transport, **kwargs),
+        )
+
+    def forget(self, response_id: str) -> None:
+        """Drop a stored response, as an expiring backend would."""
+        self._conversations.pop(response_id, None)
+
+    def build_output(self, items: list[Any]) -> list[dict[str, Any]]:
+        """Return the model output for the items the model saw."""
+        return [
+            {
+                "type": "message",
+                "role": "assistant",
+                "content": [{"type": "output_text", "text": "seen " + str(len(items))}],
+            }
+        ]
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        self.requests.append(payload)
+        previous_response_id = payload.get("previous_response_id")
+        if (
+            previous_response_id is not None
+            and previous_response_id not in self._conversations
+        ):
+            return httpx.Response(
+                400,
+                json={
+                    "error": {
+                        "message": "Previous response with id '"
+                        + previous_response_id
+                        + "' not found.",
+                        "param": "previous_response_id",
+                    }
+                },
+            )
+
+        items = [
+            *self._conversations.get(previous_response_id, []),
+            *payload["input"],
+        ]
+        self.model_inputs.append(items)
+        response_id = "resp_" + str(len(self.requests))
+        output = self.build_output(items)
+        usage = {
+            "input_tokens": 10 * len(items),
+            "input_tokens_details": {
+                "cached_tokens": 10 * (len(items) - len(payload["input"]))
+            },
+            "output_tokens": 2,
+        }
+        if payload.get("store"):
+            self._conversations[response_id] = [*items, *output]
+
+        if payload.get("stream"):
+            events = [
+                ("response.created", {"response": {"id": response_id}}),
+                ("response.output_text.delta", {"delta": "seen " + str(len(items))}),
+                (
+                    "response.completed",
+                    {"response": {"id": response_id, "usage": usage}},
+                ),
+            ]
+            return httpx.Response(
+                200,
+                headers={"content-type": "text/event-stream"},
+                content="".join(
+                    "event: " + name + "\ndata: " + json.dumps(data) + "\n\n"
+                    for name, data in events
+                ).encode("utf-8"),
+            )
+
+        return httpx.Response(
+            200, json={"id": response_id, "output": output, "usage": usage}
+        )
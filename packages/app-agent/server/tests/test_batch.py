@@ -0,0 +1,156 @@
+import asyncio
+import json
+
+import anyio
+import pytest
+from fastapi.testclient import TestClient
+
+from app.batch import (
+    BatchItemResult,
+    latency_percentile,
+    run_batch,
+    summarize_batch,
+)
+from app.jobs import JobFailedError
+from app.main import app, get_job_scheduler, get_provider, get_settings
+from app.models import ProviderResponse
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    # The relay runs on uvicorn's asyncio loop.
+    return "asyncio"
+
+
+class EchoProvider:
+    async def generate(self, request):  # type: ignore[no-untyped-def]
+        await anyio.sleep(0.05 if request.message == "slow" else 0.0)
+        return ProviderResponse(type="answer", message="Echo: " + request.message)
+
+
+def test_latency_percentile_uses_nearest_rank() -> None:
+    latencies = list(range(1, 101))
+
+    assert latency_percentile(latencies, 50) == 50
+    assert latency_percentile(latencies, 95) == 95
+    assert latency_percentile(latencies, 99) == 99
+    assert latency_percentile([7], 99) == 7
+    assert latency_percentile([], 50) is None
+
+
+def test_summarize_batch_counts_failures_and_throughput() -> None:
+    results = [
+        BatchItemResult(0, 200, 100, response={}),
+        BatchItemResult(1, 200, 300, response={}),
+        BatchItemResult(2, 502, 200, error="Provider request failed."),
+    ]
+
+    summary = summarize_batch(results, wall_ms=500)
+
+    assert (summary.completed, summary.failed) == (2, 1)
+    assert summary.turns_per_second == 4.0
+    assert (summary.p50_ms, summary.p95_ms, summary.p99_ms) == (200, 300, 300)
+
+
+@pytest.mark.anyio
+async def test_run_batch_bounds_concurrency_and_yields_in_completion_order() -> None:
+    running = 0
+    peak = 0
+
+    async def run_one(delay: float) -> dict[str, object]:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await anyio.sleep(delay)
+        running -= 1
+        if delay == 0:
+            raise JobFailedError("Rejected.", 409)
+        return {"delay": delay}
+
+    results = [
+        result
+        async for result in run_batch(
+            [0.06, 0.01, 0.0, 0.02],
+            run_one,
+            concurrency=2,
+            admission=asyncio.Semaphore(4),
+        )
+    ]
+
+    assert peak == 2
+    assert [result.index for result in results] == [1, 2, 3, 0]
+    assert (results[1].status_code, results[1].error) == (409, "Rejected.")
+    assert results[0].response == {"delay": 0.01}
+
+
+@pytest.mark.anyio
+async def test_run_batch_respects_shared_admission_slots() -> None:
+    admission = asyncio.Semaphore(1)
+    running = 0
+    peak = 0
+
+    async def run_one(item: int) -> dict[str, object]:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await anyio.sleep(0.01)
+        running -= 1
+        return {}
+
+    results = [
+        result
+        async for result in run_batch(
+            [1, 2, 3], run_one, concurrency=3, admission=admission
+        )
+    ]
+
+    assert len(results) == 3
+    assert peak == 1
+
+
+def test_agent_batch_streams_results_and_summary(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    monkeypatch.setenv("GENOMESPY_AGENT_MODEL", "test-model")
+    get_settings.cache_clear()
+    get_job_scheduler.cache_clear()
+    monkeypatch.setattr("app.main.get_provider", lambda: EchoProvider())
+
+    turn = {"history": [], "context": {"schemaVersion": 1}}
+    with TestClient(app) as client:
+        response = client.post(
+            "/v1/agent-batch",
+            json={
+                "requests": [
+                    {**turn, "message": "slow"},
+                    {**turn, "message": "fast"},
+                    {
+                        "message": "missing",
+                        "history": [],
+                        "sessionId": "batch-session",
+                        "contextHash": "unknown",
+                    },
+                ],
+                "concurrency": 3,
+            },
+        )
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert lines[-1]["summary"]["completed"] == 2
+    assert lines[-1]["summary"]["failed"] == 1
+    assert lines[-1]["summary"]["latencyMs"]["p99"] >= 50
+    results = {line["index"]: line for line in lines[:-1]}
+    assert [line["index"] for line in lines[:-1]][-1] == 0
+    assert results[0]["response"] == {"type": "answer", "message": "Echo: slow"}
+    assert results[2]["status"] == 409
+    assert results[2]["error"].startswith("Session components must be resent")
+
+    get_settings.cache_clear()
+    get_job_scheduler.cache_clear()
+    get_provider.cache_clear()
+
+
+def test_agent_batch_rejects_an_empty_batch() -> None:
+    response = TestClient(app).post("/v1/agent-batch", json={"requests": []})
+
+    assert response.status_code == 422
@@ -0,0 +1,152 @@
+import json
+from typing import AsyncGenerator, AsyncIterator
+
+import anyio
+import httpx
+import pytest
+from responses_stand_in import ResponsesStandIn, build_provider, build_settings
+
+import app.main as main_module
+from app.models import ProviderRequest, ProviderResponse, ProviderStreamEvent
+from app.providers.openai_responses import BaseProvider
+from app.throughput_debugger import CancellationTracker
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    # The relay runs on uvicorn's asyncio loop.
+    return "asyncio"
+
+
+class OpenStreamStandIn(ResponsesStandIn):
+    """Keep streams open after their first delta and record cancel requests."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.cancelled: list[str] = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/cancel"):
+            self.cancelled.append(request.url.path)
+            return httpx.Response(200, json={"status": "cancelled"})
+
+        self.requests.append(json.loads(request.content))
+
+        async def open_body() -> AsyncIterator[bytes]:
+            yield b'event: response.created\ndata: {"response": {"id": "resp_1"}}\n\n'
+            yield b'event: response.output_text.delta\ndata: {"delta": "Par"}\n\n'
+            await anyio.sleep(5)
+            yield b""
+
+        return httpx.Response(
+            200, headers={"content-type": "text/event-stream"}, content=open_body()
+        )
+
+
+class SlowProvider(BaseProvider):
+    """Answer after a delay, streaming one delta before the wait."""
+
+    def __init__(self, delay_seconds: float) -> None:
+        self.delay_seconds = delay_seconds
+        self.cancelled = False
+
+    async def generate(self, request: ProviderRequest) -> ProviderResponse:
+        try:
+            await anyio.sleep(self.delay_seconds)
+        except anyio.get_cancelled_exc_class():
+            self.cancelled = True
+            raise
+        return ProviderResponse(type="answer", message="Done.")
+
+    async def generate_stream(
+        self, request: ProviderRequest
+    ) -> AsyncGenerator[ProviderStreamEvent, None]:
+        yield ProviderStreamEvent(type="delta", delta="Partial answer")
+        yield ProviderStreamEvent(type="final", response=await self.generate(request))
+
+
+class DisconnectingRequest:
+    """Stand in for a request whose client leaves after a number of polls."""
+
+    def __init__(self, connected_polls: int) -> None:
+        self.connected_polls = connected_polls
+
+    async def is_disconnected(self) -> bool:
+        self.connected_polls -= 1
+        return self.connected_polls < 0
+
+
+def build_request() -> ProviderRequest:
+    return ProviderRequest(
+        system_prompt="system prompt",
+        context={"schemaVersion": 1},
+        history=[],
+        message="hello",
+    )
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("send_upstream_cancel", [True, False])
+async def test_closing_a_stream_cancels_the_upstream_response(
+    monkeypatch, send_upstream_cancel: bool
+) -> None:  # type: ignore[no-untyped-def]
+    server = OpenStreamStandIn()
+    server.install(monkeypatch)
+    provider = build_provider(send_upstream_cancel=send_upstream_cancel)
+
+    events = provider.generate_stream(build_request())
+    first = await anext(events)
+    with anyio.fail_after(1):
+        await events.aclose()
+
+    assert first.delta == "Par"
+    assert server.cancelled == (
+        ["/v1/responses/resp_1/cancel"] if send_upstream_cancel else []
+    )
+
+
+@pytest.mark.anyio
+async def test_disconnect_cancels_a_non_streaming_turn(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    provider = SlowProvider(delay_seconds=5)
+    monkeypatch.setattr("app.main.get_provider", lambda: provider)
+
+    with anyio.fail_after(1):
+        response = await main_module._generate_plan_until_disconnect(
+            build_request(), DisconnectingRequest(connected_polls=1)
+        )
+
+    assert response is None
+    assert provider.cancelled
+
+
+@pytest.mark.anyio
+async def test_connected_client_gets_the_non_streaming_response(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    monkeypatch.setattr("app.main.get_provider", lambda: SlowProvider(0.0))
+
+    with anyio.fail_after(1):
+        response = await main_module._generate_plan_until_disconnect(
+            build_request(), DisconnectingRequest(connected_polls=100)
+        )
+
+    assert response is not None
+    assert response.message == "Done."
+
+
+@pytest.mark.anyio
+async def test_abandoned_stream_is_counted_as_cancelled(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    tracker = CancellationTracker()
+    provider = SlowProvider(delay_seconds=5)
+    monkeypatch.setattr("app.main.get_provider", lambda: provider)
+    monkeypatch.setattr("app.main.cancellation_tracker", tracker)
+
+    stream = main_module._stream_plan(
+        build_request(),
+        build_settings(send_upstream_cancel=False),
+        estimated_input_tokens=None,
+    )
+    assert "start" in await anext(stream)
+    assert "Partial answer" in await anext(stream)
+    await stream.aclose()
+
+    summary = tracker.record_cancelled("", "test-model")
+    assert summary.cancelled_turns == 2
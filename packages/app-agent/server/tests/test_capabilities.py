@@ -0,0 +1,140 @@
+import json
+
+import httpx
+import pytest
+from responses_stand_in import ResponsesStandIn, build_provider
+
+from app.models import ProviderRequest
+from app.providers.capabilities import CapabilityCache, UpstreamCapabilities
+
+
+class StrictRoleStandIn(ResponsesStandIn):
+    """Reject developer messages and answer tool probes with function calls."""
+
+    def __init__(self, streaming: bool = True) -> None:
+        super().__init__()
+        self.streaming = streaming
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        if any(item.get("role") == "developer" for item in payload["input"]):
+            self.requests.append(payload)
+            return httpx.Response(
+                400, json={"error": {"message": "Unexpected message role."}}
+            )
+        if payload.get("stream") and not self.streaming:
+            self.requests.append(payload)
+            return httpx.Response(400, json={"error": {"message": "No streaming."}})
+        if payload.get("tools") and payload["tools"][0]["name"] == "capability_probe":
+            self.requests.append(payload)
+            return httpx.Response(
+                200,
+                json={
+                    "output": [
+                        {
+                            "type": "function_call",
+                            "call_id": "call_1",
+                            "name": "capability_probe",
+                            "arguments": "{}",
+                        }
+                    ]
+                },
+            )
+        return super().handle(request)
+
+
+def build_request() -> ProviderRequest:
+    return ProviderRequest(
+        system_prompt="system prompt",
+        context={"schemaVersion": 1},
+        history=[],
+        message="hello",
+    )
+
+
+def test_capability_cache_is_shared_through_its_file(tmp_path) -> None:  # type: ignore[no-untyped-def]
+    path = tmp_path / "capabilities.json"
+    capabilities = UpstreamCapabilities(
+        developer_role=False, streaming=True, stream_dialect="chat_completions"
+    )
+
+    CapabilityCache(path).put("http://a.test/v1/", "model-a", capabilities)
+
+    other_worker = CapabilityCache(path)
+    assert other_worker.get("http://a.test/v1", "model-a") == capabilities
+    assert other_worker.get("http://a.test/v1", "model-b") is None
+    assert list(json.loads(path.read_text())) == ["model-a@http://a.test/v1"]
+
+
+def test_capability_cache_ignores_an_unreadable_file(tmp_path) -> None:  # type: ignore[no-untyped-def]
+    path = tmp_path / "capabilities.json"
+    path.write_text("not json")
+
+    assert CapabilityCache(path).get("http://a.test/v1", "model-a") is None
+
+
+@pytest.mark.anyio
+async def test_probe_results_let_other_workers_skip_the_role_fallback(  # type: ignore[no-untyped-def]
+    monkeypatch, tmp_path
+) -> None:
+    server = StrictRoleStandIn()
+    server.install(monkeypatch)
+    cache_path = str(tmp_path / "capabilities.json")
+    first_worker = build_provider(
+        probe_upstream_capabilities=True, capability_cache_path=cache_path
+    )
+
+    await first_worker.generate(build_request())
+
+    # Role probe, role-compat retry, streaming probe, then the turn itself.
+    assert len(server.requests) == 4
+    assert server.requests[3]["input"] == [
+        {"role": "user", "content": [{"type": "input_text", "text": "hello"}]}
+    ]
+    assert CapabilityCache(tmp_path / "capabilities.json").get(
+        "http://127.0.0.1:8000/v1", "test-model"
+    ) == UpstreamCapabilities(
+        developer_role=False, streaming=True, stream_dialect="responses"
+    )
+
+    server.requests.clear()
+    second_worker = build_provider(
+        probe_upstream_capabilities=True, capability_cache_path=cache_path
+    )
+    await second_worker.generate(build_request())
+
+    assert len(server.requests) == 1
+    assert all(item["role"] != "developer" for item in server.requests[0]["input"])
+
+
+@pytest.mark.anyio
+async def test_role_fallback_learned_from_a_turn_is_persisted(  # type: ignore[no-untyped-def]
+    monkeypatch, tmp_path
+) -> None:
+    server = StrictRoleStandIn()
+    server.install(monkeypatch)
+    cache_path = str(tmp_path / "capabilities.json")
+
+    await build_provider(capability_cache_path=cache_path).generate(build_request())
+    restarted = build_provider(capability_cache_path=cache_path)
+    server.requests.clear()
+    await restarted.generate(build_request())
+
+    assert len(server.requests) == 1
+    assert CapabilityCache(tmp_path / "capabilities.json").get(
+        "http://127.0.0.1:8000/v1", "test-model"
+    ) == UpstreamCapabilities(developer_role=False)
+
+
+@pytest.mark.anyio
+async def test_stream_falls_back_to_one_request_without_streaming_support(  # type: ignore[no-untyped-def]
+    monkeypatch,
+) -> None:
+    server = StrictRoleStandIn(streaming=False)
+    server.install(monkeypatch)
+    provider = build_provider(probe_upstream_capabilities=True)
+
+    events = [event async for event in provider.generate_stream(build_request())]
+
+    assert [event.type for event in events] == ["final"]
+    assert "stream" not in server.requests[-1]
@@ -0,0 +1,52 @@
+import gzip
+
+import pytest
+
+from app.compression import (
+    BodyCompressionRecord,
+    BodyDecodingError,
+    compress_body,
+    decompress_body,
+    format_body_compression_record,
+)
+
+
+def test_compress_body_round_trips_gzip() -> None:
+    body = b'{"context":"' + b"track " * 1000 + b'"}'
+
+    compressed = compress_body(body, "gzip")
+
+    assert len(compressed) < len(body)
+    assert decompress_body(compressed, "gzip") == body
+
+
+def test_decompress_body_rejects_oversized_bodies() -> None:
+    with pytest.raises(BodyDecodingError) as exc_info:
+        decompress_body(gzip.compress(b"x" * 1000), "gzip", max_bytes=100)
+
+    assert exc_info.value.status_code == 413
+
+
+def test_decompress_body_rejects_corrupt_and_truncated_bodies() -> None:
+    compressed = gzip.compress(b"x" * 1000)
+
+    with pytest.raises(BodyDecodingError) as corrupt:
+        decompress_body(b"not gzip", "gzip")
+    with pytest.raises(BodyDecodingError) as truncated:
+        decompress_body(compressed[:-8], "gzip")
+
+    assert corrupt.value.status_code == 400
+    assert truncated.value.status_code == 400
+
+
+def test_format_body_compression_record_reports_ratio() -> None:
+    record = BodyCompressionRecord(
+        direction="upstream request",
+        encoding="gzip",
+        wire_bytes=250,
+        decoded_bytes=1000,
+    )
+
+    assert format_body_compression_record(record) == (
+        "Agent body size: upstream request gzip 250 -> 1000 bytes (ratio 4.00)"
+    )
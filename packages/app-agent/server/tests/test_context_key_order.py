@@ -0,0 +1,41 @@
+from app.context_key_order import ContextKeyOrderLearner
+
+
+def build_context(turn: int) -> dict[str, object]:
+    return {
+        "schemaVersion": 1,
+        "viewRoot": {"title": "Overview", "visible": turn < 2},
+        "provenance": [{"step": turn}],
+        "lifecycle": {"ready": True},
+    }
+
+
+def test_learner_freezes_an_order_with_churning_keys_last() -> None:
+    learner = ContextKeyOrderLearner(warmup_turns=3)
+
+    orders = [learner.order_for("session-1", build_context(turn)) for turn in range(5)]
+
+    assert orders[:3] == [None, None, None]
+    assert orders[3] == ("lifecycle", "schemaVersion", "viewRoot", "provenance")
+    assert orders[4] == orders[3]
+
+
+def test_learner_keeps_the_frozen_order_when_churn_shifts() -> None:
+    learner = ContextKeyOrderLearner(warmup_turns=1)
+    learner.order_for("session-1", build_context(0))
+    frozen = learner.order_for("session-1", build_context(1))
+
+    for turn in range(2, 6):
+        context = build_context(1)
+        context["lifecycle"] = {"ready": turn % 2 == 0}
+        assert learner.order_for("session-1", context) == frozen
+
+
+def test_learner_tracks_sessions_independently() -> None:
+    learner = ContextKeyOrderLearner(warmup_turns=1, max_sessions=2)
+    learner.order_for("session-1", build_context(0))
+    learner.order_for("session-2", build_context(0))
+    learner.order_for("session-3", build_context(0))
+
+    assert learner.order_for("session-1", build_context(1)) is None
+    assert learner.order_for("session-3", build_context(1)) is not None
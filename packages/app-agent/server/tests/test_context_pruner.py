@@ -0,0 +1,96 @@
+from app.context_pruner import (
+    ContextPruningPolicy,
+    format_context_pruning_report,
+    prune_context_to_budget,
+)
+from app.models import ProviderRequest
+from app.token_debugger import summarize_prompt_tokens
+
+
+def build_deep_view(depth: int, width: int) -> dict[str, object]:
+    if depth == 0:
+        return {"title": "Leaf track", "mark": "rect"}
+
+    return {
+        "title": "Level " + str(depth),
+        "children": [build_deep_view(depth - 1, width) for _ in range(width)],
+    }
+
+
+def build_request() -> ProviderRequest:
+    return ProviderRequest(
+        system_prompt="system prompt",
+        context={
+            "schemaVersion": 1,
+            "searchableViews": [{"view": "track" + str(i)} for i in range(50)],
+            "viewRoot": build_deep_view(5, 3),
+        },
+        history=[],
+        message="What is shown?",
+    )
+
+
+def test_prune_context_to_budget_leaves_small_prompts_untouched() -> None:
+    request = build_request()
+    summary = summarize_prompt_tokens(request, "gpt-4.1-mini")
+
+    pruned_request, report = prune_context_to_budget(
+        request, summary, ContextPruningPolicy(token_budget=summary.total)
+    )
+
+    assert pruned_request is request
+    assert report.decisions == []
+
+
+def test_prune_context_to_budget_follows_priority_order() -> None:
+    request = build_request()
+    summary = summarize_prompt_tokens(request, "gpt-4.1-mini")
+    budget = summary.total - summary.context_by_key["searchableViews"] + 50
+
+    pruned_request, report = prune_context_to_budget(
+        request, summary, ContextPruningPolicy(token_budget=budget)
+    )
+
+    assert [decision.key for decision in report.decisions] == ["searchableViews"]
+    assert report.decisions[-1].action == "dropped"
+    assert "searchableViews" not in pruned_request.context
+    assert pruned_request.context["viewRoot"] == request.context["viewRoot"]
+    assert "searchableViews" in request.context
+    assert report.total_after <= budget
+    assert summarize_prompt_tokens(pruned_request, "gpt-4.1-mini").total <= budget
+
+
+def test_prune_context_to_budget_limits_depth_before_dropping() -> None:
+    request = build_request()
+    summary = summarize_prompt_tokens(request, "gpt-4.1-mini")
+
+    pruned_request, report = prune_context_to_budget(
+        request,
+        summary,
+        ContextPruningPolicy(
+            token_budget=summary.total - summary.context_by_key["viewRoot"] // 2,
+            prune_order=("viewRoot",),
+            depth_limits=(3,),
+        ),
+    )
+
+    assert report.decisions[0].action == "depth_limited"
+    assert report.decisions[0].depth == 3
+    assert pruned_request.context["viewRoot"]["title"] == "Level 5"
+    assert "schemaVersion" in pruned_request.context
+
+
+def test_format_context_pruning_report_lists_decisions() -> None:
+    request = build_request()
+    summary = summarize_prompt_tokens(request, "gpt-4.1-mini")
+
+    _, report = prune_context_to_budget(
+        request, summary, ContextPruningPolicy(token_budget=1)
+    )
+    formatted = format_context_pruning_report(report)
+
+    assert "Agent context pruning:" in formatted
+    assert "  budget: 1" in formatted
+    assert "    searchableViews: dropped (" in formatted
+    assert "    viewRoot: depth limited to 4 (" in formatted
+    assert "  still over budget after pruning" in formatted
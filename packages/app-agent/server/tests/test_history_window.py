@@ -0,0 +1,149 @@
+from app.history_window import OMITTED_HISTORY_HEADER, apply_history_window
+from app.models import HistoryMessage, HistoryWindowPolicy, ProviderRequest, ToolCall
+from app.prompt_builder import build_prompt_ir, build_responses_input
+
+
+def build_long_history(turn_count: int) -> list[HistoryMessage]:
+    history: list[HistoryMessage] = []
+    for turn in range(turn_count):
+        history.append(
+            HistoryMessage(id=f"u{turn}", role="user", text=f"Question {turn} " * 20)
+        )
+        history.append(
+            HistoryMessage(id=f"a{turn}", role="assistant", text=f"Answer {turn} " * 20)
+        )
+    return history
+
+
+def test_apply_history_window_keeps_everything_without_policy() -> None:
+    history = build_long_history(10)
+
+    window = apply_history_window(history, None)
+
+    assert window.kept == history
+    assert window.dropped == []
+    assert window.placeholder_text is None
+
+
+def test_apply_history_window_drops_oldest_turns_over_budget() -> None:
+    history = build_long_history(10)
+
+    window = apply_history_window(
+        history, HistoryWindowPolicy(token_budget=200, keep_recent_turns=2)
+    )
+
+    assert [message.id for message in window.kept][:2] != ["u0", "a0"]
+    assert window.kept[-2:] == history[-2:]
+    assert window.kept == history[len(history) - len(window.kept) :]
+    assert len(window.dropped) == len(history) - len(window.kept)
+    assert window.dropped_turns == len(window.dropped) // 2
+    assert window.dropped_tokens > 0
+    assert window.placeholder_text is not None
+    assert window.placeholder_text.startswith(OMITTED_HISTORY_HEADER)
+
+
+def test_apply_history_window_always_keeps_recent_turns() -> None:
+    history = build_long_history(5)
+
+    window = apply_history_window(
+        history, HistoryWindowPolicy(token_budget=1, keep_recent_turns=3)
+    )
+
+    assert window.kept == history[-6:]
+    assert window.dropped_turns == 2
+
+
+def test_apply_history_window_keeps_tool_pairs_together() -> None:
+    history = [
+        HistoryMessage(id="u0", role="user", text="Inspect the view. " * 40),
+        HistoryMessage(
+            id="a0",
+            role="assistant",
+            text="",
+            tool_calls=[
+                ToolCall(call_id="call_docs", name="getIntentActionDocs", arguments={})
+            ],
+        ),
+        HistoryMessage(
+            id="t0",
+            role="tool",
+            text="Read docs. " * 40,
+            tool_call_id="call_docs",
+        ),
+        HistoryMessage(id="u1", role="user", text="Group by diagnosis."),
+        HistoryMessage(
+            id="a1",
+            role="assistant",
+            text="",
+            tool_calls=[
+                ToolCall(call_id="call_group", name="submitIntentAction", arguments={})
+            ],
+        ),
+        HistoryMessage(
+            id="t1",
+            role="tool",
+            text="Tool call was incorrect and rejected.",
+            tool_call_id="call_group",
+            rejected=True,
+        ),
+    ]
+
+    window = apply_history_window(
+        history, HistoryWindowPolicy(token_budget=10, keep_recent_turns=1)
+    )
+
+    # The latest successful tool output decides the volatile context position,
+    # so it stays pinned together with the call that produced it.
+    assert [message.id for message in window.kept] == [
+        "a0",
+        "t0",
+        "u1",
+        "a1",
+        "t1",
+    ]
+    assert [message.id for message in window.dropped] == ["u0"]
+
+
+def test_apply_history_window_pins_unresolved_tool_calls() -> None:
+    history = [
+        HistoryMessage(
+            id="a0",
+            role="assistant",
+            text="Working on it. " * 40,
+            tool_calls=[
+                ToolCall(call_id="call_open", name="expandViewNode", arguments={})
+            ],
+        ),
+        *build_long_history(3),
+    ]
+
+    window = apply_history_window(
+        history, HistoryWindowPolicy(token_budget=1, keep_recent_turns=1)
+    )
+
+    assert window.kept[0].id == "a0"
+    assert window.kept[1:] == history[-2:]
+
+
+def test_build_responses_input_places_history_placeholder_after_context() -> None:
+    request = ProviderRequest(
+        system_prompt="system prompt",
+        context={"schemaVersion": 1},
+        volatile_context={"provenance": []},
+        history=build_long_history(6),
+        message="Follow-up question",
+        history_window=HistoryWindowPolicy(token_budget=1, keep_recent_turns=1),
+    )
+
+    prompt = build_prompt_ir(request)
+    messages = build_responses_input(prompt)
+
+    assert len(prompt.history) == 2
+    assert len(prompt.dropped_history) == 10
+    assert messages[1]["role"] == "developer"
+    assert messages[1]["content"][0]["text"].startswith(OMITTED_HISTORY_HEADER)
+    assert messages[2]["id"] == "msg_u5"
+    assert messages[4]["content"][0]["text"].startswith(
+        "Current volatile GenomeSpy state:\n"
+    )
+    assert messages[5]["content"][0]["text"] == "Follow-up question"
@@ -0,0 +1,231 @@
+import time
+
+import anyio
+import pytest
+from fastapi.testclient import TestClient
+
+from app.jobs import (
+    AgentJob,
+    InMemoryJobStore,
+    JobFailedError,
+    JobScheduler,
+    SqliteJobStore,
+)
+from app.main import app, get_job_scheduler, get_provider, get_settings
+from app.models import ProviderResponse
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    # The relay runs on uvicorn's asyncio loop.
+    return "asyncio"
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class SlowProvider:
+    async def generate(self, request):  # type: ignore[no-untyped-def]
+        await anyio.sleep(0.05)
+        return ProviderResponse(type="answer", message="Jobs work.")
+
+
+def test_in_memory_job_store_expires_finished_jobs() -> None:
+    clock = FakeClock()
+    store = InMemoryJobStore(ttl_seconds=60, clock=clock)
+    store.put(AgentJob(job_id="running", state="running", submitted_at=clock.now))
+    store.put(
+        AgentJob(
+            job_id="done",
+            state="succeeded",
+            submitted_at=clock.now,
+            finished_at=clock.now,
+        )
+    )
+
+    clock.now += 61
+
+    assert store.get("done") is None
+    assert store.get("running") is not None
+
+
+def test_sqlite_job_store_round_trips_jobs(tmp_path) -> None:  # type: ignore[no-untyped-def]
+    clock = FakeClock()
+    path = tmp_path / "jobs.sqlite3"
+    job = AgentJob(
+        job_id="job-1",
+        state="succeeded",
+        submitted_at=clock.now,
+        started_at=clock.now + 1,
+        finished_at=clock.now + 3,
+        result={"type": "answer", "message": "Stored."},
+    )
+    SqliteJobStore(path, ttl_seconds=60, clock=clock).put(job)
+
+    reopened = SqliteJobStore(path, ttl_seconds=60, clock=clock)
+    assert reopened.get("job-1") == job
+    assert job.queued_ms == 1000
+    assert job.run_ms == 2000
+    clock.now += 120
+    assert reopened.get("job-1") is None
+
+
+@pytest.mark.anyio
+async def test_job_scheduler_bounds_concurrency_and_records_outcomes() -> None:
+    scheduler = JobScheduler(InMemoryJobStore(), max_concurrency=1)
+    running = 0
+    peak = 0
+
+    async def succeed() -> dict[str, object]:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await anyio.sleep(0.02)
+        running -= 1
+        return {"type": "answer", "message": "Done."}
+
+    async def fail() -> dict[str, object]:
+        raise JobFailedError("Provider request failed.", 502)
+
+    first = scheduler.submit(succeed)
+    second = scheduler.submit(succeed)
+    failed = scheduler.submit(fail)
+    with anyio.fail_after(1):
+        while not all(
+            job.finished
+            for job in (
+                scheduler.get(first.job_id),
+                scheduler.get(second.job_id),
+                scheduler.get(failed.job_id),
+            )
+            if job is not None
+        ):
+            await anyio.sleep(0.01)
+
+    second_job = scheduler.get(second.job_id)
+    failed_job = scheduler.get(failed.job_id)
+    assert peak == 1
+    assert second_job is not None and second_job.state == "succeeded"
+    assert second_job.queued_ms is not None and second_job.queued_ms >= 15
+    assert failed_job is not None
+    assert (failed_job.error, failed_job.error_status) == (
+        "Provider request failed.",
+        502,
+    )
+
+
+def test_unfinished_job_from_another_process_is_reported_failed() -> None:
+    store = InMemoryJobStore()
+    store.put(AgentJob(job_id="orphan", state="running", submitted_at=time.time()))
+
+    job = JobScheduler(store, max_concurrency=1).get("orphan")
+
+    assert job is not None
+    assert job.state == "failed"
+    assert job.error_status == 503
+
+
+def test_job_of_another_live_worker_is_reported_by_its_lease() -> None:
+    clock = FakeClock()
+    store = InMemoryJobStore(clock=clock)
+    store.put(
+        AgentJob(
+            job_id="elsewhere",
+            state="running",
+            submitted_at=clock.now,
+            owner="other-host:1234",
+            heartbeat_at=clock.now,
+        )
+    )
+    scheduler = JobScheduler(store, max_concurrency=1, clock=clock, lease_seconds=30)
+
+    running = scheduler.get("elsewhere")
+    store.renew(["elsewhere"], clock.now + 20)
+    clock.now += 45
+    renewed = scheduler.get("elsewhere")
+    clock.now += 10
+    stale = scheduler.get("elsewhere")
+
+    assert running is not None and running.state == "running"
+    assert renewed is not None and renewed.state == "running"
+    assert stale is not None and stale.state == "failed"
+    assert stale.error is not None and "other-host:1234" in stale.error
+    assert scheduler.changed("elsewhere") is None
+
+
+@pytest.mark.parametrize("persistent", [False, True])
+def test_job_stores_evict_only_finished_jobs(tmp_path, persistent: bool) -> None:  # type: ignore[no-untyped-def]
+    clock = FakeClock()
+    store = (
+        SqliteJobStore(tmp_path / "jobs.sqlite3", max_entries=2, clock=clock)
+        if persistent
+        else InMemoryJobStore(max_entries=2, clock=clock)
+    )
+    store.put(AgentJob(job_id="queued", state="queued", submitted_at=clock.now))
+    store.put(AgentJob(job_id="running", state="running", submitted_at=clock.now + 1))
+    store.put(
+        AgentJob(
+            job_id="done",
+            state="succeeded",
+            submitted_at=clock.now + 2,
+            finished_at=clock.now + 3,
+        )
+    )
+    store.put(AgentJob(job_id="new", state="queued", submitted_at=clock.now + 4))
+
+    assert store.get("queued") is not None
+    assert store.get("running") is not None
+    assert store.get("new") is not None
+    assert store.get("done") is None
+
+
+@pytest.mark.anyio
+async def test_job_scheduler_forgets_change_events_of_finished_jobs() -> None:
+    scheduler = JobScheduler(InMemoryJobStore(), max_concurrency=1)
+
+    async def succeed() -> dict[str, object]:
+        return {"type": "answer", "message": "Done."}
+
+    job = scheduler.submit(succeed)
+    assert scheduler.changed(job.job_id) is not None
+    with anyio.fail_after(1):
+        while job.job_id in scheduler._tasks:
+            await anyio.sleep(0.01)
+
+    assert scheduler.changed(job.job_id) is None
+    assert scheduler._changed == {}
+
+
+def test_agent_job_endpoints_poll_and_subscribe(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    monkeypatch.setenv("GENOMESPY_AGENT_MODEL", "test-model")
+    get_settings.cache_clear()
+    get_job_scheduler.cache_clear()
+    monkeypatch.setattr("app.main.get_provider", lambda: SlowProvider())
+
+    with TestClient(app) as client:
+        submitted = client.post(
+            "/v1/agent-jobs",
+            json={"message": "Hi", "history": [], "context": {"schemaVersion": 1}},
+        )
+        job_id = submitted.json()["jobId"]
+        events = client.get("/v1/agent-jobs/" + job_id + "/events")
+        polled = client.get("/v1/agent-jobs/" + job_id)
+        unknown = client.get("/v1/agent-jobs/unknown")
+
+    assert submitted.status_code == 202
+    assert submitted.json()["state"] == "queued"
+    assert "event: state" in events.text
+    assert "event: final" in events.text
+    assert polled.json()["state"] == "succeeded"
+    assert polled.json()["result"] == {"type": "answer", "message": "Jobs work."}
+    assert polled.json()["runMs"] >= 0
+    assert unknown.status_code == 404
+
+    get_settings.cache_clear()
+    get_job_scheduler.cache_clear()
+    get_provider.cache_clear()
@@ -1,14 +1,28 @@
+import asyncio
+import gzip
+import json
+
+import anyio
 from _pytest.logging import LogCaptureFixture
 from fastapi.testclient import TestClient
 
 from app.config import load_default_system_prompt
 from app.main import (
     app,
+    get_prefix_stability_analyzer,
     get_provider,
+    get_session_store,
     get_settings,
+    get_warmth_manager,
+)
+from app.models import (
+    ProviderPrewarmResult,
+    ProviderResponse,
+    ProviderStreamEvent,
+    ToolCall,
 )
-from app.models import ProviderResponse, ProviderStreamEvent, ToolCall
 from app.providers.openai_responses import OpenAIResponsesProvider
+from app.providers.timeouts import ProviderTimeoutError
 
 
 class StubProvider:
@@ -164,6 +178,44 @@ def test_agent_turn_endpoint_logs_token_summary(
     assert "%" in caplog.text
 
 
+def test_agent_turn_endpoint_logs_prefix_stability(
+    caplog: LogCaptureFixture, monkeypatch
+) -> None:
+    monkeypatch.setenv("GENOMESPY_AGENT_MODEL", "test-model")
+    monkeypatch.setenv("GENOMESPY_AGENT_ENABLE_PREFIX_DEBUG_LOGS", "true")
+    reset_settings_cache()
+    get_prefix_stability_analyzer.cache_clear()
+    monkeypatch.setattr("app.main.get_provider", lambda: StubProvider())
+    client = TestClient(app)
+
+    with caplog.at_level("INFO", logger="uvicorn.error"):
+        for title in ["Example", "Renamed"]:
+            response = client.post(
+                "/v1/agent-turn",
+                json={
+                    "sessionId": "prefix-session",
+                    "message": "How are methylation levels encoded?",
+                    "history": [
+                        {
+                            "id": "msg_001",
+                            "role": "user",
+                            "text": "What is in this visualization?",
+                        }
+                    ],
+                    "context": {
+                        "schemaVersion": 1,
+                        "viewRoot": {"title": title},
+                    },
+                },
+            )
+            assert response.status_code == 200
+
+    get_prefix_stability_analyzer.cache_clear()
+    assert caplog.text.count("Agent prompt prefix stability:") == 1
+    assert "in context (prefix invalidated)" in caplog.text
+    assert "  changed context keys: viewRoot.title" in caplog.text
+
+
 def test_agent_turn_endpoint_logs_estimated_throughput(
     caplog: LogCaptureFixture, monkeypatch
 ) -> None:
@@ -392,3 +444,288 @@ def test_default_system_prompt_is_markdown_text() -> None:
     assert "getIntentActionDocs" in prompt
     assert "getIntentActionTypeDocs" in prompt
     assert "includeSchema" not in prompt
+
+
+def test_agent_turn_endpoint_logs_context_pruning(
+    caplog: LogCaptureFixture, monkeypatch
+) -> None:
+    monkeypatch.setenv("GENOMESPY_AGENT_MODEL", "test-model")
+    monkeypatch.setenv("GENOMESPY_AGENT_PROMPT_TOKEN_BUDGETS", "test-model=20,*=999999")
+    reset_settings_cache()
+    monkeypatch.setattr("app.main.get_provider", lambda: StubProvider())
+    client = TestClient(app)
+
+    with caplog.at_level("INFO", logger="uvicorn.error"):
+        response = client.post(
+            "/v1/agent-turn",
+            json={
+                "message": "How are methylation levels encoded?",
+                "history": [
+                    {
+                        "id": "msg_001",
+                        "role": "user",
+                        "text": "What is in this visualization?",
+                    }
+                ],
+                "context": {
+                    "schemaVersion": 1,
+                    "viewRoot": {"title": "Example " * 50},
+                },
+            },
+        )
+
+    assert response.status_code == 200
+    assert "Agent context pruning:" in caplog.text
+    assert "    viewRoot: dropped (" in caplog.text
+    assert "    viewRoot = " not in caplog.text
+
+
+def test_agent_turn_endpoint_accepts_gzip_request_body(
+    caplog: LogCaptureFixture, monkeypatch
+) -> None:
+    monkeypatch.setenv("GENOMESPY_AGENT_MODEL", "test-model")
+    reset_settings_cache()
+    monkeypatch.setattr("app.main.get_provider", lambda: StubProvider())
+    client = TestClient(app)
+    body = json.dumps(
+        {
+            "message": "How are methylation levels encoded?",
+            "history": [
+                {
+                    "id": "msg_001",
+                    "role": "user",
+                    "text": "What is in this visualization?",
+                }
+            ],
+            "context": {"schemaVersion": 1, "padding": "track " * 500},
+        }
+    ).encode("utf-8")
+
+    with caplog.at_level("INFO", logger="uvicorn.error"):
+        response = client.post(
+            "/v1/agent-turn",
+            content=gzip.compress(body),
+            headers={"content-type": "application/json", "content-encoding": "gzip"},
+        )
+
+    assert response.status_code == 200
+    assert response.json()["message"] == "The beta-value track encodes it."
+    assert "Agent body size: browser request gzip " in caplog.text
+    assert "-> " + str(len(body)) + " bytes" in caplog.text
+
+
+def test_agent_turn_endpoint_rejects_unsupported_request_encoding(
+    monkeypatch,
+) -> None:
+    monkeypatch.setenv("GENOMESPY_AGENT_MODEL", "test-model")
+    reset_settings_cache()
+    monkeypatch.setattr("app.main.get_provider", lambda: StubProvider())
+    client = TestClient(app)
+
+    response = client.post(
+        "/v1/agent-turn",
+        content=b"not compressed",
+        headers={"content-type": "application/json", "content-encoding": "br"},
+    )
+
+    assert response.status_code == 415
+    assert "Unsupported Content-Encoding: br" in response.json()["detail"]
+
+
+def test_agent_turn_endpoint_compresses_large_json_responses(monkeypatch) -> None:
+    class LongAnswerProvider:
+        async def generate(self, request):  # type: ignore[no-untyped-def]
+            return ProviderResponse(type="answer", message="methylation " * 500)
+
+    monkeypatch.setenv("GENOMESPY_AGENT_MODEL", "test-model")
+    reset_settings_cache()
+    monkeypatch.setattr("app.main.get_provider", lambda: LongAnswerProvider())
+    client = TestClient(app)
+
+    response = client.post(
+        "/v1/agent-turn",
+        json={"message": "Explain", "history": [], "context": {"schemaVersion": 1}},
+        headers={"accept-encoding": "gzip"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json()["message"].startswith("methylation")
+
+
+def test_agent_turn_endpoint_resolves_session_deltas(monkeypatch) -> None:
+    observed_requests = []
+
+    class RecordingProvider:
+        async def generate(self, request):  # type: ignore[no-untyped-def]
+            observed_requests.append(request)
+            return ProviderResponse(type="answer", message="ok")
+
+    monkeypatch.setenv("GENOMESPY_AGENT_MODEL", "test-model")
+    reset_settings_cache()
+    get_session_store.cache_clear()
+    monkeypatch.setattr("app.main.get_provider", lambda: RecordingProvider())
+    client = TestClient(app)
+
+    first = client.post(
+        "/v1/agent-turn",
+        json={
+            "sessionId": "session-1",
+            "message": "First",
+            "history": [{"id": "u1", "role": "user", "text": "Hello"}],
+            "context": {"schemaVersion": 1, "viewRoot": {"title": "Example"}},
+        },
+    )
+    second = client.post(
+        "/v1/agent-turn",
+        json={
+            "sessionId": "session-1",
+            "message": "Second",
+            "history": [{"id": "a1", "role": "assistant", "text": "ok"}],
+            "contextHash": first.headers["x-genomespy-context-hash"],
+            "toolsHash": first.headers["x-genomespy-tools-hash"],
+            "historyBaseHash": first.headers["x-genomespy-history-hash"],
+        },
+    )
+    stale = client.post(
+        "/v1/agent-turn",
+        json={
+            "sessionId": "session-2",
+            "message": "Third",
+            "contextHash": first.headers["x-genomespy-context-hash"],
+        },
+    )
+    get_session_store.cache_clear()
+
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert observed_requests[1].context == observed_requests[0].context
+    assert [message.id for message in observed_requests[1].history] == ["u1", "a1"]
+    assert stale.status_code == 409
+    assert stale.json()["detail"]["missing"] == ["context"]
+
+
+def test_agent_prewarm_endpoint_is_disabled_by_default(monkeypatch) -> None:
+    monkeypatch.setenv("GENOMESPY_AGENT_MODEL", "test-model")
+    reset_settings_cache()
+    client = TestClient(app)
+
+    response = client.post(
+        "/v1/agent-prewarm",
+        json={"message": "", "context": {"schemaVersion": 1}},
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "disabled"}
+
+
+def test_agent_prewarm_endpoint_warms_the_session_prefix(monkeypatch) -> None:
+    observed_requests = []
+
+    class PrewarmingProvider:
+        async def prewarm(self, request):  # type: ignore[no-untyped-def]
+            observed_requests.append(request)
+            return ProviderPrewarmResult(
+                status="warmed", prefix_hash="abc", duration_ms=12
+            )
+
+    monkeypatch.setenv("GENOMESPY_AGENT_MODEL", "test-model")
+    monkeypatch.setenv("GENOMESPY_AGENT_ENABLE_PREWARM", "true")
+    reset_settings_cache()
+    get_session_store.cache_clear()
+    monkeypatch.setattr("app.main.get_provider", lambda: PrewarmingProvider())
+    client = TestClient(app)
+
+    response = client.post(
+        "/v1/agent-prewarm",
+        json={
+            "sessionId": "session-1",
+            "message": "",
+            "context": {"schemaVersion": 1},
+        },
+    )
+    get_session_store.cache_clear()
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "status": "warmed",
+        "prefixHash": "abc",
+        "durationMs": 12,
+    }
+    assert "x-genomespy-context-hash" in response.headers
+    assert observed_requests[0].context == {"schemaVersion": 1}
+
+
+def test_server_info_reports_model_warmth(monkeypatch) -> None:
+    warm_up_messages = []
+
+    class WarmingProvider:
+        async def warm_up(self, message):  # type: ignore[no-untyped-def]
+            warm_up_messages.append(message)
+
+    monkeypatch.setenv("GENOMESPY_AGENT_MODEL", "test-model")
+    monkeypatch.setenv("GENOMESPY_AGENT_WARMUP_MESSAGE", "Hi")
+    reset_settings_cache()
+    get_warmth_manager.cache_clear()
+    monkeypatch.setattr("app.main.get_provider", lambda: WarmingProvider())
+    client = TestClient(app)
+
+    try:
+        cold = client.get("/v1/server-info").json()
+        asyncio.run(get_warmth_manager().warm_up())
+        warm = client.get("/v1/server-info").json()
+    finally:
+        get_warmth_manager.cache_clear()
+
+    assert cold["modelState"] == "unknown"
+    assert warm["modelState"] == "warm"
+    assert warm["lastColdStartMs"] is None
+    assert warm_up_messages == ["Hi"]
+
+
+def test_agent_turn_stream_reports_a_stall_after_partial_output(monkeypatch) -> None:
+    class StallingProvider:
+        async def generate_stream(self, request):  # type: ignore[no-untyped-def]
+            yield ProviderStreamEvent(type="delta", delta="The beta-value")
+            raise ProviderTimeoutError("idle", 5.0)
+
+    monkeypatch.setenv("GENOMESPY_AGENT_MODEL", "test-model")
+    reset_settings_cache()
+    monkeypatch.setattr("app.main.get_provider", lambda: StallingProvider())
+    client = TestClient(app)
+
+    response = client.post(
+        "/v1/agent-turn?stream=true",
+        json={"message": "Hi", "history": [], "context": {"schemaVersion": 1}},
+    )
+
+    assert "event: delta" in response.text
+    assert "event: error" not in response.text
+    stalled = response.text.split("event: stalled\ndata: ")[1]
+    assert json.loads(stalled)["trace"]["timeouts"] == ["idle"]
+
+
+def test_agent_turn_stream_coalesces_deltas_on_request(monkeypatch) -> None:
+    class TrickleProvider:
+        async def generate_stream(self, request):  # type: ignore[no-untyped-def]
+            for index in range(20):
+                yield ProviderStreamEvent(type="delta", delta=str(index % 10))
+                await anyio.sleep(0.001)
+            yield ProviderStreamEvent(
+                type="final",
+                response=ProviderResponse(type="answer", message="Done."),
+            )
+
+    monkeypatch.setenv("GENOMESPY_AGENT_MODEL", "test-model")
+    reset_settings_cache()
+    monkeypatch.setattr("app.main.get_provider", lambda: TrickleProvider())
+    client = TestClient(app)
+    payload = {"message": "Hi", "history": [], "context": {"schemaVersion": 1}}
+
+    response = client.post("/v1/agent-turn?stream=true&coalesceMs=500", json=payload)
+    rejected = client.post("/v1/agent-turn?stream=true&coalesceMs=5000", json=payload)
+
+    assert response.text.count("event: delta") == 1
+    final = response.text.split("event: final\ndata: ")[1]
+    assert json.loads(final)["trace"]["frames"]["count"] == 2
+    assert rejected.status_code == 422
@@ -1,12 +1,21 @@
+import gzip
+import json
+
+import httpx
 import pytest
 
 from app.config import Settings
-from app.models import ProviderRequest, ProviderResponse
-from app.providers import ProviderError
+from app.models import ProviderRequest, ProviderResponse, ProviderToolDefinition
+from app.prompt_builder import build_prompt_ir, build_responses_input
+from app.providers import ProviderError, request_body
 from app.providers.openai_responses import (
     OpenAIResponsesProvider,
     _build_unexpected_role_fallback_payload,
 )
+from app.providers.request_body import (
+    clear_request_body_segment_cache,
+    encode_responses_payload,
+)
 
 
 def test_build_unexpected_role_fallback_payload_moves_developer_messages_into_instructions() -> None:
@@ -88,7 +97,7 @@ async def test_generate_retries_with_unexpected_role_fallback(monkeypatch) -> No
                 ]
             }
 
-    async def stub_post_response(payload):  # type: ignore[no-untyped-def]
+    async def stub_post_response(payload, endpoint):  # type: ignore[no-untyped-def]
         observed_payloads.append(payload)
         if len(observed_payloads) == 1:
             raise ProviderError(
@@ -146,7 +155,7 @@ async def test_generate_prefers_role_compat_payload_when_enabled(
                 ]
             }
 
-    async def stub_post_response(payload):  # type: ignore[no-untyped-def]
+    async def stub_post_response(payload, endpoint):  # type: ignore[no-untyped-def]
         observed_payloads.append(payload)
         return StubResponse()
 
@@ -158,3 +167,178 @@ async def test_generate_prefers_role_compat_payload_when_enabled(
     assert len(observed_payloads) == 1
     assert observed_payloads[0]["instructions"].startswith("system prompt\n\n")
     assert observed_payloads[0]["input"][0]["role"] == "user"
+
+
+def test_encode_responses_payload_matches_plain_json_encoding() -> None:
+    request = ProviderRequest(
+        system_prompt="system prompt",
+        context={"schemaVersion": 1, "label": "näyte \u2028"},
+        history=[],
+        message="hello",
+    )
+    prompt = build_prompt_ir(request)
+    payload = {
+        "model": "test-model",
+        "instructions": prompt.instructions,
+        "input": build_responses_input(prompt),
+        "stream": False,
+    }
+
+    body = encode_responses_payload(payload)
+
+    assert body == json.dumps(
+        payload, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+    assert json.loads(body) == payload
+
+
+def test_build_prompt_ir_reuses_context_snapshot_for_equal_contexts() -> None:
+    first = build_prompt_ir(
+        ProviderRequest(
+            system_prompt="system prompt",
+            context={"schemaVersion": 1, "views": ["a", "b"]},
+            history=[],
+            message="hello",
+        )
+    )
+    second = build_prompt_ir(
+        ProviderRequest(
+            system_prompt="system prompt",
+            context={"schemaVersion": 1, "views": ["a", "b"]},
+            history=[],
+            message="again",
+        )
+    )
+
+    assert second.context_item is first.context_item
+
+
+def build_tool_definition() -> ProviderToolDefinition:
+    return ProviderToolDefinition(
+        type="function",
+        name="expandViewNode",
+        description="Expand one view node.",
+        parameters={
+            "type": "object",
+            "properties": {"selector": {"type": "string"}},
+            "required": ["selector"],
+            "additionalProperties": False,
+        },
+        strict=True,
+    )
+
+
+def test_encode_responses_payload_reuses_tool_segment_across_turns(
+    monkeypatch,
+) -> None:  # type: ignore[no-untyped-def]
+    clear_request_body_segment_cache()
+    provider = OpenAIResponsesProvider(
+        Settings(
+            model="test-model",
+            base_url="http://127.0.0.1:8000/v1",
+            api_key="placeholder",
+            timeout_seconds=10.0,
+            system_prompt="system prompt",
+            enable_streaming=False,
+            prefer_responses_role_compat=False,
+            enable_token_debug_logs=False,
+            enable_throughput_debug_logs=False,
+        )
+    )
+    dump_calls = []
+    adapter = request_body._TOOL_DEFINITIONS_ADAPTER
+
+    class CountingAdapter:
+        def dump_json(self, tools):  # type: ignore[no-untyped-def]
+            dump_calls.append(tools)
+            return adapter.dump_json(tools)
+
+    monkeypatch.setattr(request_body, "_TOOL_DEFINITIONS_ADAPTER", CountingAdapter())
+
+    bodies = []
+    for message in ("first", "second"):
+        payload = provider._build_payload(
+            ProviderRequest(
+                system_prompt="system prompt",
+                context={"schemaVersion": 1},
+                history=[],
+                message=message,
+                tools=[build_tool_definition()],
+            )
+        )
+        bodies.append(encode_responses_payload(payload))
+        fallback_payload = _build_unexpected_role_fallback_payload(
+            payload,
+            ProviderError("Provider returned HTTP 400: Unexpected message role."),
+        )
+        assert fallback_payload is not None
+        bodies.append(encode_responses_payload(fallback_payload))
+
+    assert len(dump_calls) == 1
+    decoded = json.loads(bodies[0])
+    assert decoded["tools"] == [build_tool_definition().model_dump()]
+    assert decoded["tool_choice"] == "auto"
+    assert json.loads(bodies[3])["input"][-1]["content"][0]["text"] == "second"
+
+
+@pytest.mark.anyio
+async def test_generate_falls_back_to_uncompressed_body_after_415(
+    monkeypatch,
+) -> None:  # type: ignore[no-untyped-def]
+    provider = OpenAIResponsesProvider(
+        Settings(
+            model="test-model",
+            base_url="http://127.0.0.1:8000/v1",
+            api_key="placeholder",
+            timeout_seconds=10.0,
+            system_prompt="system prompt",
+            enable_streaming=False,
+            prefer_responses_role_compat=False,
+            enable_token_debug_logs=False,
+            enable_throughput_debug_logs=False,
+            upstream_request_compression="gzip",
+        )
+    )
+    observed_requests: list[httpx.Request] = []
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        observed_requests.append(request)
+        if request.headers.get("content-encoding") == "gzip":
+            return httpx.Response(415, text="Unsupported Media Type")
+        return httpx.Response(
+            200,
+            json={
+                "output": [
+                    {
+                        "type": "message",
+                        "role": "assistant",
+                        "content": [{"type": "output_text", "text": "ok"}],
+                    }
+                ]
+            },
+        )
+
+    real_async_client = httpx.AsyncClient
+    monkeypatch.setattr(
+        httpx,
+        "AsyncClient",
+        lambda **kwargs: real_async_client(
+            transport=httpx.MockTransport(handle), **kwargs
+        ),
+    )
+
+    response = await provider.generate(
+        ProviderRequest(
+            system_prompt="system prompt",
+            context={"schemaVersion": 1},
+            history=[],
+            message="hello",
+        )
+    )
+
+    assert response == ProviderResponse(type="answer", message="ok")
+    assert len(observed_requests) == 2
+    assert json.loads(gzip.decompress(observed_requests[0].content)) == json.loads(
+        observed_requests[1].content
+    )
+    assert "content-encoding" not in observed_requests[1].headers
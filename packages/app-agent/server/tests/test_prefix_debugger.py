@@ -0,0 +1,137 @@
+import pytest
+
+from app import prefix_debugger
+from app.models import HistoryMessage, ProviderRequest
+from app.prefix_debugger import (
+    PrefixStabilityAnalyzer,
+    _common_prefix_length,
+    format_prefix_stability_report,
+)
+
+
+def build_request(
+    history: list[HistoryMessage],
+    message: str,
+    context: dict[str, object],
+    volatile_context: dict[str, object] | None = None,
+    session_id: str | None = "session-1",
+) -> ProviderRequest:
+    return ProviderRequest(
+        system_prompt="system prompt",
+        context=context,
+        volatileContext=volatile_context or {},
+        history=history,
+        message=message,
+        session_id=session_id,
+    )
+
+
+def first_turn_history() -> list[HistoryMessage]:
+    return [
+        HistoryMessage(id="u1", role="user", text="What is shown?"),
+        HistoryMessage(id="a1", role="assistant", text="A heatmap."),
+    ]
+
+
+def test_analyzer_accepts_turns_that_extend_the_previous_prompt() -> None:
+    analyzer = PrefixStabilityAnalyzer("gpt-4.1-mini")
+    context = {"schemaVersion": 1, "viewRoot": {"title": "Overview"}}
+
+    first = analyzer.observe(
+        build_request([], "What is shown?", context, {"selection": "chr1"})
+    )
+    second = analyzer.observe(
+        build_request(first_turn_history(), "Zoom in", context, {"selection": "chr2"})
+    )
+
+    assert first is None
+    assert second is not None
+    assert second.component == "history item u1"
+    assert not second.invalidated
+    assert second.common_prefix_tokens > 0
+    assert second.context_paths == ()
+
+
+def test_analyzer_attributes_invalidations_to_context_key_paths() -> None:
+    analyzer = PrefixStabilityAnalyzer("gpt-4.1-mini")
+
+    for turn in range(3):
+        report = analyzer.observe(
+            build_request(
+                [],
+                "What is shown?",
+                {
+                    "schemaVersion": 1,
+                    "viewRoot": {"title": "Overview", "renderedAt": turn},
+                    "provenance": [{"step": turn // 2}],
+                },
+            )
+        )
+
+    assert report is not None
+    assert report.component == "context"
+    assert report.invalidated
+    assert report.context_paths == ("viewRoot.renderedAt", "provenance[0].step")
+    assert report.top_context_churn[0] == ("viewRoot.renderedAt", 2)
+
+    formatted = format_prefix_stability_report(report)
+    assert "in context (prefix invalidated)" in formatted
+    assert "  changed context keys: viewRoot.renderedAt" in formatted
+    assert "    viewRoot.renderedAt = 2 turns" in formatted
+
+
+def test_analyzer_attributes_edited_history_items() -> None:
+    analyzer = PrefixStabilityAnalyzer("gpt-4.1-mini")
+    context = {"schemaVersion": 1}
+    edited_history = [
+        HistoryMessage(id="u1", role="user", text="What is shown?"),
+        HistoryMessage(id="a1", role="assistant", text="A scatter plot."),
+    ]
+
+    analyzer.observe(build_request(first_turn_history(), "Zoom in", context))
+    report = analyzer.observe(build_request(edited_history, "Zoom in", context))
+
+    assert report is not None
+    assert report.component == "history item a1"
+    assert report.invalidated
+
+
+def test_analyzer_ignores_requests_without_sessions() -> None:
+    analyzer = PrefixStabilityAnalyzer("gpt-4.1-mini")
+    request = build_request([], "What is shown?", {}, session_id=None)
+
+    assert analyzer.observe(request) is None
+    assert analyzer.observe(request) is None
+
+
+def test_common_prefix_length_finds_the_first_differing_byte() -> None:
+    base = bytes(range(256)) * 4096
+
+    assert _common_prefix_length(base, base) == len(base)
+    assert _common_prefix_length(base, base[:1000]) == 1000
+    assert _common_prefix_length(b"", base) == 0
+    for index in (0, 1, 255, 777_777, len(base) - 1):
+        changed = base[:index] + b"\xff\xfe" + base[index + 2 :]
+        expected = index + 1 if base[index] == 0xFF else index
+        assert _common_prefix_length(base, changed) == expected
+
+
+def test_analyzer_tokenizes_shared_segments_once(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    counted: list[int] = []
+
+    def count_tokens(text: str, encoding: object) -> int:
+        counted.append(len(text))
+        return len(text) // 4
+
+    monkeypatch.setattr(prefix_debugger, "count_tokens", count_tokens)
+    analyzer = PrefixStabilityAnalyzer("gpt-4.1-mini")
+    context = {"schemaVersion": 1, "tracks": ["track" * 20] * 2000}
+
+    for turn in range(4):
+        analyzer.observe(
+            build_request([], "What is shown?", context, {"selection": turn})
+        )
+
+    assert len([length for length in counted if length > 100_000]) == 1
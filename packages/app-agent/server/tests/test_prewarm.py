@@ -0,0 +1,98 @@
+import pytest
+from responses_stand_in import ResponsesStandIn, build_provider
+
+from app.models import ProviderRequest
+from app.providers.prewarm import PrewarmLimiter
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def build_request(context: dict[str, object]) -> ProviderRequest:
+    return ProviderRequest(
+        system_prompt="system prompt",
+        context=context,
+        volatile_context={"selection": "chr1"},
+        history=[],
+        message="",
+        session_id="session-1",
+    )
+
+
+def test_limiter_deduplicates_claims_until_they_expire() -> None:
+    clock = FakeClock()
+    limiter = PrewarmLimiter(max_per_minute=10, dedup_ttl_seconds=30, clock=clock)
+
+    assert limiter.claim("prefix-a") == "accepted"
+    assert limiter.claim("prefix-a") == "deduplicated"
+    clock.now = 31
+    assert limiter.claim("prefix-a") == "accepted"
+    limiter.forget("prefix-a")
+    assert limiter.claim("prefix-a") == "accepted"
+
+
+def test_limiter_rate_limits_accepted_claims_per_minute() -> None:
+    clock = FakeClock()
+    limiter = PrewarmLimiter(max_per_minute=2, clock=clock)
+
+    assert limiter.claim("prefix-a") == "accepted"
+    assert limiter.claim("prefix-b") == "accepted"
+    assert limiter.claim("prefix-c") == "rate_limited"
+    clock.now = 60
+    assert limiter.claim("prefix-c") == "accepted"
+
+
+@pytest.mark.anyio
+async def test_prewarm_sends_only_the_stable_prefix(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    server = ResponsesStandIn()
+    server.install(monkeypatch)
+    provider = build_provider(send_prompt_cache_key=True, enable_response_chaining=True)
+
+    first = await provider.prewarm(build_request({"schemaVersion": 1}))
+    second = await provider.prewarm(build_request({"schemaVersion": 1}))
+
+    assert first.status == "warmed"
+    assert first.duration_ms is not None
+    assert second.status == "deduplicated"
+    assert second.prefix_hash == first.prefix_hash
+    assert len(server.requests) == 1
+    payload = server.requests[0]
+    assert payload["max_output_tokens"] == 16
+    assert payload["prompt_cache_key"] == first.prefix_hash
+    assert "store" not in payload
+    assert len(payload["input"]) == 1
+    assert payload["input"][0]["role"] == "developer"
+    assert payload["input"][0]["content"][0]["text"].startswith(
+        "Current GenomeSpy context snapshot:\n"
+    )
+
+
+@pytest.mark.anyio
+async def test_prewarm_is_rate_limited(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    server = ResponsesStandIn()
+    server.install(monkeypatch)
+    provider = build_provider(prewarm_max_per_minute=1)
+
+    await provider.prewarm(build_request({"schemaVersion": 1}))
+    result = await provider.prewarm(build_request({"schemaVersion": 2}))
+
+    assert result.status == "rate_limited"
+    assert len(server.requests) == 1
+
+
+@pytest.mark.anyio
+async def test_prewarm_without_input_items_is_skipped(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    server = ResponsesStandIn()
+    server.install(monkeypatch)
+    provider = build_provider(prefer_responses_role_compat=True)
+
+    result = await provider.prewarm(build_request({"schemaVersion": 1}))
+
+    assert result.status == "skipped"
+    assert result.prefix_hash is not None
+    assert server.requests == []
@@ -4,6 +4,11 @@ from app.models import HistoryMessage, ProviderRequest, ToolCall
 from app.prompt_builder import (
     build_prompt_ir,
     build_responses_input,
+    build_responses_input_segments,
+    canonicalize_context,
+    clear_response_item_cache,
+    encode_response_item,
+    get_pre_encoded_response_item,
 )
 
 
@@ -143,6 +148,43 @@ def test_build_responses_input_places_volatile_context_after_tool_output() -> No
     )
 
 
+def test_build_responses_input_segments_label_each_input_item() -> None:
+    request = ProviderRequest(
+        system_prompt="system prompt",
+        context={"schemaVersion": 1},
+        volatile_context={"activeProvenanceState": {"summary": "Grouped"}},
+        history=[
+            HistoryMessage(id="1", role="user", text="Show a plot."),
+            HistoryMessage(
+                id="2",
+                role="assistant",
+                text="I will show a plot.",
+                tool_calls=[
+                    ToolCall(
+                        call_id="call_1",
+                        name="getIntentActionDocs",
+                        arguments={"actionType": "sampleView/groupBy"},
+                    )
+                ],
+            ),
+        ],
+        message="Group it.",
+    )
+
+    prompt = build_prompt_ir(request)
+    segments = build_responses_input_segments(prompt)
+
+    assert [label for label, _ in segments] == [
+        "context",
+        "history item 1",
+        "history item 2",
+        "history item 2",
+        "volatile context",
+        "user message",
+    ]
+    assert [item for _, item in segments] == build_responses_input(prompt)
+
+
 def test_build_responses_input_keeps_rejected_tool_output_last() -> None:
     rejection_text = (
         "Tool call was incorrect and rejected. Correct it before trying again."
@@ -407,12 +449,12 @@ def test_build_prompt_ir_separates_instructions_and_context() -> None:
         prompt.context_text.removeprefix("Current GenomeSpy context snapshot:\n")
     )
     assert list(context_json) == [
-        "schemaVersion",
         "actionCatalog",
-        "sampleAttributes",
-        "viewWorkflows",
         "lifecycle",
+        "sampleAttributes",
+        "schemaVersion",
         "viewRoot",
+        "viewWorkflows",
     ]
     volatile_context_json = json.loads(
         prompt.volatile_context_text.removeprefix(
@@ -425,3 +467,111 @@ def test_build_prompt_ir_separates_instructions_and_context() -> None:
         "provenance",
     ]
     assert prompt.context == request.context
+
+
+def test_build_responses_input_reuses_converted_history_items() -> None:
+    clear_response_item_cache()
+    tool_call_message = HistoryMessage(
+        id="1",
+        role="assistant",
+        text="I will call a tool.",
+        tool_calls=[
+            ToolCall(
+                call_id="call_1",
+                name="expandViewNode",
+                arguments='{"selector": {"view": "track", "scope": []}}',
+            )
+        ],
+    )
+    first = build_responses_input(
+        build_prompt_ir(
+            ProviderRequest(
+                system_prompt="system prompt",
+                context={"schemaVersion": 1},
+                history=[tool_call_message],
+                message="First",
+            )
+        )
+    )
+    second = build_responses_input(
+        build_prompt_ir(
+            ProviderRequest(
+                system_prompt="system prompt",
+                context={"schemaVersion": 1},
+                history=[tool_call_message.model_copy()],
+                message="Second",
+            )
+        )
+    )
+    edited = build_responses_input(
+        build_prompt_ir(
+            ProviderRequest(
+                system_prompt="system prompt",
+                context={"schemaVersion": 1},
+                history=[tool_call_message.model_copy(update={"text": "Edited text."})],
+                message="Third",
+            )
+        )
+    )
+
+    assert second[2] is first[2]
+    assert second[2]["arguments"] == '{"selector": {"scope": [], "view": "track"}}'
+    assert edited[1]["content"][0]["text"] == "Edited text."
+    assert edited[2] is not first[2]
+
+
+def test_get_pre_encoded_response_item_reuses_history_item_encoding() -> None:
+    clear_response_item_cache()
+    messages = build_responses_input(
+        build_prompt_ir(
+            ProviderRequest(
+                system_prompt="system prompt",
+                context={"schemaVersion": 1},
+                history=[HistoryMessage(id="1", role="user", text="Hello")],
+                message="Next",
+            )
+        )
+    )
+
+    encoded = get_pre_encoded_response_item(messages[1])
+
+    assert encoded == encode_response_item(messages[1])
+    assert get_pre_encoded_response_item(messages[1]) is encoded
+    assert get_pre_encoded_response_item(messages[-1]) is None
+
+
+def test_build_prompt_ir_serializes_reordered_context_identically() -> None:
+    def build_context_text(context: dict[str, object]) -> str:
+        return build_prompt_ir(
+            ProviderRequest(
+                system_prompt="system prompt",
+                context=context,
+                history=[],
+                message="Hello",
+            )
+        ).context_text
+
+    first = build_context_text(
+        {"viewRoot": {"title": "Example", "children": []}, "schemaVersion": 1}
+    )
+    reordered = build_context_text(
+        {"schemaVersion": 1, "viewRoot": {"children": [], "title": "Example"}}
+    )
+
+    assert reordered == first
+
+
+def test_canonicalize_context_follows_top_level_key_order() -> None:
+    context = {
+        "viewRoot": {"title": "Example", "children": []},
+        "schemaVersion": 1,
+        "provenance": [{"summary": "Sort", "action": "sort"}],
+        "lifecycle": {"ready": True},
+    }
+
+    canonical = canonicalize_context(context, ("schemaVersion", "provenance"))
+
+    assert list(canonical) == ["schemaVersion", "provenance", "lifecycle", "viewRoot"]
+    assert list(canonical["viewRoot"]) == ["children", "title"]
+    assert list(canonical["provenance"][0]) == ["action", "summary"]
+    assert canonical == context
@@ -0,0 +1,187 @@
+import httpx
+import pytest
+from responses_stand_in import ResponsesStandIn, build_provider
+
+from app.models import HistoryMessage, ProviderRequest, ProviderToolDefinition
+from app.prompt_builder import build_prompt_ir
+from app.providers.prompt_cache import build_prompt_cache_key, parse_response_usage
+
+
+class KeylessResponsesStandIn(ResponsesStandIn):
+    """Reject `prompt_cache_key` like servers without prompt-cache routing."""
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        if b"prompt_cache_key" in request.content:
+            self.requests.append({})
+            return httpx.Response(
+                400,
+                json={
+                    "error": {
+                        "message": "Unrecognized request argument supplied: "
+                        "prompt_cache_key"
+                    }
+                },
+            )
+        return super().handle(request)
+
+
+def build_request(
+    history: list[HistoryMessage],
+    message: str,
+    context: dict[str, object] | None = None,
+) -> ProviderRequest:
+    return ProviderRequest(
+        system_prompt="system prompt",
+        context=context or {"schemaVersion": 1},
+        history=history,
+        message=message,
+        session_id="session-1",
+    )
+
+
+def test_prompt_cache_key_covers_only_the_stable_prefix() -> None:
+    tools = [
+        ProviderToolDefinition(
+            type="function",
+            name="expandViewNode",
+            description="Expand one view node.",
+            parameters={"type": "object"},
+            strict=False,
+        )
+    ]
+    first = build_prompt_ir(build_request([], "What is shown?"))
+    follow_up = build_prompt_ir(
+        build_request(
+            [HistoryMessage(id="u1", role="user", text="What is shown?")],
+            "Zoom in",
+        )
+    )
+    changed_context = build_prompt_ir(
+        build_request([], "What is shown?", context={"schemaVersion": 2})
+    )
+
+    key = build_prompt_cache_key(first, tools)
+
+    assert build_prompt_cache_key(follow_up, tools) == key
+    assert build_prompt_cache_key(changed_context, tools) != key
+    assert build_prompt_cache_key(first, []) != key
+
+
+def test_parse_response_usage_reads_cached_tokens() -> None:
+    responses_usage = parse_response_usage(
+        {
+            "usage": {
+                "input_tokens": 1200,
+                "input_tokens_details": {"cached_tokens": 1024},
+                "output_tokens": 40,
+            }
+        }
+    )
+    chat_usage = parse_response_usage(
+        {
+            "usage": {
+                "prompt_tokens": 300,
+                "prompt_tokens_details": {"cached_tokens": 256},
+                "completion_tokens": 12,
+            }
+        }
+    )
+
+    assert responses_usage is not None
+    assert responses_usage.cached_input_tokens == 1024
+    assert responses_usage.output_tokens == 40
+    assert chat_usage is not None
+    assert chat_usage.input_tokens == 300
+    assert chat_usage.cached_input_tokens == 256
+    assert parse_response_usage({"usage": {"output_tokens": 3}}) is None
+    assert parse_response_usage({}) is None
+
+
+@pytest.mark.anyio
+async def test_generate_sends_prompt_cache_key_and_reports_usage(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    server = ResponsesStandIn()
+    server.install(monkeypatch)
+    provider = build_provider(send_prompt_cache_key=True, enable_response_chaining=True)
+
+    await provider.generate(build_request([], "What is shown?"))
+    second = await provider.generate(
+        build_request(
+            [
+                HistoryMessage(id="u1", role="user", text="What is shown?"),
+                HistoryMessage(id="a1", role="assistant", text="seen 2"),
+            ],
+            "Zoom in",
+        )
+    )
+
+    key = server.requests[0]["prompt_cache_key"]
+    assert len(key) == 32
+    assert server.requests[1]["prompt_cache_key"] == key
+    assert second.usage is not None
+    assert second.usage.input_tokens == 40
+    assert second.usage.cached_input_tokens == 30
+
+
+@pytest.mark.anyio
+async def test_generate_stream_reports_usage(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    server = ResponsesStandIn()
+    server.install(monkeypatch)
+    provider = build_provider(send_prompt_cache_key=True)
+
+    events = [
+        event
+        async for event in provider.generate_stream(build_request([], "What is shown?"))
+    ]
+
+    final_response = events[-1].response
+    assert final_response is not None
+    assert final_response.usage is not None
+    assert final_response.usage.input_tokens == 20
+    assert final_response.usage.cached_input_tokens == 0
+
+
+@pytest.mark.anyio
+async def test_generate_drops_rejected_prompt_cache_key(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    server = KeylessResponsesStandIn()
+    server.install(monkeypatch)
+    provider = build_provider(send_prompt_cache_key=True)
+
+    first = await provider.generate(build_request([], "What is shown?"))
+    await provider.generate(build_request([], "What is shown?"))
+
+    assert first.message == "seen 2"
+    assert len(server.requests) == 3
+    assert "prompt_cache_key" not in server.requests[2]
+
+
+class KeylessSystemOnlyStandIn(KeylessResponsesStandIn):
+    """Also reject `developer` messages, like strict local servers."""
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        if b'"developer"' in request.content:
+            self.requests.append({})
+            return httpx.Response(
+                400, json={"error": {"message": "Unexpected message role."}}
+            )
+        return super().handle(request)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("stream", [False, True])
+async def test_stacked_capability_rejections_do_not_use_up_retries(
+    monkeypatch, stream: bool
+) -> None:  # type: ignore[no-untyped-def]
+    server = KeylessSystemOnlyStandIn()
+    server.install(monkeypatch)
+    provider = build_provider(send_prompt_cache_key=True)
+    request = build_request([], "What is shown?")
+
+    if stream:
+        events = [event async for event in provider.generate_stream(request)]
+        response = events[-1].response
+    else:
+        response = await provider.generate(request)
+
+    assert response is not None
+    assert response.message.startswith("seen")
+    assert len(server.requests) == 3
@@ -0,0 +1,262 @@
+from typing import Any
+
+import pytest
+from responses_stand_in import ResponsesStandIn, build_provider
+
+from app.models import HistoryMessage, ProviderRequest, ProviderResponse
+
+
+class ToolCallingStandIn(ResponsesStandIn):
+    """Answer every user message by calling `expandViewNode`."""
+
+    def build_output(self, items: list[Any]) -> list[dict[str, Any]]:
+        if items[-1].get("role") != "user":
+            return super().build_output(items)
+        return [
+            {
+                "type": "function_call",
+                "call_id": "call_" + str(len(self.requests)),
+                "name": "expandViewNode",
+                "arguments": "{}",
+            }
+        ]
+
+
+def build_request(
+    history: list[HistoryMessage],
+    message: str,
+    context: dict[str, object] | None = None,
+    volatile_context: dict[str, object] | None = None,
+) -> ProviderRequest:
+    return ProviderRequest(
+        system_prompt="system prompt",
+        context=context or {"schemaVersion": 1},
+        volatile_context=volatile_context or {},
+        history=history,
+        message=message,
+        session_id="session-1",
+    )
+
+
+def tool_turn_history(response: ProviderResponse) -> list[HistoryMessage]:
+    """Return the history of a turn that ran the tool the model called."""
+    [tool_call] = response.tool_calls
+    return [
+        HistoryMessage(id="u1", role="user", text="Expand the track"),
+        HistoryMessage(id="a1", role="assistant", text="", toolCalls=[tool_call]),
+        HistoryMessage(
+            id="t1", role="tool", text="Expanded.", toolCallId=tool_call.call_id
+        ),
+    ]
+
+
+def describe_items(items: list[Any]) -> list[tuple[str, str]]:
+    """Reduce input items to what the model reads, ignoring item ids."""
+    described = []
+    for item in items:
+        if item.get("type") == "function_call_output":
+            described.append(("tool", item["output"]))
+        elif item.get("type") == "function_call":
+            described.append(("tool_call", item["name"]))
+        else:
+            described.append((item["role"], item["content"][0]["text"]))
+    return described
+
+
+async def run_turns(
+    monkeypatch: Any,
+    enable_response_chaining: bool,
+    volatile_contexts: list[dict[str, object]],
+) -> tuple[ResponsesStandIn, list[list[tuple[str, str]]]]:
+    """Run one user turn per volatile context, feeding answers back as history."""
+    server = ResponsesStandIn()
+    provider = build_provider(enable_response_chaining=enable_response_chaining)
+    history: list[HistoryMessage] = []
+    with monkeypatch.context() as patch:
+        server.install(patch)
+        for index, volatile_context in enumerate(volatile_contexts):
+            message = "Question " + str(index)
+            response = await provider.generate(
+                build_request(list(history), message, volatile_context=volatile_context)
+            )
+            history.append(
+                HistoryMessage(id="u" + str(index), role="user", text=message)
+            )
+            history.append(
+                HistoryMessage(
+                    id="a" + str(index), role="assistant", text=response.message or ""
+                )
+            )
+    return server, [describe_items(items) for items in server.model_inputs]
+
+
+def first_turn_history() -> list[HistoryMessage]:
+    return [
+        HistoryMessage(id="u1", role="user", text="What is shown?"),
+        HistoryMessage(id="a1", role="assistant", text="seen 2"),
+    ]
+
+
+@pytest.mark.anyio
+async def test_generate_chains_follow_up_turns(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    server = ResponsesStandIn()
+    server.install(monkeypatch)
+    provider = build_provider(enable_response_chaining=True)
+
+    first = await provider.generate(build_request([], "What is shown?"))
+    second = await provider.generate(build_request(first_turn_history(), "Zoom in"))
+
+    assert first.message == "seen 2"
+    assert second.message == "seen 4"
+    assert "previous_response_id" not in server.requests[0]
+    assert server.requests[1]["previous_response_id"] == first.response_id
+    assert server.requests[1]["input"] == [
+        {"role": "user", "content": [{"type": "input_text", "text": "Zoom in"}]}
+    ]
+
+
+@pytest.mark.anyio
+async def test_generate_stream_chains_follow_up_turns(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    server = ResponsesStandIn()
+    server.install(monkeypatch)
+    provider = build_provider(enable_response_chaining=True)
+
+    first_events = [
+        event
+        async for event in provider.generate_stream(build_request([], "What is shown?"))
+    ]
+    second_events = [
+        event
+        async for event in provider.generate_stream(
+            build_request(first_turn_history(), "Zoom in")
+        )
+    ]
+
+    assert first_events[-1].response is not None
+    assert first_events[-1].response.response_id == "resp_1"
+    assert server.requests[1]["previous_response_id"] == "resp_1"
+    assert second_events[-1].response is not None
+    assert second_events[-1].response.message == "seen 4"
+
+
+@pytest.mark.anyio
+async def test_generate_replays_full_input_when_context_changes(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    server = ResponsesStandIn()
+    server.install(monkeypatch)
+    provider = build_provider(enable_response_chaining=True)
+
+    await provider.generate(build_request([], "What is shown?"))
+    await provider.generate(
+        build_request(first_turn_history(), "Zoom in", context={"schemaVersion": 2})
+    )
+
+    assert "previous_response_id" not in server.requests[1]
+    assert len(server.requests[1]["input"]) == 4
+
+
+@pytest.mark.anyio
+async def test_generate_falls_back_when_upstream_forgot_response(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    server = ResponsesStandIn()
+    server.install(monkeypatch)
+    provider = build_provider(enable_response_chaining=True)
+
+    first = await provider.generate(build_request([], "What is shown?"))
+    assert first.response_id is not None
+    server.forget(first.response_id)
+    second = await provider.generate(build_request(first_turn_history(), "Zoom in"))
+
+    assert second.message == "seen 4"
+    assert server.requests[1]["previous_response_id"] == first.response_id
+    assert "previous_response_id" not in server.requests[2]
+    assert len(server.requests[2]["input"]) == 4
+
+
+@pytest.mark.anyio
+async def test_generate_does_not_chain_when_disabled(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    server = ResponsesStandIn()
+    server.install(monkeypatch)
+    provider = build_provider(enable_response_chaining=False)
+
+    await provider.generate(build_request([], "What is shown?"))
+    await provider.generate(build_request(first_turn_history(), "Zoom in"))
+
+    assert "previous_response_id" not in server.requests[1]
+    assert "store" not in server.requests[1]
+
+
+@pytest.mark.anyio
+async def test_generate_chains_tool_outputs_without_model_items(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    server = ToolCallingStandIn()
+    server.install(monkeypatch)
+    provider = build_provider(enable_response_chaining=True)
+
+    first = await provider.generate(build_request([], "Expand the track"))
+    await provider.generate(build_request(tool_turn_history(first), ""))
+
+    assert [item.get("type") for item in server.requests[1]["input"]] == [
+        "function_call_output"
+    ]
+
+
+@pytest.mark.anyio
+async def test_unrecorded_assistant_items_replay_the_full_input(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    server = ToolCallingStandIn()
+    server.install(monkeypatch)
+    provider = build_provider(enable_response_chaining=True)
+
+    first = await provider.generate(build_request([], "Expand the track"))
+    # The browser kept a reply from a turn whose response was never recorded,
+    # for example because the client disconnected before it completed.
+    await provider.generate(
+        build_request(
+            [
+                *tool_turn_history(first),
+                HistoryMessage(id="a2", role="assistant", text="Expanded it."),
+            ],
+            "Zoom in",
+        )
+    )
+
+    assert "previous_response_id" not in server.requests[1]
+    assert ("assistant", "Expanded it.") in describe_items(server.model_inputs[1])
+
+
+@pytest.mark.anyio
+async def test_chained_turns_hold_one_current_volatile_snapshot(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    volatile_contexts: list[dict[str, object]] = [{"selection": "chr1"}] * 4
+
+    chained_server, chained = await run_turns(monkeypatch, True, volatile_contexts)
+    _, replayed = await run_turns(monkeypatch, False, volatile_contexts)
+
+    assert all(
+        "previous_response_id" in request for request in chained_server.requests[1:]
+    )
+    assert len(chained[-1]) == len(replayed[-1])
+    for chained_items, replayed_items in zip(chained, replayed, strict=True):
+        chained_snapshots = [
+            item for item in chained_items if "volatile" in item[1].lower()
+        ]
+        replayed_snapshots = [
+            item for item in replayed_items if "volatile" in item[1].lower()
+        ]
+        assert chained_snapshots == replayed_snapshots
+        assert len(chained_snapshots) == 1
+        # Only the snapshot's position differs: it stays where the chain began.
+        assert [item for item in chained_items if item not in chained_snapshots] == [
+            item for item in replayed_items if item not in replayed_snapshots
+        ]
+
+
+@pytest.mark.anyio
+async def test_volatile_context_change_replays_the_full_input(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    volatile_contexts: list[dict[str, object]] = [
+        {"selection": "chr" + str(index)} for index in range(1, 4)
+    ]
+
+    chained_server, chained = await run_turns(monkeypatch, True, volatile_contexts)
+    _, replayed = await run_turns(monkeypatch, False, volatile_contexts)
+
+    assert all(
+        "previous_response_id" not in request for request in chained_server.requests
+    )
+    assert chained == replayed
@@ -0,0 +1,109 @@
+import httpx
+import pytest
+from responses_stand_in import ResponsesStandIn
+
+from app.config import Settings
+from app.models import ProviderRequest
+from app.providers.openai_responses import OpenAIResponsesProvider
+from app.providers.routing import BackendRouter, format_route_decision
+
+BACKENDS = (
+    "http://replica-a:8000/v1",
+    "http://replica-b:8000/v1",
+    "http://replica-c:8000/v1",
+)
+
+
+class HostRecordingStandIn(ResponsesStandIn):
+    def __init__(self) -> None:
+        super().__init__()
+        self.hosts: list[str] = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.hosts.append(request.url.host)
+        return super().handle(request)
+
+
+def test_router_keeps_keys_on_their_backend() -> None:
+    router = BackendRouter(BACKENDS)
+
+    decisions = []
+    for _ in range(3):
+        decision = router.acquire("session-1")
+        router.release(decision)
+        decisions.append(decision)
+
+    assert {decision.backend for decision in decisions} == {decisions[0].backend}
+    assert decisions[0].affinity_hit is None
+    assert decisions[2].affinity_hit is True
+    assert (decisions[2].affinity_hits, decisions[2].repeat_turns) == (2, 2)
+    assert "affinity=hit" in format_route_decision(decisions[2])
+    assert "affinity hit rate=100.0% (2/2)" in format_route_decision(decisions[2])
+
+
+def test_router_bounds_the_load_of_hot_keys() -> None:
+    router = BackendRouter(BACKENDS, load_factor=1.0)
+
+    decisions = [router.acquire("hot-session") for _ in range(6)]
+
+    loads = {backend: 0 for backend in BACKENDS}
+    for decision in decisions:
+        loads[decision.backend] += 1
+    assert sorted(loads.values()) == [2, 2, 2]
+    assert decisions[0].backend == decisions[0].preferred_backend
+    assert decisions[1].backend != decisions[1].preferred_backend
+
+
+def test_router_moves_few_keys_when_a_backend_is_added() -> None:
+    router = BackendRouter(BACKENDS)
+    keys = ["session-" + str(index) for index in range(300)]
+    before = {key: router.preferred_backend(key) for key in keys}
+
+    router.set_backends((*BACKENDS, "http://replica-d:8000/v1"))
+    moved = [key for key in keys if router.preferred_backend(key) != before[key]]
+
+    assert 0 < len(moved) < len(keys) / 2
+    assert all(
+        router.preferred_backend(key) == "http://replica-d:8000/v1" for key in moved
+    )
+
+
+def test_router_rejects_invalid_configuration() -> None:
+    with pytest.raises(ValueError):
+        BackendRouter(())
+    with pytest.raises(ValueError):
+        BackendRouter(BACKENDS, load_factor=0.5)
+
+
+@pytest.mark.anyio
+async def test_provider_routes_session_turns_to_one_backend(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    server = HostRecordingStandIn()
+    server.install(monkeypatch)
+    provider = OpenAIResponsesProvider(
+        Settings(
+            model="test-model",
+            base_url="http://127.0.0.1:8000/v1",
+            api_key="placeholder",
+            timeout_seconds=10.0,
+            system_prompt="system prompt",
+            enable_streaming=False,
+            prefer_responses_role_compat=False,
+            enable_token_debug_logs=False,
+            enable_throughput_debug_logs=False,
+            backend_base_urls=BACKENDS,
+        )
+    )
+
+    for session_id in ["session-1", "session-1", "session-2", "session-1"]:
+        await provider.generate(
+            ProviderRequest(
+                system_prompt="system prompt",
+                context={"schemaVersion": 1},
+                history=[],
+                message="What is shown?",
+                session_id=session_id,
+            )
+        )
+
+    assert server.hosts[0] == server.hosts[1] == server.hosts[3]
+    assert all(host.startswith("replica-") for host in server.hosts)
@@ -0,0 +1,151 @@
+import pytest
+
+from app.models import AgentTurnRequest, HistoryMessage
+from app.session_store import (
+    AgentSession,
+    InMemorySessionStore,
+    SessionComponentMissingError,
+    SqliteSessionStore,
+    hash_context,
+    hash_history,
+    hash_tools,
+    resolve_session_request,
+)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def build_session(session_id: str, history_length: int = 1) -> AgentSession:
+    history = [
+        HistoryMessage(id="u" + str(index), role="user", text="Question")
+        for index in range(history_length)
+    ]
+    return AgentSession(
+        session_id=session_id,
+        context={"schemaVersion": 1},
+        context_hash=hash_context({"schemaVersion": 1}),
+        tools=[],
+        tools_hash=hash_tools([]),
+        history=history,
+        history_hash=hash_history(history),
+    )
+
+
+def test_hash_history_chains_appended_items() -> None:
+    history = [
+        HistoryMessage(id="u1", role="user", text="First"),
+        HistoryMessage(id="a1", role="assistant", text="Answer"),
+    ]
+
+    assert hash_history(history) == hash_history(history[1:], hash_history(history[:1]))
+    assert hash_history(history) != hash_history(history[:1])
+
+
+def test_in_memory_session_store_evicts_lru_and_idle_sessions() -> None:
+    clock = FakeClock()
+    store = InMemorySessionStore(max_entries=2, idle_ttl_seconds=60, clock=clock)
+
+    store.put(build_session("a"))
+    store.put(build_session("b"))
+    assert store.get("a") is not None
+    store.put(build_session("c"))
+
+    assert store.get("b") is None
+    assert store.get("a") is not None
+
+    clock.now += 61
+    assert store.get("c") is None
+
+
+def test_sqlite_session_store_persists_sessions(tmp_path) -> None:  # type: ignore[no-untyped-def]
+    path = tmp_path / "sessions.sqlite3"
+    SqliteSessionStore(path).put(build_session("a", history_length=2))
+    SqliteSessionStore(path).put(build_session("a", history_length=3))
+
+    session = SqliteSessionStore(path).get("a")
+
+    assert session is not None
+    assert session.context == {"schemaVersion": 1}
+    assert [message.id for message in session.history] == ["u0", "u1", "u2"]
+    assert session.history_hash == build_session("a", 3).history_hash
+
+
+def test_sqlite_session_store_evicts_idle_and_excess_sessions(tmp_path) -> None:  # type: ignore[no-untyped-def]
+    clock = FakeClock()
+    store = SqliteSessionStore(
+        tmp_path / "sessions.sqlite3",
+        max_entries=2,
+        idle_ttl_seconds=60,
+        clock=clock,
+    )
+
+    for session_id in ("a", "b", "c"):
+        clock.now += 1
+        store.put(build_session(session_id))
+
+    assert store.get("a") is None
+    assert store.get("c") is not None
+    clock.now += 61
+    assert store.get("c") is None
+
+
+def test_resolve_session_request_rebuilds_full_request_from_delta() -> None:
+    store = InMemorySessionStore()
+    _, first = resolve_session_request(
+        AgentTurnRequest.model_validate(
+            {
+                "sessionId": "s1",
+                "message": "First",
+                "history": [{"id": "u1", "role": "user", "text": "Hello"}],
+                "context": {"schemaVersion": 1},
+            }
+        ),
+        store,
+    )
+
+    resolved, second = resolve_session_request(
+        AgentTurnRequest.model_validate(
+            {
+                "sessionId": "s1",
+                "message": "Second",
+                "history": [{"id": "a1", "role": "assistant", "text": "Hi"}],
+                "contextHash": first.context_hash,
+                "toolsHash": first.tools_hash,
+                "historyBaseHash": first.history_hash,
+            }
+        ),
+        store,
+    )
+
+    assert resolved.context == {"schemaVersion": 1}
+    assert [message.id for message in resolved.history] == ["u1", "a1"]
+    assert second.context_hash == first.context_hash
+    assert second.history_hash == hash_history(resolved.history)
+
+
+def test_resolve_session_request_reports_missing_components() -> None:
+    with pytest.raises(SessionComponentMissingError) as exc_info:
+        resolve_session_request(
+            AgentTurnRequest.model_validate(
+                {
+                    "sessionId": "unknown",
+                    "message": "Hello",
+                    "contextHash": "stale",
+                    "historyBaseHash": "stale",
+                }
+            ),
+            InMemorySessionStore(),
+        )
+
+    assert exc_info.value.missing == ["context", "history"]
+
+
+def test_agent_turn_request_requires_session_for_hashes() -> None:
+    with pytest.raises(ValueError):
+        AgentTurnRequest.model_validate({"message": "Hello", "contextHash": "x"})
@@ -0,0 +1,211 @@
+import json
+import time
+
+import anyio
+import pytest
+
+import app.main as main_module
+from app.config import Settings
+from app.models import ProviderRequest, ProviderResponse, ProviderStreamEvent
+from app.providers import ProviderError
+from app.stream_buffer import (
+    StreamBuffer,
+    StreamBufferOverflowError,
+    format_stream_buffer_stats,
+)
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    # The relay runs on uvicorn's asyncio loop.
+    return "asyncio"
+
+
+class FastProvider:
+    """Stream a fixed number of deltas without waiting for the client."""
+
+    def __init__(self, deltas: int) -> None:
+        self.deltas = deltas
+        self.drained = anyio.Event()
+
+    async def generate_stream(self, request):  # type: ignore[no-untyped-def]
+        for index in range(self.deltas):
+            yield ProviderStreamEvent(type="delta", delta="token" + str(index) + " ")
+        yield ProviderStreamEvent(
+            type="final", response=ProviderResponse(type="answer", message="Done.")
+        )
+        self.drained.set()
+
+
+def build_settings(stream_buffer_max_bytes: int) -> Settings:
+    return Settings(
+        model="test-model",
+        base_url="http://127.0.0.1:8000/v1",
+        api_key="placeholder",
+        timeout_seconds=10.0,
+        system_prompt="system prompt",
+        enable_streaming=True,
+        prefer_responses_role_compat=False,
+        enable_token_debug_logs=False,
+        enable_throughput_debug_logs=False,
+        stream_buffer_max_bytes=stream_buffer_max_bytes,
+    )
+
+
+def build_request() -> ProviderRequest:
+    return ProviderRequest(
+        system_prompt="system prompt",
+        context={"schemaVersion": 1},
+        history=[],
+        message="hello",
+    )
+
+
+@pytest.mark.anyio
+async def test_stream_buffer_coalesces_queued_deltas() -> None:
+    buffer = StreamBuffer(max_bytes=1024)
+
+    buffer.put(ProviderStreamEvent(type="delta", delta="Hel"))
+    buffer.put(ProviderStreamEvent(type="delta", delta="lo"))
+    buffer.put(ProviderStreamEvent(type="heartbeat"))
+    buffer.put(ProviderStreamEvent(type="reasoning_delta", reasoning="Checking."))
+    buffer.put(ProviderStreamEvent(type="delta", delta="!"))
+    buffer.close()
+
+    events = []
+    while (event := await buffer.get()) is not None:
+        events.append(event)
+
+    assert [(event.type, event.delta or event.reasoning) for event in events] == [
+        ("delta", "Hello"),
+        ("reasoning_delta", "Checking."),
+        ("delta", "!"),
+    ]
+    stats = buffer.stats()
+    assert stats.high_water_bytes == 15
+    assert stats.high_water_events == 3
+    assert stats.coalesced_events == 1
+    assert buffer.upstream_complete
+    assert "bytes=15 events=3 coalesced deltas=1" in format_stream_buffer_stats(stats)
+
+
+@pytest.mark.anyio
+async def test_stream_buffer_merges_many_small_deltas_in_linear_time() -> None:
+    # Rebuilding the merged text on every put takes tens of seconds here.
+    max_bytes = 1024 * 1024
+    buffer = StreamBuffer(max_bytes=max_bytes)
+    deltas = [
+        ProviderStreamEvent(type="delta", delta="8 bytes.")
+        for _ in range(max_bytes // 8)
+    ]
+
+    started_at = time.perf_counter()
+    for delta in deltas:
+        assert buffer.put(delta)
+    elapsed = time.perf_counter() - started_at
+    buffer.close()
+
+    assert elapsed < 2.0
+    event = await buffer.get()
+    assert event is not None and event.delta == "8 bytes." * (max_bytes // 8)
+    assert buffer.stats().high_water_bytes == max_bytes
+    assert await buffer.get() is None
+
+
+@pytest.mark.anyio
+async def test_stream_buffer_returns_queued_events_before_the_failure() -> None:
+    buffer = StreamBuffer()
+
+    buffer.put(ProviderStreamEvent(type="delta", delta="Partial"))
+    buffer.close(ProviderError("Provider stream broke."))
+
+    assert (await buffer.get()) == ProviderStreamEvent(type="delta", delta="Partial")
+    with pytest.raises(ProviderError):
+        await buffer.get()
+    assert not buffer.upstream_complete
+
+
+@pytest.mark.anyio
+async def test_stream_buffer_overflows_past_its_byte_cap() -> None:
+    buffer = StreamBuffer(max_bytes=4)
+
+    assert buffer.put(ProviderStreamEvent(type="delta", delta="abc"))
+    assert not buffer.put(ProviderStreamEvent(type="delta", delta="de"))
+
+    with pytest.raises(StreamBufferOverflowError):
+        await buffer.get()
+
+
+@pytest.mark.anyio
+async def test_slow_client_does_not_hold_back_the_upstream(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    provider = FastProvider(deltas=50)
+    monkeypatch.setattr("app.main.get_provider", lambda: provider)
+
+    stream = main_module._stream_plan(
+        build_request(), build_settings(1024 * 1024), estimated_input_tokens=None
+    )
+    assert "event: start" in await anext(stream)
+    with anyio.fail_after(1):
+        await provider.drained.wait()
+    events = [event async for event in stream]
+
+    assert len(events) == 2
+    assert events[0].startswith("event: delta")
+    assert "token49" in events[0]
+    trace = json.loads(events[1].split("data: ", 1)[1])["trace"]
+    assert trace["buffer"]["coalescedEvents"] == 49
+
+
+@pytest.mark.anyio
+async def test_client_too_slow_for_the_buffer_is_abandoned(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    provider = FastProvider(deltas=50)
+    monkeypatch.setattr("app.main.get_provider", lambda: provider)
+
+    stream = main_module._stream_plan(
+        build_request(), build_settings(64), estimated_input_tokens=None
+    )
+    assert "event: start" in await anext(stream)
+    await anyio.sleep(0.05)
+    events = [event async for event in stream]
+
+    assert len(events) == 1
+    assert events[0].startswith("event: error")
+    assert "bytes behind" in events[0]
+    assert not provider.drained.is_set()
+
+
+@pytest.mark.anyio
+async def test_get_coalesced_merges_deltas_within_the_delay() -> None:
+    buffer = StreamBuffer()
+
+    async def produce() -> None:
+        for index in range(5):
+            buffer.put(ProviderStreamEvent(type="delta", delta=str(index)))
+            await anyio.sleep(0.005)
+        buffer.put(
+            ProviderStreamEvent(
+                type="final", response=ProviderResponse(type="answer", message="")
+            )
+        )
+        buffer.close()
+
+    async with anyio.create_task_group() as task_group:
+        task_group.start_soon(produce)
+        merged = await buffer.get_coalesced(1.0, max_bytes=1024)
+        final = await buffer.get_coalesced(1.0, max_bytes=1024)
+
+    assert merged == ProviderStreamEvent(type="delta", delta="01234")
+    assert final is not None and final.type == "final"
+    assert await buffer.get() is None
+
+
+@pytest.mark.anyio
+async def test_get_coalesced_flushes_at_the_byte_limit() -> None:
+    buffer = StreamBuffer()
+    buffer.put(ProviderStreamEvent(type="reasoning_delta", reasoning="abcdef"))
+
+    with anyio.fail_after(1):
+        first = await buffer.get_coalesced(10.0, max_bytes=4)
+
+    assert first is not None
+    assert first.reasoning == "abcdef"
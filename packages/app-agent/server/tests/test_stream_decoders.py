@@ -0,0 +1,162 @@
+import json
+
+import httpx
+import pytest
+
+from app.models import ProviderResponse, ProviderStreamEvent
+from app.providers.streaming import (
+    STREAM_DECODERS,
+    StreamDialect,
+    decode_generic_stream_event,
+    detect_stream_dialect,
+    iter_provider_stream_events,
+)
+
+RESPONSES_EVENTS = [
+    ("response.created", {"type": "response.created", "response": {"id": "r1"}}),
+    ("response.in_progress", {"type": "response.in_progress", "response": {}}),
+    (
+        "response.output_text.delta",
+        {"type": "response.output_text.delta", "delta": "Hi"},
+    ),
+    (
+        "response.output_text.delta",
+        {"type": "response.output_text.delta", "delta": "<tool_call>"},
+    ),
+    (
+        "response.output_item.done",
+        {
+            "type": "response.output_item.done",
+            "item": {
+                "type": "function_call",
+                "call_id": "call_1",
+                "name": "expandViewNode",
+                "arguments": "{}",
+            },
+        },
+    ),
+    ("response.output_text.done", {"type": "response.output_text.done", "text": "Hi"}),
+    (
+        "response.completed",
+        {
+            "type": "response.completed",
+            "response": {"id": "r1", "usage": {"input_tokens": 5, "output_tokens": 1}},
+        },
+    ),
+]
+
+CHAT_COMPLETIONS_EVENTS = [
+    (
+        "message",
+        {
+            "object": "chat.completion.chunk",
+            "choices": [{"delta": {"role": "assistant", "content": None}}],
+        },
+    ),
+    (
+        "message",
+        {
+            "object": "chat.completion.chunk",
+            "choices": [{"delta": {"reasoning_content": "Thinking."}}],
+        },
+    ),
+    (
+        "message",
+        {"object": "chat.completion.chunk", "choices": [{"delta": {"content": "Hi"}}]},
+    ),
+    (
+        "message",
+        {"object": "chat.completion.chunk", "choices": [{"delta": {"text": "!"}}]},
+    ),
+    ("message", {"object": "chat.completion.chunk", "choices": [], "usage": {}}),
+    (
+        "message",
+        {"object": "chat.completion.chunk", "choices": [{"finish_reason": "stop"}]},
+    ),
+]
+
+
+def test_detect_stream_dialect() -> None:
+    assert detect_stream_dialect(*RESPONSES_EVENTS[0]) == "responses"
+    assert (
+        detect_stream_dialect("message", {"type": "response.output_text.delta"})
+        == "responses"
+    )
+    assert detect_stream_dialect(*CHAT_COMPLETIONS_EVENTS[0]) == "chat_completions"
+    assert detect_stream_dialect("message", {"delta": "Hi"}) is None
+    assert detect_stream_dialect("message", "plain text") is None
+
+
+@pytest.mark.parametrize(
+    ("dialect", "events"),
+    [
+        ("responses", RESPONSES_EVENTS),
+        ("chat_completions", CHAT_COMPLETIONS_EVENTS),
+    ],
+)
+def test_specialized_decoders_match_the_generic_decoder(dialect, events) -> None:  # type: ignore[no-untyped-def]
+    decoder = STREAM_DECODERS[dialect]
+
+    for event_name, payload in events:
+        assert decoder(event_name, payload) == decode_generic_stream_event(
+            event_name, payload
+        )
+
+
+def build_chat_completions_response() -> httpx.Response:
+    body = (
+        "".join(
+            "data: " + json.dumps(payload) + "\n\n"
+            for _, payload in CHAT_COMPLETIONS_EVENTS
+        )
+        + "data: [DONE]\n\n"
+    )
+    return httpx.Response(
+        200,
+        headers={"content-type": "text/event-stream"},
+        content=body.encode("utf-8"),
+    )
+
+
+async def decode_chat_completions_stream(
+    dialect: StreamDialect | None = None,
+) -> list[ProviderStreamEvent]:
+    return [
+        event
+        async for event in iter_provider_stream_events(
+            build_chat_completions_response(),
+            parse_provider_response_text=lambda text, allow_repair: ProviderResponse(
+                type="answer", message=text
+            ),
+            normalize_provider_text=lambda text: text,
+            truncate_logged_content=lambda text: text,
+            dialect=dialect,
+        )
+    ]
+
+
+@pytest.mark.anyio
+async def test_chat_completions_stream_is_decoded_end_to_end() -> None:
+    events = await decode_chat_completions_stream()
+
+    assert [(event.type, event.delta or event.reasoning) for event in events] == [
+        ("reasoning_delta", "Thinking."),
+        ("delta", "Hi"),
+        ("delta", "!"),
+        ("final", None),
+    ]
+    assert events[-1].response is not None
+    assert events[-1].response.message == "Hi!"
+
+
+@pytest.mark.anyio
+async def test_known_dialect_skips_detection(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    def fail_detection(event_name: str, payload: object) -> None:
+        raise AssertionError("Dialect detection should be skipped.")
+
+    monkeypatch.setattr("app.providers.streaming.detect_stream_dialect", fail_detection)
+
+    events = await decode_chat_completions_stream("chat_completions")
+
+    assert events[-1].response is not None
+    assert events[-1].response.message == "Hi!"
@@ -1,5 +1,8 @@
-from app.models import ProviderResponse, ToolCall
+from app.models import ProviderResponse, ProviderUsage, ToolCall
 from app.throughput_debugger import (
+    CancellationTracker,
+    PromptCacheTracker,
+    format_cancellation_summary,
     format_throughput_summary,
     summarize_response_throughput,
 )
@@ -69,6 +72,48 @@ def test_format_throughput_summary_marks_estimation_clearly() -> None:
     assert "  estimated total tokens/s: " in formatted
 
 
+def test_prompt_cache_tracker_reports_session_and_model_hit_ratios() -> None:
+    tracker = PromptCacheTracker()
+
+    tracker.record("gpt-4.1-mini", "session-1", ProviderUsage(input_tokens=1000))
+    tracker.record(
+        "gpt-4.1-mini",
+        "session-2",
+        ProviderUsage(input_tokens=1000, cached_input_tokens=500),
+    )
+    summary = tracker.record(
+        "gpt-4.1-mini",
+        "session-1",
+        ProviderUsage(input_tokens=1000, cached_input_tokens=900),
+    )
+
+    assert summary.cached_input_tokens == 900
+    assert summary.session_hit_ratio == 0.45
+    assert summary.session_turns == 2
+    assert summary.model_hit_ratio == 1400 / 3000
+    assert summary.model_turns == 3
+
+
+def test_format_throughput_summary_includes_prompt_cache_hits() -> None:
+    prompt_cache = PromptCacheTracker().record(
+        "gpt-4.1-mini",
+        None,
+        ProviderUsage(input_tokens=200, cached_input_tokens=150),
+    )
+    summary = summarize_response_throughput(
+        ProviderResponse(type="answer", message="ok"),
+        250,
+        "gpt-4.1-mini",
+        prompt_cache=prompt_cache,
+    )
+
+    formatted = format_throughput_summary(summary)
+
+    assert "  upstream input tokens: 200 (cached 150)" in formatted
+    assert "  prompt cache hit ratio (session): n/a" in formatted
+    assert "  prompt cache hit ratio (model): 75.0% over 1 turns" in formatted
+
+
 def test_summarize_response_throughput_rejects_invalid_inputs() -> None:
     response = ProviderResponse(type="answer", message="ok")
 
@@ -85,3 +130,21 @@ def test_summarize_response_throughput_rejects_invalid_inputs() -> None:
         assert str(exc) == "Model name must not be blank."
     else:
         raise AssertionError("Expected ValueError for blank model name.")
+
+
+def test_cancellation_tracker_estimates_saved_tokens() -> None:
+    tracker = CancellationTracker()
+
+    unknown = tracker.record_cancelled("partial", "gpt-4.1-mini")
+    tracker.record_completed(ProviderUsage(input_tokens=10, output_tokens=100))
+    tracker.record_completed(ProviderUsage(input_tokens=10, output_tokens=300))
+    tracker.record_completed(ProviderUsage(input_tokens=10))
+    summary = tracker.record_cancelled("", "gpt-4.1-mini")
+
+    assert unknown.estimated_tokens_saved is None
+    assert unknown.streamed_output_tokens > 0
+    assert summary.estimated_tokens_saved == 200
+    assert summary.cancelled_turns == 2
+    assert summary.total_estimated_tokens_saved == 200
+    assert "estimated tokens saved=n/a" in format_cancellation_summary(unknown)
+    assert "total estimated tokens saved=200" in format_cancellation_summary(summary)
@@ -0,0 +1,150 @@
+import json
+from typing import Any, AsyncIterator
+
+import anyio
+import httpx
+import pytest
+from responses_stand_in import ResponsesStandIn, build_provider
+
+from app.models import ProviderRequest
+from app.providers.openai_responses import OpenAIResponsesProvider
+from app.providers.timeouts import (
+    PhaseTimeouts,
+    ProviderTimeoutError,
+    RequestDeadlines,
+)
+
+
+async def slow_events(delays: list[float]) -> AsyncIterator[int]:
+    for index, delay in enumerate(delays):
+        await anyio.sleep(delay)
+        yield index
+
+
+async def collect(deadlines: RequestDeadlines, delays: list[float]) -> list[int]:
+    return [event async for event in deadlines.iter_events(slow_events(delays))]
+
+
+class StallingStandIn(ResponsesStandIn):
+    """Stall streams sent to `stalled_host` before or after their first event."""
+
+    def __init__(self, stalled_host: str, stall_after_first_event: bool) -> None:
+        super().__init__()
+        self.stalled_host = stalled_host
+        self.stall_after_first_event = stall_after_first_event
+        self.hosts: list[str] = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.hosts.append(request.url.host)
+        if request.url.host != self.stalled_host:
+            return super().handle(request)
+
+        self.requests.append(json.loads(request.content))
+        stall_after_first_event = self.stall_after_first_event
+
+        async def stalled_body() -> AsyncIterator[bytes]:
+            if stall_after_first_event:
+                yield b'event: response.output_text.delta\ndata: {"delta": "Par"}\n\n'
+            await anyio.sleep(5)
+            yield b""
+
+        return httpx.Response(
+            200,
+            headers={"content-type": "text/event-stream"},
+            content=stalled_body(),
+        )
+
+
+FAILOVER_SETTINGS: dict[str, Any] = {
+    "backend_base_urls": ("http://a.test/v1", "http://b.test/v1"),
+    "first_event_timeout_seconds": 0.2,
+    "stream_idle_timeout_seconds": 0.2,
+}
+
+
+def build_request() -> ProviderRequest:
+    return ProviderRequest(
+        system_prompt="system prompt",
+        context={"schemaVersion": 1},
+        history=[],
+        message="hello",
+        session_id="session-1",
+    )
+
+
+def stalled_backend_host(provider: OpenAIResponsesProvider) -> str:
+    assert provider._router is not None
+    preferred = provider._router.preferred_backend("session-1")
+    return httpx.URL(preferred).host
+
+
+@pytest.mark.anyio
+async def test_deadlines_bound_the_first_event() -> None:
+    deadlines = RequestDeadlines(PhaseTimeouts(10.0, first_event_seconds=0.05))
+
+    with pytest.raises(ProviderTimeoutError) as error:
+        await collect(deadlines, [0.5])
+
+    assert error.value.phase == "first_event"
+    assert error.value.timeout_seconds == 0.05
+
+
+@pytest.mark.anyio
+async def test_deadlines_bound_idle_gaps_after_the_first_event() -> None:
+    deadlines = RequestDeadlines(
+        PhaseTimeouts(10.0, first_event_seconds=1.0, idle_seconds=0.05)
+    )
+
+    with pytest.raises(ProviderTimeoutError) as error:
+        await collect(deadlines, [0.1, 0.0, 0.5])
+
+    assert error.value.phase == "idle"
+
+
+@pytest.mark.anyio
+async def test_deadlines_bound_the_total_duration() -> None:
+    deadlines = RequestDeadlines(
+        PhaseTimeouts(10.0, idle_seconds=0.1, total_seconds=0.15)
+    )
+
+    with pytest.raises(ProviderTimeoutError) as error:
+        await collect(deadlines, [0.06, 0.06, 0.06, 0.06])
+
+    assert error.value.phase == "total"
+
+
+@pytest.mark.anyio
+async def test_deadlines_without_budgets_do_not_interfere() -> None:
+    assert await collect(RequestDeadlines(PhaseTimeouts(10.0)), [0.0, 0.0]) == [0, 1]
+
+
+@pytest.mark.anyio
+async def test_stream_stalled_before_output_fails_over(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    provider = build_provider(**FAILOVER_SETTINGS)
+    server = StallingStandIn(stalled_backend_host(provider), False)
+    server.install(monkeypatch)
+
+    events = [event async for event in provider.generate_stream(build_request())]
+
+    assert len(set(server.hosts)) == 2
+    assert server.hosts[0] == server.stalled_host
+    final = events[-1]
+    assert final.type == "final"
+    assert final.response is not None
+    assert final.response.timed_out_phases == ("first_event",)
+
+
+@pytest.mark.anyio
+async def test_stream_stalled_after_output_is_reported(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    provider = build_provider(**FAILOVER_SETTINGS)
+    server = StallingStandIn(stalled_backend_host(provider), True)
+    server.install(monkeypatch)
+    events = []
+
+    with pytest.raises(ProviderTimeoutError) as error:
+        async for event in provider.generate_stream(build_request()):
+            events.append(event)
+
+    assert error.value.phase == "idle"
+    assert [event.type for event in events] == ["delta"]
+    assert server.hosts == [server.stalled_host]
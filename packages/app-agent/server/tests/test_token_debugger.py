@@ -1,5 +1,6 @@
 from app.models import (
     HistoryMessage,
+    HistoryWindowPolicy,
     ProviderRequest,
     ProviderToolDefinition,
     ToolCall,
@@ -194,3 +195,24 @@ def test_format_token_summary_lists_ranked_context_keys() -> None:
     assert "  context keys:" in formatted
     assert "viewRoot = " in formatted
     assert "of context, " in formatted
+
+
+def test_summarize_prompt_tokens_reports_dropped_history() -> None:
+    request = ProviderRequest(
+        system_prompt="system prompt",
+        context={"schemaVersion": 1},
+        history=[
+            HistoryMessage(id=str(index), role="user", text="Question " * 50)
+            for index in range(6)
+        ],
+        message="Follow-up question",
+        history_window=HistoryWindowPolicy(token_budget=1, keep_recent_turns=2),
+    )
+
+    summary = summarize_prompt_tokens(request, "gpt-4.1-mini")
+    formatted = format_token_summary(summary)
+
+    assert summary.history_dropped_messages == 4
+    assert summary.history_dropped_tokens > summary.history
+    assert "    history dropped by window = " in formatted
+    assert "(4 messages, not sent)" in formatted
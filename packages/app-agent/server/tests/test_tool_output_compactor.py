@@ -0,0 +1,112 @@
+import json
+
+from app.models import HistoryMessage, ProviderRequest, ToolOutputCompactionPolicy
+from app.prompt_builder import build_prompt_ir, build_responses_input
+from app.tool_output_compactor import (
+    compact_json_value,
+    compact_tool_outputs,
+    limit_json_depth,
+)
+
+
+def build_tool_history(output_count: int) -> list[HistoryMessage]:
+    history: list[HistoryMessage] = []
+    for index in range(output_count):
+        history.append(
+            HistoryMessage(
+                id=f"t{index}",
+                role="tool",
+                text=f"Summarized attribute {index}.",
+                tool_call_id=f"call_{index}",
+                content={
+                    "kind": "attribute_summary",
+                    "values": list(range(50)),
+                    "note": "x" * 1000,
+                },
+            )
+        )
+    return history
+
+
+def test_compact_json_value_truncates_arrays_strings_and_depth() -> None:
+    policy = ToolOutputCompactionPolicy(
+        max_array_items=2, max_string_chars=5, max_depth=2
+    )
+
+    compacted = compact_json_value(
+        {
+            "values": [1, 2, 3, 4],
+            "label": "abcdefghij",
+            "nested": {"deeper": {"deepest": [1]}, "list": [[1, 2]]},
+        },
+        policy,
+    )
+
+    assert compacted == {
+        "values": [1, 2, "[2 more items omitted]"],
+        "label": "abcde… [5 more characters omitted]",
+        "nested": {
+            "deeper": "[object with 1 keys omitted]",
+            "list": "[array with 1 items omitted]",
+        },
+    }
+
+
+def test_limit_json_depth_only_summarizes_deep_containers() -> None:
+    value = {
+        "values": [1, 2, 3, 4],
+        "label": "abcdefghij" * 100,
+        "nested": {"deeper": {"deepest": [1]}, "list": [[1, 2]]},
+    }
+
+    assert limit_json_depth(value, 2) == {
+        "values": [1, 2, 3, 4],
+        "label": "abcdefghij" * 100,
+        "nested": {
+            "deeper": "[object with 1 keys omitted]",
+            "list": "[array with 1 items omitted]",
+        },
+    }
+
+
+def test_compact_tool_outputs_keeps_recent_outputs_verbatim() -> None:
+    history = build_tool_history(4)
+
+    compacted, count = compact_tool_outputs(
+        history, ToolOutputCompactionPolicy(keep_recent_outputs=2)
+    )
+
+    assert count == 2
+    assert compacted[2:] == history[2:]
+    assert compacted[0].content["values"][-1] == "[45 more items omitted]"
+    assert len(compacted[0].content["note"]) < 500
+    assert history[0].content["values"] == list(range(50))
+
+
+def test_compact_tool_outputs_is_deterministic_across_turns() -> None:
+    policy = ToolOutputCompactionPolicy(keep_recent_outputs=1)
+    history = build_tool_history(3)
+
+    first, _ = compact_tool_outputs(history[:2], policy)
+    second, _ = compact_tool_outputs(history, policy)
+
+    assert first[0] == second[0]
+
+
+def test_build_responses_input_compacts_older_tool_outputs() -> None:
+    request = ProviderRequest(
+        system_prompt="system prompt",
+        context={"schemaVersion": 1},
+        history=build_tool_history(3),
+        message="continue",
+        tool_output_compaction=ToolOutputCompactionPolicy(keep_recent_outputs=1),
+    )
+
+    prompt = build_prompt_ir(request)
+    messages = build_responses_input(prompt)
+
+    assert prompt.compacted_tool_outputs == 2
+    older_output = json.loads(messages[1]["output"])
+    recent_output = json.loads(messages[3]["output"])
+    assert older_output["content"]["values"][-1] == "[45 more items omitted]"
+    assert recent_output["content"]["values"] == list(range(50))
@@ -0,0 +1,123 @@
+import threading
+
+import httpx
+import pytest
+from responses_stand_in import ResponsesStandIn, build_provider
+
+from app.models import ProviderRequest
+from app.traffic_recorder import (
+    RecordedChunk,
+    RecordingTransport,
+    TrafficRecord,
+    TrafficRecorder,
+    bind_recorded_turn,
+    read_traffic_records,
+    traffic_record_files,
+)
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    # The relay runs on uvicorn's asyncio loop.
+    return "asyncio"
+
+
+def build_record(index: int) -> TrafficRecord:
+    return TrafficRecord(
+        turn_id="turn-" + str(index),
+        request=None,
+        method="POST",
+        path="/v1/responses",
+        payload={"index": index},
+        status_code=200,
+        headers={"content-type": "application/json"},
+        chunks=(RecordedChunk(12.5, b'{"id": "resp_1"}'),),
+        recorded_at=1000.0 + index,
+    )
+
+
+def test_traffic_recorder_rotates_files_and_reads_them_in_order(tmp_path) -> None:  # type: ignore[no-untyped-def]
+    path = tmp_path / "traffic.jsonl"
+    recorder = TrafficRecorder(path, max_bytes=300, backups=2)
+
+    for index in range(4):
+        recorder.write(build_record(index))
+
+    files = traffic_record_files(path)
+    assert [file.name for file in files] == [
+        "traffic.jsonl.2",
+        "traffic.jsonl.1",
+        "traffic.jsonl",
+    ]
+    records = list(read_traffic_records(path))
+    assert [record.payload["index"] for record in records] == [1, 2, 3]
+    assert records[0] == build_record(1)
+
+
+def test_traffic_record_round_trips_binary_chunks() -> None:
+    record = TrafficRecord.from_json(
+        {
+            **build_record(0).to_json(),
+            "chunks": [
+                {
+                    "atMs": 1.0,
+                    "data": b"\x1f\x8b\xff".decode("utf-8", errors="surrogateescape"),
+                }
+            ],
+        }
+    )
+
+    assert record.body == b"\x1f\x8b\xff"
+
+
+@pytest.mark.anyio
+async def test_provider_records_upstream_streams(monkeypatch, tmp_path) -> None:  # type: ignore[no-untyped-def]
+    server = ResponsesStandIn()
+    monkeypatch.setattr(
+        httpx, "AsyncHTTPTransport", lambda: httpx.MockTransport(server.handle)
+    )
+    path = tmp_path / "traffic.jsonl"
+    provider = build_provider(traffic_record_path=str(path))
+    request = ProviderRequest(
+        system_prompt="system prompt",
+        context={"schemaVersion": 1},
+        history=[],
+        message="hello",
+    )
+
+    bind_recorded_turn(request)
+    events = [event async for event in provider.generate_stream(request)]
+
+    [record] = read_traffic_records(path)
+    assert events[-1].type == "final"
+    assert record.turn_id is not None
+    assert record.request is not None and record.request["message"] == "hello"
+    assert record.path == "/v1/responses"
+    assert record.payload["stream"] is True
+    assert record.headers == {"content-type": "text/event-stream"}
+    assert b"response.completed" in record.body
+    assert record.chunks[0].at_ms >= 0
+
+
+@pytest.mark.anyio
+async def test_records_are_written_off_the_event_loop(monkeypatch, tmp_path) -> None:  # type: ignore[no-untyped-def]
+    recorder = TrafficRecorder(tmp_path / "traffic.jsonl")
+    writer_threads: list[int] = []
+    write = recorder.write
+
+    def tracking_write(record: TrafficRecord) -> None:
+        writer_threads.append(threading.get_ident())
+        write(record)
+
+    monkeypatch.setattr(recorder, "write", tracking_write)
+    transport = RecordingTransport(
+        recorder, httpx.MockTransport(lambda request: httpx.Response(200, text="OK"))
+    )
+
+    async with httpx.AsyncClient(transport=transport) as client:
+        response = await client.get("http://upstream.test/v1/models")
+
+    assert response.text == "OK"
+    assert writer_threads and writer_threads[0] != threading.get_ident()
+    [record] = read_traffic_records(tmp_path / "traffic.jsonl")
+    assert record.body == b"OK"
@@ -0,0 +1,151 @@
+import time
+
+import httpx
+import pytest
+from responses_stand_in import ResponsesStandIn, build_provider
+
+from app.main import app, get_provider, get_settings
+from app.models import ProviderRequest, ProviderResponse
+from app.traffic_recorder import (
+    RecordedChunk,
+    TrafficRecord,
+    bind_recorded_turn,
+    read_traffic_records,
+)
+from app.traffic_replay import (
+    RecordedResponses,
+    build_mock_upstream,
+    drive_relay,
+    recorded_turns,
+    replay_chunks,
+)
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    # The relay runs on uvicorn's asyncio loop.
+    return "asyncio"
+
+
+class EchoProvider:
+    async def generate(self, request):  # type: ignore[no-untyped-def]
+        return ProviderResponse(type="answer", message="Echo: " + request.message)
+
+
+def build_record(
+    payload: object,
+    chunks: tuple[RecordedChunk, ...] = (),
+    turn_id: str | None = None,
+    request: dict[str, object] | None = None,
+) -> TrafficRecord:
+    return TrafficRecord(
+        turn_id=turn_id,
+        request=request,
+        method="POST",
+        path="/v1/responses",
+        payload=payload,
+        status_code=200,
+        headers={"content-type": "text/event-stream"},
+        chunks=chunks,
+        recorded_at=1000.0,
+    )
+
+
+def test_recorded_responses_prefer_matching_payloads() -> None:
+    first = build_record({"input": "a"})
+    second = build_record({"input": "b"})
+    responses = RecordedResponses([first, second])
+
+    assert responses.match("POST", "/v1/responses", {"input": "b"}) is second
+    assert responses.match("POST", "/v1/responses", {"input": "changed"}) is first
+    assert responses.match("POST", "/v1/responses", {"input": "changed"}) is second
+    assert responses.match("GET", "/v1/models", None) is None
+
+
+@pytest.mark.anyio
+async def test_replay_chunks_scales_the_recorded_timing() -> None:
+    record = build_record(
+        None, (RecordedChunk(0.0, b"first "), RecordedChunk(80.0, b"second"))
+    )
+
+    started_at = time.perf_counter()
+    body = b"".join([chunk async for chunk in replay_chunks(record, speed=2)])
+    elapsed_ms = (time.perf_counter() - started_at) * 1000
+    instant = b"".join([chunk async for chunk in replay_chunks(record, speed=0)])
+
+    assert body == instant == b"first second"
+    assert 35 <= elapsed_ms < 80
+
+
+@pytest.mark.anyio
+async def test_mock_upstream_replays_recorded_stream(monkeypatch, tmp_path) -> None:  # type: ignore[no-untyped-def]
+    server = ResponsesStandIn()
+    monkeypatch.setattr(
+        httpx, "AsyncHTTPTransport", lambda: httpx.MockTransport(server.handle)
+    )
+    path = tmp_path / "traffic.jsonl"
+    request = ProviderRequest(
+        system_prompt="system prompt",
+        context={"schemaVersion": 1},
+        history=[],
+        message="hello",
+    )
+    bind_recorded_turn(request)
+    recorded = [
+        event
+        async for event in build_provider(
+            traffic_record_path=str(path)
+        ).generate_stream(request)
+    ]
+
+    upstream = httpx.ASGITransport(
+        app=build_mock_upstream(read_traffic_records(path), speed=0)
+    )
+    real_async_client = httpx.AsyncClient
+    monkeypatch.setattr(
+        httpx,
+        "AsyncClient",
+        lambda **kwargs: real_async_client(transport=upstream, **kwargs),
+    )
+    replayed = [event async for event in build_provider().generate_stream(request)]
+
+    assert [event.type for event in replayed] == [event.type for event in recorded]
+    assert replayed[-1].response == recorded[-1].response
+    assert len(server.requests) == 1
+
+
+@pytest.mark.anyio
+async def test_drive_relay_replays_each_recorded_turn_once(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    monkeypatch.setenv("GENOMESPY_AGENT_MODEL", "test-model")
+    get_settings.cache_clear()
+    monkeypatch.setattr("app.main.get_provider", lambda: EchoProvider())
+    request = ProviderRequest(
+        system_prompt="system prompt",
+        context={"schemaVersion": 1},
+        history=[],
+        message="hello",
+        session_id="session-1",
+    ).model_dump(mode="json", by_alias=True)
+    records = [
+        build_record(None),
+        build_record(None, turn_id="turn-1", request=request),
+        build_record(None, turn_id="turn-1", request=request),
+        build_record(None, turn_id="turn-2", request={**request, "message": "again"}),
+    ]
+
+    turns = recorded_turns(records)
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://relay"
+    ) as client:
+        results = [result async for result in drive_relay(turns, client, concurrency=2)]
+
+    assert [turn["message"] for turn in turns] == ["hello", "again"]
+    assert turns[0]["sessionId"] == "session-1"
+    assert sorted(result.status_code for result in results) == [200, 200]
+    assert {result.response["message"] for result in results if result.response} == {
+        "Echo: hello",
+        "Echo: again",
+    }
+
+    get_settings.cache_clear()
+    get_provider.cache_clear()
@@ -0,0 +1,169 @@
+from typing import AsyncIterator
+
+import anyio
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app, get_provider, get_settings, get_turn_replay_store
+from app.models import ProviderResponse, ProviderStreamEvent
+from app.turn_replay import (
+    TURN_ID_HEADER,
+    ReplayableTurn,
+    TurnEventsExpiredError,
+    TurnReplayStore,
+)
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    # The relay runs on uvicorn's asyncio loop.
+    return "asyncio"
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class StreamingProvider:
+    async def generate_stream(self, request):  # type: ignore[no-untyped-def]
+        yield ProviderStreamEvent(type="delta", delta="The beta-value")
+        yield ProviderStreamEvent(type="delta", delta=" track.")
+        yield ProviderStreamEvent(
+            type="final",
+            response=ProviderResponse(type="answer", message="The beta-value track."),
+        )
+
+
+async def frames(count: int, then_wait: bool = False) -> AsyncIterator[str]:
+    for index in range(count):
+        yield "event: delta\ndata: " + str(index) + "\n\n"
+    if then_wait:
+        await anyio.sleep(10)
+
+
+async def collect(stream: AsyncIterator[bytes]) -> list[str]:
+    return [frame.decode("utf-8") async for frame in stream]
+
+
+def test_replayable_turn_drops_the_oldest_frames_past_its_cap() -> None:
+    turn = ReplayableTurn("turn-1", max_bytes=64)
+
+    for index in range(4):
+        turn.append("event: delta\ndata: " + str(index) + "\n\n")
+
+    assert turn.last_event_id == 4
+    assert [frame.decode() for frame in turn.frames_after(3)] == [
+        "id: 4\nevent: delta\ndata: 3\n\n"
+    ]
+    with pytest.raises(TurnEventsExpiredError) as error:
+        turn.frames_after(0)
+    assert error.value.first_available_id == 3
+
+
+@pytest.mark.anyio
+async def test_turn_replay_store_replays_after_the_last_event_id() -> None:
+    clock = FakeClock()
+    store = TurnReplayStore(ttl_seconds=60, grace_seconds=1, clock=clock)
+    turn = store.start("turn-1", frames(3))
+
+    first = await collect(store.subscribe(turn))
+    resumed = await collect(store.subscribe(turn, last_event_id=2))
+
+    assert [frame.split("\n")[0] for frame in first] == ["id: 1", "id: 2", "id: 3"]
+    assert resumed == ["id: 3\nevent: delta\ndata: 2\n\n"]
+    clock.now = 61
+    assert store.get("turn-1") is None
+
+
+@pytest.mark.anyio
+async def test_abandoned_turn_is_cancelled_after_the_grace_period() -> None:
+    store = TurnReplayStore(ttl_seconds=60, grace_seconds=0.05)
+    turn = store.start("turn-1", frames(1, then_wait=True))
+
+    subscription = store.subscribe(turn)
+    await anext(subscription)
+    await subscription.aclose()
+    resumed = store.subscribe(turn, last_event_id=1)
+    with anyio.move_on_after(0.1):
+        await anext(resumed)
+    assert not turn.done
+
+    await resumed.aclose()
+    with anyio.fail_after(1):
+        while not turn.done:
+            await anyio.sleep(0.01)
+    assert turn.last_event_id == 1
+
+
+@pytest.mark.anyio
+async def test_slow_subscriber_gets_an_error_event_when_frames_expire() -> None:
+    store = TurnReplayStore(ttl_seconds=60, grace_seconds=1, max_bytes_per_turn=64)
+    turn = store.start("turn-1", frames(1, then_wait=True))
+    subscription = store.subscribe(turn)
+    assert (await anext(subscription)).startswith(b"id: 1")
+
+    for index in range(1, 5):
+        turn.append("event: delta\ndata: " + str(index) + "\n\n")
+    remaining = await collect(subscription)
+
+    assert len(remaining) == 1
+    assert remaining[0].startswith("event: error\n")
+    assert "no longer holds the events after 1" in remaining[0]
+    turn.cancel_producer()
+
+
+@pytest.mark.anyio
+async def test_turn_replay_store_evicts_finished_turns_first() -> None:
+    store = TurnReplayStore(ttl_seconds=60, grace_seconds=1, max_turns=2)
+    running = store.start("running", frames(0, then_wait=True))
+    finished = store.start("finished", frames(1))
+    await collect(store.subscribe(finished))
+
+    store.start("newest", frames(0, then_wait=True))
+    assert store.get("running") is running
+    assert store.get("finished") is None
+
+    store.start("overflow", frames(0, then_wait=True))
+    await anyio.sleep(0)
+    assert store.get("running") is None
+    assert running.done
+
+    for turn_id in ("newest", "overflow"):
+        turn = store.get(turn_id)
+        assert turn is not None
+        turn.cancel_producer()
+
+
+def test_stream_can_be_resumed_with_last_event_id(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    monkeypatch.setenv("GENOMESPY_AGENT_MODEL", "test-model")
+    monkeypatch.setenv("GENOMESPY_AGENT_ENABLE_STREAM_RESUMPTION", "true")
+    get_settings.cache_clear()
+    get_turn_replay_store.cache_clear()
+    monkeypatch.setattr("app.main.get_provider", lambda: StreamingProvider())
+    client = TestClient(app)
+
+    response = client.post(
+        "/v1/agent-turn?stream=true",
+        json={"message": "Hi", "history": [], "context": {"schemaVersion": 1}},
+    )
+    turn_id = response.headers[TURN_ID_HEADER]
+    resumed = client.get(
+        "/v1/agent-turn/" + turn_id + "/events", headers={"Last-Event-ID": "1"}
+    )
+    unknown = client.get("/v1/agent-turn/unknown/events")
+
+    assert response.text.startswith("id: 1\nevent: start\n")
+    assert '"turnId": "' + turn_id + '"' in response.text
+    assert resumed.status_code == 200
+    assert resumed.text.startswith("id: 2\nevent: delta\n")
+    assert "event: final" in resumed.text
+    assert response.text.endswith(resumed.text)
+    assert unknown.status_code == 404
+
+    get_settings.cache_clear()
+    get_turn_replay_store.cache_clear()
+    get_provider.cache_clear()
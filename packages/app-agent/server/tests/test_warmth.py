@@ -0,0 +1,148 @@
+import asyncio
+
+import pytest
+from responses_stand_in import ResponsesStandIn
+
+from app.config import Settings
+from app.models import ProviderRequest
+from app.providers import ProviderError
+from app.providers.openai_responses import OpenAIResponsesProvider
+from app.warmth import ModelWarmthManager
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeWarmUp:
+    def __init__(self, clock: FakeClock, durations: list[float]) -> None:
+        self.clock = clock
+        self.durations = durations
+        self.calls = 0
+
+    async def __call__(self) -> None:
+        self.calls += 1
+        duration = self.durations.pop(0)
+        if duration < 0:
+            raise ProviderError("backend unavailable")
+        self.clock.now += duration
+
+
+def build_provider(**overrides: object) -> OpenAIResponsesProvider:
+    settings: dict[str, object] = {
+        "model": "test-model",
+        "base_url": "http://127.0.0.1:8000/v1",
+        "api_key": "placeholder",
+        "timeout_seconds": 10.0,
+        "system_prompt": "system prompt",
+        "enable_streaming": False,
+        "prefer_responses_role_compat": False,
+        "enable_token_debug_logs": False,
+        "enable_throughput_debug_logs": False,
+        "model_keep_alive": "30m",
+    }
+    settings.update(overrides)
+    return OpenAIResponsesProvider(Settings(**settings))  # type: ignore[arg-type]
+
+
+def test_warm_up_records_cold_starts() -> None:
+    clock = FakeClock()
+    warm_up = FakeWarmUp(clock, [12.5, 0.2])
+    manager = ModelWarmthManager(warm_up, clock=clock)
+
+    assert manager.snapshot().state == "unknown"
+    assert asyncio.run(manager.warm_up()) is True
+    cold = manager.snapshot()
+    assert cold.state == "warm"
+    assert cold.last_cold_start_ms == 12500
+    assert cold.last_cold_start_at is not None
+
+    assert asyncio.run(manager.warm_up()) is True
+    assert manager.snapshot() == cold
+
+
+def test_failed_warm_up_marks_the_model_cold() -> None:
+    clock = FakeClock()
+    manager = ModelWarmthManager(FakeWarmUp(clock, [-1]), clock=clock)
+
+    assert asyncio.run(manager.warm_up()) is False
+    assert manager.snapshot().state == "cold"
+    assert manager.snapshot().last_cold_start_ms is None
+
+
+def test_keep_alive_pings_only_after_idle_intervals(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    clock = FakeClock()
+    warm_up = FakeWarmUp(clock, [0.5] * 10)
+    manager = ModelWarmthManager(
+        warm_up,
+        warm_up_on_start=True,
+        keep_alive_interval_seconds=60,
+        clock=clock,
+    )
+    sleeps: list[float] = []
+
+    async def fake_sleep(seconds: float) -> None:
+        sleeps.append(seconds)
+        if len(sleeps) == 1:
+            clock.now += 30
+            manager.record_activity()
+            seconds -= 30
+        if len(sleeps) == 3:
+            raise asyncio.CancelledError
+        clock.now += seconds
+
+    monkeypatch.setattr("app.warmth.asyncio.sleep", fake_sleep)
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(manager.run())
+
+    # Start-up warm-up, then one keep-alive once the turn recorded halfway
+    # through the first interval has been idle for a full interval.
+    assert warm_up.calls == 2
+    assert sleeps == pytest.approx([60, 30, 60])
+
+
+@pytest.mark.anyio
+async def test_provider_warm_up_sends_a_minimal_request(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    server = ResponsesStandIn()
+    server.install(monkeypatch)
+    provider = build_provider(
+        backend_base_urls=("http://a.test/v1", "http://b.test/v1")
+    )
+
+    await provider.warm_up("Reply with OK.")
+
+    assert (
+        server.requests
+        == [
+            {
+                "model": "test-model",
+                "input": "Reply with OK.",
+                "max_output_tokens": 16,
+                "keep_alive": "30m",
+            }
+        ]
+        * 2
+    )
+
+
+@pytest.mark.anyio
+async def test_keep_alive_hint_is_sent_with_turns(monkeypatch) -> None:  # type: ignore[no-untyped-def]
+    server = ResponsesStandIn()
+    server.install(monkeypatch)
+    provider = build_provider()
+
+    await provider.generate(
+        ProviderRequest(
+            system_prompt="system prompt",
+            context={},
+            history=[],
+            message="Hello",
+        )
+    )
+
+    assert server.requests[0]["keep_alive"] == "30m"